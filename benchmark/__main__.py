@@ -0,0 +1,44 @@
+import json
+import sys
+from argparse import ArgumentParser, Namespace
+from typing import Any, Dict, List
+
+from .suite import compare_results, default_sizes, get_metadata, run_benchmarks
+
+
+def main() -> None:
+    """Runs the benchmark suite, writes the results as JSON, and optionally compares them to a previous run."""
+    arg_parser: ArgumentParser = ArgumentParser(
+        prog="python3 -m benchmark", description="Benchmark the python-dev-cli hot paths"
+    )
+    arg_parser.add_argument(
+        "-s", "--sizes", type=int, nargs="+", default=default_sizes, help="numbers of scripts to benchmark"
+    )
+    arg_parser.add_argument("-r", "--repeat", type=int, default=5, help="number of times to run each benchmark")
+    arg_parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)")
+    arg_parser.add_argument("-c", "--compare", metavar="BASELINE", help="JSON results of a previous run to compare to")
+    arg_parser.add_argument(
+        "-t", "--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression (default: 1.2)"
+    )
+    args: Namespace = arg_parser.parse_args()
+
+    results: Dict[str, Any] = {**get_metadata(), "results": run_benchmarks(args.sizes, args.repeat)}
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline: Dict[str, Any] = json.load(file)
+        lines: List[str] = compare_results(baseline, results, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if any(line.endswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from src.python_dev_cli import templates
+from src.python_dev_cli.cli import build_arg_parser
+from src.python_dev_cli.scripts import Scripts
+
+# Root directory of the repository, which must be on the Python path for the `src.python_dev_cli` package to import.
+repo_root: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Version of the results file format; bump this whenever the structure of the results changes.
+results_format: int = 1
+
+# Number of scripts in each synthetic pyproject.toml file.
+default_sizes: List[int] = [10, 100, 1000, 10000]
+
+# Maximum depth of nested list references; each list script references the one before it, up to this depth.
+max_list_depth: int = 50
+
+
+def make_config(size: int) -> Dict[str, Any]:
+    """Returns a synthetic pyproject.toml configuration with the given number of scripts. Every fifth script is a
+    template that references another script and evaluates an expression, and every fifth script is a list that
+    references the previous list (up to `max_list_depth` deep) and a plain command; the rest are plain commands.
+
+    :param size: The number of scripts.
+    :return: A dictionary representing a pyproject.toml file.
+    """
+    scripts: Dict[str, str | List[str]] = {}
+    previous_list: str | None = None
+    depth: int = 0
+
+    for i in range(size):
+        command_key: str = f"cmd_{i - i % 5}"
+
+        if i % 5 == 3:
+            scripts[f"tpl_{i}"] = f"echo {{{{ dev.{command_key} }}}} {{{{ {i} * 2 }}}} {{{{ os.sep }}}}"
+        elif i % 5 == 4:
+            key: str = f"list_{i}"
+            scripts[key] = [previous_list, command_key] if previous_list and depth < max_list_depth else [command_key]
+            depth = depth + 1 if scripts[key][0] == previous_list else 0
+            previous_list = key
+        else:
+            scripts[f"cmd_{i}"] = f"echo {i} $HOME"
+
+    return {"tool": {"python-dev-cli": {"settings": {"include": ["os"]}, "scripts": scripts}}}
+
+
+def to_toml(config: Dict[str, Any]) -> str:
+    """Returns the given synthetic configuration as the contents of a pyproject.toml file. JSON strings are valid TOML
+    basic strings, so values are quoted using `json.dumps()`.
+
+    :param config: A dictionary returned by `make_config()`.
+    :return: The contents of a pyproject.toml file.
+    """
+    table: Dict[str, Any] = config["tool"]["python-dev-cli"]
+    lines: List[str] = ["[tool.python-dev-cli.settings]"]
+    lines += [f"{key} = {json.dumps(value)}" for key, value in table["settings"].items()]
+    lines += ["", "[tool.python-dev-cli.scripts]"]
+    lines += [f"{key} = {json.dumps(value)}" for key, value in table["scripts"].items()]
+    return "\n".join(lines) + "\n"
+
+
+def measure(func: Callable[[], Any], repeat: int, setup: Callable[[], Any] | None = None) -> Dict[str, float]:
+    """Calls the given function `repeat` times, and returns statistics about how long it took, in milliseconds. If a
+    setup function is given, it is called (untimed) before each call, and its return value is passed to the function.
+
+    :param func: The function being measured.
+    :param repeat: The number of times to call the function.
+    :param setup: An optional function that prepares the arguments of each call.
+    :return: A dictionary with the min, median and mean durations.
+    """
+    durations: List[float] = []
+
+    for _ in range(repeat):
+        args: List[Any] = [setup()] if setup else []
+        start: float = time.perf_counter()
+        func(*args)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+    }
+
+
+def run_dev_cli(argv: List[str], cwd: str) -> None:
+    """Runs the dev CLI with the given args in a new Python process, discarding its output.
+
+    :param argv: The command line args, excluding the program name.
+    :param cwd: The directory to run the dev CLI in; it must contain a pyproject.toml file.
+    """
+    code: str = f"import sys; sys.argv = {['dev', *argv]!r}; from src.python_dev_cli.cli import dev_cli; dev_cli()"
+    env: Dict[str, str] = {**os.environ, "PYTHONPATH": repo_root}
+    subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, check=True)
+
+
+def run_benchmarks(sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    """Runs every benchmark for each of the given sizes of synthetic pyproject.toml file.
+
+    :param sizes: The numbers of scripts to benchmark.
+    :param repeat: The number of times to run each benchmark.
+    :return: A list of results, each with the benchmark name, size and durations.
+    """
+    results: List[Dict[str, Any]] = []
+
+    for size in sizes:
+        config: Dict[str, Any] = make_config(size)
+        scripts: Scripts = Scripts.from_config(config)
+        list_keys: List[str] = [key for key in scripts if key.startswith("list_")]
+        template_keys: List[str] = [key for key in scripts if key.startswith("tpl_")]
+
+        def fresh_scripts() -> Scripts:
+            templates.set_bytecode_cache(None)  # Clears the compiled template cache.
+            return Scripts.from_config(config)
+
+        benchmarks: Dict[str, Dict[str, float]] = {
+            "from_config": measure(lambda: Scripts.from_config(config), repeat),
+            "resolve_list": measure(
+                lambda s: [s._Scripts__resolve_list(key) for key in list_keys], repeat, fresh_scripts
+            ),
+            "parse": measure(lambda s: [s._Scripts__parse(key) for key in template_keys], repeat, fresh_scripts),
+            "build_arg_parser": measure(lambda: build_arg_parser(scripts), repeat),
+        }
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "pyproject.toml"), "w") as file:
+                file.write(to_toml(config))
+            run_dev_cli(["cmd_0"], tmp_dir)  # Warm up the on-disk cache.
+            benchmarks["dev_cli"] = measure(lambda: run_dev_cli(["cmd_0"], tmp_dir), repeat)
+            benchmarks["dev_cli_no_cache"] = measure(lambda: run_dev_cli(["--no-cache", "cmd_0"], tmp_dir), repeat)
+            benchmarks["dev_cli_help"] = measure(lambda: run_dev_cli(["--help"], tmp_dir), repeat)
+
+        for name, durations in benchmarks.items():
+            results.append({"name": name, "size": size, **durations})
+
+    return results
+
+
+def get_metadata() -> Dict[str, Any]:
+    """Returns information about the environment the benchmarks were run in, so results can be compared fairly.
+
+    :return: A dictionary of metadata.
+    """
+    try:
+        commit: str | None = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=repo_root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "format": results_format,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Compares the median durations of two sets of results, and returns a line of text for each benchmark that is in
+    both. Benchmarks that are slower than the baseline by more than the given ratio are marked as regressions.
+
+    :param baseline: The results of a previous run, as written by the benchmark suite.
+    :param current: The results of the current run.
+    :param threshold: The ratio of current to baseline median duration above which a benchmark has regressed.
+    :return: A list of lines of text.
+    """
+    previous: Dict[tuple, float] = {(r["name"], r["size"]): r["median"] for r in baseline["results"]}
+    lines: List[str] = []
+
+    for result in current["results"]:
+        key: tuple = (result["name"], result["size"])
+        if key not in previous:
+            continue
+        ratio: float = result["median"] / previous[key] if previous[key] else float("inf")
+        status: str = "REGRESSION" if ratio > threshold else "ok"
+        lines.append(
+            f"{result['name']:<20} {result['size']:>6} {previous[key]:>10.2f}ms {result['median']:>10.2f}ms "
+            f"{ratio:>6.2f}x  {status}"
+        )
+
+    return lines
@@ -1,7 +1,13 @@
-from importlib.metadata import version, PackageNotFoundError
+def __getattr__(name):
+    # Importing importlib.metadata is slow, so the version is only looked up the first time it is accessed, rather than
+    # every time the `dev` CLI starts up.
+    if name == "__version__":
+        from importlib.metadata import version, PackageNotFoundError
 
-try:
-    __version__ = version("epi_models")
-except PackageNotFoundError:
-    # If the package is not installed, don't add __version__
-    pass
+        try:
+            return version("epi_models")
+        except PackageNotFoundError:
+            # If the package is not installed, don't add __version__
+            pass
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
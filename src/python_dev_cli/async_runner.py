@@ -0,0 +1,186 @@
+import asyncio
+import signal
+import sys
+from asyncio.subprocess import PIPE, Process
+from logging import Logger, getLogger
+from subprocess import CalledProcessError, CompletedProcess, TimeoutExpired
+from typing import TYPE_CHECKING, Callable, Final, List, TextIO
+
+from .calls import Call, get_call_args
+from .capture import signal_process_group
+
+if TYPE_CHECKING:
+    from .pool import WorkerPool
+
+logger: Logger = getLogger(__name__)
+
+# Maximum number of bytes buffered for a single line of output; longer lines are written out in chunks of this size.
+line_limit: Final[int] = 2**16
+
+# Number of seconds to wait for a process to exit after it is terminated, before it is killed.
+terminate_timeout: Final[float] = 5.0
+
+
+async def run_command(
+    args: List[str],
+    prefix: str = "",
+    check: bool = True,
+    capture: bool = False,
+    out_stream: TextIO | None = None,
+    err_stream: TextIO | None = None,
+    timeout: float | None = None,
+    on_start: Callable[[int], None] | None = None,
+    **kwargs,
+) -> CompletedProcess:
+    """Runs a command using asyncio, streaming its stdout and stderr line by line to the given text streams, with each
+    line prefixed by the given string. Output is never buffered in memory beyond a single line, so this is suitable for
+    long-running processes such as servers and file watchers, unless `capture` is True. If the coroutine is cancelled,
+    the process is terminated.
+
+    :param args: The command to run, as a list of args.
+    :param prefix: A string to prepend to each line of output (e.g. "[script_key] ").
+    :param check: If True and the exit code was non-zero, raise a CalledProcessError.
+    :param capture: If True, stdout and stderr are also captured in memory (without the prefix), and returned as bytes.
+    :param out_stream: The text stream to write stdout to; defaults to sys.stdout.
+    :param err_stream: The text stream to write stderr to; defaults to sys.stderr.
+    :param timeout: If given, the number of seconds after which the process is terminated.
+    :param on_start: An optional function to call with the pid of the process, once it has started (e.g. to apply the
+        resource limits of a `policy.ScriptPolicy`).
+    :param kwargs: Additional keyword arguments to pass to asyncio.create_subprocess_exec() (e.g. cwd, env).
+    :return: A CompletedProcess instance; stdout and stderr are None, unless they are captured.
+    :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+    :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
+    """
+    process: Process = await asyncio.create_subprocess_exec(*args, stdout=PIPE, stderr=PIPE, limit=line_limit, **kwargs)
+    if on_start is not None:
+        on_start(process.pid)
+    stdout: List[bytes] | None = [] if capture else None
+    stderr: List[bytes] | None = [] if capture else None
+
+    async def communicate() -> int:
+        await asyncio.gather(
+            pump_stream(process.stdout, prefix, out_stream or sys.stdout, stdout),
+            pump_stream(process.stderr, prefix, err_stream or sys.stderr, stderr),
+        )
+        return await process.wait()
+
+    try:
+        returncode: int = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        await terminate(process)
+        out, err = [b"".join(buffer) if buffer is not None else None for buffer in [stdout, stderr]]
+        raise TimeoutExpired(args, timeout, out, err) from None
+    except asyncio.CancelledError:
+        await terminate(process)
+        raise
+
+    out: bytes | None = b"".join(stdout) if stdout is not None else None
+    err: bytes | None = b"".join(stderr) if stderr is not None else None
+
+    if check and returncode != 0:
+        raise CalledProcessError(returncode, args, out, err)
+
+    return CompletedProcess(args, returncode, out, err)
+
+
+async def run_call_async(
+    call: Call,
+    prefix: str = "",
+    check: bool = True,
+    capture: bool = False,
+    out_stream: TextIO | None = None,
+    err_stream: TextIO | None = None,
+    pool: "WorkerPool | None" = None,
+    **kwargs,
+) -> CompletedProcess:
+    """Runs a Call in a worker process, if a WorkerPool is given; its stdout and stderr are captured, and written to
+    the given text streams once it finishes, with each line prefixed by the given string. A call in a worker process
+    cannot be interrupted, so if the coroutine is cancelled, the call still runs to completion.
+
+    Otherwise, the call is run like any other command, in a new Python process (see `calls.get_call_args()`), rather
+    than in the current process, where it would change the process-wide state (e.g. `sys.stdout` and the working
+    directory) of every other command running alongside it.
+
+    :param call: The Call to run.
+    :param prefix: A string to prepend to each line of output (e.g. "[script_key] ").
+    :param check: If True and the exit code was non-zero, raise a CalledProcessError.
+    :param capture: If True, stdout and stderr are also returned, as bytes.
+    :param out_stream: The text stream to write stdout to; defaults to sys.stdout.
+    :param err_stream: The text stream to write stderr to; defaults to sys.stderr.
+    :param pool: An optional WorkerPool to run the call in.
+    :param kwargs: Additional keyword arguments to pass to `calls.run_call()`, or to `run_command()` (e.g. cwd, env).
+    :return: A CompletedProcess instance; stdout and stderr are None, unless they are captured.
+    :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+    """
+    if pool is None:
+        return await run_command(get_call_args(call), prefix, check, capture, out_stream, err_stream, **kwargs)
+
+    from concurrent.futures.process import BrokenProcessPool  # Deferred, as only the pool needs multiprocessing.
+
+    try:
+        process: CompletedProcess = await asyncio.wrap_future(pool.submit(call, capture_output=True, **kwargs))
+    except BrokenProcessPool as e:
+        process = pool.get_broken_result(call, e)
+
+    for data, stream in [(process.stdout, out_stream or sys.stdout), (process.stderr, err_stream or sys.stderr)]:
+        if data:
+            stream.write("".join(f"{prefix}{line}\n" for line in data.decode(errors="replace").splitlines()))
+            stream.flush()
+
+    if check and process.returncode != 0:
+        raise CalledProcessError(process.returncode, process.args, process.stdout, process.stderr)
+
+    return process if capture else CompletedProcess(process.args, process.returncode)
+
+
+async def pump_stream(
+    reader: asyncio.StreamReader, prefix: str, stream: TextIO, buffer: List[bytes] | None = None
+) -> None:
+    """Copies lines from the given stream reader to the given text stream until EOF, prepending a prefix to each line.
+    Lines longer than `line_limit` are split into chunks, rather than being buffered in memory.
+
+    :param reader: A stream reader connected to the stdout or stderr of a process.
+    :param prefix: A string to prepend to each line.
+    :param stream: The text stream to write to.
+    :param buffer: An optional list; if given, each chunk of output is also appended to it, as bytes.
+    """
+    while True:
+        try:
+            line: bytes = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial  # The stream has ended; this is the last line, if it did not end with a newline.
+        except asyncio.LimitOverrunError as e:
+            line = await reader.read(e.consumed)
+
+        if not line:
+            break
+
+        if buffer is not None:
+            buffer.append(line)
+
+        text: str = line.decode(errors="replace")
+        stream.write(f"{prefix}{text}" if text.endswith("\n") else f"{prefix}{text}\n")
+        stream.flush()
+
+
+async def terminate(process: Process) -> None:
+    """Terminates the given process and waits for it to exit, killing it if it does not exit within `terminate_timeout`
+    seconds. If it was started in its own process group (e.g. by passing `process_group=0`), every process in the group
+    is terminated along with it.
+
+    :param process: The process to terminate.
+    """
+    if process.returncode is not None:
+        return
+
+    try:
+        if not signal_process_group(process.pid, signal.SIGTERM):
+            process.terminate()
+        await asyncio.wait_for(process.wait(), timeout=terminate_timeout)
+    except ProcessLookupError:
+        pass  # The process has already exited.
+    except asyncio.TimeoutError:
+        logger.debug(f"Process {process.pid} did not exit within {terminate_timeout} seconds; killing it")
+        if not signal_process_group(process.pid, signal.SIGKILL):
+            process.kill()
+        await process.wait()
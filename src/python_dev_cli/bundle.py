@@ -0,0 +1,99 @@
+import marshal
+import os
+from logging import Logger, getLogger
+from typing import Any, Dict, List
+
+from jinja2.exceptions import TemplateError
+
+from .cache import ConfigCache, bundle_format
+from .calls import Call
+from .commands import CompiledCommand, compile_command
+from .env import EnvVars
+from .scripts import ScriptReferenceError, Scripts, ScriptTemplateError, is_posix, template_pattern
+from .templates import is_static_template
+from .timings import timed
+
+logger: Logger = getLogger(__name__)
+
+
+def compile_bundle(cache: ConfigCache) -> str:
+    """Compiles the scripts defined in the pyproject.toml file of the given cache into a bundle, written next to it in
+    the compact binary format of the `marshal` module (see `cache.bundle_file_name`). The bundle holds everything that
+    `dev` otherwise derives from the pyproject.toml file at startup: the configuration, the flattened script references
+    of every list script, the rendered output of every static template, the args of every command, and the full path of
+    the executable each command runs. While the bundle is newer than the pyproject.toml file, `dev` loads it instead
+    (see `ConfigCache`), so it never parses TOML, splits commands, renders static templates or imports Jinja2.
+
+    Nothing that depends on the environment is compiled: environment variables are still expanded when scripts run,
+    and templates that are not static (e.g. those that use `env` or modules in `settings.include`) are still rendered.
+    Generated environment variables are never generated while compiling, and scripts that cannot be resolved are
+    skipped, as the error is raised when they run.
+
+    :param cache: The ConfigCache of the project; any existing bundle is ignored, and the pyproject.toml file is read.
+    :return: The path to the bundle.
+    :raises FileNotFoundError: If the pyproject.toml file is not found.
+    :raises ValueError: If the configuration contains values that cannot be stored in a bundle (e.g. dates).
+    :raises OSError: If the bundle cannot be written.
+    """
+    compiled_cache: ConfigCache = ConfigCache(cache.pyproject_path, cache.directory, use_bundle=False)
+    scripts: Scripts = Scripts.from_config(cache=compiled_cache)
+    scripts.env = EnvVars()  # So no environment variables are generated while compiling.
+    scripts.cache = compiled_cache  # Set again, as replacing the environment variables invalidates it.
+    posix: bool = is_posix()
+    templates_enabled: bool = scripts.settings.enable_templates
+    script_refs: str = str(scripts.settings.script_refs)
+    commands: Dict[str, CompiledCommand] = {}
+
+    def add_command(command: str) -> None:
+        if isinstance(command, Call) or (templates_enabled and template_pattern.search(command)):
+            return
+        try:
+            commands[command] = compile_command(command, posix)
+        except ValueError:
+            pass  # The command cannot be split, so the error is raised when it runs.
+
+    with timed("compile bundle"):
+        for key in scripts:
+            script: Any = scripts[key]
+            command: Any = script.get("cmd") if isinstance(script, dict) else script
+            if isinstance(command, str):
+                add_command(command)
+
+            try:
+                unparsed: List[str] = scripts.get_script_command(key, parse=False)
+                templates: List[str] = [
+                    command
+                    for command in unparsed
+                    if templates_enabled and not isinstance(command, Call) and template_pattern.search(command)
+                ]
+                if templates and all(is_static_template(template, script_refs) for template in templates):
+                    for command, parsed in zip(unparsed, scripts.get_script_command(key)):
+                        if command in templates:
+                            add_command(parsed)
+            except (KeyError, TypeError, ValueError, ScriptReferenceError, ScriptTemplateError, TemplateError) as e:
+                logger.debug(f"Unable to compile script [{key}]: {e}")
+
+        for compiled in commands.values():
+            if compiled.argv and 0 not in compiled.holes:
+                scripts.executables.which(compiled.argv[0])
+
+    bundle: Dict[str, Any] = {
+        "format": bundle_format,
+        "size": os.stat(cache.pyproject_path).st_size,
+        **compiled_cache.export(),
+        "commands": [(command, posix, compiled.argv, compiled.holes) for command, compiled in commands.items()],
+        "executables": scripts.executables.export(),
+    }
+
+    try:
+        data: bytes = marshal.dumps(bundle)
+    except ValueError as e:
+        raise ValueError(f"Unable to compile bundle for {cache.pyproject_path}: {e}") from e
+
+    tmp_path: str = f"{cache.bundle_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, cache.bundle_path)
+
+    logger.info(f"Compiled {len(scripts)} scripts and {len(commands)} commands to: {cache.bundle_path}")
+    return cache.bundle_path
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import marshal
+import os
+import time
+import tomllib
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List
+
+from .commands import add_precompiled_commands
+from .config import get_project_root
+from .settings import Settings
+from .timings import timed
+
+logger: Logger = getLogger(__name__)
+
+# Name of the directory, relative to the project root, where python-dev-cli stores cached data.
+cache_dir_name: Final[str] = ".python-dev-cli"
+
+# Environment variable that can be set to a false value (e.g. "0" or "false") to disable the on-disk cache.
+cache_env_var: Final[str] = "PYTHON_DEV_CLI_CACHE"
+
+# Version of the cache file format; bump this whenever the structure of the cache file changes.
+cache_format: Final[int] = 1
+
+# Name of the precompiled bundle written by `dev --compile`, next to the pyproject.toml file (see `bundle.py`).
+bundle_file_name: Final[str] = "pyproject.dev-bundle"
+
+# Version of the bundle format; bump this whenever the structure of the bundle changes.
+bundle_format: Final[int] = 1
+
+# Files modified less than this many seconds before being fingerprinted are always verified using a content hash,
+# because a subsequent change within the same filesystem timestamp granularity would not change the file's mtime.
+racy_mtime_window: Final[float] = 2.0
+
+
+def get_cache_dir(root: str | None = None) -> str:
+    """Returns the path to the cache directory in the project root, creating it if it does not exist. When the directory
+    is created, a .gitignore file is added to its parent directory, so that cached data is never committed.
+
+    :param root: The path to the project root; defaults to the result of `get_project_root()`.
+    :return: The path to the cache directory.
+    """
+    base_dir: str = os.path.join(root or get_project_root(), cache_dir_name)
+    cache_dir: str = os.path.join(base_dir, "cache")
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(base_dir, ".gitignore"), "w") as file:
+            file.write("# Automatically created by python-dev-cli.\n*\n")
+
+    return cache_dir
+
+
+def get_stat_fingerprint(stat: os.stat_result) -> List[int] | None:
+    """Returns the mtime and size of a file as a fingerprint, or None if the file was modified too recently for its
+    mtime to be trusted (see `racy_mtime_window`), in which case its contents should be hashed instead.
+
+    :param stat: The result of `os.stat()` for the file.
+    :return: A list containing the mtime (in nanoseconds) and size of the file, or None.
+    """
+    if time.time() - stat.st_mtime < racy_mtime_window:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def is_cache_enabled() -> bool:
+    """Returns True unless the on-disk cache has been disabled using the PYTHON_DEV_CLI_CACHE environment variable.
+
+    :return: Whether the on-disk cache is enabled.
+    """
+    return Settings.cast_to_bool(os.environ.get(cache_env_var, "true"))
+
+
+class ConfigCache:
+    """A persistent, on-disk cache of the [tool.python-dev-cli] configuration in pyproject.toml, along with values
+    derived from it: the flattened script references of each list script, and the rendered output of script templates
+    that only depend on other scripts. The cache is keyed by the mtime and size of the pyproject.toml file, falling back
+    to a content hash, and is automatically invalidated when the file changes.
+
+    If there is a precompiled bundle next to the pyproject.toml file (see `bundle.compile_bundle()`) that is newer than
+    it, the configuration is loaded from the bundle instead, without reading the pyproject.toml file at all.
+    """
+
+    def __init__(self, pyproject_path: str, directory: str | None = None, use_bundle: bool = True) -> None:
+        self.pyproject_path: str = str(pyproject_path)
+        self.root: str = os.path.dirname(self.pyproject_path)
+        self.directory: str = str(directory or os.path.join(self.root, cache_dir_name, "cache"))
+        self.use_bundle: bool = use_bundle
+        self.__bundle: Dict[str, Any] | None = None
+        self.__data: Dict[str, Any] | None = None
+        self.__dirty: bool = False
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.pyproject_path!r}, {self.directory!r})"
+
+    @property
+    def path(self) -> str:
+        """The path to the cache file."""
+        return os.path.join(self.directory, "config.json")
+
+    @property
+    def bundle_path(self) -> str:
+        """The path to the precompiled bundle."""
+        return os.path.join(self.root, bundle_file_name)
+
+    @property
+    def bundle(self) -> Dict[str, Any] | None:
+        """The precompiled bundle that the configuration was loaded from, or None if it was not loaded from one."""
+        return self.__bundle
+
+    @staticmethod
+    def from_project_root(root: str | None = None) -> "ConfigCache":
+        """Returns an instance of ConfigCache for the pyproject.toml file in the given project root. This does not touch
+        the filesystem; the cache is only read when it is first used, and only written when `save()` is called.
+
+        :param root: The path to the project root; defaults to the result of `get_project_root()`.
+        :return: An instance of ConfigCache.
+        """
+        return ConfigCache(os.path.join(root or get_project_root(), "pyproject.toml"))
+
+    def get_config(self) -> Dict[str, Any]:
+        """Returns the project configuration, containing only the [tool.python-dev-cli] table of the pyproject.toml
+        file. If the cache is stale or missing, the pyproject.toml file is parsed and the cache is reset.
+
+        :return: A dictionary of project configuration values.
+        :raises FileNotFoundError: If the pyproject.toml file is not found.
+        """
+        return {"tool": {"python-dev-cli": self.__get_data()["config"]}}
+
+    def get_rendered(self, template: str) -> str | None:
+        """Returns the cached output of the given script template, or None if it is not cached.
+
+        :param template: The script template source.
+        :return: The rendered script, or None.
+        """
+        return self.__get_data()["rendered"].get(template)
+
+    def get_resolved(self, list_key: str) -> List[str] | None:
+        """Returns the cached, flattened list of script keys referenced by the given list script, or None if it is not
+        cached.
+
+        :param list_key: The name of a script that is a list of script references.
+        :return: A flat list of script keys, or None.
+        """
+        return self.__get_data()["resolved"].get(list_key)
+
+    def set_rendered(self, template: str, rendered: str) -> None:
+        """Stores the rendered output of the given script template. Only templates whose output depends solely on the
+        pyproject.toml file should be stored.
+
+        :param template: The script template source.
+        :param rendered: The rendered script.
+        """
+        self.__get_data()["rendered"][template] = rendered
+        self.__dirty = True
+
+    def set_resolved(self, list_key: str, script_keys: List[str]) -> None:
+        """Stores the flattened list of script keys referenced by the given list script.
+
+        :param list_key: The name of a script that is a list of script references.
+        :param script_keys: A flat list of script keys.
+        """
+        self.__get_data()["resolved"][list_key] = list(script_keys)
+        self.__dirty = True
+
+    def export(self) -> Dict[str, Any]:
+        """Returns a copy of the cached data: the content hash of the pyproject.toml file, the configuration, and the
+        values derived from it; used to compile a bundle (see `bundle.compile_bundle()`).
+
+        :return: A dictionary with "sha256", "config", "resolved" and "rendered" keys.
+        :raises FileNotFoundError: If the pyproject.toml file is not found.
+        """
+        data: Dict[str, Any] = self.__get_data()
+        return {key: data[key] for key in ["sha256", "config", "resolved", "rendered"]}
+
+    def save(self) -> None:
+        """Writes the cache file, if anything has changed since it was loaded. The file is written atomically, so that
+        concurrent `dev` processes never read a partially written cache. Errors are logged and otherwise ignored, as the
+        cache is only an optimization.
+        """
+        if not self.__dirty or self.__data is None:
+            return
+
+        try:
+            self.make_directory()
+            tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(self.__data, file)
+            os.replace(tmp_path, self.path)
+            self.__dirty = False
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"Unable to write cache file {self.path}: {e}")
+
+    def make_directory(self) -> None:
+        """Creates the cache directory, using `get_cache_dir()` if it is the default one inside the project root."""
+        if os.path.abspath(self.directory) == os.path.abspath(os.path.join(self.root, cache_dir_name, "cache")):
+            get_cache_dir(self.root)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __get_data(self) -> Dict[str, Any]:
+        """Returns the cache data, loading and validating it on first use.
+
+        :return: A dictionary of cached data.
+        :raises FileNotFoundError: If the pyproject.toml file is not found.
+        """
+        if self.__data is not None:
+            return self.__data
+
+        if not os.path.exists(self.pyproject_path):
+            raise FileNotFoundError(f"No pyproject.toml file found in project root: {self.pyproject_path}")
+
+        stat: os.stat_result = os.stat(self.pyproject_path)
+
+        if self.use_bundle:
+            with timed("bundle load"):
+                bundle: Dict[str, Any] | None = self.__load_bundle(stat)
+            if bundle is not None:
+                add_precompiled_commands(bundle["commands"])
+                self.__bundle = bundle
+                self.__data = {
+                    "format": cache_format,
+                    "sha256": bundle["sha256"],
+                    "config": bundle["config"],
+                    "resolved": bundle["resolved"],
+                    "rendered": bundle["rendered"],
+                    "fingerprint": None,
+                }
+                return self.__data
+
+        fingerprint: List[int] | None = get_stat_fingerprint(stat)
+        with timed("cache load"):
+            data: Dict[str, Any] | None = self.__load()
+
+        if data is not None and fingerprint is not None and data.get("fingerprint") == fingerprint:
+            self.__data = data
+            return self.__data
+
+        # The mtime or size has changed (or cannot be trusted), so fall back to comparing a hash of the file contents.
+        with open(self.pyproject_path, "rb") as file:
+            content: bytes = file.read()
+        digest: str = hashlib.sha256(content).hexdigest()
+
+        if data is None or data.get("sha256") != digest:
+            with timed("toml parse"):
+                config: Dict[str, Any] = tomllib.loads(content.decode())
+            data = {
+                "format": cache_format,
+                "sha256": digest,
+                "config": config.get("tool", {}).get("python-dev-cli", {}),
+                "resolved": {},
+                "rendered": {},
+            }
+
+        data["fingerprint"] = fingerprint
+        self.__data = data
+        self.__dirty = True
+        return self.__data
+
+    def __load(self) -> Dict[str, Any] | None:
+        """Returns the contents of the cache file, or None if it is missing, corrupt, or in an outdated format."""
+        try:
+            with open(self.path, "r") as file:
+                data: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get("format") != cache_format:
+            return None
+
+        return data
+
+    def __load_bundle(self, stat: os.stat_result) -> Dict[str, Any] | None:
+        """Returns the contents of the precompiled bundle, or None if it is missing, corrupt, in an outdated format, or
+        older than the pyproject.toml file.
+
+        :param stat: The result of `os.stat()` for the pyproject.toml file.
+        :return: A dictionary of bundled data, or None.
+        """
+        try:
+            if os.stat(self.bundle_path).st_mtime_ns < stat.st_mtime_ns:
+                logger.debug(f"Ignoring bundle that is older than pyproject.toml: {self.bundle_path}")
+                return None
+            with open(self.bundle_path, "rb") as file:
+                bundle: Dict[str, Any] = marshal.load(file)
+        except (OSError, EOFError, TypeError, ValueError):
+            return None
+
+        if not isinstance(bundle, dict) or bundle.get("format") != bundle_format or bundle.get("size") != stat.st_size:
+            return None
+
+        logger.debug(f"Loaded configuration from bundle: {self.bundle_path}")
+        return bundle
@@ -0,0 +1,242 @@
+import importlib
+import io
+import os
+import runpy
+import sys
+import time
+import traceback
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from functools import reduce
+from logging import Logger, getLogger
+from subprocess import CompletedProcess
+from threading import RLock
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Tuple
+
+from .capture import CapturedProcess, LogWriter, TailBuffer, default_tail_size
+from .commands import Call
+
+logger: Logger = getLogger(__name__)
+
+# Calls run in the process that runs the scripts, and change process-wide state while they run (sys.argv, sys.stdout
+# and sys.stderr, and the working directory and environment variables, if given), so only one call runs at a time. This
+# does not stop other commands from seeing that state, so a call that may run alongside other commands is run in a new
+# Python process instead (see `get_call_args()`).
+call_lock: RLock = RLock()
+
+
+class CallOutput(io.RawIOBase):
+    """A stream for the captured output of a call, which passes everything written to it on to each of its targets (e.g.
+    a BytesIO, a TailBuffer or a LogWriter.Stream) as it arrives. It cannot be closed, as some tools close stdout once
+    they have written to it.
+    """
+
+    def __init__(self, *targets: Any) -> None:
+        super().__init__()
+        self.__targets: Tuple[Any, ...] = targets
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        for target in self.__targets:
+            target.write(data)
+        return len(data)
+
+    def close(self) -> None:
+        pass
+
+
+def load_callable(module: str, attr: str) -> Callable:
+    """Imports the given module, and returns the given attribute of it; the attribute can be a dotted path (e.g.
+    `Class.method`).
+
+    :param module: The name of the module.
+    :param attr: The name of the attribute.
+    :return: The callable.
+    :raises ImportError: If the module cannot be imported.
+    :raises AttributeError: If the attribute is not found.
+    :raises TypeError: If the attribute is not callable.
+    """
+    value: Any = reduce(getattr, attr.split("."), importlib.import_module(module))
+
+    if not callable(value):
+        raise TypeError(f"{module}:{attr} is not callable")
+
+    return value
+
+
+def get_exit_code(value: Any) -> int:
+    """Converts the return value of a call, or the code of a SystemExit it raised, into an exit code, in the same way
+    as `sys.exit()`: None is 0, an integer is itself, and anything else is written to stderr and is 1.
+
+    :param value: A return value, or `SystemExit.code`.
+    :return: An exit code.
+    """
+    if value is None:
+        return 0
+
+    if isinstance(value, int):
+        return int(value)
+
+    print(value, file=sys.stderr)
+    return 1
+
+
+def get_call_args(call: Call) -> List[str]:
+    """Returns the args of a command that runs a Call in a new Python process, using the same interpreter, with the
+    same result as `run_call()`: a module is run by `python -m`, and the return value of a function is its exit code.
+    Unlike `run_call()`, this never changes the state of the current process, so the call can run alongside other
+    commands, and its output is written to its own stdout and stderr.
+
+    :param call: A Call.
+    :return: A list of args.
+    """
+    if not call.attr:
+        return [sys.executable, "-m", call.module, *call.args]
+
+    code: str = (
+        "import sys; from functools import reduce; from importlib import import_module; "
+        f"sys.argv[0] = {call.module!r}; "
+        f"sys.exit(reduce(getattr, {call.attr!r}.split('.'), import_module({call.module!r}))())"
+    )
+    return [sys.executable, "-c", code, *call.args]
+
+
+@contextmanager
+def call_context(
+    call: Call,
+    cwd: str | None = None,
+    env: Dict[str, str] | None = None,
+    outputs: Tuple[CallOutput, CallOutput] | None = None,
+) -> Iterator[None]:
+    """Sets up the process for a call, and restores it afterward: `sys.argv` is set to the args of the call, the
+    working directory is prepended to `sys.path` (as `python -m` does), and the working directory and environment
+    variables are changed, if given. If `outputs` are given, stdout and stderr are redirected to them. All of these are
+    process-wide, so nothing else may run in the process until the call has finished.
+
+    :param call: A Call.
+    :param cwd: An optional working directory.
+    :param env: An optional replacement for the environment variables.
+    :param outputs: Optional streams to redirect stdout and stderr to.
+    :return: A context manager.
+    """
+    saved_argv: List[str] = sys.argv
+    saved_path: List[str] = list(sys.path)
+    saved_cwd: str = os.getcwd()
+    saved_env: Dict[str, str] | None = dict(os.environ) if env is not None else None
+
+    try:
+        if cwd is not None:
+            os.chdir(cwd)
+        if env is not None:
+            os.environ.clear()
+            os.environ.update(env)
+        sys.argv = call.argv
+        sys.path.insert(0, os.getcwd())
+
+        if outputs is None:
+            yield
+            return
+
+        stdout, stderr = [
+            io.TextIOWrapper(output, encoding="utf-8", errors="backslashreplace", write_through=True)
+            for output in outputs
+        ]
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            yield
+    finally:
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        if cwd is not None:
+            os.chdir(saved_cwd)
+        if saved_env is not None:
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+
+def run_call(
+    call: Call,
+    check: bool = False,
+    capture_output: bool = False,
+    cwd: str | None = None,
+    env: Dict[str, str] | None = None,
+    tail_size: int | None = None,
+    log_file: str | None = None,
+    text: bool = False,
+    **kwargs,
+) -> CompletedProcess:
+    """Runs a Call in the current process, and returns its result like subprocess.run() does: the exit code is the
+    return value of the function, or the code of the SystemExit it raised (see `get_exit_code()`); an uncaught
+    exception is written to stderr, and gives an exit code of 1. Modules stay imported, so calling them again is fast.
+
+    :param call: The Call to run.
+    :param check: If True and the exit code was non-zero, raise a CalledProcessError.
+    :param capture_output: If True, stdout and stderr are captured, and returned as bytes (or str, if `text` is True).
+    :param cwd: An optional working directory to run the call in.
+    :param env: An optional replacement for the environment variables while the call runs.
+    :param tail_size: If given, stdout and stderr are streamed through TailBuffers as the call writes them, and only
+        their last `tail_size` bytes are returned, in a CapturedProcess, as by `capture.run_captured()`.
+    :param log_file: If given, stdout and stderr are appended to this file as the call writes them, interleaved a line
+        at a time, as by `capture.run_captured()`.
+    :param text: If True, captured output is returned as str.
+    :param kwargs: Any other keyword arguments of subprocess.run() (e.g. `timeout`), which do not apply to calls.
+    :return: A CompletedProcess instance; or a CapturedProcess, if `tail_size` or `log_file` is given.
+    :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+    """
+    if kwargs:
+        logger.debug(f"Ignoring arguments that do not apply to calls: {', '.join(sorted(kwargs))}")
+
+    streamed: bool = tail_size is not None or log_file is not None
+    tails: List[TailBuffer] = [TailBuffer(default_tail_size if tail_size is None else tail_size) for _ in range(2)]
+    buffers: List[io.BytesIO] = [io.BytesIO(), io.BytesIO()]
+    log: BinaryIO | None = open(log_file, "ab", buffering=0) if log_file else None
+    writer: LogWriter | None = LogWriter(log) if log is not None else None
+    logs: List[LogWriter.Stream] = [writer.stream(), writer.stream()] if writer is not None else []
+    outputs: Tuple[CallOutput, CallOutput] | None = None
+
+    if streamed:
+        outputs = (CallOutput(tails[0], *logs[:1]), CallOutput(tails[1], *logs[1:]))
+    elif capture_output:
+        outputs = (CallOutput(buffers[0]), CallOutput(buffers[1]))
+
+    try:
+        with call_lock, call_context(call, cwd, env, outputs):
+            start: float = time.perf_counter()
+            try:
+                if call.attr:
+                    returncode: int = get_exit_code(load_callable(call.module, call.attr)())
+                else:
+                    runpy.run_module(call.module, run_name="__main__", alter_sys=True)
+                    returncode = 0
+            except SystemExit as e:
+                returncode = get_exit_code(e.code)
+            except Exception:
+                traceback.print_exc()
+                returncode = 1
+
+            duration: float = time.perf_counter() - start
+            for stream in [sys.stdout, sys.stderr]:
+                stream.flush()
+    finally:
+        for stream in logs:
+            stream.close()
+        if log is not None:
+            log.close()
+
+    if streamed:
+        stdout, stderr = [tail.getvalue() for tail in tails]
+        truncated: bool = any(tail.truncated for tail in tails)
+        result: CompletedProcess = CapturedProcess(call.argv, returncode, stdout, stderr, duration, log_file, truncated)
+    elif capture_output:
+        stdout, stderr = [buffer.getvalue() for buffer in buffers]
+        if text:
+            stdout, stderr = stdout.decode(errors="replace"), stderr.decode(errors="replace")
+        result = CompletedProcess(call.argv, returncode, stdout, stderr)
+    else:
+        result = CompletedProcess(call.argv, returncode)
+
+    if check:
+        result.check_returncode()
+
+    return result
@@ -0,0 +1,369 @@
+import os
+import signal
+import time
+from collections import deque
+from logging import Logger, getLogger
+from subprocess import PIPE, CalledProcessError, CompletedProcess, Popen, TimeoutExpired
+from threading import Lock, Thread
+from typing import IO, Any, BinaryIO, Callable, Deque, Final, List
+
+logger: Logger = getLogger(__name__)
+
+# Default number of bytes of stdout and stderr kept in memory for each command, when its output is streamed.
+default_tail_size: Final[int] = 2**16
+
+# Maximum number of bytes read from a pipe at once.
+read_size: Final[int] = 2**16
+
+# Keyword arguments of subprocess.run() that decode the output of a command; when output is streamed, they only apply
+# to the tail, as the log file always holds the raw bytes.
+text_kwargs: Final[frozenset] = frozenset(["text", "universal_newlines", "encoding", "errors"])
+
+
+class TailBuffer:
+    """A ring buffer that keeps only the last `size` bytes written to it, so the memory it uses is bounded no matter how
+    much output a command writes. Chunks are stored as they are written, and only joined when the value is read.
+    """
+
+    def __init__(self, size: int = default_tail_size) -> None:
+        self.size: int = size
+        self.__chunks: Deque[bytes] = deque()
+        self.__length: int = 0
+        self.__total: int = 0
+
+    def __len__(self):
+        return min(self.__length, self.size)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({len(self)} of {self.__total} bytes)"
+
+    @property
+    def total(self) -> int:
+        """The number of bytes written to the buffer, including those that have been discarded."""
+        return self.__total
+
+    @property
+    def truncated(self) -> bool:
+        """True if any bytes written to the buffer have been discarded."""
+        return self.__total > self.size
+
+    def write(self, data: bytes) -> None:
+        """Appends the given bytes to the buffer, discarding the oldest chunks that are no longer needed.
+
+        :param data: The bytes to append.
+        """
+        if not data:
+            return
+
+        self.__chunks.append(data)
+        self.__length += len(data)
+        self.__total += len(data)
+
+        while self.__chunks and self.__length - len(self.__chunks[0]) >= self.size:
+            self.__length -= len(self.__chunks.popleft())
+
+    def getvalue(self) -> bytes:
+        """Returns the last `size` bytes written to the buffer.
+
+        :return: A bytes object.
+        """
+        value: bytes = b"".join(self.__chunks)
+        return value[-self.size :] if self.size else b""
+
+
+class CapturedProcess(CompletedProcess):
+    """The result of a command whose output was streamed through a TailBuffer, rather than captured in full. Like a
+    CompletedProcess, it has `args` and `returncode` attributes; its `stdout` and `stderr` only hold the last bytes of
+    each stream (see `tail_size`), and it also records how long the command took to run and where its full output was
+    written, if anywhere.
+    """
+
+    def __init__(
+        self,
+        args: Any,
+        returncode: int,
+        stdout: Any = None,
+        stderr: Any = None,
+        duration: float = 0.0,
+        log_file: str | None = None,
+        truncated: bool = False,
+    ) -> None:
+        super().__init__(args, returncode, stdout, stderr)
+        self.duration: float = duration
+        self.log_file: str | None = log_file
+        self.truncated: bool = truncated
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(args={self.args!r}, returncode={self.returncode!r}, "
+            f"duration={self.duration:.3f}, log_file={self.log_file!r}, truncated={self.truncated!r})"
+        )
+
+    def check_returncode(self) -> None:
+        """Raises a CalledProcessError, with the tails of stdout and stderr as its output, if the exit code was
+        non-zero.
+
+        :raises CalledProcessError: If the exit code was non-zero.
+        """
+        if self.returncode:
+            raise CalledProcessError(self.returncode, self.args, self.stdout, self.stderr)
+
+
+class LogWriter:
+    """Writes the output of several streams to one log file, a line at a time, so that lines from different streams
+    are interleaved but never split. Each stream writes through its own `LogWriter.Stream`, which holds back any
+    incomplete line until the rest of it arrives (or it grows larger than `read_size`, or the stream is closed).
+    """
+
+    class Stream:
+        """One of the streams written to a LogWriter."""
+
+        def __init__(self, writer: "LogWriter") -> None:
+            self.__writer: LogWriter = writer
+            self.__pending: bytes = b""
+
+        def write(self, data: bytes) -> None:
+            """Writes every complete line in the given bytes to the log file, and holds back the rest.
+
+            :param data: The bytes read from the stream.
+            """
+            data = self.__pending + data
+            end: int = data.rfind(b"\n") + 1
+            if len(data) - end > read_size:
+                end = len(data)  # A very long line is written in pieces, so memory use stays bounded.
+            self.__pending = data[end:]
+            self.__writer.write(data[:end])
+
+        def close(self) -> None:
+            """Writes any incomplete line that was held back."""
+            self.__writer.write(self.__pending)
+            self.__pending = b""
+
+    def __init__(self, log: BinaryIO) -> None:
+        self.__log: BinaryIO = log
+        self.__lock: Lock = Lock()
+
+    def stream(self) -> "LogWriter.Stream":
+        """Returns a new stream that writes to this log file.
+
+        :return: A LogWriter.Stream instance.
+        """
+        return LogWriter.Stream(self)
+
+    def write(self, data: bytes) -> None:
+        """Writes the given bytes to the log file, without interleaving them with those written by other streams.
+
+        :param data: The bytes to write.
+        """
+        if data:
+            with self.__lock:
+                self.__log.write(data)
+
+
+def pump(pipe: IO[bytes], tail: TailBuffer, log: "LogWriter.Stream | None") -> None:
+    """Reads a pipe until it is closed, keeping the last bytes read in the given TailBuffer, and writing everything read
+    to the given log stream, if any.
+
+    :param pipe: The stdout or stderr pipe of a process.
+    :param tail: The TailBuffer to write to.
+    :param log: An optional stream of a LogWriter.
+    """
+    fd: int = pipe.fileno()
+
+    try:
+        while True:
+            data: bytes = os.read(fd, read_size)
+            if not data:
+                break
+            tail.write(data)
+            if log is not None:
+                log.write(data)
+    finally:
+        if log is not None:
+            log.close()
+
+
+def get_process_group_kwargs() -> dict:
+    """Returns the keyword arguments of subprocess.Popen() that start a process in its own process group, so it can be
+    killed along with any processes it starts (see `kill_process_group()`). Process groups are only supported on POSIX
+    systems; elsewhere, there are none.
+
+    :return: A dictionary of keyword arguments.
+    """
+    return {"process_group": 0} if os.name == "posix" else {}
+
+
+def signal_process_group(pid: int, sig: int) -> bool:
+    """Sends a signal to every process in the process group led by the given process, if it was started in its own
+    group (see `get_process_group_kwargs()`).
+
+    :param pid: The pid of the process.
+    :param sig: The signal to send (e.g. `signal.SIGTERM`).
+    :return: True if the signal was sent; or False if there is no such process group, and the caller should signal the
+        process itself.
+    """
+    if os.name != "posix":
+        return False
+
+    try:
+        os.killpg(pid, sig)
+        return True
+    except OSError as e:
+        logger.debug(f"Unable to signal process group {pid}: {e}")
+        return False
+
+
+def kill_process_group(process: Popen) -> None:
+    """Kills the given process, and every other process in its process group, if it was started in its own group (see
+    `get_process_group_kwargs()`); so that a child process that keeps its pipes open does not outlive it.
+
+    :param process: A process, ideally started with `get_process_group_kwargs()`.
+    """
+    if not signal_process_group(process.pid, signal.SIGKILL):
+        process.kill()
+
+
+def run_process(
+    args: List[str],
+    check: bool = False,
+    timeout: float | None = None,
+    input: bytes | str | None = None,
+    capture_output: bool = False,
+    on_start: Callable[[int], None] | None = None,
+    **kwargs,
+) -> CompletedProcess:
+    """Runs a command like subprocess.run(), except that it runs in its own process group, so that if it times out (or
+    `dev` is interrupted), any processes it has started are killed along with it; and that `on_start` is called with its
+    pid as soon as it has started, from the calling thread (unlike the `preexec_fn` of subprocess.Popen(), which runs
+    in the child process, and is not safe to use in a process with several threads).
+
+    :param args: The command to run, as a list of args.
+    :param check: If True and the exit code was non-zero, raise a CalledProcessError.
+    :param timeout: If given, the number of seconds after which the process group is killed.
+    :param input: Optional data to send to the stdin of the process.
+    :param capture_output: If True, stdout and stderr are captured.
+    :param on_start: An optional function to call with the pid of the process, once it has started.
+    :param kwargs: Additional keyword arguments to pass to subprocess.Popen() (e.g. cwd, env, text).
+    :return: A CompletedProcess instance.
+    :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+    :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
+    """
+    if input is not None:
+        kwargs["stdin"] = PIPE
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = PIPE
+
+    with Popen(args, **{**get_process_group_kwargs(), **kwargs}) as process:
+        try:
+            if on_start is not None:
+                on_start(process.pid)
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except TimeoutExpired:
+            kill_process_group(process)
+            stdout, stderr = process.communicate()
+            raise TimeoutExpired(process.args, timeout, stdout, stderr) from None
+        except BaseException:
+            kill_process_group(process)
+            raise
+        returncode: int = process.poll()
+
+    if check and returncode:
+        raise CalledProcessError(returncode, process.args, stdout, stderr)
+
+    return CompletedProcess(process.args, returncode, stdout, stderr)
+
+
+def decode_tail(data: bytes, kwargs: dict) -> Any:
+    """Decodes the tail of a stream if any of the text keyword arguments of subprocess.run() were given; the tail can
+    start in the middle of a character, so undecodable bytes are replaced unless `errors` is given.
+
+    :param data: The tail of a stream.
+    :param kwargs: The text keyword arguments given (see `text_kwargs`).
+    :return: A str if the output is text; otherwise, the given bytes.
+    """
+    if not any(kwargs.get(key) for key in text_kwargs):
+        return data
+
+    text: str = data.decode(kwargs.get("encoding") or "utf-8", kwargs.get("errors") or "replace")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def run_captured(
+    args: List[str],
+    tail_size: int = default_tail_size,
+    log_file: str | None = None,
+    check: bool = False,
+    timeout: float | None = None,
+    on_start: Callable[[int], None] | None = None,
+    **kwargs,
+) -> CapturedProcess:
+    """Runs a command like subprocess.run() with `capture_output=True`, except that its stdout and stderr are streamed
+    rather than held in memory: only the last `tail_size` bytes of each are kept, for error reporting, while the full
+    output of both is appended to the log file as it arrives, if one is given. Memory use is therefore bounded, however
+    much output the command writes.
+
+    The command runs in its own process group, so that if it times out (or `dev` is interrupted), any processes it has
+    started are killed along with it, rather than keeping its pipes open.
+
+    :param args: The command to run, as a list of args.
+    :param tail_size: The number of bytes of stdout and stderr to keep in memory.
+    :param log_file: An optional path to a file to append the full output to; stdout and stderr are interleaved a line
+        at a time, in the order they were read.
+    :param check: If True and the exit code was non-zero, raise a CalledProcessError.
+    :param timeout: If given, the number of seconds after which the process is killed.
+    :param on_start: An optional function to call with the pid of the process, once it has started (see
+        `run_process()`).
+    :param kwargs: Additional keyword arguments to pass to subprocess.Popen() (e.g. cwd, env); `text`, `encoding` and
+        `errors` only decode the tails.
+    :return: A CapturedProcess instance.
+    :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+    :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
+    """
+    text: dict = {key: kwargs.pop(key) for key in text_kwargs & set(kwargs)}
+    tails: List[TailBuffer] = [TailBuffer(tail_size), TailBuffer(tail_size)]
+    log: BinaryIO | None = open(log_file, "ab", buffering=0) if log_file else None
+    writer: LogWriter | None = LogWriter(log) if log is not None else None
+
+    try:
+        start: float = time.perf_counter()
+        with Popen(args, stdout=PIPE, stderr=PIPE, **{**get_process_group_kwargs(), **kwargs}) as process:
+            threads: List[Thread] = [
+                Thread(target=pump, args=(pipe, tail, writer.stream() if writer else None), daemon=True)
+                for pipe, tail in zip([process.stdout, process.stderr], tails)
+            ]
+            for thread in threads:
+                thread.start()
+
+            try:
+                if on_start is not None:
+                    on_start(process.pid)
+                returncode: int = process.wait(timeout)
+            except TimeoutExpired:
+                kill_process_group(process)
+                process.wait()
+                for thread in threads:
+                    thread.join()
+                stdout, stderr = [decode_tail(tail.getvalue(), text) for tail in tails]
+                raise TimeoutExpired(args, timeout, stdout, stderr)
+            except BaseException:
+                kill_process_group(process)
+                raise
+
+            for thread in threads:
+                thread.join()
+        duration: float = time.perf_counter() - start
+    finally:
+        if log is not None:
+            log.close()
+
+    stdout, stderr = [decode_tail(tail.getvalue(), text) for tail in tails]
+    truncated: bool = any(tail.truncated for tail in tails)
+    result: CapturedProcess = CapturedProcess(args, returncode, stdout, stderr, duration, log_file, truncated)
+
+    if check:
+        result.check_returncode()
+
+    return result
@@ -1,13 +1,48 @@
+import logging
+import os
 import sys
 from argparse import ArgumentParser, Namespace
 from logging import getLogger, Logger
-from typing import List
+from typing import Any, Dict, List, Set, Tuple
 
+from .cache import ConfigCache, is_cache_enabled
+from .completion import completion_shells, get_completion_keys, get_completion_script
 from .scripts import Scripts
+from .settings import Settings
+from .timings import Timings, enable_timings, timed
+from . import templates
 
 logger: Logger = getLogger(__name__)
 
 
+class LazyHelp:
+    """A deferred help string for a script subparser. Rendering script help can be expensive, because (with the
+    `parse_help` setting enabled) it parses every script template and imports every module in `settings.include`. This
+    object defers that work until argparse actually formats the help page, and caches the result.
+    """
+
+    def __init__(self, scripts: Scripts, script_key: str) -> None:
+        self.__scripts: Scripts = scripts
+        self.__script_key: str = script_key
+        self.__help: str | None = None
+
+    def __mod__(self, params: Dict[str, Any]) -> str:
+        # Argparse expands help strings using `help % params`; script help is displayed as-is, so that scripts that
+        # contain a literal `%` (e.g. `date +%Y`) do not break the help page.
+        return str(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.__script_key!r})"
+
+    def __str__(self):
+        if self.__help is None:
+            self.__help = str(self.__scripts.get_script_help(self.__script_key))
+        return self.__help
+
+    def strip(self, chars: str | None = None) -> str:
+        return str(self).strip(chars)
+
+
 def build_arg_parser(scripts: Scripts) -> ArgumentParser:
     """Returns the dev CLI argument parser. See also: https://docs.python.org/3/library/argparse.html
 
@@ -18,28 +53,245 @@ def build_arg_parser(scripts: Scripts) -> ArgumentParser:
         prog="dev", description="Python developer CLI for running custom scripts defined in pyproject.toml"
     )
     arg_parser.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+    arg_parser.add_argument("--no-cache", action="store_true", help="do not read or write the on-disk cache")
+    arg_parser.add_argument(
+        "--async",
+        action="store_true",
+        dest="run_async",
+        help="run scripts using asyncio, streaming their output prefixed with the script name",
+    )
+    arg_parser.add_argument(
+        "--timings", action="store_true", help="print how long each phase and command took, slowest first"
+    )
+    arg_parser.add_argument(
+        "--profile", metavar="FILE", help="write a Chrome trace of each phase and command to FILE (e.g. trace.json)"
+    )
+    arg_parser.add_argument(
+        "--graph", action="store_true", help="show the scripts referenced by a script (or all scripts) as a tree"
+    )
+    arg_parser.add_argument(
+        "--watch", action="store_true", help="run the script again whenever the files it depends on change"
+    )
+    arg_parser.add_argument(
+        "--all",
+        action="store_true",
+        help="run the script in every project under the current directory (see `dev --all --help`)",
+    )
+    arg_parser.add_argument(
+        "-j", "--jobs", type=int, metavar="N", help="maximum number of parallel scripts to run at once (default: CPUs)"
+    )
+    arg_parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="compile the scripts into a bundle next to pyproject.toml, which is loaded instead while it is newer",
+    )
+    arg_parser.add_argument(
+        "--completion",
+        choices=completion_shells,
+        help='print a shell completion script (e.g. add `eval "$(dev --completion bash)"` to ~/.bashrc)',
+    )
 
     # Add a subparser for each script defined in pyproject.toml, excluding scripts that start with an underscore.
     subparsers = arg_parser.add_subparsers(dest="script", title="available scripts")
     script_keys: List[str] = sorted([key for key in scripts if not key.startswith("_")])
-    [subparsers.add_parser(key, help=str(scripts.get_script_help(key))) for key in script_keys]
+    [subparsers.add_parser(key, help=LazyHelp(scripts, key)) for key in script_keys]
+
+    if scripts.settings.preload_executables:
+        scripts.preload_executables(script_keys)
 
     return arg_parser
 
 
-def dev_cli() -> None:
-    """The main entry point for the dev CLI. This is the function called by the `dev` command line script."""
+def is_public_script(scripts: Scripts, key: str) -> bool:
+    """Returns True if the given key is a script that can be run directly from the command line; that is, a script
+    defined in the pyproject.toml file whose name does not start with an underscore.
+
+    :param scripts: A Scripts object containing the scripts defined in the pyproject.toml file.
+    :param key: The name of the script.
+    :return: True if the script can be run directly.
+    """
+    return not key.startswith("_") and key in scripts
+
+
+def format_script_graph(scripts: Scripts, script_keys: List[str]) -> str:
+    """Returns the scripts referenced by each of the given scripts, formatted as a tree. Scripts that run a command are
+    shown with their unparsed command, and scripts that are referenced more than once are only expanded the first time;
+    later references are marked with `(*)`.
+
+    :param scripts: A Scripts object containing the scripts defined in the pyproject.toml file.
+    :param script_keys: The names of the scripts to show.
+    :return: A multi-line string.
+    :raises KeyError: If any of the scripts, or any script they reference, is not found.
+    :raises ScriptReferenceError: If any of the scripts references itself, either directly or through other scripts.
+    """
+    lines: List[str] = []
+
+    for script_key in script_keys:
+        scripts.get_script_command(script_key, parse=False)  # Raises an error if any script reference is invalid.
+        expanded: Set[str] = set()
+
+        # Each item on the stack is a script key, the prefix for its own line, and the prefix for the lines below it.
+        stack: List[Tuple[str, str, str]] = [(script_key, "", "")]
+
+        while stack:
+            key, prefix, child_prefix = stack.pop()
+            script = scripts[key]
+            references: List[str] = scripts.get_script_references(key)
+            cmd = script.get("cmd", script.get("call")) if isinstance(script, dict) else script
+            label: str = f"{key}: {cmd}" if isinstance(cmd, str) else key
+
+            if isinstance(script, dict) and script.get("parallel"):
+                label += " (parallel)"
+
+            if references and key in expanded:
+                lines.append(f"{prefix}{label} (*)")
+                continue
+
+            lines.append(f"{prefix}{label}")
+            expanded.add(key)
+
+            for i, reference in reversed(list(enumerate(references))):
+                last: bool = i == len(references) - 1
+                stack.append(
+                    (
+                        reference,
+                        child_prefix + ("`-- " if last else "|-- "),
+                        child_prefix + ("    " if last else "|   "),
+                    )
+                )
+
+    return "\n".join(lines)
+
+
+def get_option_value(argv: List[str], option: str) -> str | None:
+    """Returns the value of the given command line option (e.g. `--profile trace.json` or `--profile=trace.json`), or
+    None if it is not set. This is used for options that must take effect before the arguments are parsed.
+
+    :param argv: The command line args.
+    :param option: The name of the option, including the leading dashes.
+    :return: The value of the option, or None.
+    """
+    for i, arg in enumerate(argv):
+        if arg == option and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(f"{option}="):
+            return arg[len(option) + 1 :]
+    return None
+
+
+def report_timings(timings: Timings, profile_path: str | None, print_summary: bool) -> None:
+    """Writes the recorded timings to a Chrome trace file, and/or prints a summary table to stderr.
+
+    :param timings: The recorded timings.
+    :param profile_path: The path to write the trace file to, or None.
+    :param print_summary: Whether to print the summary table.
+    """
+    if print_summary:
+        print(timings.format_summary(), file=sys.stderr)
+
+    if profile_path:
+        try:
+            timings.write_trace(profile_path)
+            logger.info(f"Wrote {len(timings)} timing events to: {profile_path}")
+        except OSError as e:
+            logger.error(f"Unable to write profile to {profile_path}: {e}")
+
+
+def dev_cli(scripts: Scripts | None = None) -> None:
+    """The main entry point for the dev CLI. This is the function called by the `dev` command line script.
+
+    :param scripts: Scripts that are already loaded from the on-disk cache (e.g. by the daemon), used instead of loading
+        them again; ignored if the cache is disabled.
+    """
+    cache: ConfigCache | None = None
+    debug: bool = "-d" in sys.argv or "--debug" in sys.argv
+    profile_path: str | None = get_option_value(sys.argv, "--profile")
+    print_timings: bool = "--timings" in sys.argv
+
+    # Timings must be enabled before anything else, so that loading the configuration is included.
+    timings: Timings | None = enable_timings() if profile_path or print_timings else None
+
+    if debug:
+        logging.basicConfig(level=logging.DEBUG, format="%(levelname)s [%(name)s] %(message)s")
+
     try:
-        scripts: Scripts = Scripts.from_config()
-        cli: ArgumentParser = build_arg_parser(scripts)
-        args: Namespace = cli.parse_args()
+        # Workspace mode runs a script in every project under the working directory, so it does not load the scripts of
+        # the project in the working directory; there may not even be one.
+        if "--all" in sys.argv:
+            from .workspace import workspace_cli  # Deferred, as it imports asyncio.
+
+            workspace_cli(sys.argv[1:], use_cache=is_cache_enabled() and "--no-cache" not in sys.argv)
+            return
+
+        # The completion script does not depend on the project, so it can be generated outside of one.
+        shell: str | None = get_option_value(sys.argv, "--completion")
+        if shell is not None:
+            print(get_completion_script(shell, build_arg_parser(Scripts(Settings()))), end="")
+            return
+
+        # The cache must be set up before the arguments are parsed, because parsing them requires loading the scripts.
+        if is_cache_enabled() and "--no-cache" not in sys.argv:
+            cache = scripts.cache if scripts and scripts.cache else ConfigCache.from_project_root()
+            templates.set_bytecode_cache(os.path.join(cache.directory, "templates"))
+
+        # Completing script names (see `completion.get_completion_keys()`) only reads the configuration, and writes the
+        # completion index that the completion script reads until pyproject.toml changes.
+        if "--completion-keys" in sys.argv:
+            print("\n".join(get_completion_keys(cache)))
+            return
+
+        if scripts is None or cache is None or scripts.cache is not cache:
+            scripts = Scripts.from_config(cache=cache)
+
+        # Fast path: `dev <script>` runs the script directly, without building the argument parser.
+        if len(sys.argv) == 2 and is_public_script(scripts, sys.argv[1]):
+            scripts.run_script(sys.argv[1])
+            return
+
+        with timed("arg parser build"):
+            cli: ArgumentParser = build_arg_parser(scripts)
+            args: Namespace = cli.parse_args()
         key: str = args.script
-        scripts.run_script(key) if key else cli.print_help()
+        if args.compile:
+            from .bundle import compile_bundle  # Deferred, as it imports Jinja2.
+
+            print(f"Compiled scripts to: {compile_bundle(cache or ConfigCache.from_project_root())}", file=sys.stderr)
+        elif args.graph:
+            print(format_script_graph(scripts, [key] if key else sorted(k for k in scripts if not k.startswith("_"))))
+        elif not key:
+            cli.print_help()
+        elif args.watch:
+            import asyncio  # Deferred, so running scripts synchronously never imports asyncio.
+            from .watch import watch_script
+
+            try:
+                asyncio.run(watch_script(scripts, key, jobs=args.jobs))
+            except KeyboardInterrupt:
+                pass  # Stopping watch mode is not an error; the running script has already been terminated.
+        elif args.run_async:
+            import asyncio  # Deferred, so running scripts synchronously never imports asyncio.
+
+            asyncio.run(scripts.run_script_async(key, jobs=args.jobs))
+        else:
+            scripts.run_script(key, jobs=args.jobs)
     except Exception as e:
-        if "-d" in sys.argv or "--debug" in sys.argv:
+        if debug:
             raise e
         else:
             logger.error(e)
+    finally:
+        if scripts is not None and scripts.pool is not None:
+            scripts.pool.shutdown()
+        if cache:
+            with timed("cache save"):
+                cache.save()
+                if scripts is not None:
+                    scripts.executables.save()
+                    scripts.save_env()
+        if debug:
+            logger.debug(templates.get_cache_info())
+        if timings:
+            report_timings(timings, profile_path, print_timings)
 
 
 if __name__ == "__main__":
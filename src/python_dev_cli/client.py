@@ -0,0 +1,340 @@
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import time
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List, Sequence
+
+from .config import get_project_root
+
+logger: Logger = getLogger(__name__)
+
+# Name of the directory, relative to the project root, where python-dev-cli stores cached data; see `cache.py`, which is
+# not imported here, so that the client starts as quickly as possible.
+cache_dir_name: Final[str] = ".python-dev-cli"
+
+# Environment variable that can be set to a false value (e.g. "0" or "false") to make `devd` run scripts without the
+# daemon, exactly like `dev`.
+daemon_env_var: Final[str] = "PYTHON_DEV_CLI_DAEMON"
+
+# Maximum length of a Unix domain socket path; the limit is 108 bytes on Linux and 104 on macOS, including a null byte.
+max_socket_path_length: Final[int] = 100
+
+# Number of seconds to wait for a new daemon to start listening, before running scripts without it.
+start_timeout: Final[float] = 5.0
+
+# Signals forwarded to the scripts run by the daemon, which are not in the terminal's foreground process group.
+forwarded_signals: Final[List[str]] = ["SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT"]
+
+
+class DaemonError(Exception):
+    """Raised when the daemon cannot be reached, or does not respond as expected."""
+
+    pass
+
+
+class DaemonOutdatedError(DaemonError):
+    """Raised when the daemon was started by a different Python interpreter or version of this package; it stops itself
+    after responding, so a new daemon can be started.
+    """
+
+    pass
+
+
+def is_daemon_supported() -> bool:
+    """Returns True if the daemon can be used on this platform; it requires Unix domain sockets that can pass file
+    descriptors, and `os.fork()`.
+
+    :return: Whether the daemon is supported.
+    """
+    return (
+        hasattr(socket, "AF_UNIX")
+        and hasattr(socket, "send_fds")
+        and hasattr(os, "fork")
+        and (hasattr(socket, "SO_PEERCRED") or hasattr(socket, "LOCAL_PEERCRED"))
+    )
+
+
+def get_runtime_dir() -> str:
+    """Returns the directory for the sockets of daemons whose project root is too long for a socket path: the user's
+    `$XDG_RUNTIME_DIR`, if set; or a `python-dev-cli-<uid>` directory in the temp directory, which is created if it does
+    not exist. Either way, the directory must be owned by the current user, and not be accessible by anyone else, so
+    that no other user can create a socket there for a client to connect to.
+
+    :return: The path to the directory.
+    :raises DaemonError: If the directory is not owned by the current user, or is accessible by other users.
+    """
+    path: str | None = os.environ.get("XDG_RUNTIME_DIR")
+
+    if not path:
+        path = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"python-dev-cli-{os.getuid()}")
+        try:
+            os.mkdir(path, 0o700)
+        except FileExistsError:
+            pass  # Checked below, as another user may have created it.
+
+    try:
+        info: os.stat_result = os.lstat(path)
+    except OSError as e:
+        raise DaemonError(f"Unable to use runtime directory: {e}") from e
+
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise DaemonError(f"Runtime directory must be owned by the current user, with mode 0700: {path}")
+
+    return path
+
+
+def get_peer_uid(sock: socket.socket) -> int:
+    """Returns the ID of the user that owns the process at the other end of a connected Unix domain socket, using
+    `SO_PEERCRED` on Linux, or `LOCAL_PEERCRED` on macOS and BSD.
+
+    :param sock: A connected Unix domain socket.
+    :return: The user ID of the peer.
+    """
+    if hasattr(socket, "SO_PEERCRED"):
+        _pid, uid, _gid = struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, 12))
+        return uid
+
+    # A struct xucred, which starts with its version and the user ID; SOL_LOCAL is 0.
+    _version, uid = struct.unpack_from("2I", sock.getsockopt(0, socket.LOCAL_PEERCRED, 76))
+    return uid
+
+
+def check_peer(sock: socket.socket) -> None:
+    """Checks that the process at the other end of a connected Unix domain socket is run by the current user, so that
+    neither the client nor the daemon sends its environment variables or file descriptors to anyone else.
+
+    :param sock: A connected Unix domain socket.
+    :raises DaemonError: If the peer is run by a different user.
+    """
+    uid: int = get_peer_uid(sock)
+
+    if uid != os.getuid():
+        raise DaemonError(f"Peer is run by a different user (uid {uid})")
+
+
+def get_socket_path(root: str) -> str:
+    """Returns the path to the Unix domain socket of the daemon for the given project root. The socket is in the
+    `.python-dev-cli` directory, unless that path is too long for a socket, in which case it is in the runtime directory
+    (see `get_runtime_dir()`).
+
+    :param root: The path to the project root.
+    :return: The path to the socket.
+    :raises DaemonError: If the path is too long, and the runtime directory cannot be used.
+    """
+    path: str = os.path.join(root, cache_dir_name, "daemon.sock")
+
+    if len(os.fsencode(path)) <= max_socket_path_length:
+        return path
+
+    import hashlib  # Deferred, as it is only needed for long paths.
+
+    digest: str = hashlib.sha256(os.fsencode(os.path.abspath(root))).hexdigest()[:16]
+    return os.path.join(get_runtime_dir(), f"python-dev-cli-{digest}.sock")
+
+
+def get_daemon_version() -> str:
+    """Returns a string that identifies the Python interpreter and the source files of this package, so that a daemon
+    started by a different interpreter, or before the package was upgraded or edited, is replaced.
+
+    :return: A version string.
+    """
+    package_dir: str = os.path.dirname(os.path.abspath(__file__))
+    mtime: int = max(entry.stat().st_mtime_ns for entry in os.scandir(package_dir) if entry.name.endswith(".py"))
+    return f"{sys.executable}:{package_dir}:{mtime}"
+
+
+def start_daemon(root: str) -> None:
+    """Starts a daemon for the given project root in the background, in a new session, so that it keeps running after
+    the client exits and never receives signals from the client's terminal. Its output is written to `daemon.log` in
+    the `.python-dev-cli` directory.
+
+    :param root: The path to the project root.
+    """
+    import subprocess  # Deferred, as it is only needed when the daemon is not already running.
+
+    log_dir: str = os.path.join(root, cache_dir_name)
+    os.makedirs(log_dir, exist_ok=True)
+
+    with open(os.path.join(log_dir, "daemon.log"), "ab") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", f"{__package__}.daemon", "--root", root, "run"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            cwd=root,
+            start_new_session=True,
+        )
+
+
+def connect(root: str, start: bool = True) -> socket.socket:
+    """Returns a socket connected to the daemon for the given project root, starting the daemon if it is not running.
+    The daemon must be run by the current user (see `check_peer()`), as requests include the environment variables and
+    file descriptors of the client.
+
+    :param root: The path to the project root.
+    :param start: Whether to start the daemon if it is not running.
+    :return: A connected socket.
+    :raises DaemonError: If the daemon is not running and cannot be started, or is run by a different user.
+    """
+    path: str = get_socket_path(root)
+    deadline: float | None = None
+
+    while True:
+        sock: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            check_peer(sock)
+            return sock
+        except DaemonError:
+            sock.close()
+            raise
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            sock.close()
+            if not start:
+                raise DaemonError(f"Daemon is not running: {path}") from e
+
+        if deadline is None:
+            logger.debug(f"Starting daemon for project root: {root}")
+            start_daemon(root)
+            deadline = time.monotonic() + start_timeout
+        elif time.monotonic() > deadline:
+            raise DaemonError(
+                f"Daemon did not start within {start_timeout} seconds; see daemon.log in {cache_dir_name}"
+            )
+
+        time.sleep(0.02)
+
+
+def send_request(
+    sock: socket.socket,
+    argv: List[str],
+    cwd: str | None = None,
+    env: Dict[str, str] | None = None,
+    fds: Sequence[int] = (0, 1, 2),
+) -> int:
+    """Asks the daemon to run the `dev` CLI with the given args, working directory and environment variables. The given
+    stdin, stdout and stderr file descriptors are passed to the daemon, so scripts read from and write to them
+    directly. Signals received while waiting (e.g. SIGINT when `Ctrl+C` is pressed) are forwarded to the scripts.
+
+    :param sock: A socket connected to the daemon.
+    :param argv: The command line args, excluding the program name.
+    :param cwd: The working directory; defaults to the current working directory.
+    :param env: The environment variables; defaults to those of the current process.
+    :param fds: The stdin, stdout and stderr file descriptors to use.
+    :return: The exit code of the `dev` CLI.
+    :raises DaemonOutdatedError: If the daemon is outdated; the request was not run.
+    :raises DaemonError: If the daemon rejects the request, or closes the connection without responding.
+    """
+    request: Dict[str, Any] = {
+        "argv": list(argv),
+        "cwd": cwd or os.getcwd(),
+        "env": dict(os.environ if env is None else env),
+        "version": get_daemon_version(),
+    }
+
+    socket.send_fds(sock, [b"\0"], list(fds))
+    sock.sendall(json.dumps(request).encode() + b"\n")
+
+    def forward(signum: int, _frame: Any) -> None:
+        try:
+            sock.sendall(json.dumps({"signal": signum}).encode() + b"\n")
+        except OSError:
+            pass  # The daemon has already closed the connection.
+
+    previous: Dict[int, Any] = {}
+    for name in forwarded_signals:
+        try:
+            previous[getattr(signal, name)] = signal.signal(getattr(signal, name), forward)
+        except (AttributeError, ValueError):
+            pass  # The signal does not exist on this platform, or this is not the main thread.
+
+    try:
+        with sock.makefile("rb") as file:
+            line: bytes = file.readline()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+    if not line:
+        raise DaemonError("Daemon closed the connection without responding")
+
+    response: Dict[str, Any] = json.loads(line)
+
+    if response.get("outdated"):
+        raise DaemonOutdatedError(response["error"])
+
+    if "error" in response:
+        raise DaemonError(response["error"])
+
+    return int(response["returncode"])
+
+
+def stop_daemon(root: str) -> bool:
+    """Asks the daemon for the given project root to stop, once any scripts it is running have finished.
+
+    :param root: The path to the project root.
+    :return: True if the daemon was running.
+    """
+    try:
+        sock: socket.socket = connect(root, start=False)
+    except DaemonError:
+        return False
+
+    with sock:
+        sock.sendall(b"\0" + json.dumps({"command": "stop"}).encode() + b"\n")  # No file descriptors are passed.
+        sock.recv(1)  # Wait for the daemon to acknowledge the request, by responding or closing the connection.
+
+    return True
+
+
+def dev_client() -> None:
+    """The main entry point for the `devd` command, which is a drop-in replacement for `dev` that runs scripts using a
+    resident daemon, so that each invocation only pays for starting this thin client, rather than importing Jinja2,
+    parsing pyproject.toml and building the argument parser. The daemon is started automatically, and if it cannot be
+    used (e.g. on Windows), the `dev` CLI is run in this process instead.
+    """
+    if is_daemon_supported() and os.environ.get(daemon_env_var, "true").lower() not in ["false", "0", "no", ""]:
+        returncode: int | None = run_with_daemon(str(get_project_root()), sys.argv[1:])
+        if returncode is not None:
+            sys.exit(returncode)
+
+    from .cli import dev_cli
+
+    dev_cli()
+
+
+def run_with_daemon(root: str, argv: List[str]) -> int | None:
+    """Runs the `dev` CLI with the given args using the daemon for the given project root, starting (or restarting) the
+    daemon if necessary.
+
+    :param root: The path to the project root.
+    :param argv: The command line args, excluding the program name.
+    :return: The exit code of the `dev` CLI; or None if the daemon could not be used, and the request was not run.
+    """
+    for attempt in range(2):
+        try:
+            sock: socket.socket = connect(root)
+        except (DaemonError, OSError) as e:
+            logger.debug(f"Unable to connect to daemon: {e}")
+            return None
+
+        with sock:
+            try:
+                return send_request(sock, argv)
+            except DaemonOutdatedError as e:
+                logger.debug(f"Restarting daemon: {e}")  # The outdated daemon stops, so the next attempt starts one.
+            except (DaemonError, OSError) as e:
+                # The request may already have been run, so it must not be run again without the daemon.
+                logger.error(e)
+                return 1
+
+    return None
+
+
+if __name__ == "__main__":
+    dev_client()
@@ -0,0 +1,166 @@
+import os
+import re
+import shlex
+from functools import lru_cache
+from os.path import expandvars
+from typing import Dict, Final, Iterable, List, Mapping, NamedTuple, Pattern, Sequence, Tuple
+
+# Maximum number of distinct script commands whose tokens are kept in memory.
+command_cache_size: Final[int] = 4096
+
+# Characters that start an environment variable reference expanded by `os.path.expandvars()`; Windows also expands
+# `%name%`.
+variable_chars: Final[str] = "$%" if os.name == "nt" else "$"
+
+# Matches the environment variable references expanded by `expand_variables()`: `$NAME` and `${NAME}`; and `%NAME%` on
+# Windows.
+variable_pattern: Final[Pattern] = re.compile(
+    r"\$(\w+)|\$\{([^}]*)\}" + (r"|%([^%]*)%" if os.name == "nt" else ""), re.ASCII
+)
+
+
+class CompiledCommand(NamedTuple):
+    """A script command split into args once, along with the positions of the args that reference environment
+    variables, so running it only needs to expand those args rather than split the whole command again.
+    """
+
+    argv: Tuple[str, ...]
+    holes: Tuple[int, ...]
+
+
+# Commands compiled ahead of time by `dev --compile` (see `bundle.compile_bundle()`), keyed by the command and
+# whether POSIX rules were used; they are used instead of splitting the commands again.
+precompiled_commands: Dict[Tuple[str, bool], CompiledCommand] = {}
+
+
+class Command(str):
+    """A script command with its environment variables expanded, which also carries the args it was split into before
+    they were expanded. The string value is used for display, fingerprints and cache keys, exactly as before; the args
+    are what is run, so an environment variable whose value contains spaces or quotes is always passed as part of a
+    single arg, rather than being split again.
+    """
+
+    argv: List[str]
+
+    def __new__(cls, value: str, argv: List[str]) -> "Command":
+        instance: Command = super().__new__(cls, value)
+        instance.argv = argv
+        return instance
+
+    def __reduce__(self):
+        return self.__class__, (str(self), self.argv)
+
+
+class Call(str):
+    """A script command that calls a Python function in the running process, instead of running a subprocess; defined
+    as a table with a `call` key, e.g. `test = { call = "pytest:main", args = ["-q"] }`. The target uses the same
+    `module:attr` syntax as `settings.include`; if it is only a module (e.g. `call = "black"`), the module is run as
+    `python -m black` would run it. The string value is the target followed by its args, which is used for display,
+    fingerprints and cache keys. It is defined alongside Command, rather than in `calls`, so telling the two apart
+    never imports the modules that run calls.
+    """
+
+    module: str
+    attr: str | None
+    args: List[str]
+
+    def __new__(cls, module: str, attr: str | None = None, args: Sequence[str] = ()) -> "Call":
+        target: str = f"{module}:{attr}" if attr else module
+        instance: Call = super().__new__(cls, shlex.join([target, *args]))
+        instance.module = module
+        instance.attr = attr
+        instance.args = list(args)
+        return instance
+
+    def __reduce__(self):
+        return self.__class__, (self.module, self.attr, self.args)
+
+    @property
+    def argv(self) -> List[str]:
+        """The value of `sys.argv` while the call runs: the module name, followed by the args."""
+        return [self.module, *self.args]
+
+
+@lru_cache(maxsize=command_cache_size)
+def split_command(script: str, posix: bool = True) -> Tuple[str, ...]:
+    """Splits a script command into args, using the same rules as a shell (see `shlex.split()`). The result is kept in a
+    bounded LRU cache keyed by command, so each command is only split once per process.
+
+    :param script: A script command.
+    :param posix: Whether to use POSIX rules; otherwise, quotes are kept (as they are on Windows).
+    :return: A tuple of args.
+    :raises ValueError: If the command cannot be split (e.g. it has an unclosed quote).
+    """
+    compiled: CompiledCommand | None = precompiled_commands.get((script, posix))
+    return compiled.argv if compiled else tuple(shlex.split(script, posix=posix))
+
+
+@lru_cache(maxsize=command_cache_size)
+def compile_command(script: str, posix: bool = True) -> CompiledCommand:
+    """Compiles a script command whose environment variables have not been expanded (e.g. `pytest $PYTEST_ARGS`). Like
+    `split_command()`, the result is cached, so each command is only compiled once per process.
+
+    :param script: A script command.
+    :param posix: Whether to use POSIX rules when splitting the command.
+    :return: A CompiledCommand instance.
+    :raises ValueError: If the command cannot be split (e.g. it has an unclosed quote).
+    """
+    compiled: CompiledCommand | None = precompiled_commands.get((script, posix))
+    if compiled:
+        return compiled
+
+    argv: Tuple[str, ...] = split_command(script, posix)
+    holes: Tuple[int, ...] = tuple(i for i, arg in enumerate(argv) if any(char in arg for char in variable_chars))
+    return CompiledCommand(argv, holes)
+
+
+def expand_variables(value: str, env: Mapping[str, str] | None = None) -> str:
+    """Expands the environment variables in a string (e.g. $HOME, ${HOME}), like `os.path.expandvars()`, but reads
+    their values from the given mapping. References to variables that are not set are left unchanged.
+
+    :param value: A string, such as a script command or one of its args.
+    :param env: The environment variables; defaults to `os.environ`.
+    :return: The expanded string.
+    """
+    if env is None or env is os.environ:
+        return expandvars(value)
+    if not any(char in value for char in variable_chars):
+        return value
+
+    def replace(match: re.Match) -> str:
+        name: str = next(group for group in match.groups() if group is not None)
+        return env.get(name, match.group(0))
+
+    return variable_pattern.sub(replace, value)
+
+
+def expand_command(script: str, posix: bool = True, env: Mapping[str, str] | None = None) -> str:
+    """Expands the environment variables in a script command (e.g. $HOME, ${HOME}), and returns it as a Command that
+    carries its args. Only the args that reference an environment variable are expanded; the command is never split
+    again. If the command cannot be split, it is returned as a plain string, so the error is raised when it runs.
+
+    :param script: A script command.
+    :param posix: Whether to use POSIX rules when splitting the command.
+    :param env: The environment variables; defaults to `os.environ` (see `expand_variables()`).
+    :return: A Command instance; or a str, if the command cannot be split.
+    """
+    try:
+        compiled: CompiledCommand = compile_command(script, posix)
+    except ValueError:
+        return expand_variables(script, env)
+
+    argv: List[str] = list(compiled.argv)
+    for i in compiled.holes:
+        argv[i] = expand_variables(argv[i], env)
+
+    return Command(expand_variables(script, env) if compiled.holes else script, argv)
+
+
+def add_precompiled_commands(commands: Iterable[Tuple[str, bool, Tuple[str, ...], Tuple[int, ...]]]) -> None:
+    """Adds commands that were compiled ahead of time to `precompiled_commands`, so they are not split again.
+
+    :param commands: A list of tuples, each containing a command, whether POSIX rules were used, and the argv and holes
+        of its CompiledCommand.
+    """
+    for script, posix, argv, holes in commands:
+        precompiled_commands[(script, bool(posix))] = CompiledCommand(tuple(argv), tuple(holes))
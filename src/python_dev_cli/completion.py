@@ -0,0 +1,155 @@
+import os
+import shlex
+from argparse import SUPPRESS, Action, ArgumentParser
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List
+
+from .cache import ConfigCache, cache_dir_name
+from .config import get_pyproject_toml
+
+logger: Logger = getLogger(__name__)
+
+# Name of the completion index, in the cache directory: the names of the public scripts, one per line.
+completion_index_name: Final[str] = "completion.txt"
+
+# Shells that `dev --completion` can write a completion script for.
+completion_shells: Final[List[str]] = ["bash", "zsh", "fish"]
+
+# Completion scripts, in which `@INDEX@` is replaced with the path of the completion index relative to the project root,
+# and `@OPTIONS@` with the options of the dev CLI.
+
+# Completion script for bash. The project root is found like `config.get_project_root()` does, and the index is read
+# with a builtin, unless it is missing or older than pyproject.toml; then `dev --completion-keys` rebuilds it.
+bash_script: Final[
+    str
+] = """
+_dev_completion() {
+    local cur="${COMP_WORDS[COMP_CWORD]}" dir="${PYTHON_DEV_CLI_ROOT:-$PWD}" index
+    if [[ -z "$PYTHON_DEV_CLI_ROOT" ]]; then
+        while [[ "$dir" != / && ! -f "$dir/pyproject.toml" ]]; do dir="${dir%/*}"; dir="${dir:-/}"; done
+    fi
+    index="$dir/@INDEX@"
+    if [[ "$cur" == -* ]]; then
+        COMPREPLY=($(compgen -W "@OPTIONS@" -- "$cur"))
+    elif [[ -f "$index" && ! "$dir/pyproject.toml" -nt "$index" ]]; then
+        COMPREPLY=($(compgen -W "$(< "$index")" -- "$cur"))
+    else
+        COMPREPLY=($(compgen -W "$(command dev --completion-keys 2>/dev/null)" -- "$cur"))
+    fi
+}
+complete -F _dev_completion dev
+"""
+
+# Completion script for zsh, which works the same way as the bash script; `compinit` must be loaded first.
+zsh_script: Final[
+    str
+] = """
+_dev_completion() {
+    local dir="${PYTHON_DEV_CLI_ROOT:-$PWD}" index
+    if [[ -z "$PYTHON_DEV_CLI_ROOT" ]]; then
+        while [[ "$dir" != / && ! -f "$dir/pyproject.toml" ]]; do dir="${dir:h}"; done
+    fi
+    index="$dir/@INDEX@"
+    if [[ "$PREFIX" == -* ]]; then
+        compadd -- @OPTIONS@
+    elif [[ -f "$index" && ! "$dir/pyproject.toml" -nt "$index" ]]; then
+        compadd -- ${(f)"$(<"$index")"}
+    else
+        compadd -- ${(f)"$(command dev --completion-keys 2>/dev/null)"}
+    fi
+}
+compdef _dev_completion dev
+"""
+
+# Completion script for fish (3.5 or later, for `path mtime`), which works the same way as the bash script.
+fish_script: Final[
+    str
+] = """
+function __dev_completion_keys
+    set -l dir $PYTHON_DEV_CLI_ROOT
+    if test -z "$dir"
+        set dir $PWD
+        while test "$dir" != / -a ! -f "$dir/pyproject.toml"
+            set dir (path dirname $dir)
+        end
+    end
+    set -l index "$dir/@INDEX@"
+    if test -f $index -a -f "$dir/pyproject.toml"; and test (path mtime $index) -gt (path mtime "$dir/pyproject.toml")
+        while read -l key
+            echo $key
+        end <$index
+    else
+        command dev --completion-keys 2>/dev/null
+    end
+end
+complete -c dev -f -n 'not string match -q -- "-*" (commandline -ct)' -a '(__dev_completion_keys)'
+@OPTIONS@
+"""
+
+
+def get_completion_keys(cache: ConfigCache | None = None) -> List[str]:
+    """Returns the names of the scripts that can be run from the command line (those that do not start with an
+    underscore), sorted, and writes them to the completion index in the cache directory, if there is a cache. The
+    index is read by the completion scripts (see `get_completion_script()`) until pyproject.toml changes, so pressing
+    TAB does not start the `dev` CLI at all. Errors writing the index are logged and otherwise ignored.
+
+    :param cache: An optional ConfigCache; if it is not given, the pyproject.toml file is parsed, and no index is
+        written.
+    :return: A list of script names.
+    :raises FileNotFoundError: If the pyproject.toml file is not found.
+    """
+    config: Dict[str, Any] = cache.get_config() if cache else get_pyproject_toml()
+    scripts: Dict[str, Any] = config.get("tool", {}).get("python-dev-cli", {}).get("scripts", {})
+    keys: List[str] = sorted(key for key in scripts if not key.startswith("_"))
+
+    if cache:
+        path: str = os.path.join(cache.directory, completion_index_name)
+        try:
+            cache.make_directory()
+            tmp_path: str = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write("".join(f"{key}\n" for key in keys))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Unable to write completion index {path}: {e}")
+
+    return keys
+
+
+def get_completion_script(shell: str, arg_parser: ArgumentParser) -> str:
+    """Returns a script that adds completion of script names and options for the `dev` command to the given shell, to
+    be evaluated by its startup file (e.g. `eval "$(dev --completion bash)"` in ~/.bashrc). Script names are read from
+    the completion index in the project's cache directory (see `get_completion_keys()`), so completion only reads a
+    small file, unless pyproject.toml has changed since it was written.
+
+    :param shell: The name of the shell (see `completion_shells`).
+    :param arg_parser: The dev CLI argument parser, whose options are completed.
+    :return: A shell script.
+    :raises ValueError: If the shell is not supported.
+    """
+    if shell not in completion_shells:
+        raise ValueError(f"Unsupported shell: {shell} (must be one of: {', '.join(completion_shells)})")
+
+    actions: List[Action] = [
+        action for action in arg_parser._actions if action.option_strings and action.help != SUPPRESS
+    ]
+    script: str = {"bash": bash_script, "zsh": zsh_script, "fish": fish_script}[shell]
+
+    if shell == "fish":
+        lines: List[str] = []
+        for action in actions:
+            flags: List[str] = [
+                f"-l {option[2:]}" if option.startswith("--") else f"-s {option[1:]}"
+                for option in action.option_strings
+            ]
+            if action.choices:
+                flags.append(f"-x -a {shlex.quote(' '.join(action.choices))}")
+            elif action.nargs != 0:
+                flags.append("-r")
+            lines.append(f"complete -c dev {' '.join(flags)} -d {shlex.quote(str(action.help))}")
+        options: str = "\n".join(lines)
+    else:
+        options = " ".join(option for action in actions for option in action.option_strings)
+
+    index: str = f"{cache_dir_name}/cache/{completion_index_name}"
+    return script.replace("@INDEX@", index).replace("@OPTIONS@", options).lstrip()
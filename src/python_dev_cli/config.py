@@ -1,23 +1,51 @@
 import os
 import tomllib
+from functools import lru_cache
 from logging import Logger, getLogger
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Final
+
+from .timings import timed
 
 logger: Logger = getLogger(__name__)
 
+# Environment variable that sets the project root, so that it is not searched for; relative paths are relative to the
+# current working directory.
+root_env_var: Final[str] = "PYTHON_DEV_CLI_ROOT"
+
+
+def get_project_root() -> Path:
+    """Returns the path to the project root. This is the directory that contains the pyproject.toml file: either the
+    directory set by the PYTHON_DEV_CLI_ROOT environment variable, or the nearest directory, starting from the current
+    working directory and searching upward, that contains a pyproject.toml file. If there is none, it is the current
+    working directory. The result of the search is memoized for each working directory (see `find_project_root()`).
+
+    :return: The path to the project root.
+    """
+    root: str | None = os.environ.get(root_env_var)
+
+    if root:
+        return Path(os.path.abspath(os.path.expanduser(root)))
+
+    return find_project_root(os.getcwd())
+
 
-def get_project_root() -> str:
-    """Returns the path to the project root. This is the directory that should contain the pyproject.toml file.
+@lru_cache(maxsize=64)
+def find_project_root(cwd: str) -> Path:
+    """Searches upward from the given directory for the nearest directory that contains a pyproject.toml file, and
+    returns it; or the given directory, if there is none. The result is memoized for the lifetime of the process, so
+    processes that stay running (e.g. the daemon) only search once per working directory.
 
+    :param cwd: The absolute path to the directory to search upward from.
     :return: The path to the project root.
     """
-    path = Path().cwd()
+    with timed("config discovery"):
+        path: Path = Path(cwd)
 
-    while Path(path, "__init__.py").exists():
-        if path.parent == path:
-            break  # Prevent infinite loop if __init__.py is in the root directory.
-        path = path.parent
+        while not Path(path, "pyproject.toml").is_file():
+            if path.parent == path:
+                return Path(cwd)  # No pyproject.toml file was found, so the error names the working directory.
+            path = path.parent
 
     return path
 
@@ -35,5 +63,5 @@ def get_pyproject_toml(path: str | None = None) -> Dict[str, Any]:
     if not os.path.exists(path):
         raise FileNotFoundError(f"No pyproject.toml fil found in project root: {path}")
 
-    with open(path, "rb") as file:
+    with open(path, "rb") as file, timed("toml parse"):
         return tomllib.load(file)
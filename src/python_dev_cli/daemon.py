@@ -0,0 +1,479 @@
+import json
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+import traceback
+from argparse import ArgumentParser, Namespace
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List, Tuple
+
+from . import templates
+from .cache import ConfigCache, get_cache_dir, get_stat_fingerprint
+from .cli import dev_cli
+from .client import DaemonError, check_peer, connect, get_daemon_version, get_socket_path, stop_daemon
+from .config import get_project_root
+from .scripts import Scripts
+
+logger: Logger = getLogger(__name__)
+
+# Environment variable that sets the number of seconds the daemon waits for a request before it stops itself.
+idle_timeout_env_var: Final[str] = "PYTHON_DEV_CLI_DAEMON_TIMEOUT"
+default_idle_timeout: Final[float] = 900.0
+
+# Maximum number of bytes of a request; requests contain the environment variables of the client, so they can be large.
+max_request_size: Final[int] = 2**22
+
+# Number of seconds a client has to send its request once it has connected, before the connection is closed.
+request_timeout: Final[float] = 5.0
+
+
+class Daemon:
+    """A resident server that keeps the scripts of a project loaded, with Jinja2, the modules in `settings.include` and
+    every script template already imported and compiled, so that the `devd` client does not pay for any of that work.
+
+    The daemon listens on a Unix domain socket. Each request passes the client's stdin, stdout and stderr file
+    descriptors, along with its args, working directory and environment variables; the daemon forks a child process
+    that runs the `dev` CLI with them, so scripts read from and write to the client's terminal directly, and sends the
+    exit code back once it finishes. The scripts are reloaded when pyproject.toml changes, and the daemon stops itself
+    after `idle_timeout` seconds without a request.
+    """
+
+    def __init__(self, root: str, idle_timeout: float = default_idle_timeout) -> None:
+        self.root: str = str(root)
+        self.idle_timeout: float = idle_timeout
+        self.version: str = get_daemon_version()
+        self.__scripts: Scripts | None = None
+        self.__stat: List[int] | None = None
+        self.__listener: socket.socket | None = None
+        self.__selector: selectors.BaseSelector | None = None
+        self.__wakeup: Tuple[socket.socket, socket.socket] | None = None
+        self.__children: Dict[int, socket.socket] = {}
+        self.__buffers: Dict[socket.socket, bytes] = {}
+        self.__requests: Dict[socket.socket, Tuple[float, List[int]]] = {}
+        self.__stopping: bool = False
+        self.__stop_requested: bool = False
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.root!r})"
+
+    @property
+    def path(self) -> str:
+        """The path to the Unix domain socket."""
+        return get_socket_path(self.root)
+
+    def serve(self) -> None:
+        """Listens for requests until the daemon is idle for `idle_timeout` seconds, or is asked to stop; then waits for
+        any scripts that are still running to finish.
+
+        :raises OSError: If the socket cannot be created, or another daemon is already listening on it.
+        """
+        self.__listen()
+        self.__load()
+        last_active: float = time.monotonic()
+        logger.info(f"Daemon listening on {self.path} (pid {os.getpid()})")
+
+        try:
+            while self.__children or not self.__stopping:
+                if self.__stop_requested:
+                    self.__stop()
+
+                for key, _ in self.__selector.select(timeout=1.0):
+                    last_active = time.monotonic()
+                    if key.fileobj is self.__listener:
+                        self.__accept()
+                    elif key.fileobj is self.__wakeup[0]:
+                        self.__reap()
+                    elif key.data is None:
+                        self.__receive(key.fileobj)
+                    else:
+                        self.__read(key.fileobj)
+
+                self.__expire()
+
+                if not self.__children and time.monotonic() - last_active > self.idle_timeout:
+                    logger.info(f"Daemon idle for {self.idle_timeout} seconds; stopping")
+                    self.__stop()
+        finally:
+            self.__stop()
+            self.__selector.close()
+
+    def __listen(self) -> None:
+        """Creates the listening socket, replacing any stale socket file left by a daemon that did not exit cleanly, and
+        sets up a wakeup socket that becomes readable whenever a child process exits.
+
+        :raises OSError: If the socket cannot be created, or another daemon is already listening on it.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.dirname(self.path) == os.path.join(self.root, ".python-dev-cli"):
+            get_cache_dir(self.root)  # Creates the .gitignore file, so the socket is never committed.
+
+        if os.path.exists(self.path):
+            probe: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise OSError(f"Another daemon is already listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)
+            finally:
+                probe.close()
+
+        self.__listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__listener.bind(self.path)
+        self.__listener.listen()
+        self.__wakeup = socket.socketpair()
+        for sock in self.__wakeup:
+            sock.setblocking(False)
+        signal.set_wakeup_fd(self.__wakeup[1].fileno(), warn_on_full_buffer=False)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, "_Daemon__stop_requested", True))
+        self.__selector = selectors.DefaultSelector()
+        self.__selector.register(self.__listener, selectors.EVENT_READ)
+        self.__selector.register(self.__wakeup[0], selectors.EVENT_READ)
+
+    def __load(self) -> Scripts | None:
+        """Loads the scripts, if they have not been loaded or pyproject.toml has changed since they were, and preloads
+        them (see `Scripts.preload()`). Errors are logged, rather than raised, so that the error is reported to the
+        client when the `dev` CLI loads the scripts itself.
+
+        :return: The loaded scripts, or None if they could not be loaded.
+        """
+        pyproject_path: str = os.path.join(self.root, "pyproject.toml")
+
+        try:
+            stat: os.stat_result = os.stat(pyproject_path)
+        except OSError as e:
+            logger.error(f"Unable to load scripts: {e}")
+            self.__scripts = None
+            return None
+
+        # If pyproject.toml was modified too recently for its mtime to be trusted, the scripts are always reloaded.
+        fingerprint: List[int] | None = get_stat_fingerprint(stat)
+        if self.__scripts is not None and fingerprint is not None and self.__stat == fingerprint:
+            return self.__scripts
+
+        try:
+            logger.info(f"Loading scripts from {pyproject_path}")
+            cache: ConfigCache = ConfigCache(pyproject_path)
+            templates.set_bytecode_cache(os.path.join(cache.directory, "templates"))
+            self.__scripts = Scripts.from_config(cache=cache)
+            self.__scripts.preload()
+            cache.save()  # Saved once here, so that each child process does not need to save it again.
+            self.__scripts.executables.save()
+            self.__stat = fingerprint
+        except Exception as e:
+            logger.error(f"Unable to load scripts: {e}")
+            self.__scripts = None
+
+        return self.__scripts
+
+    def __accept(self) -> None:
+        """Accepts a connection from a client run by the current user, and waits for its request without blocking, so
+        that a client that is slow to send it does not hold up any others.
+        """
+        conn, _ = self.__listener.accept()
+
+        try:
+            check_peer(conn)
+        except (DaemonError, OSError) as e:
+            logger.error(f"Rejected connection: {e}")
+            conn.close()
+            return
+
+        conn.setblocking(False)
+        self.__requests[conn] = (time.monotonic(), [])
+        self.__buffers[conn] = b""
+        self.__selector.register(conn, selectors.EVENT_READ)
+
+    def __receive(self, conn: socket.socket) -> None:
+        """Reads as much of a request as has arrived, along with any file descriptors passed with it; once the whole
+        request has arrived, it is handled (see `__handle()`).
+
+        :param conn: The connection to the client.
+        """
+        fds: List[int] = self.__requests[conn][1]
+
+        try:
+            data, received, _, _ = socket.recv_fds(conn, 65536, 3)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            data, received = b"", []
+            logger.error(f"Invalid request: {e}")
+
+        fds.extend(received)
+        buffer: bytes = self.__buffers[conn] + data
+
+        if not data:
+            if not buffer:
+                logger.debug("Client closed the connection without sending a request")  # E.g. `status` checks.
+            else:
+                logger.error("Invalid request: connection closed before the request was received")
+            self.__close(conn)
+            return
+
+        if b"\n" not in buffer:
+            if len(buffer) > max_request_size:
+                logger.error(f"Invalid request: request is larger than {max_request_size} bytes")
+                self.__close(conn)
+            else:
+                self.__buffers[conn] = buffer
+            return
+
+        line, self.__buffers[conn] = buffer[1:].split(b"\n", 1)  # The first byte carries the file descriptors.
+
+        try:
+            request: Dict[str, Any] = json.loads(line)
+        except ValueError as e:
+            logger.error(f"Invalid request: {e}")
+            self.__close(conn)
+            return
+
+        del self.__requests[conn]
+        self.__handle(conn, request, fds)
+
+    def __expire(self) -> None:
+        """Closes the connections of clients that have not sent their request within `request_timeout` seconds."""
+        now: float = time.monotonic()
+
+        for conn, (started, _) in list(self.__requests.items()):
+            if now - started > request_timeout:
+                logger.error(f"Invalid request: not received within {request_timeout} seconds")
+                self.__close(conn)
+
+    def __close(self, conn: socket.socket) -> None:
+        """Closes the connection of a client whose request has not been handled, and any file descriptors it passed.
+
+        :param conn: The connection to the client.
+        """
+        _, fds = self.__requests.pop(conn, (0.0, []))
+        for fd in fds:
+            os.close(fd)
+        self.__buffers.pop(conn, None)
+        self.__selector.unregister(conn)
+        conn.close()
+
+    def __handle(self, conn: socket.socket, request: Dict[str, Any], fds: List[int]) -> None:
+        """Handles a request: either a command (e.g. "stop"), or a request to run the `dev` CLI, along with the file
+        descriptors it should use.
+
+        :param conn: The connection to the client.
+        :param request: The request.
+        :param fds: The file descriptors passed with the request.
+        """
+        response: Dict[str, Any] | None = None
+
+        if request.get("command") == "stop":
+            logger.info("Daemon asked to stop")
+            self.__stop()
+            response = {"stopping": True}
+        elif request.get("version") != self.version:
+            logger.info("Client is a different version; stopping, so that a new daemon is started")
+            self.__stop()
+            response = {"error": "Daemon is outdated", "outdated": True}
+        elif self.__stopping:
+            response = {"error": "Daemon is stopping", "outdated": True}
+        elif len(fds) != 3:
+            response = {"error": f"Expected 3 file descriptors, received {len(fds)}"}
+        else:
+            pid: int = self.__fork(request, fds, self.__load())
+            try:
+                os.setpgid(pid, pid)  # Also set by the child, so signals can be forwarded before the child has run.
+            except OSError:
+                pass  # The child has already set it, or has already exited.
+            self.__children[pid] = conn
+            self.__selector.modify(conn, selectors.EVENT_READ, pid)
+
+        if response is not None:
+            self.__selector.unregister(conn)
+            self.__buffers.pop(conn, None)
+            conn.setblocking(True)
+            self.__respond(conn, response)
+
+        for fd in fds:
+            os.close(fd)
+
+    def __fork(self, request: Dict[str, Any], fds: List[int], scripts: Scripts | None) -> int:
+        """Forks a child process that runs the `dev` CLI for the given request, and returns its process ID. The child
+        is the leader of a new process group, so that signals forwarded by the client reach every process it starts.
+
+        :param request: The request, with "argv", "cwd" and "env" keys.
+        :param fds: The client's stdin, stdout and stderr file descriptors.
+        :param scripts: The preloaded scripts, or None if they could not be loaded.
+        :return: The process ID of the child.
+        """
+        pid: int = os.fork()
+
+        if pid:
+            logger.info(f"Running `dev {' '.join(request['argv'])}` in {request['cwd']} (pid {pid})")
+            return pid
+
+        returncode: int = 1
+        try:
+            os.setpgid(0, 0)
+            signal.set_wakeup_fd(-1)
+            for signum in [signal.SIGCHLD, signal.SIGTERM]:
+                signal.signal(signum, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            self.__selector.close()
+            for sock in [self.__listener, *self.__wakeup, *self.__children.values(), *self.__requests]:
+                sock.close()
+            for _, pending in self.__requests.values():
+                for fd in pending:
+                    os.close(fd)
+
+            for i, fd in enumerate(fds):
+                os.dup2(fd, i)
+            for fd in fds:
+                if fd > 2:
+                    os.close(fd)
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            if scripts:
+                scripts.env.reset()  # So the client's environment variables override generated ones.
+            sys.argv = ["dev", *request["argv"]]
+            logging.getLogger().handlers.clear()  # The daemon's log handlers write to its log file, not the client.
+
+            try:
+                dev_cli(scripts=scripts)
+                returncode = 0
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+            except KeyboardInterrupt:
+                returncode = 128 + signal.SIGINT
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            for stream in [sys.stdout, sys.stderr]:
+                try:
+                    stream.flush()
+                except (OSError, ValueError):
+                    pass
+            os._exit(returncode)
+
+    def __read(self, conn: socket.socket) -> None:
+        """Reads messages from a client whose request is running; these are signals to forward to the child process.
+        If the client disconnects (e.g. because it was killed), the child process is terminated.
+
+        :param conn: The connection to the client.
+        """
+        pid: int = self.__selector.get_key(conn).data
+
+        try:
+            data: bytes = conn.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            logger.info(f"Client of pid {pid} disconnected; terminating it")
+            self.__selector.unregister(conn)
+            self.__kill(pid, signal.SIGTERM)
+            return
+
+        buffer: bytes = self.__buffers.get(conn, b"") + data
+        *lines, self.__buffers[conn] = buffer.split(b"\n")
+
+        for line in lines:
+            try:
+                self.__kill(pid, int(json.loads(line)["signal"]))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(f"Invalid message from client of pid {pid}: {e}")
+
+    def __reap(self) -> None:
+        """Waits for any child processes that have exited, and sends their exit codes to their clients."""
+        try:
+            while self.__wakeup[0].recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        for pid, conn in list(self.__children.items()):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+
+            if not done:
+                continue
+
+            returncode: int = os.waitstatus_to_exitcode(status)
+            returncode = 128 - returncode if returncode < 0 else returncode  # Killed by a signal.
+            logger.info(f"Pid {pid} exited with code {returncode}")
+            del self.__children[pid]
+            self.__buffers.pop(conn, None)
+            try:
+                self.__selector.unregister(conn)
+            except (KeyError, ValueError):
+                pass  # The client has already disconnected.
+            conn.setblocking(True)
+            self.__respond(conn, {"returncode": returncode})
+
+    def __kill(self, pid: int, signum: int) -> None:
+        try:
+            os.killpg(pid, signum)
+        except OSError as e:
+            logger.debug(f"Unable to send signal {signum} to pid {pid}: {e}")
+
+    def __stop(self) -> None:
+        """Stops accepting requests, and removes the socket file, so that a new daemon can be started straight away.
+        Scripts that are already running are allowed to finish.
+        """
+        if self.__stopping:
+            return
+
+        self.__stopping = True
+        self.__selector.unregister(self.__listener)
+        self.__listener.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __respond(conn: socket.socket, response: Dict[str, Any]) -> None:
+        try:
+            conn.sendall(json.dumps(response).encode() + b"\n")
+        except OSError as e:
+            logger.debug(f"Unable to respond to client: {e}")
+        finally:
+            conn.close()
+
+
+def main() -> None:
+    """Runs, stops or checks the status of the daemon for a project; the `devd` client starts it automatically."""
+    arg_parser: ArgumentParser = ArgumentParser(
+        prog=f"python3 -m {__package__}.daemon", description="Resident daemon for the python-dev-cli `devd` client"
+    )
+    arg_parser.add_argument("--root", help="project root (default: the project root of the working directory)")
+    arg_parser.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+    arg_parser.add_argument("command", choices=["run", "stop", "status"], help="run the daemon, stop it, or check it")
+    args: Namespace = arg_parser.parse_args()
+    root: str = os.path.abspath(args.root or str(get_project_root()))
+
+    if args.command == "stop":
+        print("Daemon stopped" if stop_daemon(root) else "Daemon is not running")
+    elif args.command == "status":
+        try:
+            connect(root, start=False).close()
+            print(f"Daemon is running: {get_socket_path(root)}")
+        except DaemonError:
+            print("Daemon is not running")
+    else:
+        logging.basicConfig(
+            level=logging.DEBUG if args.debug else logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+        )
+        idle_timeout: float = float(os.environ.get(idle_timeout_env_var, default_idle_timeout))
+        Daemon(root, idle_timeout).serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import json
+import os
+import re
+import subprocess
+import time
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger, getLogger
+from threading import Lock
+from typing import Any, Dict, Final, FrozenSet, Iterable, List, Mapping, Pattern, Set
+
+from .cache import ConfigCache, get_stat_fingerprint
+from .commands import split_command
+from .fingerprints import match_files
+from .timings import command_category, timed
+
+logger: Logger = getLogger(__name__)
+
+# Version of the env file format; bump this whenever the structure of the file changes.
+env_format: Final[int] = 1
+
+# The keys that are allowed in an environment variable defined as a table, e.g.
+# `GIT_SHA = { cmd = "git rev-parse HEAD", inputs = [".git/HEAD", ".git/refs/**"] }`:
+# - "cmd" => the command whose stdout (without trailing newlines) is the value of the variable (required)
+# - "ttl" => the number of seconds the value is stored on disk and reused by later invocations
+# - "inputs" => a list of glob patterns matching the files the value depends on; it is stored on disk and reused by
+#   later invocations until any of them change
+env_table_keys: Final[frozenset] = frozenset(["cmd", "ttl", "inputs"])
+
+# Matches the references to environment variables in a script command or template: `$NAME`, `${NAME}`, `env.NAME` and
+# `env["NAME"]`; and `%NAME%` on Windows, where it is also expanded by `os.path.expandvars()`.
+reference_pattern: Final[Pattern] = re.compile(
+    r"\$\{?(\w+)|\benv\.(\w+)|\benv\[[\"'](\w+)[\"']\]" + (r"|%(\w+)%" if os.name == "nt" else "")
+)
+
+
+class EnvError(Exception):
+    """Raised when the command that generates an environment variable cannot be run, or fails."""
+
+    pass
+
+
+def validate_env_entry(name: str, entry: Any) -> None:
+    """Validates an environment variable defined under [tool.python-dev-cli.env], raising a TypeError if it is invalid.
+    It is either a command string, or a table (see `env_table_keys`).
+
+    :param name: The name of the environment variable.
+    :param entry: The command string or table.
+    :raises TypeError: If the entry is invalid.
+    """
+    if isinstance(entry, str):
+        return
+
+    if not isinstance(entry, dict):
+        raise TypeError(f"Invalid environment variable `{name}`: {entry} (must be str or table)")
+
+    unknown_keys: Set[str] = set(entry) - env_table_keys
+    if unknown_keys:
+        raise TypeError(f"Invalid environment variable key for `{name}`: {', '.join(sorted(unknown_keys))}")
+
+    if not isinstance(entry.get("cmd"), str):
+        raise TypeError(f"Invalid environment variable `cmd` for `{name}`: {entry.get('cmd')} (must be str)")
+
+    ttl = entry.get("ttl", 0)
+    if isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl < 0:
+        raise TypeError(f"Invalid environment variable `ttl` for `{name}`: {ttl} (must be a non-negative number)")
+
+    inputs = entry.get("inputs", [])
+    if not isinstance(inputs, list) or not all(isinstance(i, str) for i in inputs):
+        raise TypeError(f"Invalid environment variable `inputs` for `{name}`: {inputs} (must be list of str)")
+
+
+def find_references(scripts: Iterable[str]) -> Set[str]:
+    """Returns the names of the environment variables referenced by the given script commands or templates.
+
+    :param scripts: A list of script commands or templates.
+    :return: A set of names.
+    """
+    return {
+        name for script in scripts for match in reference_pattern.finditer(script) for name in match.groups() if name
+    }
+
+
+class EnvVars:
+    """The environment variables defined under [tool.python-dev-cli.env] in pyproject.toml, whose values are generated
+    by running a command (e.g. `GIT_SHA = "git rev-parse HEAD"`). A variable that was already set in the environment
+    when the instance was created is never generated, so it can be overridden (e.g. `GIT_SHA=abc123 dev build`).
+
+    Values are generated lazily: only when a script that references them (as `$NAME`, `${NAME}` or `{{ env.NAME }}`) is
+    resolved, and at most once per instance. The variables referenced by a script are generated concurrently, and kept
+    by the instance rather than set in `os.environ`, so the values of one project never leak into another; they are
+    expanded and passed to script commands through `environ`.
+
+    Commands run in the given root directory, if any; otherwise, in the project root of the ConfigCache, if there is
+    one. Variables defined as a table with a `ttl` or `inputs` are also stored on disk next to the ConfigCache, and
+    reused by later processes until the `ttl` expires, any of the `inputs` change, or the command changes.
+
+    In script templates, the instance is available as `env`; any other environment variable can be read through it too.
+    """
+
+    def __init__(
+        self,
+        entries: Dict[str, str | Dict[str, Any]] | None = None,
+        cache: ConfigCache | None = None,
+        root: str | None = None,
+    ):
+        self.__entries: Dict[str, Dict[str, Any]] = {}
+        self.cache: ConfigCache | None = cache
+        self.root: str | None = root
+        self.__stored: Dict[str, Dict[str, Any]] = {}
+        self.__data: Dict[str, Any] | None = None
+        self.__lock: Lock = Lock()
+        self.__values: Dict[str, str] = {}
+        self.__overrides: FrozenSet[str] = frozenset(os.environ)
+
+        for name, entry in (entries or {}).items():
+            validate_env_entry(name, entry)
+            self.__entries[name] = {"cmd": entry} if isinstance(entry, str) else dict(entry)
+
+    def __contains__(self, item):
+        return item in self.__entries or item in os.environ
+
+    def __getattr__(self, name: str) -> str:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(f"Environment variable not found: {name}") from None
+
+    def __getitem__(self, name: str) -> str:
+        self.resolve([name])
+        return self.__values[name] if name in self.__values else os.environ[name]
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({sorted(self.__entries)})"
+
+    @property
+    def names(self) -> List[str]:
+        """The names of the generated environment variables, in the order they are defined."""
+        return list(self.__entries)
+
+    @property
+    def environ(self) -> Mapping[str, str]:
+        """The environment of the current process, along with the values generated so far; used to expand script
+        commands and as the environment they are run with."""
+        return ChainMap(self.__values, os.environ) if self.__values else os.environ
+
+    @property
+    def generated(self) -> Dict[str, str]:
+        """The values generated so far, keyed by name."""
+        return dict(self.__values)
+
+    @property
+    def path(self) -> str | None:
+        """The path to the env file, or None if values are not stored on disk."""
+        return os.path.join(self.cache.directory, "env.json") if self.cache else None
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        """Returns the value of an environment variable, generating it if needed, or the default if it is not set.
+
+        :param name: The name of the environment variable.
+        :param default: The value to return if the environment variable is not set.
+        :return: The value of the environment variable, or the default.
+        """
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def prefetch(self, scripts: Iterable[str]) -> None:
+        """Generates the environment variables referenced by any of the given script commands or templates, so that
+        they are generated concurrently, rather than one at a time as each command is expanded.
+
+        :param scripts: A list of script commands or templates.
+        :raises EnvError: If the command that generates any of the environment variables fails.
+        """
+        if self.__entries:
+            self.resolve(find_references(scripts))
+
+    def reset(self) -> None:
+        """Discards the values generated so far, and takes the variables that are set in `os.environ` as overrides
+        again; used when the environment of the process is replaced (e.g. by the daemon for each request).
+        """
+        with self.__lock:
+            self.__values = {}
+            self.__overrides = frozenset(os.environ)
+
+    def resolve(self, names: Iterable[str]) -> None:
+        """Generates the given environment variables concurrently, unless they are overridden or were already
+        generated, and keeps their values (see `environ`). Names that are not defined under [tool.python-dev-cli.env]
+        are ignored.
+
+        :param names: The names of the environment variables.
+        :raises EnvError: If the command that generates any of the environment variables fails.
+        """
+        pending: List[str] = [
+            name
+            for name in names
+            if name in self.__entries and name not in self.__overrides and name not in self.__values
+        ]
+
+        if not pending:
+            return
+
+        with self.__lock:
+            pending = [name for name in pending if name not in self.__values]
+            values: Dict[str, str] = {}
+
+            for name in pending:
+                value: str | None = self.__read_stored(name)
+                if value is not None:
+                    values[name] = value
+
+            missing: List[str] = [name for name in pending if name not in values]
+            if len(missing) > 1:
+                with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                    values.update(zip(missing, executor.map(self.__generate, missing)))
+            elif missing:
+                values[missing[0]] = self.__generate(missing[0])
+
+            self.__values.update((name, values[name]) for name in pending)
+
+    def save(self) -> None:
+        """Writes any newly generated values with a `ttl` or `inputs` to the env file, if there is one. The file is
+        written atomically, and errors are logged and otherwise ignored, as storing values is only an optimization.
+        """
+        if not self.__stored or not self.cache:
+            return
+
+        with self.__lock:
+            data: Dict[str, Any] = self.__read()
+            data["values"].update(self.__stored)
+            self.__stored = {}
+
+            for name in [name for name in data["values"] if name not in self.__entries]:
+                del data["values"][name]
+
+            try:
+                self.cache.make_directory()
+                tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as file:
+                    json.dump(data, file)
+                os.replace(tmp_path, self.path)
+            except (OSError, TypeError, ValueError) as e:
+                logger.debug(f"Unable to write env file {self.path}: {e}")
+
+    def __generate(self, name: str) -> str:
+        """Runs the command of an environment variable, and returns its stdout without trailing newlines (like `$(...)`
+        in a shell). If the value can be stored, it is added to the values written by `save()`.
+
+        :param name: The name of the environment variable.
+        :return: The value of the environment variable.
+        :raises EnvError: If the command cannot be run, or fails.
+        """
+        entry: Dict[str, Any] = self.__entries[name]
+        # The inputs are fingerprinted before the command runs, so changes made while it runs are detected next time.
+        inputs: Dict[str, List[int]] | None = self.__fingerprint_inputs(entry)
+
+        logger.info(f"Generating environment variable {name}: {entry['cmd']}")
+        try:
+            with timed(f"[env {name}] {entry['cmd']}", command_category):
+                process = subprocess.run(
+                    split_command(entry["cmd"]),
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    cwd=self.root or (self.cache.root if self.cache else None),
+                )
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            stderr: str = getattr(e, "stderr", None) or str(e)
+            raise EnvError(f"Unable to generate environment variable {name}: {stderr.strip()}") from e
+
+        value: str = process.stdout.rstrip("\r\n")
+
+        if self.cache and (entry.get("ttl") or inputs is not None):
+            self.__stored[name] = {"cmd": entry["cmd"], "time": time.time(), "inputs": inputs, "value": value}
+
+        return value
+
+    def __read_stored(self, name: str) -> str | None:
+        """Returns the stored value of an environment variable, if there is one and it is still valid: its command is
+        unchanged, its `ttl` (if any) has not expired, and its `inputs` (if any) are unchanged.
+
+        :param name: The name of the environment variable.
+        :return: The stored value, or None.
+        """
+        entry: Dict[str, Any] = self.__entries[name]
+
+        if not self.cache or not (entry.get("ttl") or entry.get("inputs")):
+            return None
+
+        stored: Any = self.__read()["values"].get(name)
+
+        if (
+            not isinstance(stored, dict)
+            or stored.get("cmd") != entry["cmd"]
+            or not isinstance(stored.get("value"), str)
+        ):
+            return None
+
+        if entry.get("ttl") and time.time() - stored.get("time", 0) >= entry["ttl"]:
+            return None
+
+        if entry.get("inputs") and (
+            stored.get("inputs") is None or stored["inputs"] != self.__fingerprint_inputs(entry)
+        ):
+            return None
+
+        logger.debug(f"Using stored value of environment variable {name}")
+        return stored["value"]
+
+    def __fingerprint_inputs(self, entry: Dict[str, Any]) -> Dict[str, List[int]] | None:
+        """Returns the mtime and size of each input file of an environment variable, relative to the project root.
+
+        :param entry: The table of the environment variable.
+        :return: A dictionary mapping each input file to its fingerprint; or None if there are no inputs, there is no
+            cache, or any of the files was modified too recently for its mtime to be trusted.
+        """
+        if not entry.get("inputs") or not self.cache:
+            return None
+
+        fingerprints: Dict[str, List[int]] = {}
+
+        for path in match_files(self.cache.root, entry["inputs"]):
+            try:
+                fingerprint: List[int] | None = get_stat_fingerprint(os.stat(os.path.join(self.cache.root, path)))
+            except OSError:
+                return None
+            if fingerprint is None:
+                return None
+            fingerprints[path] = fingerprint
+
+        return fingerprints
+
+    def __read(self) -> Dict[str, Any]:
+        """Reads the env file once, returning an empty store if it is missing, invalid or in an older format.
+
+        :return: A dictionary of stored values.
+        """
+        if self.__data is not None:
+            return self.__data
+
+        try:
+            with open(self.path, "r") as file:
+                data: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            data = {}
+
+        if not isinstance(data, dict) or data.get("format") != env_format or not isinstance(data.get("values"), dict):
+            data = {"format": env_format, "values": {}}
+
+        self.__data = data
+        return data
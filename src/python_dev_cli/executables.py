@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+from logging import Logger, getLogger
+from threading import Lock
+from typing import Any, Dict, Final, List
+
+from .cache import ConfigCache, get_stat_fingerprint
+
+logger: Logger = getLogger(__name__)
+
+# Version of the executables file format; bump this whenever the structure of the file changes.
+executables_format: Final[int] = 1
+
+# Maximum number of PATH values whose executables are stored on disk; the least recently saved are discarded first.
+max_path_entries: Final[int] = 8
+
+
+def get_path_key() -> str:
+    """Returns the value that determines where `shutil.which()` finds executables in the current process: the PATH
+    environment variable and, on Windows, the PATHEXT environment variable and the current working directory, which is
+    searched before PATH.
+
+    :return: A string that changes whenever the result of `shutil.which()` for a bare command name could change.
+    """
+    path: str = os.environ.get("PATH", os.defpath)
+
+    if os.name == "nt":
+        return os.pathsep.join([os.getcwd(), os.environ.get("PATHEXT", ""), path])
+
+    return path
+
+
+def get_path_dirs_fingerprint(path_key: str) -> Dict[str, List[int] | None] | None:
+    """Returns the mtime and size of each directory on the given PATH; a directory's mtime changes whenever a file is
+    added to it, removed from it or renamed within it, so a lookup is still valid if none of these have changed.
+
+    :param path_key: A value returned by `get_path_key()`.
+    :return: A dictionary mapping each directory to its fingerprint (or None if it does not exist), or None if any of
+        the directories was modified too recently for its mtime to be trusted.
+    """
+    dirs: Dict[str, List[int] | None] = {}
+
+    for directory in dict.fromkeys(path_key.split(os.pathsep)):
+        try:
+            fingerprint: List[int] | None = get_stat_fingerprint(os.stat(directory or os.curdir))
+        except OSError:
+            dirs[directory] = None
+            continue
+        if fingerprint is None:
+            return None
+        dirs[directory] = fingerprint
+
+    return dirs
+
+
+class ExecutableCache:
+    """A cache of the full paths of the executables that script commands run, so that `shutil.which()` (which stats a
+    file in every PATH directory until it finds the executable) is only called once per executable, rather than once
+    per command. Lookups are memoized for the lifetime of the instance, keyed by the current PATH (see
+    `get_path_key()`), so changing PATH never returns a stale result.
+
+    If a ConfigCache is given, lookups are also stored on disk next to it, along with the mtime of every PATH directory;
+    they are reused by later processes until PATH changes, or an executable is installed in or removed from any of its
+    directories. Like the fingerprints, they are not invalidated when pyproject.toml changes.
+    """
+
+    def __init__(self, cache: ConfigCache | None = None) -> None:
+        self.cache: ConfigCache | None = cache
+        self.__lookups: Dict[str, Dict[str, str | None]] = {}
+        self.__dirs: Dict[str, Dict[str, List[int] | None] | None] = {}
+        self.__dirty: bool = False
+        self.__lock: Lock = Lock()
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    @property
+    def path(self) -> str | None:
+        """The path to the executables file, or None if lookups are not stored on disk."""
+        return os.path.join(self.cache.directory, "executables.json") if self.cache else None
+
+    def which(self, name: str, cwd: str | None = None) -> str | None:
+        """Returns the full path of the given executable, as returned by `shutil.which()`, or None if it is not found.
+        Names that contain a directory (e.g. `./configure`) are relative to the working directory the command runs in,
+        so they are never cached.
+
+        :param name: The name of an executable.
+        :param cwd: The working directory the command runs in; defaults to the current working directory.
+        :return: The full path of the executable, or None.
+        """
+        if os.path.dirname(name):
+            return shutil.which(os.path.join(cwd, name) if cwd else name)
+
+        lookups: Dict[str, str | None] = self.__get_lookups(get_path_key())
+
+        if name not in lookups:
+            lookups[name] = shutil.which(name)
+            self.__dirty = True
+
+        return lookups[name]
+
+    def save(self) -> None:
+        """Writes any new lookups to the executables file, if there is one. The file is written atomically, and errors
+        are logged and otherwise ignored, as caching lookups is only an optimization. Lookups made while any of the
+        PATH directories had just been modified are not written, as their mtimes cannot be trusted.
+        """
+        if not self.__dirty or not self.cache:
+            return
+
+        with self.__lock:
+            self.__dirty = False
+            data: Dict[str, Any] = self.__read()
+
+            for path_key, lookups in self.__lookups.items():
+                dirs: Dict[str, List[int] | None] | None = self.__dirs.get(path_key)
+                data["paths"].pop(path_key, None)  # Re-inserted last, so it is the last to be discarded.
+                if dirs is not None:
+                    data["paths"][path_key] = {"dirs": dirs, "executables": lookups}
+
+            for path_key in list(data["paths"])[:-max_path_entries]:
+                del data["paths"][path_key]
+
+            try:
+                self.cache.make_directory()
+                tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as file:
+                    json.dump(data, file)
+                os.replace(tmp_path, self.path)
+            except (OSError, TypeError, ValueError) as e:
+                logger.debug(f"Unable to write executables file {self.path}: {e}")
+
+    def __get_lookups(self, path_key: str) -> Dict[str, str | None]:
+        """Returns the lookups for the given PATH, loading them from the executables file on first use if all of its
+        directories are unchanged since they were stored.
+
+        :param path_key: A value returned by `get_path_key()`.
+        :return: A dictionary mapping executable names to their full paths (or None, if they were not found).
+        """
+        if path_key in self.__lookups:
+            return self.__lookups[path_key]
+
+        with self.__lock:
+            if path_key not in self.__lookups:
+                # The directories are fingerprinted before any lookup is made, so changes made while looking up
+                # executables are detected by the next process.
+                dirs: Dict[str, List[int] | None] | None = get_path_dirs_fingerprint(path_key) if self.cache else None
+                stored: Dict[str, Any] = self.__get_bundled(path_key) if dirs is not None else {}
+                if dirs is not None and stored.get("dirs") != dirs:
+                    stored = self.__read()["paths"].get(path_key, {})
+                valid: bool = stored.get("dirs") == dirs and isinstance(stored.get("executables"), dict)
+
+                self.__dirs[path_key] = dirs
+                self.__lookups[path_key] = dict(stored["executables"]) if valid else {}
+
+        return self.__lookups[path_key]
+
+    def export(self) -> Dict[str, Any]:
+        """Returns the lookups made so far, in the same format as the executables file, for storing in a precompiled
+        bundle (see `bundle.compile_bundle()`). Lookups made while any of the PATH directories had just been modified
+        are excluded, as their mtimes cannot be trusted.
+
+        :return: A dictionary mapping each PATH to its directory fingerprints and lookups.
+        """
+        with self.__lock:
+            return {
+                path_key: {"dirs": self.__dirs[path_key], "executables": dict(lookups)}
+                for path_key, lookups in self.__lookups.items()
+                if self.__dirs.get(path_key) is not None
+            }
+
+    def __get_bundled(self, path_key: str) -> Dict[str, Any]:
+        """Returns the lookups for the given PATH stored in the precompiled bundle, if the configuration was loaded from
+        one (see `ConfigCache.bundle`).
+
+        :param path_key: A value returned by `get_path_key()`.
+        :return: A dictionary containing the directory fingerprints and lookups, or an empty dictionary.
+        """
+        bundle: Dict[str, Any] | None = self.cache.bundle if self.cache else None
+        stored: Any = bundle.get("executables", {}).get(path_key) if bundle else None
+        return stored if isinstance(stored, dict) else {}
+
+    def __read(self) -> Dict[str, Any]:
+        """Reads the executables file, returning an empty store if it is missing, invalid or in an older format.
+
+        :return: A dictionary of stored lookups.
+        """
+        try:
+            with open(self.path, "r") as file:
+                data: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            data = {}
+
+        if (
+            not isinstance(data, dict)
+            or data.get("format") != executables_format
+            or not isinstance(data.get("paths"), dict)
+        ):
+            data = {"format": executables_format, "paths": {}}
+
+        return data
@@ -0,0 +1,174 @@
+import glob
+import hashlib
+import json
+import os
+from logging import Logger, getLogger
+from threading import Lock
+from typing import Any, Dict, Final, List, Set
+
+from .cache import ConfigCache, get_stat_fingerprint
+
+logger: Logger = getLogger(__name__)
+
+# Version of the fingerprints file format; bump this whenever the structure of the file changes.
+fingerprints_format: Final[int] = 1
+
+# Number of bytes read at a time when hashing a file.
+hash_chunk_size: Final[int] = 2**20
+
+
+def get_file_hash(path: str) -> str:
+    """Returns the SHA-256 hash of the contents of the given file, reading it in chunks.
+
+    :param path: The path to the file.
+    :return: A hex digest.
+    :raises OSError: If the file cannot be read.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(hash_chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def match_files(root: str, patterns: List[str]) -> List[str]:
+    """Returns the paths of the files matching any of the given glob patterns, relative to the given root directory.
+    Patterns can use `**` to match any number of subdirectories.
+
+    :param root: The directory the patterns are relative to.
+    :param patterns: A list of glob patterns.
+    :return: A sorted list of file paths, relative to the root directory.
+    """
+    paths: Set[str] = set()
+
+    for pattern in patterns:
+        for path in glob.glob(pattern, root_dir=root, recursive=True):
+            if os.path.isfile(os.path.join(root, path)):
+                paths.add(os.path.normpath(path))
+
+    return sorted(paths)
+
+
+class FingerprintStore:
+    """A persistent, on-disk store of the fingerprints of scripts with `inputs` and `outputs`, used to skip running a
+    script when none of its input files or commands have changed since it last succeeded, and all of its outputs exist.
+
+    Each input file is fingerprinted by its mtime and size, falling back to a hash of its contents when they have
+    changed (or cannot be trusted), so touching a file without changing it does not cause the script to run again. The
+    fingerprints are stored next to the ConfigCache, but are not invalidated when pyproject.toml changes.
+    """
+
+    def __init__(self, cache: ConfigCache) -> None:
+        self.cache: ConfigCache = cache
+        self.__data: Dict[str, Any] | None = None
+        self.__lock: Lock = Lock()
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    @property
+    def path(self) -> str:
+        """The path to the fingerprints file."""
+        return os.path.join(self.cache.directory, "fingerprints.json")
+
+    @property
+    def root(self) -> str:
+        """The directory that input and output patterns are relative to; this is the project root."""
+        return self.cache.root
+
+    def check(
+        self, script_key: str, commands: List[str], inputs: List[str], outputs: List[str]
+    ) -> Dict[str, Any] | None:
+        """Returns None if the given script is up-to-date; that is, if its commands and the contents of its input files
+        are the same as when it last succeeded, and each of its output patterns matches at least one file. Otherwise, it
+        returns the current fingerprint of the script, which should be stored using `update()` once the script has run
+        successfully. The fingerprint is taken before the script runs, so any input files that change while it is
+        running cause it to run again next time.
+
+        :param script_key: The name of the script.
+        :param commands: The commands of the script.
+        :param inputs: A list of glob patterns matching the input files of the script.
+        :param outputs: A list of glob patterns matching the output files of the script.
+        :return: None if the script is up-to-date, otherwise its current fingerprint.
+        """
+        previous: Dict[str, Any] = self.__get_data()["scripts"].get(script_key, {})
+        previous_files: Dict[str, List[Any]] = previous.get("inputs", {})
+        files: Dict[str, List[Any]] = {}
+
+        for path in match_files(self.root, inputs):
+            try:
+                files[path] = self.__fingerprint(path, previous_files.get(path))
+            except OSError as e:
+                logger.debug(f"Unable to fingerprint input file {path}: {e}")  # E.g. it was deleted after matching.
+
+        fingerprint: Dict[str, Any] = {"commands": list(commands), "inputs": files}
+        unchanged: bool = previous.get("commands") == fingerprint["commands"] and {
+            path: value[2] for path, value in previous_files.items()
+        } == {path: value[2] for path, value in files.items()}
+
+        if unchanged and all(glob.glob(pattern, root_dir=self.root, recursive=True) for pattern in outputs):
+            return None
+
+        return fingerprint
+
+    def update(self, script_key: str, fingerprint: Dict[str, Any]) -> None:
+        """Stores the fingerprint of a script that has run successfully, and writes the fingerprints file. The file is
+        written atomically, and errors are logged and otherwise ignored, as skipping scripts is only an optimization.
+
+        :param script_key: The name of the script.
+        :param fingerprint: The fingerprint returned by `check()` before the script was run.
+        """
+        with self.__lock:
+            data: Dict[str, Any] = self.__get_data()
+            data["scripts"][script_key] = fingerprint
+
+            try:
+                self.cache.make_directory()
+                tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as file:
+                    json.dump(data, file)
+                os.replace(tmp_path, self.path)
+            except (OSError, TypeError, ValueError) as e:
+                logger.debug(f"Unable to write fingerprints file {self.path}: {e}")
+
+    def __get_data(self) -> Dict[str, Any]:
+        """Returns the stored fingerprints, loading them on first use.
+
+        :return: A dictionary of stored fingerprints.
+        """
+        if self.__data is not None:
+            return self.__data
+
+        try:
+            with open(self.path, "r") as file:
+                data: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            data = {}
+
+        if not isinstance(data, dict) or data.get("format") != fingerprints_format:
+            data = {"format": fingerprints_format, "scripts": {}}
+
+        self.__data = data
+        return self.__data
+
+    def __fingerprint(self, path: str, previous: List[Any] | None) -> List[Any]:
+        """Returns the fingerprint of an input file, as a list containing its mtime, size and content hash. The hash is
+        reused from the previous fingerprint if the mtime and size have not changed, and can be trusted. If the file
+        was modified too recently for its mtime to be trusted, the mtime is not stored, so it is hashed again next time.
+
+        :param path: The path to the file, relative to the project root.
+        :param previous: The previous fingerprint of the file, or None.
+        :return: A list containing the mtime (in nanoseconds, or None), size and SHA-256 hash of the file.
+        """
+        full_path: str = os.path.join(self.root, path)
+        stat: os.stat_result = os.stat(full_path)
+        stat_fingerprint: List[int] | None = get_stat_fingerprint(stat)
+
+        if previous is not None and stat_fingerprint is not None and previous[:2] == stat_fingerprint:
+            return previous
+
+        mtime: int | None = stat.st_mtime_ns if stat_fingerprint is not None else None
+        return [mtime, stat.st_size, get_file_hash(full_path)]
@@ -0,0 +1,227 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from logging import Logger, getLogger
+from subprocess import CompletedProcess
+from threading import Event
+from typing import Awaitable, Callable, Dict, List, Set
+
+logger: Logger = getLogger(__name__)
+
+
+class ScriptGraphError(Exception):
+    """Raised when a script graph is invalid (e.g. it contains a cycle, or a reference to an unknown node)."""
+
+    pass
+
+
+class ScriptGraph:
+    """A directed acyclic graph of scripts, used to run scripts concurrently while respecting their dependencies. Each
+    node is a script key (or, for a script that is run more than once, a key for each run), with a list of commands that
+    are run in order; a node is only run once all of the nodes it depends on have completed successfully.
+    """
+
+    def __init__(self) -> None:
+        self.__commands: Dict[str, List[str]] = {}
+        self.__dependencies: Dict[str, Set[str]] = {}
+        self.__script_keys: Dict[str, str] = {}
+
+    def __contains__(self, item):
+        return item in self.__commands
+
+    def __iter__(self):
+        return iter(self.__commands)
+
+    def __len__(self):
+        return len(self.__commands)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.__dependencies})"
+
+    def add_node(
+        self, key: str, commands: List[str], dependencies: List[str] | None = None, script_key: str | None = None
+    ) -> None:
+        """Adds a node to the graph, replacing any existing node with the same key.
+
+        :param key: The name of the node; usually the name of the script.
+        :param commands: A list of script commands, which are run in order.
+        :param dependencies: An optional list of node keys that must be run before this node.
+        :param script_key: The name of the script the node runs, if it is not the same as the node key (e.g. when the
+            same script is run more than once).
+        """
+        self.__commands[key] = list(commands)
+        self.__dependencies[key] = set(dependencies or [])
+        self.__script_keys[key] = script_key or key
+
+    def get_script_key(self, key: str) -> str:
+        """Returns the name of the script that the given node runs.
+
+        :param key: The name of the node.
+        :return: A script key.
+        :raises KeyError: If the node is not found.
+        """
+        return self.__script_keys[key]
+
+    def get_commands(self, key: str) -> List[str]:
+        """Returns the list of commands for the given node.
+
+        :param key: The name of the script.
+        :return: A list of script commands.
+        :raises KeyError: If the node is not found.
+        """
+        return self.__commands[key]
+
+    def get_dependencies(self, key: str) -> Set[str]:
+        """Returns the set of nodes that must be run before the given node.
+
+        :param key: The name of the script.
+        :return: A set of script keys.
+        :raises KeyError: If the node is not found.
+        """
+        return self.__dependencies[key]
+
+    def get_dependents(self) -> Dict[str, List[str]]:
+        """Returns a dictionary mapping each node to the list of nodes that depend on it.
+
+        :return: A dictionary of script keys.
+        :raises ScriptGraphError: If any node depends on a node that is not in the graph.
+        """
+        dependents: Dict[str, List[str]] = {key: [] for key in self.__commands}
+
+        for key, dependencies in self.__dependencies.items():
+            for dependency in dependencies:
+                if dependency not in dependents:
+                    raise ScriptGraphError(f"Invalid script dependency `{dependency}` in: {key}")
+                dependents[dependency].append(key)
+
+        return dependents
+
+    def topological_order(self) -> List[str]:
+        """Returns the nodes of the graph in an order that respects their dependencies, using Kahn's algorithm.
+
+        :return: A list of script keys.
+        :raises ScriptGraphError: If the graph contains a cycle, or any node depends on a node that is not in the graph.
+        """
+        dependents: Dict[str, List[str]] = self.get_dependents()
+        remaining: Dict[str, int] = {key: len(dependencies) for key, dependencies in self.__dependencies.items()}
+        ready: List[str] = [key for key, count in remaining.items() if count == 0]
+        order: List[str] = []
+
+        while ready:
+            key = ready.pop()
+            order.append(key)
+            for dependent in dependents[key]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.__commands):
+            cycle: List[str] = sorted(key for key, count in remaining.items() if count > 0)
+            raise ScriptGraphError(f"Circular script dependency between: {', '.join(cycle)}")
+
+        return order
+
+    def is_sequential(self) -> bool:
+        """Returns True if the nodes of the graph can only run one at a time: that is, if each node in topological
+        order depends on the node before it, so no two nodes can ever run concurrently.
+
+        :return: True if the graph is a single chain of nodes.
+        :raises ScriptGraphError: If the graph contains a cycle, or any node depends on a node that is not in the graph.
+        """
+        order: List[str] = self.topological_order()
+        return all(previous in self.__dependencies[key] for previous, key in zip(order, order[1:]))
+
+    def run(
+        self, run_node: Callable[[str, Event], List[CompletedProcess]], jobs: int | None = None
+    ) -> List[CompletedProcess]:
+        """Runs every node in the graph using a bounded pool of worker threads, starting each node as soon as all of its
+        dependencies have completed. If any node raises an exception (e.g. a CalledProcessError), no further nodes are
+        started, and the exception is raised once the nodes that are already running have finished. The nodes that are
+        already running are notified using an Event, so they can skip any remaining commands.
+
+        :param run_node: A function that runs the commands of the given node, and returns the results; it is called with
+            the node key and an Event that is set when the run is aborted.
+        :param jobs: The maximum number of nodes to run at once; defaults to the number of CPUs.
+        :return: A list of CompletedProcess instances, in the order the nodes completed.
+        :raises ScriptGraphError: If the graph contains a cycle, or any node depends on a node that is not in the graph.
+        """
+        self.topological_order()  # Raises ScriptGraphError if the graph is invalid, before anything is run.
+
+        dependents: Dict[str, List[str]] = self.get_dependents()
+        remaining: Dict[str, int] = {key: len(dependencies) for key, dependencies in self.__dependencies.items()}
+        ready: List[str] = [key for key, count in remaining.items() if count == 0]
+        running: Dict[Future, str] = {}
+        abort: Event = Event()
+        output: List[CompletedProcess] = []
+        max_workers: int = jobs or os.cpu_count() or 1
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while ready or running:
+                # Only submit as many nodes as there are workers, so no queued node can start after a node has failed.
+                while ready and len(running) < max_workers:
+                    key = ready.pop(0)
+                    running[executor.submit(run_node, key, abort)] = key
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    key = running.pop(future)
+                    error: BaseException | None = future.exception()
+
+                    if error:
+                        abort.set()
+                        logger.debug(f"Script [{key}] failed; waiting for {len(running)} running script(s) to finish")
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        raise error
+
+                    output.extend(future.result())
+
+                    for dependent in dependents[key]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            ready.append(dependent)
+
+        return output
+
+    async def run_async(
+        self, run_node: Callable[[str], Awaitable[List[CompletedProcess]]], jobs: int | None = None
+    ) -> List[CompletedProcess]:
+        """Runs every node in the graph as an asyncio task, starting each node as soon as all of its dependencies have
+        completed. Unlike `run()`, the number of nodes running at once is unlimited by default, so that long-running
+        scripts (e.g. servers and file watchers) can all run side by side. If any node raises an exception, all of the
+        other nodes are cancelled immediately, and the exception is raised.
+
+        :param run_node: A coroutine function that runs the commands of the given node, and returns the results.
+        :param jobs: The maximum number of nodes to run at once; defaults to no limit.
+        :return: A list of CompletedProcess instances, in the order the nodes completed.
+        :raises ScriptGraphError: If the graph contains a cycle, or any node depends on a node that is not in the graph.
+        """
+        import asyncio  # Deferred, so running scripts synchronously never imports asyncio.
+
+        semaphore: asyncio.Semaphore | None = asyncio.Semaphore(jobs) if jobs else None
+        tasks: Dict[str, asyncio.Task] = {}
+        output: List[CompletedProcess] = []
+
+        async def run(key: str) -> None:
+            await asyncio.gather(*[tasks[dependency] for dependency in self.__dependencies[key]])
+            if semaphore:
+                async with semaphore:
+                    output.extend(await run_node(key))
+            else:
+                output.extend(await run_node(key))
+
+        # Tasks are created in topological order, so the tasks for the dependencies of each node already exist.
+        for key in self.topological_order():
+            tasks[key] = asyncio.create_task(run(key))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return output
@@ -0,0 +1,198 @@
+import os
+import re
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, List, NamedTuple, Pattern
+
+try:
+    import resource
+except ImportError:  # The resource module is only available on POSIX systems.
+    resource = None
+
+logger: Logger = getLogger(__name__)
+
+# The keys of a script table that set the policy its commands are run with (see `ScriptPolicy`):
+# - "timeout" => the number of seconds after which a command is killed, and fails with a TimeoutExpired error
+# - "retries" => the number of times a command that fails (or times out) is run again, before the script fails
+# - "retry_delay" => the number of seconds to wait before the first retry, doubled for each retry after that
+# - "nice" => an increment to the niceness of each command, so it yields the CPU to others (see `os.setpriority()`)
+# - "cpu_affinity" => a list of the CPUs each command may run on (see `os.sched_setaffinity()`; Linux only)
+# - "memory_limit" => the maximum size of the virtual memory of each command, in bytes or with a `K`, `M` or `G` suffix
+#   (e.g. "2G"), beyond which memory allocations fail (see `resource.prlimit()`; Linux only)
+policy_keys: Final[frozenset] = frozenset(["timeout", "retries", "retry_delay", "nice", "cpu_affinity", "memory_limit"])
+
+# Factor by which the delay before each retry grows.
+retry_backoff: Final[float] = 2.0
+
+# Matches a memory size with an optional unit suffix, e.g. "512M" or "2GB".
+size_pattern: Final[Pattern] = re.compile(r"(\d+)\s*([KMG]?)B?", re.IGNORECASE)
+
+
+def is_number(value: Any) -> bool:
+    """Returns True if the given value is an int or float, but not a bool.
+
+    :param value: Any value.
+    :return: Whether the value is a number.
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_size(value: int | str) -> int:
+    """Converts a memory size (e.g. `536870912`, "512M" or "2G") into a number of bytes.
+
+    :param value: A number of bytes, or a string with a `K`, `M` or `G` suffix.
+    :return: A number of bytes.
+    :raises ValueError: If the value is not a valid memory size.
+    """
+    if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+        return value
+
+    match = size_pattern.fullmatch(value.strip()) if isinstance(value, str) else None
+    if not match or not int(match.group(1)):
+        raise ValueError(f"Invalid memory size: {value}")
+
+    return int(match.group(1)) * 1024 ** " KMG".index(match.group(2).upper() or " ")
+
+
+def validate_policy(key: str, table: Dict[str, Any]) -> None:
+    """Validates the policy keys of a script table (see `policy_keys`), raising a TypeError if any of them are invalid.
+
+    :param key: The name of the script.
+    :param table: The script table.
+    :raises TypeError: If any of the policy keys are invalid.
+    """
+    if not policy_keys & set(table):
+        return
+
+    if isinstance(table.get("cmd"), list):
+        names: str = ", ".join(f"`{name}`" for name in sorted(policy_keys & set(table)))
+        raise TypeError(
+            f"Invalid script table for `{key}`: {names} requires a command (set it on the scripts in `cmd`)"
+        )
+
+    timeout = table.get("timeout", 1)
+    if not is_number(timeout) or timeout <= 0:
+        raise TypeError(f"Invalid script table `timeout` for `{key}`: {timeout} (must be a positive number)")
+
+    retries = table.get("retries", 0)
+    if not isinstance(retries, int) or isinstance(retries, bool) or retries < 0:
+        raise TypeError(f"Invalid script table `retries` for `{key}`: {retries} (must be a non-negative int)")
+
+    retry_delay = table.get("retry_delay", 0)
+    if not is_number(retry_delay) or retry_delay < 0:
+        raise TypeError(
+            f"Invalid script table `retry_delay` for `{key}`: {retry_delay} (must be a non-negative number)"
+        )
+
+    nice = table.get("nice", 0)
+    if not isinstance(nice, int) or isinstance(nice, bool):
+        raise TypeError(f"Invalid script table `nice` for `{key}`: {nice} (must be int)")
+
+    cpu_affinity = table.get("cpu_affinity", [0])
+    if (
+        not isinstance(cpu_affinity, list)
+        or not cpu_affinity
+        or not all(isinstance(cpu, int) and not isinstance(cpu, bool) and cpu >= 0 for cpu in cpu_affinity)
+    ):
+        raise TypeError(
+            f"Invalid script table `cpu_affinity` for `{key}`: {cpu_affinity} (must be list of CPU numbers)"
+        )
+
+    if "memory_limit" in table:
+        try:
+            parse_size(table["memory_limit"])
+        except ValueError:
+            raise TypeError(
+                f"Invalid script table `memory_limit` for `{key}`: {table['memory_limit']} (must be a positive number "
+                f"of bytes, or a str with a K, M or G suffix)"
+            ) from None
+
+
+class ScriptPolicy(NamedTuple):
+    """The policy that the commands of a script are run with: a timeout, a number of retries with exponential backoff,
+    and resource limits, which are set by the policy keys of a script table (see `policy_keys`). The default policy has
+    no timeout, no retries and no limits.
+    """
+
+    timeout: float | None = None
+    retries: int = 0
+    retry_delay: float = 1.0
+    nice: int | None = None
+    cpu_affinity: List[int] | None = None
+    memory_limit: int | None = None
+
+    @staticmethod
+    def from_table(table: Dict[str, Any]) -> "ScriptPolicy":
+        """Returns the policy set by the policy keys of a script table, which must already be valid (see
+        `validate_policy()`).
+
+        :param table: The script table.
+        :return: A ScriptPolicy instance.
+        """
+        return ScriptPolicy(
+            timeout=table.get("timeout"),
+            retries=table.get("retries", 0),
+            retry_delay=table.get("retry_delay", 1.0),
+            nice=table.get("nice"),
+            cpu_affinity=table.get("cpu_affinity"),
+            memory_limit=parse_size(table["memory_limit"]) if "memory_limit" in table else None,
+        )
+
+    @property
+    def limited(self) -> bool:
+        """True if the policy sets any resource limits."""
+        return bool(self.nice) or self.cpu_affinity is not None or self.memory_limit is not None
+
+    def get_delay(self, attempt: int) -> float:
+        """Returns the number of seconds to wait before running a command again, after it failed.
+
+        :param attempt: The number of the attempt that failed, starting at 0.
+        :return: A number of seconds.
+        """
+        return self.retry_delay * retry_backoff**attempt
+
+    def get_kwargs(self) -> Dict[str, Any]:
+        """Returns the keyword arguments that enforce the policy when passed to `capture.run_process()`,
+        `capture.run_captured()` or `async_runner.run_command()`: the `timeout`, if there is one; and an `on_start`
+        function that applies the resource limits to each process as soon as it has started, if there are any (see
+        `apply_limits()`). If there are either, each process is also started in its own process group, so that the
+        processes it starts are killed along with it if it times out. Resource limits are only supported on POSIX
+        systems, and are ignored elsewhere.
+
+        :return: A dictionary of keyword arguments; empty for the default policy.
+        """
+        kwargs: Dict[str, Any] = {}
+
+        if self.timeout is not None:
+            kwargs["timeout"] = self.timeout
+
+        if self.limited:
+            if os.name == "posix":
+                kwargs["on_start"] = self.apply_limits
+            else:
+                logger.debug(f"Ignoring resource limits, which are not supported on this platform: {self}")
+
+        if kwargs and os.name == "posix":
+            kwargs["process_group"] = 0
+
+        return kwargs
+
+    def apply_limits(self, pid: int) -> None:
+        """Applies the resource limits of the policy to a process that has just started, from the parent process; so
+        unlike a `preexec_fn`, it is safe to use when `dev` runs commands from several threads. Any processes it starts
+        afterward inherit the limits. Limits that are not supported on this platform (e.g. `cpu_affinity` and
+        `memory_limit` on macOS) are ignored; and errors (e.g. a negative `nice` without permission) are logged, and
+        otherwise ignored, as the command is already running.
+
+        :param pid: The pid of the process.
+        """
+        try:
+            if self.nice:
+                os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, pid) + self.nice)
+            if self.cpu_affinity is not None and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(pid, self.cpu_affinity)
+            if self.memory_limit is not None and hasattr(resource, "prlimit"):
+                resource.prlimit(pid, resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+        except ProcessLookupError:
+            pass  # The process has already exited.
+        except OSError as e:
+            logger.warning(f"Unable to apply resource limits to process {pid}: {e}")
@@ -0,0 +1,137 @@
+import importlib
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging import Logger, getLogger
+from subprocess import CompletedProcess
+from threading import Lock
+from typing import Iterable, List
+
+from .calls import Call, run_call
+
+logger: Logger = getLogger(__name__)
+
+
+def get_start_method() -> str:
+    """Returns the method used to start worker processes: "forkserver" where it is available (on POSIX systems), so
+    that preloaded modules are imported once by the server process and inherited by every worker it forks; otherwise
+    "spawn", where each worker imports them itself.
+
+    :return: A multiprocessing start method.
+    """
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def import_modules(modules: List[str]) -> None:
+    """Imports the given modules in a worker process, before it runs any calls. Modules that cannot be imported are
+    logged and otherwise ignored, so that calls that do not need them can still run.
+
+    :param modules: A list of module names.
+    """
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.debug(f"Unable to preload module {module} in worker process {os.getpid()}: {e}")
+
+
+class WorkerPool:
+    """A pool of warm worker processes that run Calls (see `calls.run_call()`), so that calls can run concurrently, and
+    heavyweight tools are imported once per worker rather than once per command. The pool is started the first time a
+    call is submitted, and its workers are reused until it is shut down.
+
+    The working directory and environment variables of the submitting process are passed with each call, so calls see
+    the same values as subprocesses would, even if they have changed since the pool was started (e.g. by generated
+    environment variables).
+    """
+
+    def __init__(self, workers: int, preload: Iterable[str] = ()) -> None:
+        self.workers: int = workers
+        self.preload: List[str] = list(dict.fromkeys([run_call.__module__, *preload]))
+        self.__executor: ProcessPoolExecutor | None = None
+        self.__lock: Lock = Lock()
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.workers} workers, preload={self.preload})"
+
+    @property
+    def started(self) -> bool:
+        """True if the worker processes have been started, and not shut down."""
+        return self.__executor is not None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The ProcessPoolExecutor that runs the calls, which is created the first time it is used."""
+        with self.__lock:
+            if self.__executor is None:
+                context = multiprocessing.get_context(get_start_method())
+                if context.get_start_method() == "forkserver":
+                    context.set_forkserver_preload(self.preload)
+                self.__executor = ProcessPoolExecutor(
+                    self.workers, mp_context=context, initializer=import_modules, initargs=(self.preload,)
+                )
+            return self.__executor
+
+    def submit(self, call: Call, **kwargs) -> Future:
+        """Submits a call to be run by a worker process.
+
+        :param call: The Call to run.
+        :param kwargs: Additional keyword arguments to pass to `calls.run_call()`.
+        :return: A Future, whose result is the CompletedProcess returned by `calls.run_call()`.
+        """
+        kwargs.setdefault("cwd", os.getcwd())
+        if kwargs.get("env") is None:
+            kwargs["env"] = dict(os.environ)
+
+        return self.executor.submit(run_call, call, **kwargs)
+
+    def run(self, call: Call, **kwargs) -> CompletedProcess:
+        """Runs a call in a worker process, and waits for its result. If a worker process dies while it runs (e.g. the
+        call used `os._exit()`), the call fails like a command that exits with an error (see `get_broken_result()`).
+
+        :param call: The Call to run.
+        :param kwargs: Additional keyword arguments to pass to `calls.run_call()`.
+        :return: A CompletedProcess instance.
+        :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+        """
+        try:
+            return self.submit(call, **kwargs).result()
+        except BrokenProcessPool as e:
+            result: CompletedProcess = self.get_broken_result(call, e)
+
+        if not kwargs.get("capture_output"):
+            sys.stderr.write(result.stderr.decode())
+            result.stdout = result.stderr = None
+        elif kwargs.get("text"):
+            result.stdout, result.stderr = result.stdout.decode(), result.stderr.decode()
+
+        if kwargs.get("check"):
+            result.check_returncode()
+
+        return result
+
+    def get_broken_result(self, call: Call, error: BrokenProcessPool) -> CompletedProcess:
+        """Returns the result of a call whose worker process died while running it: an exit code of 1, with the error as
+        its stderr, so that the script fails with a CalledProcessError naming the call. The pool is shut down, so that
+        the next call starts a new one.
+
+        :param call: The Call that was running.
+        :param error: The error raised by the pool.
+        :return: A CompletedProcess instance, with stdout and stderr as bytes.
+        """
+        logger.debug(f"Worker process died while running {call}: {error}")
+        self.shutdown()
+        return CompletedProcess(call.argv, 1, b"", f"Worker process died while running {call}\n".encode())
+
+    def shutdown(self) -> None:
+        """Stops the worker processes, if they were started, once any calls they are running have finished."""
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
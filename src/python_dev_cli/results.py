@@ -0,0 +1,403 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from logging import Logger, getLogger
+from subprocess import CompletedProcess
+from threading import Lock, get_ident
+from typing import Any, Dict, Final, List, Pattern, Set, Tuple
+
+from .fingerprints import get_file_hash
+
+logger: Logger = getLogger(__name__)
+
+# Version of the result cache format; bump this whenever the structure of the manifests, or of the cache keys, changes.
+results_format: Final[int] = 1
+
+# Default maximum size of the result cache, in megabytes.
+default_max_size: Final[int] = 1024
+
+# Number of seconds after an object was last written or reused before it can be evicted, so that objects stored by a
+# concurrent `ResultCache.put()` are not deleted before the manifest that uses them has been written.
+object_grace_period: Final[float] = 60.0
+
+# Pattern of the SHA-256 hashes that objects are named after; manifests are not trusted to name any other file.
+digest_pattern: Final[Pattern[str]] = re.compile(r"[0-9a-f]{64}")
+
+# Lock held while the umask is read, as the only way to read it is to set it (see `get_umask()`).
+umask_lock: Final[Lock] = Lock()
+
+
+def get_umask() -> int:
+    """Returns the umask of the process. It can only be read by setting it, so it is briefly set to 0o077, which is at
+    least as strict as any umask, before being restored.
+
+    :return: The umask.
+    """
+    with umask_lock:
+        umask: int = os.umask(0o077)
+        os.umask(umask)
+
+    return umask
+
+
+def get_result_key(commands: List[str], inputs: Dict[str, str], outputs: List[str], env: Dict[str, str | None]) -> str:
+    """Returns the key of a script result in the result cache: a SHA-256 hash of everything that determines what the
+    script does; that is, its rendered commands, the hashes of the contents of its input files, its output patterns, and
+    the values of any environment variables it depends on.
+
+    :param commands: The rendered commands of the script.
+    :param inputs: A dictionary mapping the path of each input file, relative to the project root, to its SHA-256 hash.
+    :param outputs: A list of glob patterns matching the output files of the script.
+    :param env: A dictionary mapping the names of environment variables to their values (or None, if they are not set).
+    :return: A hex digest.
+    """
+    key: Dict[str, Any] = {
+        "format": results_format,
+        "platform": sys.platform,
+        "commands": list(commands),
+        "inputs": dict(sorted(inputs.items())),
+        "outputs": list(outputs),
+        "env": dict(sorted(env.items())),
+    }
+    return hashlib.sha256(json.dumps(key, separators=(",", ":")).encode()).hexdigest()
+
+
+class ResultCache:
+    """A local, content-addressed cache of script results, used to restore the output files, stdout, stderr and exit
+    codes of a script that has already been run with the same commands, inputs and environment variables, instead of
+    running it again. It works entirely offline, against a directory that can be shared by any number of checkouts.
+
+    The contents of each output file and output stream are stored once as an object, named after its SHA-256 hash, and
+    each result is stored as a manifest, named after its key (see `get_result_key()`), that lists the objects it uses.
+    The mtime of a manifest is updated whenever it is used, so that when the cache grows larger than `max_size` bytes,
+    the least recently used results are evicted first.
+    """
+
+    def __init__(self, directory: str, max_size: int = default_max_size * 2**20) -> None:
+        self.directory: str = str(directory)
+        self.max_size: int = int(max_size)
+        self.__lock: Lock = Lock()
+        self.__size: int | None = None
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.directory!r}, {self.max_size!r})"
+
+    @property
+    def objects_dir(self) -> str:
+        """The directory where the contents of output files and streams are stored, named after their hash."""
+        return os.path.join(self.directory, "objects")
+
+    @property
+    def results_dir(self) -> str:
+        """The directory where result manifests are stored, named after their key."""
+        return os.path.join(self.directory, "results")
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        """Returns the manifest of the result with the given key, or None if it is not cached (or any of the objects it
+        uses are missing). The manifest is marked as recently used.
+
+        :param key: The result key.
+        :return: A dictionary with "processes" and "outputs" keys, or None.
+        """
+        path: str = self.__get_result_path(key)
+
+        try:
+            with open(path, "r") as file:
+                manifest: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(manifest, dict) or manifest.get("format") != results_format:
+            return None
+
+        if not all(self.__is_relative_path(path) for path in manifest.get("outputs", {})):
+            logger.debug(f"Result {key} has output paths outside the project root; ignoring it")
+            return None
+
+        try:
+            digests: Set[str] = self.__get_objects(manifest)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            digests = {""}
+
+        if not all(self.__is_digest(digest) for digest in digests) or not all(
+            isinstance(mode, int) for _, mode in manifest["outputs"].values()
+        ):
+            logger.debug(f"Result {key} has invalid object hashes or modes; ignoring it")
+            return None
+
+        if not all(os.path.isfile(self.__get_object_path(digest)) for digest in digests):
+            logger.debug(f"Result {key} is missing one or more objects; ignoring it")
+            return None
+
+        try:
+            os.utime(path)
+        except OSError as e:
+            logger.debug(f"Unable to mark result {key} as used: {e}")
+
+        return manifest
+
+    def put(self, key: str, processes: List[CompletedProcess], root: str, paths: List[str]) -> None:
+        """Stores the result of a script that has run successfully, and evicts the least recently used results if the
+        cache has grown larger than `max_size`. The size of the cache is only scanned by the first eviction; after that,
+        it is tracked as objects are stored, so the cache is only scanned again once it crosses the limit. Errors are
+        logged and otherwise ignored, as the cache is only an optimization.
+
+        :param key: The result key.
+        :param processes: The processes run by the script; their stdout and stderr must have been captured.
+        :param root: The directory that output paths are relative to; this is the project root.
+        :param paths: The paths of the output files of the script, relative to the root directory.
+        """
+        try:
+            manifest: Dict[str, Any] = {
+                "format": results_format,
+                "processes": [
+                    {
+                        "returncode": process.returncode,
+                        "stdout": self.__put_object(self.__to_bytes(process.stdout)),
+                        "stderr": self.__put_object(self.__to_bytes(process.stderr)),
+                    }
+                    for process in processes
+                ],
+                "outputs": {path: self.__put_file(os.path.join(root, path)) for path in paths},
+            }
+            self.__write(self.__get_result_path(key), json.dumps(manifest).encode())
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"Unable to store result {key}: {e}")
+            return
+
+        if self.__size is None or self.__size > self.max_size:
+            self.evict()
+
+    def read(self, digest: str) -> bytes:
+        """Returns the contents of the object with the given hash.
+
+        :param digest: The SHA-256 hash of the object.
+        :return: The contents of the object.
+        :raises OSError: If the object cannot be read, or the hash is invalid.
+        """
+        with open(self.__get_object_path(digest), "rb") as file:
+            return file.read()
+
+    def restore(self, manifest: Dict[str, Any], root: str) -> None:
+        """Restores the output files of a cached result, replacing any existing files atomically. Their permission bits
+        are those they were stored with, less any removed by the umask.
+
+        :param manifest: A manifest returned by `get()`.
+        :param root: The directory that output paths are relative to; this is the project root.
+        :raises OSError: If an output file cannot be written, or its path is not inside the root directory (the cache
+            directory can be shared, so manifests are not trusted to only write files in the project).
+        """
+        for path in manifest["outputs"]:
+            if not self.__is_relative_path(path):
+                raise OSError(f"Invalid output path in cached result: {path}")
+
+        mask: int = 0o777 & ~get_umask()
+        for path, (digest, mode) in manifest["outputs"].items():
+            self.__write(os.path.join(root, path), self.read(digest), int(mode) & mask)
+
+    def evict(self) -> int:
+        """Deletes the least recently used results until the total size of the cache is no larger than `max_size`, and
+        then deletes any objects that are no longer used by a result. Objects written or reused in the last
+        `object_grace_period` seconds are kept, as they may belong to a result that another thread or process is still
+        storing; they are deleted by a later eviction.
+
+        :return: The number of bytes deleted.
+        """
+        with self.__lock:
+            stats: Dict[str, Tuple[int, float]] = self.__get_object_stats()
+            sizes: Dict[str, int] = {digest: size for digest, (size, _) in stats.items()}
+            total: int = sum(sizes.values())
+
+            if total <= self.max_size:
+                self.__size = total
+                return 0
+
+            results: List[Tuple[float, str, Set[str]]] = []
+            for name in self.__listdir(self.results_dir):
+                path: str = os.path.join(self.results_dir, name)
+                try:
+                    mtime: float = os.stat(path).st_mtime
+                    with open(path, "r") as file:
+                        results.append((mtime, path, self.__get_objects(json.load(file))))
+                except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                    results.append((0.0, path, set()))  # Unreadable results are evicted first.
+
+            # Objects can be shared by many results, so they are only counted against the results that still use them.
+            results.sort(key=lambda result: result[0])
+            counts: Dict[str, int] = {}
+            for _, _, digests in results:
+                for digest in digests:
+                    counts[digest] = counts.get(digest, 0) + 1
+
+            used: int = sum(size for digest, size in sizes.items() if digest in counts)
+            for _, path, digests in results:
+                if used <= self.max_size:
+                    break
+                self.__remove(path)
+                for digest in digests:
+                    counts[digest] -= 1
+                    if counts[digest] == 0:
+                        used -= sizes.get(digest, 0)
+
+            deleted: int = 0
+            expired: float = time.time() - object_grace_period
+            for digest, (size, mtime) in stats.items():
+                if counts.get(digest, 0) == 0 and mtime < expired:
+                    self.__remove(self.__get_object_path(digest))
+                    deleted += size
+
+            self.__size = total - deleted
+            logger.debug(f"Evicted {deleted} bytes from result cache {self.directory}")
+            return deleted
+
+    def __get_result_path(self, key: str) -> str:
+        return os.path.join(self.results_dir, f"{key}.json")
+
+    def __get_object_path(self, digest: str) -> str:
+        if not self.__is_digest(digest):
+            raise OSError(f"Invalid object hash in cached result: {digest!r}")
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def __get_object_stats(self) -> Dict[str, Tuple[int, float]]:
+        """Returns the size, in bytes, and the mtime of each object in the cache.
+
+        :return: A dictionary mapping the hash of each object to its size and mtime.
+        """
+        stats: Dict[str, Tuple[int, float]] = {}
+
+        for prefix in self.__listdir(self.objects_dir):
+            for digest in self.__listdir(os.path.join(self.objects_dir, prefix)):
+                if not self.__is_digest(digest):
+                    continue
+                try:
+                    stat: os.stat_result = os.stat(self.__get_object_path(digest))
+                    stats[digest] = (stat.st_size, stat.st_mtime)
+                except OSError:
+                    pass  # E.g. it was evicted by another process.
+
+        return stats
+
+    @staticmethod
+    def __get_objects(manifest: Dict[str, Any]) -> Set[str]:
+        """Returns the hashes of the objects used by the given manifest.
+
+        :param manifest: A result manifest.
+        :return: A set of SHA-256 hashes.
+        """
+        digests: Set[str] = {digest for digest, _ in manifest["outputs"].values()}
+        for process in manifest["processes"]:
+            digests.update([process["stdout"], process["stderr"]])
+        return digests
+
+    def __put_object(self, content: bytes) -> str:
+        """Stores the given content as an object, unless an identical object already exists (see `__reuse()`).
+
+        :param content: The content to store.
+        :return: The SHA-256 hash of the content.
+        """
+        digest: str = hashlib.sha256(content).hexdigest()
+        path: str = self.__get_object_path(digest)
+
+        if not self.__reuse(path):
+            self.__write(path, content)
+            self.__grow(len(content))
+
+        return digest
+
+    def __put_file(self, path: str) -> List[Any]:
+        """Stores the contents of the given file as an object, unless an identical object already exists (see
+        `__reuse()`).
+
+        :param path: The path to the file.
+        :return: A list containing the SHA-256 hash of the file and its permission bits.
+        """
+        digest: str = get_file_hash(path)
+        object_path: str = self.__get_object_path(digest)
+
+        if not self.__reuse(object_path):
+            with open(path, "rb") as file:
+                content: bytes = file.read()
+            self.__write(object_path, content)
+            self.__grow(len(content))
+
+        return [digest, os.stat(path).st_mode & 0o777]
+
+    def __grow(self, size: int) -> None:
+        """Adds the size of a new object to the tracked size of the cache, once it has been scanned by `evict()`.
+
+        :param size: The size of the object, in bytes.
+        """
+        with self.__lock:
+            if self.__size is not None:
+                self.__size += size
+
+    @staticmethod
+    def __reuse(path: str) -> bool:
+        """Marks an existing object as used, so it is not evicted before the manifest that uses it is written (see
+        `object_grace_period`).
+
+        :param path: The path to the object.
+        :return: True if the object exists, or False if it must be written.
+        """
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def __is_digest(digest: Any) -> bool:
+        return isinstance(digest, str) and digest_pattern.fullmatch(digest) is not None
+
+    @staticmethod
+    def __is_relative_path(path: str) -> bool:
+        """Returns True if the given path is relative, and does not lead out of the directory it is relative to.
+
+        :param path: A path from a result manifest.
+        :return: Whether the path is safe to join onto the project root.
+        """
+        if not isinstance(path, str) or os.path.isabs(path) or os.path.splitdrive(path)[0]:
+            return False
+        normalized: str = os.path.normpath(path)
+        return normalized not in (os.curdir, os.pardir) and not normalized.startswith(os.pardir + os.sep)
+
+    @staticmethod
+    def __write(path: str, content: bytes, mode: int | None = None) -> None:
+        """Writes a file atomically, creating its directory if needed, so that concurrent threads and processes never
+        read a partially written file.
+
+        :param path: The path to the file.
+        :param content: The content to write.
+        :param mode: The permission bits to set, if any.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path: str = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def __listdir(path: str) -> List[str]:
+        try:
+            return [name for name in os.listdir(path) if not name.endswith(".tmp")]
+        except OSError:
+            return []
+
+    @staticmethod
+    def __remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.debug(f"Unable to remove {path}: {e}")
+
+    @staticmethod
+    def __to_bytes(value: bytes | str | None) -> bytes:
+        return value.encode() if isinstance(value, str) else value or b""
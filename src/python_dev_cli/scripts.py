@@ -1,19 +1,33 @@
+import os
 import re
-import shlex
-import shutil
+import sys
+import time
+from collections import deque
 from functools import lru_cache
-from os.path import expandvars
 from importlib.util import find_spec
 from logging import Logger, getLogger
-from subprocess import CompletedProcess, run
-from typing import Any, Dict, Final, List, Pattern
-
-from jinja2 import Template
-from jinja2.exceptions import TemplateError
+from subprocess import CalledProcessError, CompletedProcess, TimeoutExpired, run
+from threading import Event
+from typing import TYPE_CHECKING, Any, Deque, Dict, Final, Iterator, List, Mapping, Pattern, Set, Tuple
 
+from .cache import ConfigCache, cache_dir_name
+from .commands import Call, Command, expand_command, expand_variables, split_command
+from .executables import ExecutableCache
 from .settings import Settings
+from .templates import LazyImport, compile_template, is_static_template
+from .timings import command_category, render_category, timed, which_category
 from .config import get_pyproject_toml
 
+# Modules that are only needed by some scripts (e.g. tables with `inputs`, or generated environment variables) are
+# imported where they are first used, so running a plain script never imports them.
+if TYPE_CHECKING:
+    from .env import EnvVars
+    from .fingerprints import FingerprintStore
+    from .graph import ScriptGraph
+    from .policy import ScriptPolicy
+    from .pool import WorkerPool
+    from .results import ResultCache
+
 logger: Logger = getLogger(__name__)
 
 # The include pattern is used when parsing the settings.include property, and captures the following groups:
@@ -27,6 +41,97 @@ include_pattern: Final[Pattern] = re.compile(r"([\w+.?]+):?(\w+)?( as )?(\w+)?")
 template_pattern: Final[Pattern] = re.compile(r"{{.+}}")
 
 
+# The keys that are allowed in a script defined as a table, e.g. `lint = { cmd = ["black", "ruff"], parallel = true }`:
+# - "cmd" => the script itself; either a command string, or a list of script references (required, unless `call` is set)
+# - "call" => instead of `cmd`, a Python function to call in the running process, using the same `module:attr` syntax
+#   as `settings.include` (e.g. "pytest:main"), or a module to run as `python -m` would run it (e.g. "black")
+# - "args" => a list of args for `call`, which it reads from `sys.argv`
+# - "preload" => a list of modules for `call` that are imported by the worker processes before they start, when calls
+#   run in a pool of workers (see `settings.call_workers`)
+# - "depends_on" => a list of script references that must be run before this script
+# - "parallel" => if true, the script references in `cmd` are run concurrently instead of in order
+# - "inputs" => a list of glob patterns matching the files the script reads; if they have not changed since the script
+#   last succeeded (and all of its outputs exist), the script is skipped
+# - "outputs" => a list of glob patterns matching the files the script writes
+# - "cache" => if true, the output files, stdout, stderr and exit codes of the script are stored in the result cache,
+#   and restored instead of running the script again when its commands, input files and `cache_env` are the same
+# - "cache_env" => a list of names of environment variables that affect the result of the script
+# The policy keys ("timeout", "retries", "retry_delay", "nice", "cpu_affinity" and "memory_limit") are also allowed;
+# they set the policy that the commands of the script are run with (see `policy.policy_keys`).
+script_table_keys: Final[frozenset] = frozenset(
+    ["cmd", "call", "args", "preload", "depends_on", "parallel", "inputs", "outputs", "cache", "cache_env"]
+)
+
+
+def validate_script_table(key: str, table: Dict[str, Any]) -> None:
+    """Validates a script defined as a table, raising a TypeError if it is invalid. See `script_table_keys` for a
+    description of the keys that are allowed in a script table.
+
+    :param key: The name of the script.
+    :param table: The script table.
+    :raises TypeError: If the script table is invalid.
+    """
+    from .policy import policy_keys, validate_policy  # Deferred, so scripts that are not tables never import it.
+
+    unknown_keys: Set[str] = set(table) - script_table_keys - policy_keys
+    if unknown_keys:
+        raise TypeError(f"Invalid script table key for `{key}`: {', '.join(sorted(unknown_keys))}")
+
+    if "call" in table:
+        validate_script_call(key, table)
+        cmd = ""
+    else:
+        cmd = table.get("cmd")
+
+    for name in ["args", "preload"]:
+        if name in table and "call" not in table:
+            raise TypeError(f"Invalid script table for `{key}`: `{name}` requires `call`")
+
+    if not isinstance(cmd, (str, list)) or (isinstance(cmd, list) and not all(isinstance(c, str) for c in cmd)):
+        raise TypeError(f"Invalid script table `cmd` for `{key}`: {cmd} (must be str or list of str)")
+
+    depends_on = table.get("depends_on", [])
+    if not isinstance(depends_on, list) or not all(isinstance(d, str) for d in depends_on):
+        raise TypeError(f"Invalid script table `depends_on` for `{key}`: {depends_on} (must be list of str)")
+
+    if not isinstance(table.get("parallel", False), bool):
+        raise TypeError(f"Invalid script table `parallel` for `{key}`: {table['parallel']} (must be bool)")
+
+    for name in ["inputs", "outputs", "cache_env"]:
+        values = table.get(name, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise TypeError(f"Invalid script table `{name}` for `{key}`: {values} (must be list of str)")
+
+    if not isinstance(table.get("cache", False), bool):
+        raise TypeError(f"Invalid script table `cache` for `{key}`: {table['cache']} (must be bool)")
+
+    if table.get("cache") and "inputs" not in table:
+        raise TypeError(f"Invalid script table for `{key}`: `cache = true` requires `inputs`")
+
+    validate_policy(key, table)
+
+
+def validate_script_call(key: str, table: Dict[str, Any]) -> None:
+    """Validates the `call`, `args` and `preload` keys of a script table, raising a TypeError if they are invalid.
+
+    :param key: The name of the script.
+    :param table: The script table.
+    :raises TypeError: If the `call`, `args` or `preload` keys are invalid.
+    """
+    if "cmd" in table:
+        raise TypeError(f"Invalid script table for `{key}`: `cmd` and `call` cannot both be set")
+
+    call = table["call"]
+    match = include_pattern.fullmatch(call) if isinstance(call, str) else None
+    if not match or match.group(3):
+        raise TypeError(f"Invalid script table `call` for `{key}`: {call} (must be `module` or `module:function`)")
+
+    for name in ["args", "preload"]:
+        values = table.get(name, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise TypeError(f"Invalid script table `{name}` for `{key}`: {values} (must be list of str)")
+
+
 @lru_cache(maxsize=1)
 def is_posix():
     try:
@@ -41,14 +146,33 @@ class ScriptTemplateError(Exception):
     pass
 
 
+class ScriptReferenceError(Exception):
+    """Raised when a script references itself, either directly or through other scripts."""
+
+    pass
+
+
 class Scripts:
     """A container for storing scripts defined in the pyproject.toml file."""
 
     def __init__(self, settings: Settings, **kwargs):
         self.__settings: Settings = settings
-        self.__scripts: Dict[str, str | List[str] | Dict[str, str]] = {}
+        self.__scripts: Dict[str, str | List[str] | Dict[str, Any]] = {}
+        self.__version: int = 0
         self.__context: Dict[str, Any] | None = None
-        self.__context_hash: int | None = None
+        self.__context_version: Tuple[int, int] | None = None
+        self.__cache: ConfigCache | None = None
+        self.__cache_version: Tuple[int, int] | None = None
+        self.__root: str | None = None
+        self.__fingerprints: "FingerprintStore | None" = None
+        self.__executables: ExecutableCache = ExecutableCache()
+        self.__env: "EnvVars | None" = None
+        self.__pool: "WorkerPool | None" = None
+        self.__pool_version: Tuple[int, int] | None = None
+        self.__results: "ResultCache | None" = None
+        self.__results_version: int | None = None
+        self.__flattened: Dict[str, List[str]] = {}
+        self.__flattened_version: Tuple[int, int] | None = None
 
         for key, value in kwargs.items():
             self[key] = value
@@ -63,13 +187,18 @@ class Scripts:
         if not isinstance(key, str):
             raise TypeError(f"Invalid script key: {key}")
 
-        if not isinstance(value, (str, list)):
+        if not isinstance(value, (str, list, dict)):
             raise TypeError(f"Invalid script value: {value}")
 
+        if isinstance(value, dict):
+            validate_script_table(key, value)
+
         self.__scripts[key] = value
+        self.__version += 1
 
     def __delitem__(self, key):
         del self.__scripts[key]
+        self.__version += 1
 
     def __contains__(self, item):
         return item in self.__scripts
@@ -91,32 +220,176 @@ class Scripts:
         """A dictionary of context values used in the Jinja2 environment when parsing script templates. This includes
         the script references defined under [tool.python-dev-cli.scripts] in pyproject.toml, as well as any modules
         defined in the `settings.include` property. The context is cached, so it is only built once per instance, unless
-        any of the settings or scripts change.
+        any of the settings or scripts change (see `version`).
         """
-        current_context_hash = self.__build_context_hash()
+        current_version: Tuple[int, int] = self.version
 
-        if self.__context is None or current_context_hash != self.__context_hash:
+        if self.__context is None or current_version != self.__context_version:
             # Rebuild the context if the settings or scripts have changed.
             self.__context = self.__build_context()
-            self.__context_hash = current_context_hash
+            self.__context_version = current_version
 
         return self.__context
 
+    @property
+    def version(self) -> Tuple[int, int]:
+        """A tuple of monotonically increasing counters, which change whenever a script is added, replaced or deleted,
+        or any of the settings are changed. This is used to invalidate cached values derived from the scripts and
+        settings in constant time. Note that changes made in place (e.g. appending to a list script, or to the
+        `settings.include` list) are not detected; assign a new value instead.
+        """
+        return self.__version, self.__settings.version
+
+    @property
+    def cache(self) -> ConfigCache | None:
+        """An optional on-disk cache of values derived from the pyproject.toml file, used to avoid resolving script
+        lists and rendering static script templates on every invocation. It is set by `from_config()` when the
+        configuration is loaded from a ConfigCache, and is ignored as soon as any of the scripts or settings change.
+        """
+        return self.__cache if self.__cache_version == self.version else None
+
+    @cache.setter
+    def cache(self, value: ConfigCache | None):
+        self.__cache = value
+        self.__cache_version = self.version
+        self.__fingerprints = None
+        self.__executables = ExecutableCache(value)
+        if self.__env is not None:
+            self.__env.cache = value
+
+    @property
+    def root(self) -> str | None:
+        """The directory that script commands run in, if it is not the current working directory (e.g. a project in a
+        workspace). Relative executables (e.g. `./bin/tool`) are found in it, generated environment variables are
+        generated in it, and script templates are rendered in it. Pass it to `run_script()` as `cwd` too.
+        """
+        return self.__root
+
+    @root.setter
+    def root(self, value: str | None):
+        self.__root = value
+        if self.__env is not None:
+            self.__env.root = value
+
+    @property
+    def fingerprints(self) -> "FingerprintStore | None":
+        """An optional on-disk store of the fingerprints of scripts with `inputs` or `outputs`, used to skip scripts
+        that are up-to-date. It is stored alongside the cache, so it is set whenever the cache is set; unlike the cache,
+        it remains valid when the scripts or settings change, as the fingerprints include the commands of each script.
+        """
+        if self.__fingerprints is None and self.__cache is not None:
+            from .fingerprints import FingerprintStore  # Deferred, so scripts without `inputs` never import it.
+
+            self.__fingerprints = FingerprintStore(self.__cache)
+
+        return self.__fingerprints
+
+    @property
+    def executables(self) -> ExecutableCache:
+        """A cache of the full paths of the executables run by script commands, so each is only looked up on PATH once.
+        Lookups are always memoized in memory; when the on-disk cache is set, they are also stored alongside it, and
+        reused by later processes until PATH or any of its directories change.
+        """
+        return self.__executables
+
+    @property
+    def env(self) -> "EnvVars":
+        """The environment variables defined under [tool.python-dev-cli.env] in pyproject.toml, which are generated by
+        running a command the first time a script references them (see `EnvVars`). They are stored alongside the cache
+        when it is set, if they have a `ttl` or `inputs`.
+        """
+        if self.__env is None:
+            from .env import EnvVars  # Deferred, so projects without generated environment variables never import it.
+
+            self.__env = EnvVars(cache=self.__cache, root=self.__root)
+
+        return self.__env
+
+    @env.setter
+    def env(self, value: "EnvVars"):
+        value.cache = self.__cache
+        value.root = self.__root
+        self.__env = value
+        self.__version += 1
+
+    def save_env(self) -> None:
+        """Writes any newly generated environment variables with a `ttl` or `inputs` to the env file (see
+        `EnvVars.save()`); unless none are defined, in which case there is nothing to write.
+        """
+        if self.__env is not None:
+            self.__env.save()
+
+    @property
+    def pool(self) -> "WorkerPool | None":
+        """An optional pool of warm worker processes that run scripts with a `call` key, if the `call_workers` setting
+        is greater than 0; otherwise, calls run in this process. The workers preload the modules returned by
+        `get_preload_modules()`, and are started the first time a call runs. If any of the scripts or settings change,
+        the pool is shut down and replaced.
+        """
+        if not self.__settings.call_workers:
+            return None
+
+        if self.__pool is None or self.__pool_version != self.version:
+            from .pool import WorkerPool  # Deferred, so scripts without calls never import multiprocessing.
+
+            if self.__pool is not None:
+                self.__pool.shutdown()
+            self.__pool = WorkerPool(self.__settings.call_workers, self.get_preload_modules())
+            self.__pool_version = self.version
+
+        return self.__pool
+
+    @property
+    def settings(self) -> Settings:
+        """The settings defined under [tool.python-dev-cli.settings] in pyproject.toml."""
+        return self.__settings
+
+    @property
+    def results(self) -> "ResultCache | None":
+        """An optional, content-addressed cache of the results of scripts with `cache = true`, used to restore their
+        output files and streams instead of running them again. Like the fingerprint store, it is only available when
+        the on-disk cache is set; its location and size are set by the `result_cache_dir` and `result_cache_size`
+        settings.
+        """
+        if self.fingerprints is None:
+            return None
+
+        if self.__results is None or self.__results_version != self.__settings.version:
+            from .results import ResultCache  # Deferred, so scripts without `cache = true` never import it.
+
+            root: str = self.fingerprints.root
+            directory: str = self.__settings.result_cache_dir or os.path.join(root, cache_dir_name, "results")
+            max_size: int = int(self.__settings.result_cache_size * 2**20)
+            self.__results = ResultCache(os.path.join(root, os.path.expanduser(directory)), max_size)
+            self.__results_version = self.__settings.version
+
+        return self.__results
+
     @staticmethod
-    def from_config(config: Dict[str, Any] | None = None) -> "Scripts":
+    def from_config(config: Dict[str, Any] | None = None, cache: ConfigCache | None = None) -> "Scripts":
         """Returns an instance of Scripts, populated with values from the given configuration dictionary. If the
-        configuration dictionary is not provided, the pyproject.toml file in the project root is used.
+        configuration dictionary is not provided, the pyproject.toml file in the project root is used; if a
+        ConfigCache is also provided, the configuration is loaded from the cache (when it is up-to-date) instead of
+        parsing the file.
 
         :param config: An optional dictionary representing a pyproject.toml file.
+        :param cache: An optional ConfigCache; ignored if `config` is provided.
         :return: An instance of Scripts, populated with values from the given configuration dictionary.
         """
-        config = config or get_pyproject_toml()
-        settings: Settings = Settings.from_config(config)
-        scripts: Dict[str, str | List[str] | Dict[str, str]] = (
-            config.get("tool", {}).get("python-dev-cli", {}).get("scripts", {})
-        )
+        cache = None if config else cache
+        config = config or (cache.get_config() if cache else get_pyproject_toml())
+
+        with timed("scripts construction"):
+            settings: Settings = Settings.from_config(config)
+            table: Dict[str, Any] = config.get("tool", {}).get("python-dev-cli", {})
+            instance: Scripts = Scripts(settings, **table.get("scripts", {}))
+            if table.get("env"):
+                from .env import EnvVars  # Deferred, so projects without generated environment variables skip it.
 
-        return Scripts(settings, **scripts)
+                instance.env = EnvVars(table["env"])
+
+        instance.cache = cache
+        return instance
 
     def get_script_command(self, script_key: str, parse: bool | None = None) -> List[str]:
         """Returns a list of script commands for the given script key. If the script key is not found, a KeyError is
@@ -133,6 +406,140 @@ class Scripts:
         parse = self.__settings.enable_templates if parse is None else parse
         return self.__parse(script_key) if parse else self.__resolve(script_key)
 
+    def get_script_graph(self, script_key: str) -> "ScriptGraph":
+        """Returns a graph of the scripts that need to be run for the given script key, for running them concurrently.
+        Each script reference becomes a node of the graph, and:
+        - a table with `parallel = true` depends on each of the scripts in its `cmd` list, which can run concurrently;
+          a script listed more than once in the same parallel table is only run once;
+        - a table with `depends_on` depends on each of the scripts in that list, which are run once each, however many
+          scripts depend on them;
+        - a list of script references that contains a parallel table is chained, so that each script in the list
+          depends on the one before it; a script that is referenced more than once is run each time, as it is by
+          `get_script_command()`;
+        - any other script is a single node, with its commands resolved in order as they are by `get_script_command()`.
+
+        Nodes are named after their script, and a script that is run more than once has a node for each run, with a
+        `#<n>` suffix on every node after the first (see `ScriptGraph.get_script_key()`).
+
+        :param script_key: The name of the script being run.
+        :return: A ScriptGraph instance.
+        :raises KeyError: If the script key is not found, or if any script reference is not found.
+        :raises ScriptReferenceError: If the script references itself, either directly or through other scripts.
+        :raises ScriptTemplateError: If an error occurs while parsing a script template.
+        """
+        if script_key not in self.__scripts:
+            raise KeyError(f"Script not found: {script_key}")
+        if isinstance(self.__scripts[script_key], (list, dict)):
+            self.__flatten(script_key)  # Raises ScriptReferenceError if the script references itself.
+
+        commands: Dict[str, List[str]] = {}
+        dependencies: Dict[str, Set[str]] = {}
+        script_keys: Dict[str, str] = {script_key: script_key}
+        dependency_nodes: Dict[str, str] = {}
+        stack: List[str] = [script_key]
+
+        def add_node(key: str) -> str:
+            node: str = key
+            count: int = 1
+            while node in script_keys:
+                count += 1
+                node = f"{key}#{count}"
+            script_keys[node] = key
+            return node
+
+        while stack:
+            node = stack.pop()
+            key = script_keys[node]
+
+            if key not in self.__scripts:
+                raise KeyError(f"Script not found: {key}")
+
+            script = self.__scripts[key]
+            table: Dict[str, Any] = script if isinstance(script, dict) else {}
+            body: str | List[str] = table.get("cmd", script)
+
+            # The scripts a table depends on are shared by every node that depends on them, so each is run once.
+            depends_on: List[str] = []
+            for dependency in table.get("depends_on", []):
+                if dependency not in dependency_nodes:
+                    dependency_nodes[dependency] = add_node(dependency)
+                    stack.append(dependency_nodes[dependency])
+                depends_on.append(dependency_nodes[dependency])
+            dependencies.setdefault(node, set()).update(depends_on)
+
+            if isinstance(body, list) and (table.get("parallel") or self.__needs_graph(body)):
+                # Scripts listed more than once in a parallel table are only run once, as they would run concurrently.
+                children: List[str] = [
+                    add_node(child) for child in (list(dict.fromkeys(body)) if table.get("parallel") else body)
+                ]
+                inherited: Set[str] = set(dependencies[node])
+                commands[node] = []
+                dependencies[node].update(children)
+                stack.extend(children)
+
+                # Children cannot start until the dependencies of their parent have completed (including the script
+                # before it, if it is in a list); and unless the parent is a parallel table, each child must also wait
+                # for the one before it.
+                for i, child in enumerate(children):
+                    dependencies.setdefault(child, set()).update(inherited)
+                    if i > 0 and not table.get("parallel"):
+                        dependencies[child].add(children[i - 1])
+            elif isinstance(body, list):
+                commands[node] = [command for child in body for command in self.get_script_command(child)]
+            else:
+                command: str = self.__expand(self.__get_command(key))
+                commands[node] = [self.__parse_script(key, command) if self.__settings.enable_templates else command]
+
+        from .graph import ScriptGraph  # Deferred, so scripts that run in order never import it.
+
+        graph: ScriptGraph = ScriptGraph()
+        for node, node_commands in commands.items():
+            graph.add_node(node, node_commands, sorted(dependencies.get(node, set())), script_keys[node])
+
+        return graph
+
+    def get_script_references(self, script_key: str) -> List[str]:
+        """Returns the keys of the scripts directly referenced by the given script, in the order they are resolved: the
+        `depends_on` list of a table, followed by its `cmd` (if it is a list of script references). A string script, or
+        a table with a string `cmd` and no dependencies, references no other scripts.
+
+        :param script_key: The name of the script.
+        :return: A list of script keys.
+        :raises KeyError: If the script key is not found.
+        :raises TypeError: If the script is not a str, list or table.
+        """
+        if script_key not in self.__scripts:
+            raise KeyError(f"Script not found: {script_key}")
+
+        script = self.__scripts[script_key]
+
+        if isinstance(script, str):
+            return []
+        elif isinstance(script, list):
+            return list(script)
+        elif isinstance(script, dict):
+            cmd = script.get("cmd")
+            return script.get("depends_on", []) + (cmd if isinstance(cmd, list) else [])
+        else:
+            raise TypeError(f"Invalid script type for `{script_key}`: {type(script)} (must be str, list or table)")
+
+    def get_script_policy(self, script_key: str) -> "ScriptPolicy":
+        """Returns the policy that the commands of the given script are run with: its timeout, retries and resource
+        limits, which are set by the policy keys of a script table (see `policy.policy_keys`). Any other script has the
+        default policy.
+
+        :param script_key: The name of the script.
+        :return: A ScriptPolicy instance.
+        :raises KeyError: If the script key is not found.
+        """
+        if script_key not in self.__scripts:
+            raise KeyError(f"Script not found: {script_key}")
+
+        from .policy import ScriptPolicy  # Deferred, so scripts that are not tables never import it.
+
+        script = self.__scripts[script_key]
+        return ScriptPolicy.from_table(script) if isinstance(script, dict) else ScriptPolicy()
+
     def get_script_help(self, script_key: str) -> List[str]:
         """Returns a list of script commands for the given script key. If the `parse_help` setting is False, it returns
         the unparsed script commands. Otherwise, the behavior is identical to `get_script_command()`.
@@ -145,48 +552,267 @@ class Scripts:
         parse: bool = self.__settings.enable_templates and self.__settings.parse_help
         return self.get_script_command(script_key, parse=parse)
 
-    def run_script(self, script_key: str, **kwargs) -> List[CompletedProcess]:
+    def preload(self) -> None:
+        """Does the work that is otherwise deferred until a script is run: imports Jinja2 and every module in the
+        `settings.include` property, compiles every script template, and looks up the executables of every command that
+        is not a template (see `preload_executables()`). This is used by long-lived processes, such as
+        the daemon, so that the scripts they run start warm. Templates are compiled, but not rendered, so no template
+        code is run; and scripts with invalid references or syntax are skipped, as the error is raised when they run.
+
+        :raises ModuleNotFoundError: If a module in the `settings.include` property is not found.
+        :raises AttributeError: If an attribute of a module in the `settings.include` property is not found.
+        """
+        self.preload_executables()
+
+        if not self.__settings.enable_templates:
+            return
+
+        from jinja2.exceptions import TemplateError  # Deferred, so scripts that are not templates never import Jinja2.
+
+        with timed("preload"):
+            for value in self._context.values():
+                if isinstance(value, LazyImport):
+                    value._load()
+
+            for key in self.__scripts:
+                try:
+                    for command in self.__resolve(key):
+                        if template_pattern.search(command):
+                            compile_template(command)
+                except (KeyError, ScriptReferenceError, TemplateError) as e:
+                    logger.debug(f"Unable to preload script [{key}]: {e}")
+
+    def get_preload_modules(self) -> List[str]:
+        """Returns the modules imported by the worker processes of `pool` before they start: the modules in
+        `settings.include`, the module of every script with a `call` key, and the modules in their `preload` lists.
+
+        :return: A list of module names, without duplicates.
+        """
+        modules: List[str] = []
+
+        for include in self.__settings.include:
+            match = include_pattern.match(include)
+            if match:
+                modules.append(match.group(1))
+
+        for script in self.__scripts.values():
+            if isinstance(script, dict) and "call" in script:
+                modules.append(include_pattern.fullmatch(script["call"]).group(1))
+                modules.extend(script.get("preload", []))
+
+        return list(dict.fromkeys(modules))
+
+    def preload_executables(self, script_keys: List[str] | None = None) -> None:
+        """Looks up the executable run by each command of the given scripts (see `executables`), so that running them
+        does not search PATH. Commands that are templates are skipped, as their executable is not known until they are
+        rendered.
+
+        :param script_keys: The names of the scripts; defaults to every script.
+        """
+        with timed("preload executables"):
+            for key in self.__scripts if script_keys is None else script_keys:
+                try:
+                    commands: List[str] = self.__resolve(key)
+                except (KeyError, TypeError, ScriptReferenceError) as e:
+                    logger.debug(f"Unable to preload executables of script [{key}]: {e}")
+                    continue
+
+                for command in commands:
+                    if self.__settings.enable_templates and template_pattern.search(command):
+                        continue
+                    if isinstance(command, Command) and command.argv:  # Otherwise, it cannot be split.
+                        self.executables.which(command.argv[0], self.__root)
+
+    def run_script(
+        self,
+        script_key: str,
+        jobs: int | None = None,
+        tail_size: int | None = None,
+        log_file: str | None = None,
+        **kwargs,
+    ) -> List[CompletedProcess]:
         """Runs the script commands for the given script key. If the script key is not found, a KeyError is raised. If
         the script is a template and templates are enabled, it is resolved and parsed, and the resulting list of script
         commands are run. Otherwise, the script is resolved and run as a list of unparsed commands.
 
+        If the script references a table with `parallel = true`, the scripts are run concurrently using a pool of up to
+        `jobs` worker threads, as described by `get_script_graph()`. If any script fails, no further scripts are
+        started, and the exception is raised once the scripts that are already running have finished.
+
         If `check` is True and the exit code was non-zero, it raises a CalledProcessError. The CalledProcessError object
         will have the return code in the `returncode` attribute, and output & stderr attributes if those streams were
         captured. If `timeout` is given, and the process takes too long, a TimeoutExpired exception will be raised.
 
+        If `tail_size` or `log_file` is given, the output of each command is streamed instead of being written to the
+        terminal or captured in full (see `capture.run_captured()`): only the last `tail_size` bytes of its stdout and
+        stderr are kept in memory, and its full output is written to the log file, which is truncated first. Each
+        result is then a CapturedProcess, which also records how long the command took; and the result cache is not
+        used, as it needs the full output.
+
+        Each script is run with its policy (see `get_script_policy()`): a command that fails or times out is run again
+        up to `retries` times, with a delay that doubles after each retry; its `timeout` overrides the `timeout` keyword
+        argument; and its resource limits are applied to each command that runs in a subprocess.
+
         :param script_key: The name of the script being run.
+        :param jobs: The maximum number of scripts to run concurrently; defaults to the number of CPUs.
+        :param tail_size: If given, the number of bytes of the stdout and stderr of each command to keep in memory.
+        :param log_file: If given, the path to a file to write the full output of every command to.
         :param kwargs: Additional keyword arguments to pass to subprocess.run().
         :return: A list of CompletedProcess instances; these are the return values of subprocess.run().
+        :raises ValueError: If `tail_size` or `log_file` is given along with `capture_output`, `stdout` or `stderr`.
         :raises KeyError: If the script key is not found.
         :raises ScriptTemplateError: If an error occurs while parsing a script template.
+        :raises ScriptGraphError: If the scripts being run concurrently have circular dependencies.
         :raises CalledProcessError: If `check` is True and the exit code was non-zero.
         :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
         """
-        output: List[CompletedProcess] = []
-
         # By default, tell subprocess.run() to raise an exception if the script fails.
         if "check" not in kwargs:
             kwargs["check"] = True
 
-        for script in self.get_script_command(script_key):
-            # Split the script into a list of args, replacing the first arg with the full executable path if possible.
-            args: List[str] = shlex.split(script, posix=is_posix())
-            executable: str = shutil.which(args[0])
-            if executable:
-                args[0] = executable
+        if tail_size is not None or log_file is not None:
+            if {"capture_output", "stdout", "stderr"} & set(kwargs):
+                raise ValueError("capture_output, stdout and stderr may not be used with tail_size or log_file.")
+            if log_file:
+                open(log_file, "wb").close()
+            from .capture import default_tail_size  # Deferred, so output that is not streamed never imports it.
+
+            kwargs["tail_size"] = default_tail_size if tail_size is None else tail_size
+            kwargs["log_file"] = log_file
+
+        self.__prefetch(script_key)
+
+        if self.__needs_graph([script_key]):
+            graph: ScriptGraph = self.get_script_graph(script_key)
+            kwargs = self.__add_env(kwargs)
+            # Calls that may run alongside other commands are run in a new process (see `__run_command()`).
+            concurrent: bool = jobs != 1 and not graph.is_sequential()
+            return graph.run(
+                lambda key, abort: self.__run_node(
+                    graph.get_script_key(key), graph.get_commands(key), abort, concurrent, **kwargs
+                ),
+                jobs,
+            )
+
+        commands: List[str] = self.get_script_command(script_key)
+        return self.__run_commands(script_key, commands, **self.__add_env(kwargs))
+
+    async def run_script_async(
+        self, script_key: str, jobs: int | None = None, label: str | None = None, **kwargs
+    ) -> List[CompletedProcess]:
+        """Runs the script commands for the given script key using asyncio, instead of subprocess.run(). The stdout and
+        stderr of each command are streamed line by line, prefixed with the name of the script (e.g. `[lint] ...`), and
+        are never captured in memory. Scripts are resolved and parsed in the same way as `run_script()`.
+
+        If the script references a table with `parallel = true`, the scripts are run concurrently as described by
+        `get_script_graph()`; by default, there is no limit to the number of scripts running at once, so long-running
+        scripts such as servers and file watchers can run side by side. If any script fails, or the coroutine is
+        cancelled, all running processes are terminated. Each script is run with its policy, as in `run_script()`.
 
-            # Run the script and append the result to the output list.
-            logger.info(f"Running script [{script_key}]: {script}")
-            output.append(run(args, **kwargs))
+        :param script_key: The name of the script being run.
+        :param jobs: The maximum number of scripts to run concurrently; defaults to no limit.
+        :param label: An optional label to put before the script name in the prefix of each line of output (e.g. a
+            label of `api:` gives `[api:lint] ...`), to tell apart scripts of the same name run by several projects.
+        :param kwargs: Additional keyword arguments to pass to `async_runner.run_command()` (e.g. check, cwd, env).
+        :return: A list of CompletedProcess instances; stdout and stderr are always None, as they are not captured.
+        :raises KeyError: If the script key is not found.
+        :raises ScriptTemplateError: If an error occurs while parsing a script template.
+        :raises ScriptGraphError: If the scripts being run concurrently have circular dependencies.
+        :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+        :raises TimeoutExpired: If the script has a `timeout`, and a command takes too long.
+        """
 
-        return output
+        # Deferred, so running scripts synchronously never imports asyncio.
+        import asyncio
+
+        from .async_runner import run_call_async, run_command
+
+        async def run_commands(key: str, commands: List[str]) -> List[CompletedProcess]:
+            up_to_date, fingerprint = self.__check_fingerprint(key, commands)
+            if up_to_date:
+                return []
+
+            prefix: str = f"[{label or ''}{key}] "
+            result_key: str | None = self.__get_result_key(key, commands, fingerprint, kwargs.get("env"))
+            output: List[CompletedProcess] | None = self.__restore_result(key, commands, result_key, prefix)
+
+            if output is None:
+                output = []
+                policy: ScriptPolicy = self.get_script_policy(key)
+                capture: bool = result_key is not None
+                for script in commands:
+                    for attempt in range(policy.retries + 1):
+                        logger.info(f"Running script [{key}]: {script}")
+                        with timed(f"[{key}] {script}", command_category):
+                            try:
+                                if isinstance(script, Call):
+                                    result: CompletedProcess = await run_call_async(
+                                        script, prefix=prefix, capture=capture, pool=self.pool, **kwargs
+                                    )
+                                else:
+                                    args: List[str] = self.__split_command(script)
+                                    result = await run_command(
+                                        args, prefix=prefix, capture=capture, **{**kwargs, **policy.get_kwargs()}
+                                    )
+                            except (CalledProcessError, TimeoutExpired) as e:
+                                if attempt == policy.retries:
+                                    raise e
+                                result = CompletedProcess(e.cmd, getattr(e, "returncode", -1))
+                                error: Exception | str = e
+                            else:
+                                error = f"exit status {result.returncode}"
+
+                        if result.returncode and attempt < policy.retries:
+                            delay: float = policy.get_delay(attempt)
+                            logger.warning(
+                                f"Script [{key}] failed ({error}); retrying in {delay:g}s "
+                                f"(retry {attempt + 1} of {policy.retries})"
+                            )
+                            await asyncio.sleep(delay)
+                            continue
+
+                        output.append(result)
+                        break
+                self.__save_result(key, commands, output, result_key)
+
+            self.__save_fingerprint(key, commands, output, fingerprint)
+            return output
+
+        self.__prefetch(script_key)
+
+        if self.__needs_graph([script_key]):
+            graph: ScriptGraph = self.get_script_graph(script_key)
+            kwargs = self.__add_env(kwargs)
+            return await graph.run_async(
+                lambda key: run_commands(graph.get_script_key(key), graph.get_commands(key)), jobs
+            )
+
+        commands: List[str] = self.get_script_command(script_key)
+        kwargs = self.__add_env(kwargs)
+        return await run_commands(script_key, commands)
+
+    def __add_env(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds the values of the generated environment variables (see `EnvVars.environ`) to the environment that
+        script commands are run with, as they are never set in `os.environ`. Call this once the scripts being run have
+        been prefetched (see `__prefetch()`) and resolved, so all the variables they reference have been generated.
+
+        :param kwargs: The keyword arguments that script commands are run with.
+        :return: The keyword arguments, with an `env` that includes the generated values, if any were generated.
+        """
+        generated: Dict[str, str] = self.__env.generated if self.__env is not None else {}
+        if not generated:
+            return kwargs
+
+        env: Dict[str, str] | None = kwargs.get("env")
+        return {**kwargs, "env": {**generated, **env} if env is not None else dict(self.__env.environ)}
 
     def __build_context(self) -> Dict[str, Any]:
         """Builds a context dictionary for use when parsing script templates using Jinja2. This includes the script
         references defined under [tool.python-dev-cli.scripts] in pyproject.toml as the `settings.script_refs` property;
         and any modules defined in the `settings.include` property. If a module in the `settings.include` property does
         not match the expected format, a ValueError is raised. If a module in the `settings.include` property is not
-        found, a ModuleNotFoundError is raised.
+        found, a ModuleNotFoundError is raised. Included modules are not imported until a template uses them (see
+        `LazyImport`), so templates that only reference other scripts never import them.
 
         :return: A dictionary of context values.
         :raises ValueError: If a module in the `settings.include` property does not match the expected format.
@@ -194,7 +820,8 @@ class Scripts:
         """
         context: Dict[str, Any] = {str(self.__settings.script_refs): self.__scripts}
 
-        # TODO: Add support for script-generated environment variables, defined in `config.tool.python_dev_cli.env`.
+        # Environment variables, including those generated by commands defined in [tool.python-dev-cli.env].
+        context["env"] = self.env
 
         # Include any modules defined in the `settings.include` property, if templates are enabled.
         if self.__settings.enable_templates:
@@ -204,20 +831,12 @@ class Scripts:
                     raise ValueError(f"Invalid module reference in [tool.python-dev-cli.settings.include]: {include}")
                 module, attr, _, alias = match.groups()
                 key = alias or attr or module
-                fromlist = [attr] if attr else None
-                value = __import__(module, fromlist=fromlist)  # Raises ModuleNotFoundError if module is not found.
-                context[key] = getattr(value, attr) if attr else value
+                if find_spec(module) is None:  # Finds the module without importing it (unless it is a submodule).
+                    raise ModuleNotFoundError(f"No module named '{module}'", name=module)
+                context[key] = LazyImport(module, attr)
 
         return context
 
-    def __build_context_hash(self):
-        """Returns the hash of a string representation of the current settings, scripts, and context. This is used to
-        invalidate the cached context when the settings or scripts change.
-
-        :return: A hash of the string representation of settings and scripts.
-        """
-        return hash(str((self.__settings.__dict__, self.__scripts, self.__context)))
-
     def __parse(self, script_key: str) -> List[str]:
         """Parses the given script key as a template and returns the resulting script commands. If the script key is not
         found, a KeyError is raised. If the script is not a template, it is resolved and returned as a list of commands.
@@ -238,24 +857,476 @@ class Scripts:
         # If templates are enabled, parse each of the script templates.
         if self.__settings.enable_templates:
             for i, script in enumerate(scripts):
-                error: str | None = None
+                # Replace the script template with the parsed script.
+                scripts[i] = self.__parse_script(script_key, script)
+
+        return scripts
+
+    def __parse_script(self, script_key: str, script: str) -> str:
+        """Parses a single script command as a template, and returns the resulting script command. Scripts can reference
+        other scripts, so the output is parsed repeatedly until it is no longer a template, or until it repeats (which
+        means the script references itself).
+
+        :param script_key: The name of the script being parsed.
+        :param script: A script command.
+        :return: The parsed script command.
+        :raises ScriptTemplateError: If an error occurs while parsing a script template.
+        """
+        if isinstance(script, Call) or not template_pattern.search(script):
+            return script
+
+        cache: ConfigCache | None = self.cache
+        error: str | None = None
+        rendered: Set[str] = set()
+
+        # Scripts can reference other scripts, so parse them recursively.
+        with timed(f"render [{script_key}]", render_category):
+            while template_pattern.search(script):
+                if script in rendered:
+                    error = f"Circular script reference in template [{script_key}]: {script}"
+                    break
+                rendered.add(script)
+                cached: str | None = cache.get_rendered(script) if cache else None
+                if cached is not None:
+                    script = cached  # Rendered by an earlier process (or `dev --compile`), so Jinja2 is not imported.
+                    continue
+
+                from jinja2.exceptions import TemplateError  # Deferred until a template is actually rendered.
+
+                try:
+                    script = self.__render(script)
+                except TemplateError as e:
+                    error = f"Error parsing script template [{script_key}]: {script} => {e}"
+                    break
+
+        # If an error occurred while parsing a script template, raise an exception outside the loop.
+        if error:
+            raise ScriptTemplateError(error)
+
+        return script
+
+    def __needs_graph(self, script_keys: List[str]) -> bool:
+        """Returns True if any of the given scripts, or any of the scripts they reference, is a table with
+        `parallel = true`, with `inputs` or `outputs`, or with a policy; that is, if running them requires a
+        ScriptGraph, either to run scripts concurrently, to skip scripts that are up-to-date, or to run each script with
+        its own policy.
+
+        :param script_keys: A list of script keys.
+        :return: True if the scripts must be run using a ScriptGraph.
+        """
+        stack: List[str] = list(script_keys)
+        visited: Set[str] = set()
+
+        while stack:
+            key = stack.pop()
+
+            if key in visited or key not in self.__scripts:
+                continue
+
+            visited.add(key)
+            script = self.__scripts[key]
+
+            if isinstance(script, dict):
+                from .policy import policy_keys  # Deferred, so scripts that are not tables never import it.
+
+                if script.get("parallel") or "inputs" in script or "outputs" in script or policy_keys & set(script):
+                    return True
+                stack.extend(script.get("depends_on", []))
+                script = script.get("cmd")
+
+            if isinstance(script, list):
+                stack.extend(script)
+
+        return False
+
+    def __check_fingerprint(self, script_key: str, commands: List[str]) -> Tuple[bool, Dict[str, Any] | None]:
+        """Checks whether the given script is a table with `inputs` or `outputs` that is up-to-date (see
+        `FingerprintStore.check()`). Scripts are never skipped if there is no fingerprint store (e.g. when the cache is
+        disabled).
+
+        :param script_key: The name of the script.
+        :param commands: The commands of the script.
+        :return: A tuple of whether the script can be skipped, and its current fingerprint (or None if it is up-to-date,
+            or does not have inputs or outputs).
+        """
+        script = self.__scripts.get(script_key)
+        fingerprints: "FingerprintStore | None" = self.fingerprints
+
+        if fingerprints is None or not commands or not isinstance(script, dict):
+            return False, None
+
+        if "inputs" not in script and "outputs" not in script:
+            return False, None
+
+        with timed(f"fingerprint [{script_key}]"):
+            fingerprint = fingerprints.check(script_key, commands, script.get("inputs", []), script.get("outputs", []))
+
+        if fingerprint is None:
+            logger.info(f"Skipping script [{script_key}]: inputs and outputs are up-to-date")
+            return True, None
+
+        return False, fingerprint
+
+    def __save_fingerprint(
+        self, script_key: str, commands: List[str], output: List[CompletedProcess], fingerprint: Dict[str, Any] | None
+    ) -> None:
+        """Stores the fingerprint of the given script, if it has one and every one of its commands succeeded.
+
+        :param script_key: The name of the script.
+        :param commands: The commands of the script.
+        :param output: The results of running the commands.
+        :param fingerprint: The fingerprint returned by `__check_fingerprint()` before the script was run.
+        """
+        if fingerprint is None or self.fingerprints is None:
+            return
+
+        if len(output) == len(commands) and all(process.returncode == 0 for process in output):
+            self.fingerprints.update(script_key, fingerprint)
+
+    def __get_result_key(
+        self, script_key: str, commands: List[str], fingerprint: Dict[str, Any] | None, env: Dict[str, str] | None
+    ) -> str | None:
+        """Returns the key of the given script in the result cache, if it is a table with `cache = true` and there is a
+        result cache; otherwise, it returns None.
+
+        :param script_key: The name of the script.
+        :param commands: The commands of the script.
+        :param fingerprint: The fingerprint returned by `__check_fingerprint()`, which includes the input file hashes.
+        :param env: The environment variables the script is run with; defaults to those of the current process.
+        :return: A result key, or None.
+        """
+        script = self.__scripts.get(script_key)
+
+        if fingerprint is None or self.results is None or not isinstance(script, dict) or not script.get("cache"):
+            return None
+
+        from .results import get_result_key  # Deferred, so scripts without `cache = true` never import it.
+
+        env = (os.environ if self.__env is None else self.__env.environ) if env is None else env
+        inputs: Dict[str, str] = {path: value[2] for path, value in fingerprint["inputs"].items()}
+        values: Dict[str, str | None] = {name: env.get(name) for name in script.get("cache_env", [])}
+        return get_result_key(commands, inputs, script.get("outputs", []), values)
+
+    def __restore_result(
+        self, script_key: str, commands: List[str], result_key: str | None, prefix: str | None = None
+    ) -> List[CompletedProcess] | None:
+        """Restores the result of the given script from the result cache, if it is there; that is, it restores the
+        output files of the script, and writes out the stdout and stderr of each of its commands.
+
+        :param script_key: The name of the script.
+        :param commands: The commands of the script.
+        :param result_key: The key returned by `__get_result_key()`, or None.
+        :param prefix: If given, each line of output is written with this prefix, as by `run_script_async()`.
+        :return: A list of CompletedProcess instances, with stdout and stderr as bytes; or None if there is no result.
+        """
+        manifest: Dict[str, Any] | None = self.results.get(result_key) if result_key else None
+
+        if manifest is None or len(manifest["processes"]) != len(commands):
+            return None
+
+        output: List[CompletedProcess] = []
+
+        try:
+            with timed(f"restore [{script_key}]"):
+                self.results.restore(manifest, self.fingerprints.root)
+                for script, process in zip(commands, manifest["processes"]):
+                    stdout: bytes = self.results.read(process["stdout"])
+                    stderr: bytes = self.results.read(process["stderr"])
+                    output.append(CompletedProcess(self.__get_args(script), process["returncode"], stdout, stderr))
+        except OSError as e:
+            logger.debug(f"Unable to restore script [{script_key}] from the result cache: {e}")
+            return None
+
+        logger.info(f"Restored script [{script_key}] from the result cache")
+        for process in output:
+            self.__replay(process.stdout, process.stderr, prefix)
+
+        return output
+
+    def __save_result(
+        self, script_key: str, commands: List[str], output: List[CompletedProcess], result_key: str | None
+    ) -> None:
+        """Stores the result of the given script in the result cache, if it has a result key and every one of its
+        commands succeeded.
+
+        :param script_key: The name of the script.
+        :param commands: The commands of the script.
+        :param output: The results of running the commands, with stdout and stderr captured.
+        :param result_key: The key returned by `__get_result_key()`, or None.
+        """
+        if result_key is None or len(output) != len(commands) or any(process.returncode for process in output):
+            return
+
+        from .fingerprints import match_files  # Deferred, so scripts without `cache = true` never import it.
+
+        with timed(f"store [{script_key}]"):
+            paths: List[str] = match_files(self.fingerprints.root, self.__scripts[script_key].get("outputs", []))
+            self.results.put(result_key, output, self.fingerprints.root, paths)
+
+    @staticmethod
+    def __replay(stdout: bytes | str | None, stderr: bytes | str | None, prefix: str | None = None) -> None:
+        """Writes out the captured stdout and stderr of a command.
+
+        :param stdout: The captured stdout, if any.
+        :param stderr: The captured stderr, if any.
+        :param prefix: If given, each line is written with this prefix.
+        """
+        for data, stream in [(stdout, sys.stdout), (stderr, sys.stderr)]:
+            if not data:
+                continue
+            text: str = data.decode(errors="replace") if isinstance(data, bytes) else data
+            if prefix is not None:
+                text = "".join(f"{prefix}{line}\n" for line in text.splitlines())
+            stream.write(text)
+            stream.flush()
+
+    def __render(self, script: str) -> str:
+        """Renders a single script template, storing the output in the on-disk cache (if any) if the template is static.
+        If `root` is set, the template is rendered in it, so anything it reads from the working directory (e.g.
+        `{{ os.getcwd() }}`) is the same as for the commands.
+
+        :param script: A script template.
+        :return: The rendered script.
+        :raises TemplateError: If an error occurs while parsing the script template.
+        """
+        cache: ConfigCache | None = self.cache
+
+        if self.__root is None or os.path.samefile(self.__root, os.getcwd()):
+            rendered: str = compile_template(script).render(self._context)
+        else:
+            # Deferred, so scripts that are run in the current working directory never import it.
+            from .calls import call_lock
+
+            # The working directory belongs to the whole process, so it is only changed under the same lock as calls.
+            with call_lock:
+                cwd: str = os.getcwd()
+                os.chdir(self.__root)
+                try:
+                    rendered = compile_template(script).render(self._context)
+                finally:
+                    os.chdir(cwd)
+
+        if cache and is_static_template(script, str(self.__settings.script_refs)):
+            cache.set_rendered(script, rendered)
+
+        return rendered
+
+    def __run_node(
+        self, script_key: str, commands: List[str], abort: Event, concurrent: bool = False, **kwargs
+    ) -> List[CompletedProcess]:
+        """Runs the commands of a node of a ScriptGraph, unless the script is up-to-date; and stores the fingerprint of
+        the script if it has `inputs` or `outputs`, and all of its commands succeeded. If the script has `cache = true`,
+        its result is restored from the result cache if possible, or stored in it after it has run.
+
+        :param script_key: The name of the script being run.
+        :param commands: A list of script commands.
+        :param abort: An Event; if it is set, any remaining commands are skipped.
+        :param concurrent: Whether other nodes may be running at the same time.
+        :param kwargs: Additional keyword arguments to pass to subprocess.run().
+        :return: A list of CompletedProcess instances; these are the return values of subprocess.run().
+        :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+        :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
+        """
+        up_to_date, fingerprint = self.__check_fingerprint(script_key, commands)
+        if up_to_date:
+            return []
+
+        # Streamed output is not kept in full, so it cannot be stored in the result cache.
+        streamed: bool = "tail_size" in kwargs
+        result_key: str | None = (
+            None if streamed else self.__get_result_key(script_key, commands, fingerprint, kwargs.get("env"))
+        )
+        output: List[CompletedProcess] | None = self.__restore_result(script_key, commands, result_key)
+
+        if output is None:
+            # The output of cached scripts is captured, so it can be stored; it is written out after each command.
+            capture: bool = result_key is not None and not {"capture_output", "stdout", "stderr"} & set(kwargs)
+            output = self.__run_commands(script_key, commands, abort, replay=capture, concurrent=concurrent, **kwargs)
+            self.__save_result(script_key, commands, output, result_key)
+
+        self.__save_fingerprint(script_key, commands, output, fingerprint)
+        return output
+
+    def __run_commands(
+        self,
+        script_key: str,
+        commands: List[str],
+        abort: Event | None = None,
+        replay: bool = False,
+        concurrent: bool = False,
+        **kwargs,
+    ) -> List[CompletedProcess]:
+        """Runs the given script commands in order, with the policy of the script (see `get_script_policy()`), and
+        returns the results. A command that fails, or times out, is run again up to `retries` times, waiting longer
+        before each retry; the script only fails if the last attempt fails.
+
+        :param script_key: The name of the script being run.
+        :param commands: A list of script commands.
+        :param abort: An optional Event; if it is set, any remaining commands are skipped, and no more retries are made.
+        :param replay: If True, the stdout and stderr of each command are captured, and written out once it finishes.
+        :param concurrent: Whether other commands may be running at the same time.
+        :param kwargs: Additional keyword arguments to pass to subprocess.run(); or to `capture.run_captured()`, if
+            `tail_size` is given.
+        :return: A list of CompletedProcess instances; these are the return values of subprocess.run().
+        :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+        :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
+        """
+        output: List[CompletedProcess] = []
+        # Only a script table can have a policy; any other script is run without one, so it never imports the module.
+        script_table: bool = isinstance(self.__scripts.get(script_key), dict)
+        policy: "ScriptPolicy | None" = self.get_script_policy(script_key) if script_table else None
+        retries: int = policy.retries if policy else 0
+
+        for script in commands:
+            if abort and abort.is_set():
+                break
 
-                # Scripts can reference other scripts, so parse them recursively.
-                while template_pattern.search(script):
+            # Run the script and append the result to the output list.
+            args: List[str] = [] if isinstance(script, Call) else self.__split_command(script)
+            for attempt in range(retries + 1):
+                logger.info(f"Running script [{script_key}]: {script}")
+                with timed(f"[{script_key}] {script}", command_category):
                     try:
-                        script = Template(script).render(self._context)
-                    except TemplateError as e:
-                        error = f"Error parsing script template [{script_key}]: {script} => {e}"
-                        break
+                        result: CompletedProcess = self.__run_command(
+                            script, args, policy, replay, concurrent, **kwargs
+                        )
+                    except (CalledProcessError, TimeoutExpired) as e:
+                        if replay:
+                            self.__replay(e.stdout, e.stderr)
+                        if attempt == retries or (abort and abort.is_set()):
+                            raise e
+                        self.__wait_to_retry(script_key, policy, attempt, e, abort)
+                        continue
+
+                if replay:
+                    self.__replay(result.stdout, result.stderr)
+                if result.returncode and attempt < retries and not (abort and abort.is_set()):
+                    self.__wait_to_retry(script_key, policy, attempt, f"exit status {result.returncode}", abort)
+                    continue
+
+                output.append(result)
+                break
 
-                # If an error occurred while parsing a script template, raise an exception outside the loop.
-                if error:
-                    raise ScriptTemplateError(error)
+        return output
 
-                # Replace the script template with the parsed script.
-                scripts[i] = script
+    def __run_command(
+        self,
+        script: str,
+        args: List[str],
+        policy: "ScriptPolicy | None",
+        replay: bool = False,
+        concurrent: bool = False,
+        **kwargs,
+    ) -> CompletedProcess:
+        """Runs a single script command once. The timeout and resource limits of the policy apply to commands that run a
+        subprocess, and override the `timeout` keyword argument; a command with either is run by `capture.run_process()`
+        instead of subprocess.run(), so it runs in its own process group, which is killed if it times out. A Call runs
+        in a Python process, so only its retries apply.
+
+        A Call runs in this process, unless there is a worker pool (see `pool`); but as it changes process-wide state
+        while it runs (e.g. `sys.stdout` and the working directory), it runs in a new Python process instead if other
+        commands may be running at the same time (see `calls.get_call_args()`).
+
+        :param script: A script command.
+        :param args: The args of the command, unless it is a Call.
+        :param policy: The policy of the script.
+        :param replay: If True, the stdout and stderr of the command are captured.
+        :param concurrent: Whether other commands may be running at the same time.
+        :param kwargs: Additional keyword arguments to pass to subprocess.run(); or to `capture.run_captured()`, if
+            `tail_size` is given.
+        :return: A CompletedProcess instance.
+        :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+        :raises TimeoutExpired: If `timeout` is given, and the process takes too long.
+        """
+        if isinstance(script, Call):
+            if not concurrent or self.pool is not None:
+                return (
+                    self.__run_call(script, capture_output=True, **kwargs)
+                    if replay
+                    else self.__run_call(script, **kwargs)
+                )
 
-        return scripts
+            from .calls import get_call_args  # Deferred, so scripts without calls never import it.
+
+            args, policy = get_call_args(script), None
+
+        policy_kwargs: Dict[str, Any] = policy.get_kwargs() if policy else {}
+        kwargs.update(policy_kwargs)
+
+        if "tail_size" in kwargs:
+            from .capture import run_captured  # Deferred, so output that is not streamed never imports it.
+
+            return run_captured(args, **kwargs)
+        if policy_kwargs:
+            from .capture import run_process  # Deferred, so scripts without a timeout or limits never import it.
+
+            return run_process(args, capture_output=True, **kwargs) if replay else run_process(args, **kwargs)
+        if replay:
+            return run(args, capture_output=True, **kwargs)
+        return run(args, **kwargs)
+
+    @staticmethod
+    def __wait_to_retry(
+        script_key: str, policy: "ScriptPolicy", attempt: int, error: Exception | str, abort: Event | None = None
+    ) -> None:
+        """Logs that a command of a script failed, and waits before it is run again (see `ScriptPolicy.get_delay()`).
+
+        :param script_key: The name of the script being run.
+        :param policy: The policy of the script.
+        :param attempt: The number of the attempt that failed, starting at 0.
+        :param error: The error, or a description of it.
+        :param abort: An optional Event; if it is set, the wait ends early.
+        """
+        delay: float = policy.get_delay(attempt)
+        logger.warning(
+            f"Script [{script_key}] failed ({error}); retrying in {delay:g}s (retry {attempt + 1} of {policy.retries})"
+        )
+        if abort:
+            abort.wait(delay)
+        else:
+            time.sleep(delay)
+
+    def __run_call(self, call: Call, **kwargs) -> CompletedProcess:
+        """Runs a Call using the worker pool, if there is one (see `pool`); otherwise, in this process.
+
+        :param call: The Call to run.
+        :param kwargs: Additional keyword arguments to pass to `calls.run_call()`.
+        :return: A CompletedProcess instance.
+        :raises CalledProcessError: If `check` is True and the exit code was non-zero.
+        """
+        pool: "WorkerPool | None" = self.pool
+        if pool:
+            return pool.run(call, **kwargs)
+
+        from .calls import run_call  # Deferred, so scripts without calls never import it.
+
+        return run_call(call, **kwargs)
+
+    @staticmethod
+    def __get_args(script: str) -> List[str]:
+        """Returns the args of a script command. Commands that are not templates were split when their environment
+        variables were expanded (see `__expand()`); the output of a template is split here, as it is not known until the
+        template is rendered.
+
+        :param script: A script command.
+        :return: A list of args.
+        :raises ValueError: If the command cannot be split (e.g. it has an unclosed quote).
+        """
+        return list(script.argv) if isinstance(script, Command) else list(split_command(script, is_posix()))
+
+    def __split_command(self, script: str) -> List[str]:
+        """Splits a script command into a list of args, replacing the first arg with the full executable path if
+        possible.
+
+        :param script: A script command.
+        :return: A list of args.
+        """
+        args: List[str] = self.__get_args(script)
+        with timed(f"which {args[0]}", which_category):
+            executable: str | None = self.executables.which(args[0], self.__root)
+        if executable:
+            args[0] = executable
+        return args
 
     def __resolve(self, script_key: str) -> List[str]:
         """Resolves the given script key and returns the resulting script commands. If the script key is not found, a
@@ -273,51 +1344,165 @@ class Scripts:
         script = self.__scripts[script_key]
 
         if isinstance(script, str):
-            return [expandvars(script)]  # Expand environment variables in the script (e.g. $HOME, ${HOME}).
-        elif isinstance(script, list):
+            return [self.__expand(script)]  # Expand environment variables in the script (e.g. $HOME, ${HOME}).
+        elif isinstance(script, (list, dict)):
             return self.__resolve_list(script_key)
         else:
-            raise TypeError(f"Invalid script type for `{script_key}`: {type(script)} (must be str or list)")
+            raise TypeError(f"Invalid script type for `{script_key}`: {type(script)} (must be str, list or table)")
 
     def __resolve_list(self, list_key: str) -> List[str]:
         """Resolves the given script key and returns the resulting script commands, for the specific case where the
-        script is a list of script references. Do not call this function directly; use `__resolve()` instead.
-
-        A script defined as a list of script references can contain one or more references to other lists, so we need to
-        resolve them recursively. We do this by using a stack to keep track of the unresolved script references, and a
-        second list to store the resolved script commands as output. This allows us to more easily flatten the output
-        list, and is more efficient than recursion in terms of memory usage and execution time, because it avoids the
-        overhead of creating new stack frames for each function call.
+        script is a list of script references or a table. Do not call this function directly; use `__resolve()` instead.
+        Any scripts listed in the `depends_on` key of a table are resolved before the table itself. The
+        flattened script references are stored in the on-disk cache (if any), so they only need to be computed once for
+        a given pyproject.toml file.
 
-        :param list_key: The name of the script being resolved; this script must be a list of script references.
+        :param list_key: The name of the script being resolved; this script must be a list of script references or a
+        table.
         :return: A list of script commands.
         :raises KeyError: If the script key is not found, or if any script reference is not found.
-        :raises TypeError: If the script is not a list, or if any script reference is not a str or list.
+        :raises TypeError: If the script is not a list or table, or if any script reference is not a str, list or table.
+        """
+        cache: ConfigCache | None = self.cache
+        script_keys: List[str] | None = cache.get_resolved(list_key) if cache else None
+
+        if script_keys is None:
+            script_keys = self.__flatten(list_key)
+            if cache:
+                cache.set_resolved(list_key, script_keys)
+
+        # Expand environment variables in each script (e.g. $HOME, ${HOME}); this is never cached, as it depends on the
+        # environment of the current process.
+        return [self.__expand(self.__get_command(script_key)) for script_key in script_keys]
+
+    def __flatten(self, list_key: str) -> List[str]:
+        """Returns a flat list of the keys of the string scripts (and tables with a string `cmd`) referenced by the
+        given list script or table, in the order they should be run. Do not call this function directly; use
+        `__resolve_list()` instead.
+
+        A script defined as a list of script references can contain one or more references to other lists, so we need to
+        resolve them recursively. We do this with an iterative depth-first search, using a stack of the scripts on the
+        current path, so each script is visited once and deeply nested lists do not hit the recursion limit. The
+        flattened output of every script visited along the way is memoized, so script lists that are shared by several
+        scripts (e.g. `lint` and `lint_fix`) are only resolved once, until any of the scripts or settings change.
+
+        :param list_key: The name of the script being resolved; this script must be a list of script references or a
+        table.
+        :return: A list of script keys.
+        :raises KeyError: If the script key is not found, or if any script reference is not found.
+        :raises TypeError: If the script is not a list or table, or if any script reference is not a str, list or table.
+        :raises ScriptReferenceError: If the script references itself, either directly or through other scripts.
         """
         if list_key not in self.__scripts:
             raise KeyError(f"Invalid script reference: {list_key}")
 
-        script_list = self.__scripts[list_key]
+        if not isinstance(self.__scripts[list_key], (list, dict)):
+            raise TypeError(
+                f"Invalid script type for `{list_key}`: {type(self.__scripts[list_key])} (must be list or table)"
+            )
 
-        if not isinstance(script_list, list):
-            raise TypeError(f"Invalid script type for `{list_key}`: {type(script_list)} (must be list)")
+        # Discard the memoized output if the scripts or settings have changed.
+        if self.__flattened_version != self.version:
+            self.__flattened = {}
+            self.__flattened_version = self.version
 
-        stack: List[str] = self.__scripts[list_key].copy()
-        output: List[str] = []
+        memo: Dict[str, List[str]] = self.__flattened
 
-        while len(stack) > 0:
-            script_key = stack.pop(0)
+        # Each item on the stack is a script key on the current path, and an iterator over the scripts it references
+        # that have not been visited yet; `on_path` mirrors the stack for constant-time cycle detection.
+        stack: Deque[Tuple[str, Iterator[str]]] = deque()
+        on_path: Set[str] = set()
 
-            if script_key not in self.__scripts:
-                raise KeyError(f"Invalid script reference `{script_key}` in: {list_key}")
+        if list_key not in memo:
+            stack.append((list_key, iter(self.get_script_references(list_key))))
+            on_path.add(list_key)
 
-            script = self.__scripts[script_key]
+        while stack:
+            script_key, references = stack[-1]
 
-            if isinstance(script, str):
-                output.append(expandvars(script))  # Expand environment variables in the script (e.g. $HOME, ${HOME}).
-            elif isinstance(script, list):
-                stack = script + stack
+            for reference in references:
+                if reference in memo:
+                    continue
+
+                if reference not in self.__scripts:
+                    raise KeyError(f"Invalid script reference `{reference}` in: {script_key}")
+
+                if reference in on_path:
+                    path: List[str] = [key for key, _ in stack]
+                    cycle: List[str] = path[path.index(reference) :] + [reference]
+                    raise ScriptReferenceError(f"Circular script reference: {' -> '.join(cycle)}")
+
+                stack.append((reference, iter(self.get_script_references(reference))))
+                on_path.add(reference)
+                break
             else:
-                raise TypeError(f"Invalid script type for `{script_key}`: {type(script)} (must be str or list)")
+                # Every reference has been flattened, so this script can be flattened too.
+                stack.pop()
+                on_path.discard(script_key)
+                output: List[str] = [
+                    key for reference in self.get_script_references(script_key) for key in memo[reference]
+                ]
+                script = self.__scripts[script_key]
+                if isinstance(script, str) or (isinstance(script, dict) and not isinstance(script.get("cmd"), list)):
+                    output.append(script_key)
+                memo[script_key] = output
+
+        return list(memo[list_key])
+
+    def __prefetch(self, script_key: str) -> None:
+        """Generates the environment variables referenced by the commands of the given script, and of every script it
+        references, all at once (see `EnvVars.prefetch()`), unless there are none defined. This is only called by
+        `run_script()` and `run_script_async()`, just before the script is resolved to run it, so that resolving a
+        script for any other reason (e.g. to show its help, or to preload it) never generates them.
 
-        return output
+        :param script_key: The name of the script being run.
+        :raises EnvError: If the command that generates any of the environment variables fails.
+        """
+        if self.__env is None:
+            return
+
+        commands: List[str] = []
+        seen: Set[str] = set()
+        stack: List[str] = [script_key]
+
+        while stack:
+            key: str = stack.pop()
+            if key in seen or key not in self.__scripts:
+                continue  # A missing script is reported when the script is resolved.
+            seen.add(key)
+            stack.extend(self.get_script_references(key))
+            script = self.__scripts[key]
+            if isinstance(script, str) or (isinstance(script, dict) and not isinstance(script.get("cmd"), list)):
+                commands.append(self.__get_command(key))
+
+        self.__env.prefetch(commands)
+
+    def __expand(self, script: str) -> str:
+        """Expands the environment variables in a script command (e.g. $HOME, ${HOME}). Unless the command is a
+        template, it is also split into args (see `commands.expand_command()`), so it is not split again when it runs,
+        and the value of an environment variable is never split into several args.
+
+        :param script: A script command.
+        :return: The expanded script command.
+        """
+        environ: Mapping[str, str] = os.environ if self.__env is None else self.__env.environ
+        if isinstance(script, Call):
+            return Call(script.module, script.attr, [expand_variables(arg, environ) for arg in script.args])
+        if self.__settings.enable_templates and template_pattern.search(script):
+            return expand_variables(script, environ)
+        return expand_command(script, is_posix(), environ)
+
+    def __get_command(self, script_key: str) -> str:
+        """Returns the unresolved command string of a string script, or a table with a string `cmd`; or a Call, for a
+        table with a `call`.
+
+        :param script_key: The name of the script.
+        :return: A script command.
+        """
+        script = self.__scripts[script_key]
+
+        if isinstance(script, dict) and "call" in script:
+            module, attr, _, _ = include_pattern.fullmatch(script["call"]).groups()
+            return Call(module, attr, script.get("args", []))
+
+        return script["cmd"] if isinstance(script, dict) else script
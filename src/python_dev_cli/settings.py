@@ -6,11 +6,19 @@ from .config import get_pyproject_toml
 class Settings:
     """A container for storing dev module settings, with defaults for any missing values."""
 
+    # The version counter is stored in a slot, rather than the instance dict, so it is not listed with the settings.
+    __slots__ = ("__dict__", "_version")
+
     def __init__(self, **kwargs) -> None:
+        self._version = 0
         self.enable_templates = kwargs.get("enable_templates", True)
         self.parse_help = kwargs.get("parse_help", True)
         self.include = kwargs.get("include", None)
         self.script_refs = kwargs.get("script_refs", "dev")
+        self.result_cache_dir = kwargs.get("result_cache_dir", None)
+        self.result_cache_size = kwargs.get("result_cache_size", 1024)
+        self.preload_executables = kwargs.get("preload_executables", False)
+        self.call_workers = kwargs.get("call_workers", 0)
 
     def __dir__(self) -> List[str]:
         return sorted([key for key in self.__dict__.keys()])
@@ -24,6 +32,13 @@ class Settings:
     def __str__(self):
         return f"{self.__class__.__name__}({self.__dict__})"
 
+    @property
+    def version(self) -> int:
+        """A monotonically increasing counter, incremented whenever any of the settings are changed. This allows objects
+        that cache values derived from the settings to detect changes in constant time.
+        """
+        return self._version
+
     @property
     def enable_templates(self):
         """Whether to enable Jinja2 templates. Defaults to True. This enables the use of built-in Python syntax,
@@ -39,6 +54,7 @@ class Settings:
     @enable_templates.setter
     def enable_templates(self, value: bool | int | str):
         self._enable_templates = self.cast_to_bool(value)
+        self._version += 1
 
     @property
     def parse_help(self):
@@ -50,6 +66,7 @@ class Settings:
     @parse_help.setter
     def parse_help(self, value: bool | int | str):
         self._parse_help = self.cast_to_bool(value)
+        self._version += 1
 
     @property
     def include(self):
@@ -69,6 +86,7 @@ class Settings:
     @include.setter
     def include(self, value: List[str] | None):
         self._include = list(value) if value is not None else []
+        self._version += 1
 
     @property
     def script_refs(self):
@@ -80,6 +98,61 @@ class Settings:
     @script_refs.setter
     def script_refs(self, value: str):
         self._script_refs = str(value)
+        self._version += 1
+
+    @property
+    def result_cache_dir(self):
+        """Path to the directory where the results of scripts with `cache = true` are stored. Defaults to None, which
+        means `.python-dev-cli/results` in the project root. Relative paths are relative to the project root, and `~` is
+        expanded, so a single directory (e.g. `~/.cache/python-dev-cli`) can be shared by several checkouts.
+        """
+        return self._result_cache_dir
+
+    @result_cache_dir.setter
+    def result_cache_dir(self, value: str | None):
+        self._result_cache_dir = str(value) if value is not None else None
+        self._version += 1
+
+    @property
+    def result_cache_size(self):
+        """Maximum size of the result cache, in megabytes. Defaults to 1024. When the cache grows larger than this, the
+        least recently used results are deleted.
+        """
+        return self._result_cache_size
+
+    @result_cache_size.setter
+    def result_cache_size(self, value: int | float | str):
+        self._result_cache_size = float(value)
+        self._version += 1
+
+    @property
+    def preload_executables(self):
+        """Whether to look up the executable of every script command on PATH while building the CLI argument parser.
+        Defaults to False. Lookups are cached on disk, so this makes the first run of each script after PATH changes
+        faster, at the cost of a slower help page.
+        """
+        return self._preload_executables
+
+    @preload_executables.setter
+    def preload_executables(self, value: bool | int | str):
+        self._preload_executables = self.cast_to_bool(value)
+        self._version += 1
+
+    @property
+    def call_workers(self):
+        """The number of worker processes that run scripts with a `call` key. Defaults to 0, which runs them in the
+        `dev` process itself, one at a time. Otherwise, they run in a pool of warm worker processes, which import the
+        modules in `include`, the modules of every `call` and any modules listed in a script's `preload` key before
+        they start; so calls can run concurrently, and a tool that is slow to import is only imported once per worker.
+        """
+        return self._call_workers
+
+    @call_workers.setter
+    def call_workers(self, value: int | str):
+        if int(value) < 0:
+            raise ValueError(f"Invalid setting `call_workers`: {value} (must be a non-negative integer)")
+        self._call_workers = int(value)
+        self._version += 1
 
     @staticmethod
     def cast_to_bool(value: bool | int | str) -> bool:
@@ -0,0 +1,44 @@
+import os
+from logging import Logger, getLogger
+from typing import Callable, Tuple
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache
+from jinja2.bccache import Bucket
+
+logger: Logger = getLogger(__name__)
+
+
+class SourceLoader(BaseLoader):
+    """A Jinja2 loader whose template names are the template sources themselves. Loading script templates by name
+    (rather than using `Environment.from_string()`) allows the environment to use a bytecode cache, so templates that
+    have been compiled by a previous `dev` process do not need to be compiled again.
+    """
+
+    def get_source(self, environment: Environment, template: str) -> Tuple[str, str | None, Callable[[], bool]]:
+        return template, None, lambda: True
+
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    """A Jinja2 bytecode cache that stores compiled templates in a directory, and counts cache hits and misses. The
+    directory is created when the first template is stored, and errors writing to it are ignored, as the cache is only
+    an optimization.
+    """
+
+    def __init__(self, directory: str) -> None:
+        super().__init__(directory, pattern="%s.jinja2")
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            super().dump_bytecode(bucket)
+        except OSError as e:
+            logger.debug(f"Unable to write template bytecode cache in {self.directory}: {e}")
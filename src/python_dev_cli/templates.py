@@ -0,0 +1,177 @@
+import importlib
+from functools import lru_cache
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Any, Final
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+logger: Logger = getLogger(__name__)
+
+# Jinja2 is only imported when a script template is actually compiled or parsed, so that running plain scripts (and
+# displaying the help page, when none of the scripts are templates) does not pay the cost of importing it.
+
+# Maximum number of compiled templates kept in memory; the least recently used templates are discarded first.
+template_cache_size: Final[int] = 512
+
+# Jinja2 global functions and filters whose output is not deterministic, and therefore cannot be cached.
+nondeterministic_names: Final[frozenset] = frozenset(["lipsum", "random"])
+
+_environment: "Environment | None" = None
+_bytecode_cache_dir: str | None = None
+
+
+class LazyImport:
+    """A stand-in for a module (or an attribute of a module) listed in `settings.include`, which imports it the first
+    time it is used in a script template. Attribute access, calls, conversion to a string, iteration, indexing and
+    truth testing are all delegated to the imported value, so templates can use it as if it had been imported eagerly.
+    """
+
+    def __init__(self, module: str, attr: str | None = None) -> None:
+        self._module: str = module
+        self._attr: str | None = attr
+        self._value: Any = None
+        self._loaded: bool = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._load()(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return str(self._load())
+
+    def __repr__(self) -> str:
+        name: str = f"{self._module}:{self._attr}" if self._attr else self._module
+        return f"{self.__class__.__name__}({name!r})"
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __getitem__(self, item) -> Any:
+        return self._load()[item]
+
+    def __contains__(self, item) -> bool:
+        return item in self._load()
+
+    def __bool__(self) -> bool:
+        return bool(self._load())
+
+    def _load(self) -> Any:
+        """Imports the module (and gets the attribute, if any) the first time it is called, and returns it.
+
+        :return: The imported module, or the value of the attribute.
+        :raises ModuleNotFoundError: If the module is not found.
+        :raises AttributeError: If the attribute is not found.
+        """
+        if not self._loaded:
+            logger.debug(f"Importing template module: {self!r}")
+            value: Any = importlib.import_module(self._module)
+            self._value = getattr(value, self._attr) if self._attr else value
+            self._loaded = True
+        return self._value
+
+
+def get_environment() -> "Environment":
+    """Returns the Jinja2 environment shared by all script templates, creating it if necessary.
+
+    :return: A Jinja2 Environment instance.
+    """
+    global _environment
+
+    if _environment is None:
+        from jinja2 import Environment
+        from .template_loaders import SourceLoader
+
+        # Templates are cached by `compile_template()`, so the environment's own template cache is disabled.
+        _environment = Environment(loader=SourceLoader(), cache_size=0)
+        _apply_bytecode_cache(_environment)
+
+    return _environment
+
+
+def set_bytecode_cache(directory: str | None) -> None:
+    """Enables or disables persisting compiled templates to disk, using a Jinja2 bytecode cache in the given directory.
+    This also clears the in-memory template cache. If the Jinja2 environment has not been created yet, the setting is
+    applied when it is.
+
+    :param directory: The directory to store compiled templates in, or None to disable the bytecode cache.
+    """
+    global _bytecode_cache_dir
+
+    _bytecode_cache_dir = directory
+
+    if _environment is not None:
+        _apply_bytecode_cache(_environment)
+
+    compile_template.cache_clear()
+
+
+def _apply_bytecode_cache(environment: "Environment") -> None:
+    """Sets the bytecode cache of the given environment, according to the last call to `set_bytecode_cache()`.
+
+    :param environment: A Jinja2 Environment instance.
+    """
+    if _bytecode_cache_dir:
+        from .template_loaders import CountingBytecodeCache
+
+        environment.bytecode_cache = CountingBytecodeCache(_bytecode_cache_dir)
+    else:
+        environment.bytecode_cache = None
+
+
+@lru_cache(maxsize=template_cache_size)
+def compile_template(source: str) -> "Template":
+    """Returns a compiled Jinja2 template for the given template source. Compiled templates are kept in a bounded LRU
+    cache keyed by source, and in the bytecode cache (if enabled by `set_bytecode_cache()`), so each template is only
+    compiled once.
+
+    :param source: A script template.
+    :return: A compiled Jinja2 Template instance.
+    :raises TemplateError: If the template cannot be compiled.
+    """
+    return get_environment().get_template(source)
+
+
+def get_cache_info() -> str:
+    """Returns a summary of the template cache hit and miss counters, for debugging.
+
+    :return: A human-readable summary of template cache statistics.
+    """
+    info = compile_template.cache_info()
+    summary: str = f"Template cache: {info.hits} hits, {info.misses} misses, {info.currsize}/{info.maxsize} templates"
+
+    # There are no bytecode cache statistics unless the Jinja2 environment has been created.
+    if _environment is not None:
+        from .template_loaders import CountingBytecodeCache
+
+        bytecode_cache = _environment.bytecode_cache
+        if isinstance(bytecode_cache, CountingBytecodeCache):
+            summary += f"; bytecode cache: {bytecode_cache.hits} hits, {bytecode_cache.misses} misses"
+
+    return summary
+
+
+def is_static_template(script: str, script_refs: str) -> bool:
+    """Returns True if the given script template only depends on other scripts (via the `script_refs` object) and
+    deterministic Jinja2 built-ins; that is, if rendering it will always produce the same output for a given
+    pyproject.toml file. Templates that reference modules in `settings.include` are never static.
+
+    :param script: A script template.
+    :param script_refs: The name of the object used to reference other scripts in templates.
+    :return: True if the template is static.
+    :raises TemplateError: If the template cannot be parsed.
+    """
+    from jinja2 import meta, nodes
+
+    ast: nodes.Template = get_environment().parse(script)
+
+    if not meta.find_undeclared_variables(ast) <= {script_refs}:
+        return False
+
+    names = [node.name for node in ast.find_all((nodes.Name, nodes.Filter))]
+    return nondeterministic_names.isdisjoint(names)
@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from logging import Logger, getLogger
+from typing import Any, Dict, Final, Iterator, List
+
+try:
+    import resource
+except ImportError:  # The resource module is only available on POSIX systems.
+    resource = None
+
+logger: Logger = getLogger(__name__)
+
+# Categories of timed events; "phase" events are the stages of loading and parsing scripts, and "command" events are
+# the subprocesses run by scripts, which also record the CPU time and memory usage of the subprocess.
+phase_category: Final[str] = "phase"
+render_category: Final[str] = "render"
+which_category: Final[str] = "which"
+command_category: Final[str] = "command"
+
+_timings: "Timings | None" = None
+
+
+class Timings:
+    """A recorder of timed events, such as loading the configuration, rendering a script template, or running a
+    subprocess. Events are stored in the Chrome trace event format (https://ui.perfetto.dev can open the trace file),
+    with timestamps in microseconds relative to when the recorder was created.
+    """
+
+    def __init__(self) -> None:
+        self.__start: float = time.perf_counter()
+        self.__events: List[Dict[str, Any]] = []
+
+    def __len__(self):
+        return len(self.__events)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({len(self.__events)} events)"
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        """The recorded events, in the order they finished."""
+        return list(self.__events)
+
+    def record(self, name: str, category: str, start: float, end: float, **args) -> None:
+        """Records a timed event.
+
+        :param name: The name of the event.
+        :param category: The category of the event (e.g. "phase" or "command").
+        :param start: The value of `time.perf_counter()` when the event started.
+        :param end: The value of `time.perf_counter()` when the event finished.
+        :param args: Additional values to store with the event (e.g. "cpu_ms" and "max_rss_kb").
+        """
+        self.__events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.__start) * 1_000_000,
+                "dur": (end - start) * 1_000_000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    def format_summary(self) -> str:
+        """Returns a table of the total duration of each phase, and the wall time and CPU time of each command, sorted
+        by duration (slowest first). The peak memory usage shown for each command is cumulative: it is the largest peak
+        of any command that had finished by the time it did (see `timed()`), not the peak of the command itself.
+
+        :return: A multi-line string.
+        """
+        phases: Dict[str, List[float]] = {}
+        commands: List[Dict[str, Any]] = []
+
+        for event in self.__events:
+            if event["cat"] == command_category:
+                commands.append(event)
+            else:
+                # Each lookup of an executable is a separate event, so they are summarized together.
+                key: str = "shutil.which" if event["cat"] == which_category else event["name"]
+                phases.setdefault(key, []).append(event["dur"])
+
+        lines: List[str] = [f"{'Phase':<40} {'Count':>7} {'Total (ms)':>12}"]
+        for name, durations in sorted(phases.items(), key=lambda item: -sum(item[1])):
+            lines.append(f"{name:<40} {len(durations):>7} {sum(durations) / 1000:>12.2f}")
+
+        if commands:
+            lines += ["", f"{'Command':<40} {'Wall (ms)':>12} {'CPU (ms)':>12} {'Max RSS so far (KB)':>20}"]
+            for event in sorted(commands, key=lambda e: -e["dur"]):
+                name: str = event["name"] if len(event["name"]) <= 40 else event["name"][:37] + "..."
+                cpu: str = f"{event['args']['cpu_ms']:.2f}" if "cpu_ms" in event["args"] else "-"
+                rss: str = str(event["args"]["max_rss_kb"]) if "max_rss_kb" in event["args"] else "-"
+                lines.append(f"{name:<40} {event['dur'] / 1000:>12.2f} {cpu:>12} {rss:>20}")
+
+        return "\n".join(lines)
+
+    def write_trace(self, path: str) -> None:
+        """Writes the recorded events to a file in the Chrome trace event format.
+
+        :param path: The path to the trace file.
+        """
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.__events, "displayTimeUnit": "ms"}, file)
+
+
+def enable_timings() -> Timings:
+    """Starts recording timed events, and returns the recorder.
+
+    :return: A Timings instance.
+    """
+    global _timings
+    _timings = Timings()
+    return _timings
+
+
+def disable_timings() -> None:
+    """Stops recording timed events."""
+    global _timings
+    _timings = None
+
+
+def get_timings() -> Timings | None:
+    """Returns the recorder of timed events, or None if timings are not enabled.
+
+    :return: A Timings instance, or None.
+    """
+    return _timings
+
+
+def get_children_usage() -> Dict[str, float] | None:
+    """Returns the total CPU time, in milliseconds, and the peak resident set size, in kilobytes, of all child processes
+    that have been waited for; or None if the resource module is not available.
+
+    :return: A dictionary with "cpu_ms" and "max_rss_kb" keys, or None.
+    """
+    if resource is None:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    max_rss: int = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss  # Bytes on macOS.
+    return {"cpu_ms": (usage.ru_utime + usage.ru_stime) * 1000, "max_rss_kb": max_rss}
+
+
+@contextmanager
+def timed(name: str, category: str = phase_category, **args) -> Iterator[None]:
+    """A context manager that records how long its body takes, if timings are enabled; otherwise, it does nothing.
+
+    For command events, the CPU time and peak memory usage of child processes are also recorded, using
+    `resource.getrusage()`. The CPU time is the difference in the total CPU time of all child processes, so when
+    commands are run in parallel, it includes any other subprocesses that finished at the same time. The operating
+    system only reports the largest peak resident set size of any child process waited for so far, so that is what is
+    recorded: once a command has used the most memory, every command after it reports the same peak.
+
+    :param name: The name of the event.
+    :param category: The category of the event; defaults to "phase".
+    :param args: Additional values to store with the event.
+    """
+    timings: Timings | None = _timings
+
+    if timings is None:
+        yield
+        return
+
+    before: Dict[str, float] | None = get_children_usage() if category == command_category else None
+    start: float = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        end: float = time.perf_counter()
+        after: Dict[str, float] | None = get_children_usage() if before is not None else None
+        if before is not None and after is not None:
+            args["cpu_ms"] = after["cpu_ms"] - before["cpu_ms"]
+            args["max_rss_kb"] = after["max_rss_kb"]
+        timings.record(name, category, start, end, **args)
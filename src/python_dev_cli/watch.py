@@ -0,0 +1,546 @@
+import os
+import re
+import select
+import struct
+import sys
+import time
+from errno import ENOENT, ENOTDIR
+from logging import Logger, getLogger
+from typing import TYPE_CHECKING, Dict, Final, List, Pattern, Set, Tuple
+
+from .cache import get_stat_fingerprint
+from .config import get_project_root
+
+if TYPE_CHECKING:
+    from .scripts import Scripts
+
+logger: Logger = getLogger(__name__)
+
+# Number of seconds to wait for further changes after a file changes, before the script is run again, so that a burst of
+# changes (e.g. saving several files, or switching branches) only runs the script once.
+default_debounce: Final[float] = 0.2
+
+# Number of seconds between scans of the watched files, when inotify is not available.
+default_poll_interval: Final[float] = 0.5
+
+# Maximum number of seconds a watcher blocks for at a time, so that watching can be cancelled promptly.
+wait_timeout: Final[float] = 0.5
+
+# Names of directories that are never watched, in addition to hidden directories (e.g. `.git` and `.venv`).
+ignored_dir_names: Final[frozenset] = frozenset(["__pycache__", "node_modules"])
+
+# Flags of the inotify events that are watched, and of the events that need special handling; see `man inotify`.
+IN_MODIFY: Final[int] = 0x00000002
+IN_ATTRIB: Final[int] = 0x00000004
+IN_CLOSE_WRITE: Final[int] = 0x00000008
+IN_MOVED_FROM: Final[int] = 0x00000040
+IN_MOVED_TO: Final[int] = 0x00000080
+IN_CREATE: Final[int] = 0x00000100
+IN_DELETE: Final[int] = 0x00000200
+IN_DELETE_SELF: Final[int] = 0x00000400
+IN_Q_OVERFLOW: Final[int] = 0x00004000
+IN_IGNORED: Final[int] = 0x00008000
+IN_ONLYDIR: Final[int] = 0x01000000
+IN_ISDIR: Final[int] = 0x40000000
+inotify_mask: Final[int] = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+
+# Each inotify event is a struct with the watch descriptor, mask, cookie and length of the name that follows it.
+inotify_event: Final[struct.Struct] = struct.Struct("iIII")
+
+
+def compile_pattern(pattern: str) -> Pattern:
+    """Compiles a glob pattern, relative to the project root, into a regular expression that matches file paths with `/`
+    separators, in the same way as the `inputs` and `outputs` of a script table: `*` and `?` match within a single path
+    component, and `**` matches any number of subdirectories.
+
+    :param pattern: A glob pattern.
+    :return: A compiled regular expression.
+    """
+    pattern = os.path.normpath(pattern).replace(os.sep, "/")
+    parts: List[str] = []
+    i: int = 0
+
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end: int = pattern.index("]", i + 2)
+            chars: str = pattern[i + 1 : end]
+            parts.append(f"[{'^' + chars[1:] if chars.startswith('!') else chars}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+
+    return re.compile("".join(parts) + r"\Z")
+
+
+class PathMatcher:
+    """Decides which files and directories under the project root are watched. If there are no patterns, every file is
+    watched; otherwise, only files matching one of the patterns are watched, and only the directories that could contain
+    them are scanned. Files matching any of the excluded patterns (e.g. the outputs of the script being watched) and
+    hidden or ignored directories (see `ignored_dir_names`) are never watched.
+    """
+
+    def __init__(self, patterns: List[str] | None = None, exclude: List[str] | None = None) -> None:
+        self.patterns: List[str] = list(patterns or [])
+        self.__include: List[Pattern] = [compile_pattern(pattern) for pattern in self.patterns]
+        self.__exclude: List[Pattern] = [compile_pattern(pattern) for pattern in exclude or []]
+        self.__limits: List[Tuple[str, int | None]] = [self.__get_limit(pattern) for pattern in self.patterns]
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.patterns!r})"
+
+    @property
+    def roots(self) -> List[str]:
+        """The directories, relative to the project root, that are scanned for files; these are the longest directory
+        paths that the patterns start with, excluding any that are inside another root.
+        """
+        prefixes: List[str] = sorted({prefix for prefix, _ in self.__limits}) if self.__limits else ["."]
+
+        if "." in prefixes:
+            return ["."]
+
+        return [p for p in prefixes if not any(p.startswith(f"{other}/") for other in prefixes if other != p)]
+
+    def matches(self, path: str) -> bool:
+        """Returns True if the file at the given path is watched.
+
+        :param path: The path to a file, relative to the project root, with `/` separators.
+        :return: True if changes to the file should run the script again.
+        """
+        if any(pattern.match(path) for pattern in self.__exclude):
+            return False
+        return not self.__include or any(pattern.match(path) for pattern in self.__include)
+
+    def should_descend(self, path: str) -> bool:
+        """Returns True if the directory at the given path should be scanned for watched files.
+
+        :param path: The path to a directory, relative to the project root, with `/` separators.
+        :return: True if the directory could contain watched files.
+        """
+        name: str = path.rsplit("/", 1)[-1]
+
+        if name.startswith(".") or name in ignored_dir_names:
+            return False
+
+        if not self.__limits:
+            return True
+
+        depth: int = path.count("/") + 1
+        for prefix, limit in self.__limits:
+            under: bool = prefix == "." or path == prefix or path.startswith(f"{prefix}/")
+            if under and (limit is None or depth <= limit):
+                return True
+
+        return False
+
+    @staticmethod
+    def __get_limit(pattern: str) -> Tuple[str, int | None]:
+        """Returns the directory that the given pattern starts with (the components before the first one containing a
+        wildcard), and the maximum depth of the directories that files matching the pattern can be in; or None if the
+        pattern uses `**`, which can match any depth.
+
+        :param pattern: A glob pattern.
+        :return: A tuple of the directory path (or "." for the project root) and the maximum depth, or None.
+        """
+        components: List[str] = os.path.normpath(pattern).replace(os.sep, "/").split("/")
+        prefix: List[str] = []
+
+        for component in components[:-1]:
+            if any(char in component for char in "*?["):
+                break
+            prefix.append(component)
+
+        return "/".join(prefix) or ".", None if "**" in pattern else len(components) - 1
+
+
+def get_watch_patterns(scripts: "Scripts", script_key: str) -> Tuple[List[str], List[str]]:
+    """Returns the glob patterns of the files to watch for the given script, and of the files to ignore; these are the
+    `inputs` and `outputs` of the script and every script it references. If none of them have `inputs`, the first list
+    is empty, which means every file in the project is watched.
+
+    :param scripts: A Scripts object containing the scripts defined in the pyproject.toml file.
+    :param script_key: The name of the script being watched.
+    :return: A tuple of the input and output patterns.
+    :raises KeyError: If the script, or any script it references, is not found.
+    """
+    inputs: List[str] = []
+    outputs: List[str] = []
+    stack: List[str] = [script_key]
+    visited: Set[str] = set()
+
+    while stack:
+        key: str = stack.pop()
+        if key in visited:
+            continue
+        visited.add(key)
+        script = scripts[key]
+        if isinstance(script, dict):
+            inputs += [pattern for pattern in script.get("inputs", []) if pattern not in inputs]
+            outputs += [pattern for pattern in script.get("outputs", []) if pattern not in outputs]
+        stack.extend(scripts.get_script_references(key))
+
+    return inputs, outputs
+
+
+class PollingWatcher:
+    """Watches files for changes by scanning them periodically. Each scan only lists the directories that could contain
+    watched files (see `PathMatcher`), reusing the previous listing of any directory whose mtime has not changed, and
+    compares the mtime and size of each watched file with the previous scan; file contents are never read.
+    """
+
+    def __init__(self, root: str, matcher: PathMatcher, interval: float = default_poll_interval) -> None:
+        self.root: str = str(root)
+        self.matcher: PathMatcher = matcher
+        self.interval: float = interval
+        self.__listings: Dict[str, Tuple[int, List[str], List[str]]] = {}
+        self.__snapshot: Dict[str, Tuple[int, int]] = self.__scan()
+        self.__last_scan: float = time.monotonic()
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.root!r}, {self.matcher!r})"
+
+    def __len__(self):
+        return len(self.__snapshot)
+
+    def wait(self, timeout: float) -> Set[str]:
+        """Waits for any watched files to change, scanning them every `interval` seconds.
+
+        :param timeout: The maximum number of seconds to wait.
+        :return: The paths of the files that changed, relative to the project root; empty if none changed in time.
+        """
+        deadline: float = time.monotonic() + timeout
+
+        while True:
+            delay: float = self.__last_scan + self.interval - time.monotonic()
+            if delay > 0:
+                remaining: float = deadline - time.monotonic()
+                if delay > remaining:
+                    time.sleep(max(remaining, 0))
+                    return set()
+                time.sleep(delay)
+
+            snapshot: Dict[str, Tuple[int, int]] = self.__scan()
+            self.__last_scan = time.monotonic()
+            changes: Set[str] = {path for path, stat in snapshot.items() if self.__snapshot.get(path) != stat}
+            changes.update(self.__snapshot.keys() - snapshot.keys())
+            self.__snapshot = snapshot
+
+            if changes:
+                return changes
+
+    def close(self) -> None:
+        """Stops watching files; polling does not hold any resources, so this does nothing."""
+        pass
+
+    def __scan(self) -> Dict[str, Tuple[int, int]]:
+        """Returns the mtime and size of every watched file.
+
+        :return: A dictionary mapping file paths, relative to the project root, to their mtime and size.
+        """
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        listings: Dict[str, Tuple[int, List[str], List[str]]] = {}
+        stack: List[str] = list(self.matcher.roots)
+
+        while stack:
+            directory: str = stack.pop()
+            full_path: str = os.path.join(self.root, directory)
+
+            try:
+                stat: os.stat_result = os.stat(full_path)
+                listing: Tuple[int, List[str], List[str]] | None = self.__listings.get(directory)
+                if listing is None or listing[0] != stat.st_mtime_ns:
+                    listing = self.__list(full_path, stat)
+            except OSError:
+                continue  # E.g. the directory was deleted.
+
+            listings[directory] = listing
+            prefix: str = "" if directory == "." else f"{directory}/"
+
+            for name in listing[1]:
+                path: str = prefix + name
+                if self.matcher.matches(path):
+                    try:
+                        file_stat: os.stat_result = os.stat(os.path.join(self.root, path))
+                        snapshot[path] = (file_stat.st_mtime_ns, file_stat.st_size)
+                    except OSError:
+                        pass  # E.g. the file was deleted after the directory was listed.
+
+            stack.extend(prefix + name for name in listing[2] if self.matcher.should_descend(prefix + name))
+
+        self.__listings = listings
+        return snapshot
+
+    @staticmethod
+    def __list(path: str, stat: os.stat_result) -> Tuple[int, List[str], List[str]]:
+        """Lists the files and subdirectories of the given directory.
+
+        :param path: The path to the directory.
+        :param stat: The result of `os.stat()` for the directory.
+        :return: A tuple of the mtime of the directory, its files and its subdirectories. If the directory was modified
+            too recently for its mtime to be trusted, the mtime is -1, so that it is listed again by the next scan.
+        """
+        files: List[str] = []
+        directories: List[str] = []
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+
+        mtime: int = stat.st_mtime_ns if get_stat_fingerprint(stat) is not None else -1
+        return mtime, files, directories
+
+
+class InotifyWatcher:
+    """Watches files for changes using the Linux inotify API, called using ctypes. Each directory that could contain
+    watched files (see `PathMatcher`) is watched, including directories created after the watcher starts, so no files
+    are scanned while waiting for changes.
+    """
+
+    def __init__(self, root: str, matcher: PathMatcher) -> None:
+        import ctypes  # Deferred, as it is only needed in watch mode.
+
+        self.root: str = str(root)
+        self.matcher: PathMatcher = matcher
+        self.__libc = ctypes.CDLL(None, use_errno=True)
+        self.__get_errno = ctypes.get_errno
+        self.__watches: Dict[int, str] = {}
+        self.__fd: int = self.__libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+
+        if self.__fd < 0:
+            raise self.__error("inotify_init1")
+
+        try:
+            for directory in matcher.roots:
+                self.__add_watches(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.root!r}, {self.matcher!r})"
+
+    def __len__(self):
+        return len(self.__watches)
+
+    def wait(self, timeout: float) -> Set[str]:
+        """Waits for any watched files to change.
+
+        :param timeout: The maximum number of seconds to wait.
+        :return: The paths of the files that changed, relative to the project root; empty if none changed in time. If
+            the kernel's event queue overflowed, the project root (".") is returned, as any file may have changed.
+        """
+        ready, _, _ = select.select([self.__fd], [], [], timeout)
+        changes: Set[str] = set()
+
+        while ready:
+            try:
+                data: bytes = os.read(self.__fd, 2**16)
+            except BlockingIOError:
+                break
+            changes.update(self.__parse(data))
+
+        return changes
+
+    def close(self) -> None:
+        """Stops watching files, and closes the inotify file descriptor."""
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
+            self.__watches.clear()
+
+    def __parse(self, data: bytes) -> Set[str]:
+        """Parses a buffer of inotify events, watching any new directories, and returns the paths of watched files that
+        changed.
+
+        :param data: The bytes read from the inotify file descriptor.
+        :return: A set of file paths, relative to the project root.
+        """
+        changes: Set[str] = set()
+        offset: int = 0
+
+        while offset + inotify_event.size <= len(data):
+            wd, mask, _, length = inotify_event.unpack_from(data, offset)
+            offset += inotify_event.size
+            name: str = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changes.add(".")
+                continue
+
+            if mask & IN_IGNORED:
+                self.__watches.pop(wd, None)  # The directory was deleted, or moved out of the project.
+                continue
+
+            directory: str | None = self.__watches.get(wd)
+            if directory is None or not name:
+                continue
+
+            path: str = name if directory == "." else f"{directory}/{name}"
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and self.matcher.should_descend(path):
+                    # Files may have been added to the directory before it was watched, so they count as changes.
+                    changes.update(self.__add_watches(path))
+            elif self.matcher.matches(path):
+                changes.add(path)
+
+        return changes
+
+    def __add_watches(self, root: str) -> Set[str]:
+        """Watches the given directory and every subdirectory that could contain watched files.
+
+        :param root: The path to a directory, relative to the project root.
+        :return: The paths of the watched files that are already in the directories.
+        :raises OSError: If a directory cannot be watched (e.g. because the limit on the number of watches is reached).
+        """
+        files: Set[str] = set()
+        stack: List[str] = [root]
+
+        while stack:
+            directory: str = stack.pop()
+            full_path: str = os.path.join(self.root, directory)
+            wd: int = self.__libc.inotify_add_watch(self.__fd, os.fsencode(full_path), inotify_mask | IN_ONLYDIR)
+
+            if wd < 0:
+                error: OSError = self.__error(f"inotify_add_watch {full_path}")
+                if error.errno in (ENOENT, ENOTDIR):
+                    continue  # The directory was deleted or replaced after it was listed.
+                raise error
+
+            self.__watches[wd] = directory
+            prefix: str = "" if directory == "." else f"{directory}/"
+
+            try:
+                with os.scandir(full_path) as entries:
+                    for entry in entries:
+                        path: str = prefix + entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.matcher.should_descend(path):
+                                stack.append(path)
+                        elif self.matcher.matches(path):
+                            files.add(path)
+            except OSError:
+                pass  # E.g. the directory was deleted after it was watched.
+
+        return files
+
+    def __error(self, function: str) -> OSError:
+        errno: int = self.__get_errno()
+        return OSError(errno, f"{function}: {os.strerror(errno)}")
+
+
+def create_watcher(root: str, matcher: PathMatcher) -> "InotifyWatcher | PollingWatcher":
+    """Returns an InotifyWatcher, if inotify is available; otherwise, a PollingWatcher. Inotify is not available on
+    systems other than Linux, and fails when there are more directories to watch than the `fs.inotify.max_user_watches`
+    limit allows.
+
+    :param root: The path to the project root.
+    :param matcher: A PathMatcher, which decides which files are watched.
+    :return: A watcher.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, matcher)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Unable to use inotify; falling back to polling: {e}")
+
+    return PollingWatcher(root, matcher)
+
+
+async def watch_script(
+    scripts: "Scripts",
+    script_key: str,
+    jobs: int | None = None,
+    debounce: float = default_debounce,
+    watcher: "InotifyWatcher | PollingWatcher | None" = None,
+    **kwargs,
+) -> None:
+    """Runs the given script using `Scripts.run_script_async()`, and runs it again whenever any of the files it depends
+    on change, until it is cancelled. The files watched are the `inputs` of the script and the scripts it references,
+    or every file in the project if none of them have `inputs` (see `get_watch_patterns()`); their `outputs` are never
+    watched, so scripts do not trigger themselves.
+
+    Changes are debounced: the script is only run again once no files have changed for `debounce` seconds. If the
+    script is still running when files change, it is cancelled (terminating its processes) before it is run again.
+
+    :param scripts: A Scripts object containing the scripts defined in the pyproject.toml file.
+    :param script_key: The name of the script being watched.
+    :param jobs: The maximum number of scripts to run concurrently; defaults to no limit.
+    :param debounce: The number of seconds to wait for further changes before running the script again.
+    :param watcher: The watcher to use; defaults to the result of `create_watcher()` for the project root.
+    :param kwargs: Additional keyword arguments to pass to `Scripts.run_script_async()`.
+    :raises KeyError: If the script key is not found.
+    """
+    import asyncio  # Deferred, so running scripts synchronously never imports asyncio.
+
+    if script_key not in scripts:
+        raise KeyError(f"Script not found: {script_key}")
+
+    if watcher is None:
+        matcher: PathMatcher = PathMatcher(*get_watch_patterns(scripts, script_key))
+        watcher = create_watcher(str(get_project_root()), matcher)
+        logger.info(f"Watching for changes to {', '.join(matcher.patterns) or 'any file'} using {watcher}")
+
+    loop = asyncio.get_running_loop()
+    task: asyncio.Task | None = None
+
+    async def run() -> None:
+        try:
+            await scripts.run_script_async(script_key, jobs=jobs, **kwargs)
+        # E.g. a failed command, a template error, a timeout or a missing script; it may be fixed by the next change.
+        except Exception as e:
+            logger.error(f"Script [{script_key}] failed: {type(e).__name__}: {e}")
+        print(f"Waiting for changes to re-run [{script_key}]...", file=sys.stderr)
+
+    try:
+        while True:
+            if task is None:
+                task = loop.create_task(run())
+
+            changes: Set[str] = await loop.run_in_executor(None, watcher.wait, wait_timeout)
+            if not changes:
+                continue
+
+            # Keep collecting changes until there is a pause, so that a burst of changes only runs the script once.
+            while more := await loop.run_in_executor(None, watcher.wait, debounce):
+                changes |= more
+
+            if not task.done():
+                logger.info(f"Cancelling script [{script_key}]")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+            print(f"Changed: {', '.join(sorted(changes)[:3])}{' ...' if len(changes) > 3 else ''}", file=sys.stderr)
+            task = None
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        watcher.close()
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from logging import Logger, getLogger
+from typing import Dict, Final, List, NamedTuple, Pattern, Set
+
+from .cache import ConfigCache
+from .config import get_pyproject_toml
+from .scripts import Scripts
+from .timings import timed
+from .watch import compile_pattern, ignored_dir_names
+
+logger: Logger = getLogger(__name__)
+
+# Names of directories that are never searched for projects, in addition to hidden directories and those ignored by
+# watch mode; they contain build output or installed packages, rather than projects.
+workspace_ignored_dir_names: Final[frozenset] = ignored_dir_names | frozenset(["build", "dist", "site-packages"])
+
+
+class WorkspaceError(Exception):
+    """Raised when the projects of a workspace cannot be found, or a script fails in any of them."""
+
+    pass
+
+
+class Project(NamedTuple):
+    """A project in a workspace; that is, a directory that contains a pyproject.toml file. The `path` is absolute, and
+    the `name` is the path relative to the workspace root, with `/` separators (or `.` for the workspace root itself).
+    """
+
+    path: str
+    name: str
+
+
+class ProjectResult(NamedTuple):
+    """The outcome of running a script in a single project of a workspace: its `status` is "ok", "failed" or "skipped"
+    (if the project does not define the script), its `duration` is the number of seconds the script took to run, and
+    its `error` is the error message, if the script failed.
+    """
+
+    project: Project
+    status: str
+    duration: float
+    error: str | None = None
+
+
+def find_projects(root: str, patterns: List[str] | None = None) -> List[Project]:
+    """Finds every project under the given workspace root, in a single scan of its directory tree: each directory is
+    listed once, and no other filesystem calls are made. Hidden directories (e.g. `.git` and `.venv`), directories that
+    contain build output or installed packages (see `workspace_ignored_dir_names`), and virtual environments are never
+    searched.
+
+    :param root: The path to the workspace root.
+    :param patterns: Optional glob patterns, relative to the workspace root (e.g. `packages/*`); if given, only the
+        projects whose paths match at least one of them are returned.
+    :return: A list of projects, sorted by path.
+    """
+    root = os.path.abspath(root)
+    compiled: List[Pattern] = [compile_pattern(pattern.strip("/")) for pattern in patterns or []]
+    projects: List[Project] = []
+    stack: List[str] = [root]
+
+    with timed("workspace discovery"):
+        while stack:
+            path: str = stack.pop()
+            try:
+                with os.scandir(path) as entries:
+                    names: Dict[str, bool] = {entry.name: entry.is_dir(follow_symlinks=False) for entry in entries}
+            except OSError as e:
+                logger.debug(f"Unable to list directory {path}: {e}")
+                continue
+
+            if "pyvenv.cfg" in names:
+                continue  # A virtual environment.
+
+            if "pyproject.toml" in names and not names["pyproject.toml"]:
+                name: str = os.path.relpath(path, root).replace(os.sep, "/")
+                if not compiled or any(pattern.match(name) for pattern in compiled):
+                    projects.append(Project(path, name))
+
+            for name, is_dir in names.items():
+                if is_dir and not name.startswith(".") and name not in workspace_ignored_dir_names:
+                    stack.append(os.path.join(path, name))
+
+    return sorted(projects, key=lambda project: project.name)
+
+
+def get_changed_projects(root: str, projects: List[Project], since: str) -> List[Project]:
+    """Returns the projects that contain a file that has changed since the given git ref, including uncommitted and
+    untracked files. Each changed file belongs only to the nearest project that contains it, so changes to a nested
+    project do not select the project around it.
+
+    :param root: The path to the workspace root, which must be in a git repository.
+    :param projects: The projects of the workspace.
+    :param since: A git ref (e.g. `origin/main` or `HEAD~1`).
+    :return: The projects that have changed, in the same order.
+    :raises WorkspaceError: If git fails (e.g. the ref does not exist).
+    """
+    commands: List[List[str]] = [
+        ["git", "diff", "--name-only", "--relative", since, "--"],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ]
+    changed: List[str] = []
+
+    for command in commands:
+        try:
+            process = subprocess.run(command, cwd=root, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr: str = getattr(e, "stderr", None) or str(e)
+            raise WorkspaceError(f"Unable to find files changed since {since}: {stderr.strip()}") from e
+        changed.extend(line for line in process.stdout.splitlines() if line)
+
+    # Longer names first (and the workspace root last), so that each file is matched to the nearest project.
+    by_depth: List[Project] = sorted(
+        projects, key=lambda project: len(project.name) if project.name != "." else 0, reverse=True
+    )
+    selected: Set[Project] = set()
+
+    for path in changed:
+        for project in by_depth:
+            if project.name == "." or path.startswith(f"{project.name}/"):
+                selected.add(project)
+                break
+
+    return [project for project in projects if project in selected]
+
+
+def load_project_scripts(project: Project, use_cache: bool = True) -> Scripts:
+    """Loads the scripts of a project, using its on-disk cache if it is enabled. The project directory is set as the
+    root of the scripts (see `Scripts.root`), so they are resolved as if they were run from it.
+
+    :param project: A project.
+    :param use_cache: Whether to use the project's on-disk cache.
+    :return: An instance of Scripts.
+    :raises FileNotFoundError: If the pyproject.toml file no longer exists.
+    """
+    pyproject_path: str = os.path.join(project.path, "pyproject.toml")
+    if use_cache:
+        scripts: Scripts = Scripts.from_config(cache=ConfigCache(pyproject_path))
+    else:
+        scripts = Scripts.from_config(get_pyproject_toml(pyproject_path))
+
+    scripts.root = project.path
+    return scripts
+
+
+async def run_workspace(
+    projects: List[Project], script_key: str, jobs: int | None = None, use_cache: bool = True
+) -> List[ProjectResult]:
+    """Runs a script in each of the given projects that defines it, using a Scripts instance loaded from the project's
+    own pyproject.toml file. Up to `jobs` projects run at once; each command is run in its project directory, and its
+    output is streamed line by line, prefixed with the project and script name (e.g. `[packages/api:test] ...`). A
+    project whose script fails does not stop the others.
+
+    :param projects: The projects to run the script in.
+    :param script_key: The name of the script.
+    :param jobs: The maximum number of projects to run the script in at once; defaults to the number of CPUs.
+    :param use_cache: Whether to use the on-disk cache of each project.
+    :return: The result for each project, in the same order.
+    """
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(jobs or os.cpu_count() or 1)
+
+    async def run_project(project: Project) -> ProjectResult:
+        try:
+            # Loaded on a worker thread, as parsing pyproject.toml or reading the cache would block the event loop.
+            scripts: Scripts = await asyncio.to_thread(load_project_scripts, project, use_cache)
+        except Exception as e:
+            return ProjectResult(project, "failed", 0.0, f"Unable to load scripts: {e}")
+
+        if script_key.startswith("_") or script_key not in scripts:
+            return ProjectResult(project, "skipped", 0.0)
+
+        async with semaphore:
+            start: float = time.perf_counter()
+            try:
+                await scripts.run_script_async(script_key, label=f"{project.name}:", cwd=project.path)
+                result: ProjectResult = ProjectResult(project, "ok", time.perf_counter() - start)
+            except Exception as e:
+                result = ProjectResult(project, "failed", time.perf_counter() - start, str(e))
+            finally:
+                if scripts.pool is not None:
+                    scripts.pool.shutdown()
+                if scripts.cache:
+                    scripts.cache.save()
+                scripts.executables.save()
+                scripts.save_env()
+
+        return result
+
+    return list(await asyncio.gather(*[run_project(project) for project in projects]))
+
+
+def format_summary(script_key: str, results: List[ProjectResult], elapsed: float) -> str:
+    """Returns a summary of the results of running a script across a workspace: a line for each project that ran the
+    script, slowest first, followed by the totals.
+
+    :param script_key: The name of the script.
+    :param results: The result for each project.
+    :param elapsed: The wall time, in seconds, of the whole run.
+    :return: A multi-line string.
+    """
+    ran: List[ProjectResult] = sorted(
+        [result for result in results if result.status != "skipped"], key=lambda result: result.duration, reverse=True
+    )
+    failed: int = sum(1 for result in ran if result.status == "failed")
+    skipped: int = len(results) - len(ran)
+    lines: List[str] = [f"{'Status':<8} {'Time (s)':>9}  Project"]
+
+    for result in ran:
+        line: str = f"{result.status.upper():<8} {result.duration:>9.2f}  {result.project.name}"
+        lines.append(f"{line}: {result.error}" if result.error else line)
+
+    lines.append(
+        f"Ran `{script_key}` in {len(ran)} of {len(results)} projects in {elapsed:.2f}s: {len(ran) - failed} ok, "
+        f"{failed} failed, {skipped} skipped (script not defined)"
+    )
+    return "\n".join(lines)
+
+
+def build_workspace_arg_parser() -> ArgumentParser:
+    """Returns the argument parser for workspace mode (`dev --all <script>`), which does not load the scripts of the
+    project in the working directory; there may not even be one.
+
+    :return: An ArgumentParser object.
+    """
+    arg_parser: ArgumentParser = ArgumentParser(
+        prog="dev --all", description="Run a script in every project under the current working directory"
+    )
+    arg_parser.add_argument("--all", action="store_true", help="run the script in every project (required)")
+    arg_parser.add_argument("-d", "--debug", action="store_true", help="enable debug logging")
+    arg_parser.add_argument("--no-cache", action="store_true", help="do not read or write the on-disk cache")
+    arg_parser.add_argument("--timings", action="store_true", help="print how long each phase took, slowest first")
+    arg_parser.add_argument("--profile", metavar="FILE", help="write a Chrome trace of each phase to FILE")
+    arg_parser.add_argument(
+        "--filter",
+        action="append",
+        metavar="GLOB",
+        help="only run the script in projects whose paths match GLOB (e.g. 'packages/*'); can be repeated",
+    )
+    arg_parser.add_argument(
+        "--since", metavar="REF", help="only run the script in projects with files changed since the git REF"
+    )
+    arg_parser.add_argument(
+        "-j", "--jobs", type=int, metavar="N", help="maximum number of projects to run at once (default: CPUs)"
+    )
+    arg_parser.add_argument("script", help="the name of the script to run")
+    return arg_parser
+
+
+def workspace_cli(argv: List[str], use_cache: bool = True) -> None:
+    """Runs `dev --all <script>`: finds every project under the current working directory, and runs the script in
+    each project that defines it, then prints a summary to stderr.
+
+    :param argv: The command line args, excluding the program name.
+    :param use_cache: Whether to use the on-disk cache of each project.
+    :raises WorkspaceError: If no projects are found, or the script fails in any project.
+    """
+    args = build_workspace_arg_parser().parse_args(argv)
+    root: str = os.getcwd()
+    projects: List[Project] = find_projects(root, args.filter)
+
+    if args.since:
+        projects = get_changed_projects(root, projects, args.since)
+
+    if not projects:
+        raise WorkspaceError(f"No matching projects found in {root}")
+
+    start: float = time.perf_counter()
+    results: List[ProjectResult] = asyncio.run(run_workspace(projects, args.script, args.jobs, use_cache))
+    print(format_summary(args.script, results, time.perf_counter() - start), file=sys.stderr)
+
+    failed: List[str] = [result.project.name for result in results if result.status == "failed"]
+    if failed:
+        raise WorkspaceError(f"Script `{args.script}` failed in {len(failed)} project(s): {', '.join(failed)}")
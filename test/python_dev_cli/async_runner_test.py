@@ -0,0 +1,68 @@
+import asyncio
+import io
+import sys
+import time
+import unittest
+from subprocess import CalledProcessError, TimeoutExpired
+
+from src.python_dev_cli.async_runner import line_limit, run_command
+
+
+class TestRunCommand(unittest.IsolatedAsyncioTestCase):
+    async def test_run_command(self):
+        out, err = io.StringIO(), io.StringIO()
+        code = "import sys; print('foo'); print('bar'); print('baz', file=sys.stderr)"
+        result = await run_command([sys.executable, "-c", code], prefix="[test] ", out_stream=out, err_stream=err)
+        self.assertEqual(result.returncode, 0)
+        self.assertIsNone(result.stdout)
+        self.assertEqual(out.getvalue(), "[test] foo\n[test] bar\n")
+        self.assertEqual(err.getvalue(), "[test] baz\n")
+
+    async def test_run_command_capture(self):
+        out, err = io.StringIO(), io.StringIO()
+        code = "import sys; print('foo'); print('bar', file=sys.stderr); sys.exit(2)"
+        result = await run_command(
+            [sys.executable, "-c", code], prefix="> ", check=False, capture=True, out_stream=out, err_stream=err
+        )
+        self.assertEqual((result.returncode, result.stdout.strip(), result.stderr.strip()), (2, b"foo", b"bar"))
+        self.assertEqual(out.getvalue().strip(), "> foo")
+
+    async def test_run_command_no_trailing_newline(self):
+        out = io.StringIO()
+        code = "import sys; sys.stdout.write('foo')"
+        await run_command([sys.executable, "-c", code], prefix="> ", out_stream=out)
+        self.assertEqual(out.getvalue(), "> foo\n")
+
+    async def test_run_command_long_line(self):
+        out = io.StringIO()
+        code = f"print('x' * {line_limit * 2})"
+        await run_command([sys.executable, "-c", code], out_stream=out)
+        self.assertEqual(out.getvalue().replace("\n", ""), "x" * line_limit * 2)
+
+    async def test_run_command_check(self):
+        with self.assertRaises(CalledProcessError):
+            await run_command([sys.executable, "-c", "import sys; sys.exit(3)"])
+        result = await run_command([sys.executable, "-c", "import sys; sys.exit(3)"], check=False)
+        self.assertEqual(result.returncode, 3)
+
+    async def test_run_command_cancelled(self):
+        start = time.monotonic()
+        task = asyncio.create_task(run_command([sys.executable, "-c", "import time; time.sleep(10)"]))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertLess(time.monotonic() - start, 5)
+
+    async def test_run_command_timeout(self):
+        out = io.StringIO()
+        code = "import time; print('foo', flush=True); time.sleep(10)"
+        start = time.monotonic()
+        with self.assertRaises(TimeoutExpired) as context:
+            await run_command([sys.executable, "-c", code], capture=True, out_stream=out, timeout=1.0)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual((context.exception.timeout, context.exception.output), (1.0, b"foo\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
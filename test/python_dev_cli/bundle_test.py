@@ -0,0 +1,101 @@
+import marshal
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.bundle import compile_bundle
+from src.python_dev_cli.cache import ConfigCache, bundle_file_name
+from src.python_dev_cli.commands import CompiledCommand, precompiled_commands
+from src.python_dev_cli.scripts import Scripts
+
+pyproject_toml = """
+[tool.python-dev-cli.env]
+GIT_SHA = "git rev-parse HEAD"
+
+[tool.python-dev-cli.scripts]
+foo = "echo foo"
+bar = ["foo", "baz"]
+baz = "{{ dev.foo }} baz"
+sha = "echo $GIT_SHA"
+"""
+
+
+@patch.dict(precompiled_commands, clear=True)
+class TestBundle(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.pyproject_path = os.path.join(self.root, "pyproject.toml")
+        self.write_pyproject(pyproject_toml)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_pyproject(self, content: str, age: float = 10.0):
+        with open(self.pyproject_path, "w") as file:
+            file.write(content)
+        mtime = time.time() - age
+        os.utime(self.pyproject_path, (mtime, mtime))
+
+    def read_bundle(self):
+        with open(os.path.join(self.root, bundle_file_name), "rb") as file:
+            return marshal.load(file)
+
+    def test_compile_bundle(self):
+        path = compile_bundle(ConfigCache.from_project_root(self.root))
+        self.assertEqual(path, os.path.join(self.root, bundle_file_name))
+        bundle = self.read_bundle()
+        self.assertEqual(bundle["config"]["scripts"]["foo"], "echo foo")
+        self.assertEqual(bundle["resolved"], {"bar": ["foo", "baz"]})
+        self.assertEqual(bundle["rendered"], {"{{ dev.foo }} baz": "echo foo baz"})
+        commands = {command: (argv, holes) for command, _, argv, holes in bundle["commands"]}
+        self.assertEqual(commands["echo foo"], (("echo", "foo"), ()))
+        self.assertEqual(commands["echo foo baz"], (("echo", "foo", "baz"), ()))
+        self.assertEqual(commands["echo $GIT_SHA"], (("echo", "$GIT_SHA"), (1,)))
+        self.assertNotIn("GIT_SHA", os.environ)  # Generated environment variables are never generated.
+
+    def test_load_bundle(self):
+        compile_bundle(ConfigCache.from_project_root(self.root))
+        precompiled_commands.clear()
+        with patch("src.python_dev_cli.cache.tomllib.loads", autospec=True) as mock_loads:
+            cache = ConfigCache.from_project_root(self.root)
+            scripts = Scripts.from_config(cache=cache)
+            self.assertIsNotNone(cache.bundle)
+            self.assertEqual(cache.get_resolved("bar"), ["foo", "baz"])
+            self.assertEqual(cache.get_rendered("{{ dev.foo }} baz"), "echo foo baz")
+            self.assertEqual(scripts.get_script_command("bar"), ["echo foo", "echo foo baz"])
+            mock_loads.assert_not_called()
+        self.assertEqual(precompiled_commands[("echo foo", True)], CompiledCommand(("echo", "foo"), ()))
+
+    def test_load_bundle_executables(self):
+        compile_bundle(ConfigCache.from_project_root(self.root))
+        scripts = Scripts.from_config(cache=ConfigCache.from_project_root(self.root))
+        scripts.get_script_command("foo")
+        with patch("src.python_dev_cli.executables.shutil.which", autospec=True) as mock_which:
+            self.assertTrue(scripts.executables.which("echo"))
+            mock_which.assert_not_called()
+
+    def test_load_bundle_stale(self):
+        compile_bundle(ConfigCache.from_project_root(self.root))
+        self.write_pyproject(pyproject_toml.replace("echo foo", "echo qux"), age=0.0)
+        cache = ConfigCache.from_project_root(self.root)
+        self.assertEqual(cache.get_config()["tool"]["python-dev-cli"]["scripts"]["foo"], "echo qux")
+        self.assertIsNone(cache.bundle)
+
+    def test_load_bundle_disabled(self):
+        compile_bundle(ConfigCache.from_project_root(self.root))
+        cache = ConfigCache(self.pyproject_path, use_bundle=False)
+        self.assertEqual(cache.get_config()["tool"]["python-dev-cli"]["scripts"]["foo"], "echo foo")
+        self.assertIsNone(cache.bundle)
+
+    def test_compile_bundle_invalid(self):
+        self.write_pyproject(pyproject_toml + "\n[tool.python-dev-cli.meta]\ndate = 2023-01-01\n")
+        with self.assertRaises(ValueError):
+            compile_bundle(ConfigCache.from_project_root(self.root))
+        self.assertFalse(os.path.exists(os.path.join(self.root, bundle_file_name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.cache import ConfigCache, cache_dir_name, get_cache_dir, is_cache_enabled
+
+pyproject_toml = """
+[tool.python-dev-cli.scripts]
+foo = "echo foo"
+bar = ["foo", "foo"]
+"""
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.pyproject_path = os.path.join(self.root, "pyproject.toml")
+        self.write_pyproject(pyproject_toml)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_pyproject(self, content: str, age: float = 10.0):
+        with open(self.pyproject_path, "w") as file:
+            file.write(content)
+        mtime = time.time() - age
+        os.utime(self.pyproject_path, (mtime, mtime))
+
+    def test_get_cache_dir(self):
+        cache_dir = get_cache_dir(self.root)
+        self.assertEqual(cache_dir, os.path.join(self.root, cache_dir_name, "cache"))
+        self.assertTrue(os.path.isdir(cache_dir))
+        self.assertTrue(os.path.isfile(os.path.join(self.root, cache_dir_name, ".gitignore")))
+
+    def test_is_cache_enabled(self):
+        tests = [
+            {"value": None, "expected": True},
+            {"value": "1", "expected": True},
+            {"value": "0", "expected": False},
+            {"value": "false", "expected": False},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                env = {} if test["value"] is None else {"PYTHON_DEV_CLI_CACHE": test["value"]}
+                with patch.dict(os.environ, env, clear=True):
+                    self.assertEqual(is_cache_enabled(), test["expected"])
+
+    def test_get_config(self):
+        cache = ConfigCache.from_project_root(self.root)
+        config = cache.get_config()
+        self.assertEqual(config["tool"]["python-dev-cli"]["scripts"]["foo"], "echo foo")
+        self.assertFalse(os.path.exists(cache.path))
+        cache.save()
+        self.assertTrue(os.path.exists(cache.path))
+
+    def test_get_config_cached(self):
+        cache = ConfigCache.from_project_root(self.root)
+        cache.get_config()
+        cache.set_resolved("bar", ["foo", "foo"])
+        cache.set_rendered("echo {{ dev.foo }}", "echo echo foo")
+        cache.save()
+        with patch("src.python_dev_cli.cache.tomllib.loads", autospec=True) as mock_loads:
+            cache = ConfigCache.from_project_root(self.root)
+            self.assertEqual(cache.get_config()["tool"]["python-dev-cli"]["scripts"]["foo"], "echo foo")
+            self.assertEqual(cache.get_resolved("bar"), ["foo", "foo"])
+            self.assertEqual(cache.get_rendered("echo {{ dev.foo }}"), "echo echo foo")
+            mock_loads.assert_not_called()
+
+    def test_get_config_invalidated(self):
+        cache = ConfigCache.from_project_root(self.root)
+        cache.get_config()
+        cache.set_resolved("bar", ["foo", "foo"])
+        cache.save()
+        self.write_pyproject(pyproject_toml.replace("echo foo", "echo baz"))
+        cache = ConfigCache.from_project_root(self.root)
+        self.assertEqual(cache.get_config()["tool"]["python-dev-cli"]["scripts"]["foo"], "echo baz")
+        self.assertIsNone(cache.get_resolved("bar"))
+
+    def test_get_config_touched(self):
+        cache = ConfigCache.from_project_root(self.root)
+        cache.get_config()
+        cache.set_resolved("bar", ["foo", "foo"])
+        cache.save()
+        self.write_pyproject(pyproject_toml, age=5.0)
+        with patch("src.python_dev_cli.cache.tomllib.loads", autospec=True) as mock_loads:
+            cache = ConfigCache.from_project_root(self.root)
+            self.assertEqual(cache.get_resolved("bar"), ["foo", "foo"])
+            mock_loads.assert_not_called()
+
+    def test_get_config_not_found(self):
+        cache = ConfigCache(os.path.join(self.root, "missing", "pyproject.toml"))
+        with self.assertRaises(FileNotFoundError):
+            cache.get_config()
+
+
+if __name__ == "__main__":
+    unittest.main()
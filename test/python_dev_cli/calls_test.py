@@ -0,0 +1,156 @@
+import json
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from subprocess import CalledProcessError, run
+from unittest.mock import patch
+
+from src.python_dev_cli.calls import Call, get_call_args, get_exit_code, load_callable, run_call
+from src.python_dev_cli.capture import TailBuffer
+
+# The module of the functions below, as it is imported from the repository root by new Python processes.
+module: str = "test.python_dev_cli.calls_test"
+
+
+def greet():
+    print("hello", *sys.argv[1:])
+    print(os.environ.get("GREETING_SUFFIX", ""), file=sys.stderr)
+
+
+def fail():
+    sys.exit("oops")
+
+
+def crash():
+    raise RuntimeError("boom")
+
+
+def interleave():
+    for i in range(1000):
+        print("out", i)
+        print("err", i, file=sys.stderr)
+
+
+def print_pid():
+    print(os.getpid())
+
+
+def print_modules():
+    print(*sorted(name for name in sys.argv[1:] if name in sys.modules))
+
+
+def exit_now():
+    os._exit(1)
+
+
+def print_cwd():
+    print(os.getcwd())
+    return 3
+
+
+class TestCall(unittest.TestCase):
+    def test_call(self):
+        call = Call(module, "greet", ["a b", "c"])
+        self.assertEqual(call, f"{module}:greet 'a b' c")
+        self.assertEqual(call.argv, [module, "a b", "c"])
+        self.assertEqual(Call("json.tool"), "json.tool")
+
+        copy = pickle.loads(pickle.dumps(call))
+        self.assertEqual((copy, copy.module, copy.attr, copy.args), (call, call.module, call.attr, call.args))
+
+    def test_load_callable(self):
+        self.assertIs(load_callable("os.path", "join"), os.path.join)
+        self.assertIs(load_callable("json", "JSONDecoder.decode"), json.JSONDecoder.decode)
+        with self.assertRaises(TypeError):
+            load_callable("os", "sep")
+        with self.assertRaises(AttributeError):
+            load_callable("os", "missing")
+
+    def test_get_exit_code(self):
+        for value, code in [(None, 0), (0, 0), (2, 2), (True, 1), ("error", 1)]:
+            with self.subTest(value=value):
+                self.assertEqual(get_exit_code(value), code)
+
+
+class TestRunCall(unittest.TestCase):
+    def test_run_call(self):
+        argv = list(sys.argv)
+        env = {**os.environ, "GREETING_SUFFIX": "!"}
+        result = run_call(Call(module, "greet", ["world"]), capture_output=True, env=env)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.args, [module, "world"])
+        self.assertEqual((result.stdout, result.stderr), (b"hello world\n", b"!\n"))
+        self.assertEqual(sys.argv, argv)
+        self.assertNotIn("GREETING_SUFFIX", os.environ)
+
+        result = run_call(Call(module, "greet"), capture_output=True, text=True)
+        self.assertEqual(result.stdout, "hello\n")
+
+    def test_run_call_module(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "data.json")
+            with open(path, "w") as f:
+                f.write('{"a":1}')
+            result = run_call(Call("json.tool", None, ["--compact", path]), capture_output=True)
+        self.assertEqual(result.stdout, b'{"a":1}\n')
+
+    def test_run_call_cwd(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = run_call(Call(module, "print_cwd"), capture_output=True, cwd=tmp_dir)
+            self.assertEqual(os.path.realpath(result.stdout.decode().strip()), os.path.realpath(tmp_dir))
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_run_call_fail(self):
+        tests = [
+            {"attr": "fail", "stderr": b"oops\n"},
+            {"attr": "crash", "stderr": b"RuntimeError: boom\n"},
+            {"attr": "missing", "stderr": b"has no attribute 'missing'\n"},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                result = run_call(Call(module, test["attr"]), capture_output=True)
+                self.assertEqual(result.returncode, 1)
+                self.assertTrue(result.stderr.endswith(test["stderr"]), result.stderr)
+                with self.assertRaises(CalledProcessError):
+                    run_call(Call(module, test["attr"]), capture_output=True, check=True)
+
+    def test_get_call_args(self):
+        tests = [
+            {"call": Call(module, "greet", ["a b"]), "returncode": 0, "stdout": b"hello a b\n"},
+            {"call": Call(module, "print_cwd"), "returncode": 3, "stdout": os.getcwd().encode() + b"\n"},
+            {"call": Call(module, "fail"), "returncode": 1, "stdout": b""},
+            {"call": Call("json.tool", None, ["--compact"]), "returncode": 0, "stdout": b'{"a":1}\n'},
+        ]
+        for test in tests:
+            with self.subTest(call=test["call"]):
+                process = run(get_call_args(test["call"]), input=b'{"a": 1}', capture_output=True)
+                self.assertEqual((process.returncode, process.stdout), (test["returncode"], test["stdout"]))
+
+    def test_run_call_streamed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, "output.log")
+            result = run_call(Call(module, "greet", ["world"]), tail_size=6, log_file=log_file)
+            with open(log_file, "rb") as f:
+                self.assertEqual(f.read(), b"hello world\n\n")
+        self.assertEqual(result.stdout, b"world\n")
+        self.assertTrue(result.truncated)
+        self.assertGreater(result.duration, 0)
+
+    def test_run_call_streamed_interleaved(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, "output.log")
+            with patch.object(TailBuffer, "write", autospec=True, side_effect=TailBuffer.write) as mock_write:
+                result = run_call(Call(module, "interleave"), tail_size=8, log_file=log_file)
+            with open(log_file, "rb") as f:
+                expected = "".join(f"out {i}\nerr {i}\n" for i in range(1000))
+                self.assertEqual(f.read().decode(), expected)
+        self.assertEqual((result.stdout, result.stderr), (b"out 999\n", b"err 999\n"))
+        self.assertGreater(mock_write.call_count, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
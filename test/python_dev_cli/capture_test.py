@@ -0,0 +1,145 @@
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from subprocess import CalledProcessError, TimeoutExpired
+
+from src.python_dev_cli.capture import CapturedProcess, LogWriter, TailBuffer, run_captured, run_process
+
+# A command that writes 100 numbered lines to stdout, and a line to stderr.
+print_lines: str = "import sys; [print(i) for i in range(100)]; print('done', file=sys.stderr)"
+
+
+class TestTailBuffer(unittest.TestCase):
+    def test_write(self):
+        tests = [
+            {"size": 5, "chunks": [], "value": b"", "truncated": False},
+            {"size": 5, "chunks": [b"abc"], "value": b"abc", "truncated": False},
+            {"size": 5, "chunks": [b"abc", b"de"], "value": b"abcde", "truncated": False},
+            {"size": 5, "chunks": [b"abc", b"def"], "value": b"bcdef", "truncated": True},
+            {"size": 5, "chunks": [b"a", b"b", b"cdefghij", b"k"], "value": b"ghijk", "truncated": True},
+            {"size": 0, "chunks": [b"abc"], "value": b"", "truncated": True},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                tail = TailBuffer(test["size"])
+                for chunk in test["chunks"]:
+                    tail.write(chunk)
+                self.assertEqual(tail.getvalue(), test["value"])
+                self.assertEqual(len(tail), len(test["value"]))
+                self.assertEqual(tail.total, sum(len(chunk) for chunk in test["chunks"]))
+                self.assertEqual(tail.truncated, test["truncated"])
+
+    def test_bounded(self):
+        tail = TailBuffer(100)
+        for _ in range(10_000):
+            tail.write(b"x" * 7)
+        self.assertEqual(tail.getvalue(), b"x" * 100)
+        self.assertEqual(tail.total, 70_000)
+        self.assertLess(len(tail._TailBuffer__chunks), 17)
+
+
+class TestLogWriter(unittest.TestCase):
+    def test_write(self):
+        log = io.BytesIO()
+        writer = LogWriter(log)
+        out, err = writer.stream(), writer.stream()
+        out.write(b"1\n1")
+        err.write(b"do")
+        out.write(b"1\n")
+        err.write(b"ne\nerr")
+        self.assertEqual(log.getvalue(), b"1\n11\ndone\n")
+        err.close()
+        out.close()
+        self.assertEqual(log.getvalue(), b"1\n11\ndone\nerr")
+
+    def test_write_long_line(self):
+        log = io.BytesIO()
+        out = LogWriter(log).stream()
+        out.write(b"x" * (2**16 + 1))
+        self.assertEqual(len(log.getvalue()), 2**16 + 1)
+
+
+class TestRunCaptured(unittest.TestCase):
+    def test_run_captured(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, "output.log")
+            result = run_captured([sys.executable, "-c", print_lines], tail_size=6, log_file=log_file)
+            with open(log_file, "rb") as f:
+                log = f.read()
+
+        self.assertIsInstance(result, CapturedProcess)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, b"98\n99\n")
+        self.assertEqual(result.stderr, b"done\n")
+        self.assertTrue(result.truncated)
+        self.assertEqual(result.log_file, log_file)
+        self.assertGreater(result.duration, 0)
+        self.assertEqual(sorted(log.splitlines()), sorted([str(i).encode() for i in range(100)] + [b"done"]))
+
+    def test_run_captured_text(self):
+        result = run_captured([sys.executable, "-c", "print('café')"], tail_size=2, text=True)
+        self.assertEqual(result.stdout, "�\n")
+
+    def test_run_captured_check(self):
+        args = [sys.executable, "-c", "import sys; print('out'); sys.exit('error')"]
+        self.assertEqual(run_captured(args).returncode, 1)
+        with self.assertRaises(CalledProcessError) as cm:
+            run_captured(args, check=True)
+        self.assertEqual(cm.exception.returncode, 1)
+        self.assertEqual(cm.exception.stdout, b"out\n")
+        self.assertEqual(cm.exception.stderr, b"error\n")
+
+    def test_run_captured_timeout(self):
+        args = [sys.executable, "-c", "import time; print('started', flush=True); time.sleep(10)"]
+        with self.assertRaises(TimeoutExpired) as cm:
+            run_captured(args, timeout=1)
+        self.assertEqual(cm.exception.stdout, b"started\n")
+
+    @unittest.skipUnless(os.name == "posix", "process groups are only supported on POSIX systems")
+    def test_run_captured_timeout_process_group(self):
+        # The grandchild keeps the pipes open, so the pumps would never finish if only the child were killed.
+        code = "import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])"
+        start = time.monotonic()
+        with self.assertRaises(TimeoutExpired):
+            run_captured([sys.executable, "-c", f"{code}; time.sleep(30)"], timeout=1)
+        self.assertLess(time.monotonic() - start, 10)
+
+
+class TestRunProcess(unittest.TestCase):
+    def test_run_process(self):
+        pids = []
+        result = run_process([sys.executable, "-c", print_lines], capture_output=True, on_start=pids.append)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.splitlines()[-1], b"99")
+        self.assertEqual(result.stderr, b"done\n")
+        self.assertEqual(len(pids), 1)
+
+    def test_run_process_input(self):
+        code = "import sys; print(sys.stdin.read().upper())"
+        result = run_process([sys.executable, "-c", code], input="foo", capture_output=True, text=True)
+        self.assertEqual(result.stdout, "FOO\n")
+
+    def test_run_process_check(self):
+        args = [sys.executable, "-c", "import sys; sys.exit(2)"]
+        self.assertEqual(run_process(args).returncode, 2)
+        with self.assertRaises(CalledProcessError):
+            run_process(args, check=True)
+
+    @unittest.skipUnless(os.name == "posix", "process groups are only supported on POSIX systems")
+    def test_run_process_timeout_process_group(self):
+        code = "import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])"
+        start = time.monotonic()
+        with self.assertRaises(TimeoutExpired):
+            run_process(
+                [sys.executable, "-c", f"{code}; print('started', flush=True); time.sleep(30)"],
+                timeout=1,
+                capture_output=True,
+            )
+        self.assertLess(time.monotonic() - start, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,9 @@ from argparse import ArgumentParser, Namespace
 from unittest.mock import MagicMock, patch
 
 from src.python_dev_cli.scripts import Scripts
-from src.python_dev_cli.cli import build_arg_parser, dev_cli
+from src.python_dev_cli.cli import LazyHelp, build_arg_parser, dev_cli, format_script_graph, get_option_value
+from src.python_dev_cli.scripts import ScriptReferenceError
+from src.python_dev_cli.timings import disable_timings
 
 
 class TestBuildArgParser(unittest.TestCase):
@@ -21,6 +23,74 @@ class TestBuildArgParser(unittest.TestCase):
         self.assertEqual(arg_parser.prog, "dev")
         self.assertEqual(arg_parser.parse_args(["test_key"]).script, "test_key")
 
+    def test_build_arg_parser_lazy_help(self):
+        scripts = Scripts.from_config({"tool": {"python-dev-cli": {"scripts": {"foo": "echo {{ 2 + 2 }}"}}}})
+        scripts.get_script_help = MagicMock(return_value=["echo 4"])
+        arg_parser = build_arg_parser(scripts)
+        arg_parser.parse_args(["foo"])
+        scripts.get_script_help.assert_not_called()
+        self.assertIn("['echo 4']", arg_parser.format_help())
+        scripts.get_script_help.assert_called_once_with("foo")
+
+
+class TestLazyHelp(unittest.TestCase):
+    def test_lazy_help(self):
+        scripts = MagicMock(get_script_help=MagicMock(return_value=["date +%Y"]))
+        lazy_help = LazyHelp(scripts, "foo")
+        scripts.get_script_help.assert_not_called()
+        self.assertEqual(str(lazy_help), "['date +%Y']")
+        self.assertEqual(lazy_help % {"prog": "dev"}, "['date +%Y']")
+        self.assertEqual(lazy_help.strip(), "['date +%Y']")
+        scripts.get_script_help.assert_called_once_with("foo")
+
+
+class TestGetOptionValue(unittest.TestCase):
+    def test_get_option_value(self):
+        tests = [
+            {"argv": ["dev", "--profile", "trace.json", "foo"], "expected": "trace.json"},
+            {"argv": ["dev", "--profile=trace.json", "foo"], "expected": "trace.json"},
+            {"argv": ["dev", "foo", "--profile"], "expected": None},
+            {"argv": ["dev", "foo"], "expected": None},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                self.assertEqual(get_option_value(test["argv"], "--profile"), test["expected"])
+
+
+class TestFormatScriptGraph(unittest.TestCase):
+    def test_format_script_graph(self):
+        scripts = Scripts.from_config(
+            {
+                "tool": {
+                    "python-dev-cli": {
+                        "scripts": {
+                            "black": "black .",
+                            "ruff": "ruff .",
+                            "clean": "rm -rf dist",
+                            "lint": {"cmd": ["black", "ruff"], "parallel": True},
+                            "build": {"cmd": "python3 -m build", "depends_on": ["clean"]},
+                            "ci": ["lint", "build", "lint"],
+                        }
+                    }
+                }
+            }
+        )
+        expected = [
+            "ci",
+            "|-- lint (parallel)",
+            "|   |-- black: black .",
+            "|   `-- ruff: ruff .",
+            "|-- build: python3 -m build",
+            "|   `-- clean: rm -rf dist",
+            "`-- lint (parallel) (*)",
+        ]
+        self.assertEqual(format_script_graph(scripts, ["ci"]), "\n".join(expected))
+
+    def test_format_script_graph_cycle(self):
+        scripts = Scripts.from_config({"tool": {"python-dev-cli": {"scripts": {"foo": ["bar"], "bar": ["foo"]}}}})
+        with self.assertRaises(ScriptReferenceError):
+            format_script_graph(scripts, ["foo"])
+
 
 @patch("src.python_dev_cli.cli.Scripts.from_config")
 @patch("src.python_dev_cli.cli.build_arg_parser")
@@ -30,16 +100,146 @@ class TestDevCli(unittest.TestCase):
         mock_sys.argv = ["dev", "test_key"]
         scripts = mock_from_config()
         scripts.run_script = MagicMock()
-        mock_build_arg_parser.return_value = MagicMock(parse_args=MagicMock(return_value=Namespace(script="test_key")))
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(
+                return_value=Namespace(
+                    compile=False, script="test_key", jobs=None, run_async=False, graph=False, watch=False
+                )
+            )
+        )
+        dev_cli()
+        scripts.run_script.assert_called_once_with("test_key", jobs=None)
+
+    @patch("src.python_dev_cli.cli.format_script_graph")
+    def test_dev_cli_graph(self, mock_format_script_graph, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "--graph", "test_key"]
+        scripts = mock_from_config()
+        scripts.run_script = MagicMock()
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(
+                return_value=Namespace(compile=False, script="test_key", jobs=None, run_async=False, graph=True)
+            )
+        )
+        dev_cli()
+        scripts.run_script.assert_not_called()
+        mock_format_script_graph.assert_called_once_with(scripts, ["test_key"])
+
+    @patch("src.python_dev_cli.bundle.compile_bundle")
+    def test_dev_cli_compile(self, mock_compile_bundle, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "--compile"]
+        scripts = mock_from_config()
+        scripts.run_script = MagicMock()
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(return_value=Namespace(compile=True, script=None, graph=False))
+        )
+        dev_cli()
+        scripts.run_script.assert_not_called()
+        mock_compile_bundle.assert_called_once()
+
+    @patch("src.python_dev_cli.cli.get_completion_script", return_value="complete -F _dev_completion dev\n")
+    def test_dev_cli_completion(self, mock_get_completion_script, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "--completion", "bash"]
+        dev_cli()
+        mock_get_completion_script.assert_called_once_with("bash", mock_build_arg_parser.return_value)
+        mock_from_config.assert_not_called()
+
+    @patch("src.python_dev_cli.cli.get_completion_keys", return_value=["lint", "test"])
+    def test_dev_cli_completion_keys(self, mock_get_completion_keys, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "--completion-keys"]
+        dev_cli()
+        mock_get_completion_keys.assert_called_once()
+        mock_from_config.assert_not_called()
+        mock_build_arg_parser.assert_not_called()
+
+    @patch("src.python_dev_cli.cli.report_timings")
+    def test_dev_cli_timings(self, mock_report_timings, mock_sys, mock_build_arg_parser, mock_from_config):
+        self.addCleanup(disable_timings)
+        mock_sys.argv = ["dev", "--timings", "--profile", "trace.json", "test_key"]
+        scripts = mock_from_config()
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(
+                return_value=Namespace(
+                    compile=False, script="test_key", jobs=None, run_async=False, graph=False, watch=False
+                )
+            )
+        )
+        dev_cli()
+        timings, profile_path, print_summary = mock_report_timings.call_args.args
+        self.assertEqual((profile_path, print_summary), ("trace.json", True))
+        self.assertIn("arg parser build", [event["name"] for event in timings.events])
+        scripts.run_script.assert_called_once_with("test_key", jobs=None)
+
+    @patch("asyncio.run")
+    def test_dev_cli_async(self, mock_asyncio_run, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "--async", "test_key"]
+        scripts = mock_from_config()
+        scripts.run_script = MagicMock()
+        scripts.run_script_async = MagicMock()
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(
+                return_value=Namespace(
+                    compile=False, script="test_key", jobs=2, run_async=True, graph=False, watch=False
+                )
+            )
+        )
+        dev_cli()
+        scripts.run_script.assert_not_called()
+        scripts.run_script_async.assert_called_once_with("test_key", jobs=2)
+        mock_asyncio_run.assert_called_once_with(scripts.run_script_async.return_value)
+
+    @patch("src.python_dev_cli.watch.watch_script", new_callable=MagicMock)
+    @patch("asyncio.run")
+    def test_dev_cli_watch(
+        self, mock_asyncio_run, mock_watch_script, mock_sys, mock_build_arg_parser, mock_from_config
+    ):
+        mock_sys.argv = ["dev", "--watch", "test_key"]
+        scripts = mock_from_config()
+        mock_asyncio_run.side_effect = KeyboardInterrupt
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(
+                return_value=Namespace(
+                    compile=False, script="test_key", jobs=None, run_async=False, graph=False, watch=True
+                )
+            )
+        )
+        dev_cli()
+        scripts.run_script.assert_not_called()
+        mock_watch_script.assert_called_once_with(scripts, "test_key", jobs=None)
+        mock_asyncio_run.assert_called_once_with(mock_watch_script.return_value)
+
+    @patch("src.python_dev_cli.workspace.workspace_cli")
+    def test_dev_cli_all(self, mock_workspace_cli, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "--all", "--no-cache", "test_key"]
+        dev_cli()
+        mock_workspace_cli.assert_called_once_with(["--all", "--no-cache", "test_key"], use_cache=False)
+        mock_from_config.assert_not_called()
+        mock_build_arg_parser.assert_not_called()
+
+    def test_dev_cli_fast_path(self, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "test_key"]
+        scripts = mock_from_config()
+        scripts.__contains__.return_value = True
+        scripts.run_script = MagicMock()
         dev_cli()
         scripts.run_script.assert_called_once_with("test_key")
+        mock_build_arg_parser.assert_not_called()
+
+    def test_dev_cli_fast_path_private_script(self, mock_sys, mock_build_arg_parser, mock_from_config):
+        mock_sys.argv = ["dev", "_test_key"]
+        scripts = mock_from_config()
+        scripts.__contains__.return_value = True
+        mock_build_arg_parser.return_value = MagicMock(
+            parse_args=MagicMock(return_value=Namespace(compile=False, script=None, graph=False))
+        )
+        dev_cli()
+        mock_build_arg_parser.assert_called_once_with(scripts)
 
     def test_dev_cli_no_script(self, mock_sys, mock_build_arg_parser, mock_from_config):
         mock_sys.argv = ["dev"]
         scripts = mock_from_config()
         scripts.run_script = MagicMock()
         mock_build_arg_parser.return_value = MagicMock(
-            parse_args=MagicMock(return_value=Namespace(script=None)),
+            parse_args=MagicMock(return_value=Namespace(compile=False, script=None, graph=False)),
             print_help=MagicMock(),
         )
         dev_cli()
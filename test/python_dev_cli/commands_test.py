@@ -0,0 +1,58 @@
+import os
+import pickle
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.commands import Command, compile_command, expand_command, expand_variables, split_command
+
+
+class TestCommands(unittest.TestCase):
+    def test_split_command(self):
+        self.assertEqual(split_command("echo 'foo bar' baz"), ("echo", "foo bar", "baz"))
+        self.assertEqual(split_command("echo 'foo bar' baz", posix=False), ("echo", "'foo bar'", "baz"))
+        with self.assertRaises(ValueError):
+            split_command("echo 'foo")
+
+    def test_compile_command(self):
+        compiled = compile_command('pytest "$HOME/tests" -k ${KEYWORD} --verbose')
+        self.assertEqual(compiled.argv, ("pytest", "$HOME/tests", "-k", "${KEYWORD}", "--verbose"))
+        self.assertEqual(compiled.holes, (1, 3))
+        self.assertIs(compile_command("echo foo"), compile_command("echo foo"))
+
+    @patch.dict(os.environ, {"SPACES": "foo bar", "QUOTES": "'baz'"})
+    def test_expand_command(self):
+        tests = [
+            {"script": "echo foo", "expected": "echo foo", "argv": ["echo", "foo"]},
+            {"script": "echo $SPACES", "expected": "echo foo bar", "argv": ["echo", "foo bar"]},
+            {"script": "echo ${QUOTES}!", "expected": "echo 'baz'!", "argv": ["echo", "'baz'!"]},
+            {"script": "echo '$SPACES' x", "expected": "echo 'foo bar' x", "argv": ["echo", "foo bar", "x"]},
+            {"script": "echo $UNSET_VARIABLE", "expected": "echo $UNSET_VARIABLE", "argv": ["echo", "$UNSET_VARIABLE"]},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                command = expand_command(test["script"])
+                self.assertIsInstance(command, Command)
+                self.assertEqual(command, test["expected"])
+                self.assertEqual(command.argv, test["argv"])
+
+    @patch.dict(os.environ, {"SPACES": "foo bar"})
+    def test_expand_variables(self):
+        env = {"FOO": "foo", "EMPTY": ""}
+        self.assertEqual(expand_variables("$FOO ${FOO}-$EMPTY $SPACES $$", env), "foo foo- $SPACES $$")
+        self.assertEqual(expand_variables("echo $SPACES"), "echo foo bar")
+        self.assertEqual(expand_command("echo $FOO", env=env).argv, ["echo", "foo"])
+
+    def test_expand_command_invalid(self):
+        command = expand_command("echo 'foo")
+        self.assertNotIsInstance(command, Command)
+        self.assertEqual(command, "echo 'foo")
+
+    def test_pickle(self):
+        command = Command("echo foo bar", ["echo", "foo bar"])
+        copy = pickle.loads(pickle.dumps(command))
+        self.assertEqual(copy, command)
+        self.assertEqual(copy.argv, ["echo", "foo bar"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.cache import ConfigCache
+from src.python_dev_cli.cli import build_arg_parser
+from src.python_dev_cli.completion import completion_index_name, get_completion_keys, get_completion_script
+from src.python_dev_cli.scripts import Scripts
+from src.python_dev_cli.settings import Settings
+
+pyproject_toml = """
+[tool.python-dev-cli.scripts]
+lint = "echo lint"
+lint_fix = "echo fix"
+test = ["lint"]
+_private = "echo private"
+"""
+
+
+class TestCompletion(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.pyproject_path = os.path.join(self.root, "pyproject.toml")
+        with open(self.pyproject_path, "w") as file:
+            file.write(pyproject_toml)
+        mtime = time.time() - 10.0
+        os.utime(self.pyproject_path, (mtime, mtime))
+        self.index_path = os.path.join(self.root, ".python-dev-cli", "cache", completion_index_name)
+        self.arg_parser = build_arg_parser(Scripts(Settings()))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_completion_keys(self):
+        self.assertEqual(get_completion_keys(ConfigCache.from_project_root(self.root)), ["lint", "lint_fix", "test"])
+        with open(self.index_path, "r") as file:
+            self.assertEqual(file.read(), "lint\nlint_fix\ntest\n")
+
+    @patch("src.python_dev_cli.completion.get_pyproject_toml", autospec=True)
+    def test_get_completion_keys_no_cache(self, mock_get_pyproject_toml):
+        mock_get_pyproject_toml.return_value = {"tool": {"python-dev-cli": {"scripts": {"b": "", "a": "", "_c": ""}}}}
+        self.assertEqual(get_completion_keys(), ["a", "b"])
+        self.assertFalse(os.path.exists(self.index_path))
+
+    def test_get_completion_script(self):
+        tests = [
+            {"shell": "bash", "expected": ["complete -F _dev_completion dev", "--no-cache --async"]},
+            {"shell": "zsh", "expected": ["compdef _dev_completion dev", "--no-cache --async"]},
+            {"shell": "fish", "expected": ["complete -c dev -l no-cache", "complete -c dev -s j -l jobs -r"]},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                script = get_completion_script(test["shell"], self.arg_parser)
+                self.assertIn(f".python-dev-cli/cache/{completion_index_name}", script)
+                self.assertNotIn("@", script)
+                for expected in test["expected"]:
+                    self.assertIn(expected, script)
+
+    def test_get_completion_script_invalid(self):
+        with self.assertRaises(ValueError):
+            get_completion_script("tcsh", self.arg_parser)
+
+    @unittest.skipUnless(shutil.which("bash"), "bash is not installed")
+    def test_bash_completion(self):
+        get_completion_keys(ConfigCache.from_project_root(self.root))
+        subdir = os.path.join(self.root, "src", "package")
+        os.makedirs(subdir)
+        script = get_completion_script("bash", self.arg_parser)
+        code = f'{script}\nCOMP_WORDS=(dev li); COMP_CWORD=1; _dev_completion; echo "${{COMPREPLY[@]}}"'
+        env = {key: value for key, value in os.environ.items() if key != "PYTHON_DEV_CLI_ROOT"}
+        process = subprocess.run(["bash", "-c", code], cwd=subdir, env=env, capture_output=True, text=True, check=True)
+        self.assertEqual(process.stdout.strip(), "lint lint_fix")
+
+
+if __name__ == "__main__":
+    unittest.main()
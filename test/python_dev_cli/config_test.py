@@ -1,16 +1,51 @@
+import os
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
-from src.python_dev_cli.config import get_pyproject_toml, get_project_root
+from src.python_dev_cli.config import find_project_root, get_project_root, get_pyproject_toml
 
 project_root = Path(__file__).parent.parent.parent
 
 
 class TestConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp_dir.name)
+        self.nested = os.path.join(self.root, "src", "pkg", "sub")
+        os.makedirs(self.nested)
+        with open(os.path.join(self.root, "pyproject.toml"), "w") as file:
+            file.write("")
+        find_project_root.cache_clear()
+
+    def tearDown(self):
+        find_project_root.cache_clear()
+        self.tmp_dir.cleanup()
+
     def test_get_project_root(self):
         self.assertEqual(get_project_root(), project_root)
 
+    def test_get_project_root_env_var(self):
+        with patch.dict(os.environ, {"PYTHON_DEV_CLI_ROOT": self.nested}):
+            self.assertEqual(get_project_root(), Path(self.nested))
+
+    def test_find_project_root(self):
+        self.assertEqual(find_project_root(self.nested), Path(self.root))
+        self.assertEqual(find_project_root(self.root), Path(self.root))
+
+        # The result is memoized, so adding a nearer pyproject.toml file has no effect until the cache is cleared.
+        with open(os.path.join(self.nested, "pyproject.toml"), "w") as file:
+            file.write("")
+        self.assertEqual(find_project_root(self.nested), Path(self.root))
+        find_project_root.cache_clear()
+        self.assertEqual(find_project_root(self.nested), Path(self.nested))
+
+    def test_find_project_root_not_found(self):
+        os.remove(os.path.join(self.root, "pyproject.toml"))
+        with patch("src.python_dev_cli.config.Path.is_file", return_value=False):
+            self.assertEqual(find_project_root(self.nested), Path(self.nested))
+
     @patch("src.python_dev_cli.config.tomllib.load", autospec=True)
     def test_get_pyproject_toml(self, mock_load):
         expected = {"foo": "bar"}
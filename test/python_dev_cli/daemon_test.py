@@ -0,0 +1,195 @@
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+
+from src.python_dev_cli.client import (
+    DaemonError,
+    DaemonOutdatedError,
+    connect,
+    dev_client,
+    get_peer_uid,
+    get_runtime_dir,
+    get_socket_path,
+    is_daemon_supported,
+    max_socket_path_length,
+    send_request,
+    stop_daemon,
+)
+
+# Root directory of the repository, which must be on the Python path for the `src.python_dev_cli` package to import.
+repo_root: str = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pyproject_toml: str = """
+[tool.python-dev-cli.scripts]
+hello = "echo hello {{ 1 + 1 }}"
+read = "cat"
+"""
+
+
+class TestClient(unittest.TestCase):
+    def test_get_socket_path(self):
+        self.assertEqual(get_socket_path("/project"), "/project/.python-dev-cli/daemon.sock")
+
+        long_root = "/" + "a" * max_socket_path_length
+        path = get_socket_path(long_root)
+        self.assertLessEqual(len(path), max_socket_path_length)
+        self.assertEqual(path, get_socket_path(long_root))
+        self.assertNotEqual(path, get_socket_path(long_root + "b"))
+        self.assertEqual(os.path.dirname(path), get_runtime_dir())
+
+    def test_get_runtime_dir(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, patch.dict(os.environ, {"TMPDIR": tmp_dir}):
+            os.environ.pop("XDG_RUNTIME_DIR", None)
+            path = get_runtime_dir()
+            self.assertEqual(path, os.path.join(tmp_dir, f"python-dev-cli-{os.getuid()}"))
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o700)
+            self.assertEqual(get_runtime_dir(), path)
+
+            os.chmod(path, 0o777)
+            with self.assertRaises(DaemonError):
+                get_runtime_dir()
+            os.rmdir(path)
+            os.symlink(tmp_dir, path)
+            with self.assertRaises(DaemonError):
+                get_runtime_dir()
+
+    @unittest.skipUnless(is_daemon_supported(), "the daemon is not supported on this platform")
+    def test_get_peer_uid(self):
+        left, right = socket.socketpair(socket.AF_UNIX)
+        with left, right:
+            self.assertEqual(get_peer_uid(left), os.getuid())
+
+    def test_connect_not_running(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(DaemonError):
+                connect(tmp_dir, start=False)
+            self.assertFalse(stop_daemon(tmp_dir))
+
+    def test_dev_client_disabled(self):
+        with patch.dict(os.environ, {"PYTHON_DEV_CLI_DAEMON": "0"}), patch(
+            "src.python_dev_cli.client.run_with_daemon"
+        ) as mock_run_with_daemon, patch("src.python_dev_cli.cli.dev_cli") as mock_dev_cli:
+            dev_client()
+        mock_run_with_daemon.assert_not_called()
+        mock_dev_cli.assert_called_once()
+
+
+@unittest.skipUnless(is_daemon_supported(), "the daemon is not supported on this platform")
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root: str = os.path.realpath(self.tmp_dir.name)
+        self.write_pyproject(pyproject_toml)
+        self.process = self.start_daemon()
+
+    def tearDown(self):
+        stop_daemon(self.root)
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.tmp_dir.cleanup()
+
+    def start_daemon(self) -> subprocess.Popen:
+        env: Dict[str, str] = {**os.environ, "PYTHONPATH": repo_root}
+        process = subprocess.Popen(
+            [sys.executable, "-m", "src.python_dev_cli.daemon", "--root", self.root, "run"],
+            cwd=repo_root,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                connect(self.root, start=False).close()
+                return process
+            except DaemonError:
+                self.assertIsNone(process.poll(), "daemon exited before it started listening")
+                self.assertLess(time.monotonic(), deadline, "daemon did not start listening")
+                time.sleep(0.02)
+
+    def write_pyproject(self, content: str) -> None:
+        with open(os.path.join(self.root, "pyproject.toml"), "w") as f:
+            f.write(content)
+
+    def run_request(self, argv: List[str], stdin: bytes = b"") -> Tuple[int, str, str]:
+        files = [tempfile.TemporaryFile() for _ in range(3)]
+        try:
+            files[0].write(stdin)
+            files[0].seek(0)
+            with connect(self.root, start=False) as sock:
+                returncode = send_request(sock, argv, cwd=self.root, fds=[file.fileno() for file in files])
+            for file in files:
+                file.seek(0)
+            return returncode, files[1].read().decode(), files[2].read().decode()
+        finally:
+            for file in files:
+                file.close()
+
+    def test_run(self):
+        tests = [
+            {"argv": ["hello"], "stdin": b"", "returncode": 0, "stdout": "hello 2\n"},
+            {"argv": ["read"], "stdin": b"piped\n", "returncode": 0, "stdout": "piped\n"},
+            {"argv": ["nosuch"], "stdin": b"", "returncode": 2, "stdout": ""},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                returncode, stdout, stderr = self.run_request(test["argv"], test["stdin"])
+                self.assertEqual(returncode, test["returncode"])
+                self.assertEqual(stdout, test["stdout"])
+                if test["returncode"] == 2:
+                    self.assertIn("invalid choice: 'nosuch'", stderr)
+
+    def test_reload(self):
+        self.assertEqual(self.run_request(["hello"])[1], "hello 2\n")
+        self.write_pyproject(pyproject_toml.replace("hello {{", "hi {{"))
+        self.assertEqual(self.run_request(["hello"])[1], "hi 2\n")
+
+    def test_outdated(self):
+        with patch("src.python_dev_cli.client.get_daemon_version", return_value="other"):
+            with self.assertRaises(DaemonOutdatedError):
+                self.run_request(["hello"])
+        self.process.wait(timeout=10)
+        self.assertFalse(os.path.exists(get_socket_path(self.root)))
+
+    def test_stop(self):
+        self.assertTrue(stop_daemon(self.root))
+        self.assertEqual(self.process.wait(timeout=10), 0)
+        self.assertFalse(stop_daemon(self.root))
+        with self.assertRaises(DaemonError):
+            connect(self.root, start=False)
+
+    def test_peer_other_user(self):
+        with patch("src.python_dev_cli.client.get_peer_uid", return_value=os.getuid() + 1):
+            with self.assertRaisesRegex(DaemonError, "different user"):
+                connect(self.root, start=False)
+
+    def test_slow_client(self):
+        with connect(self.root, start=False) as slow:
+            slow.sendall(b"\0")  # An incomplete request, which must not hold up other clients.
+            start = time.monotonic()
+            self.assertEqual(self.run_request(["hello"])[1], "hello 2\n")
+            self.assertLess(time.monotonic() - start, 2.0)
+
+    def test_stale_socket(self):
+        self.process.kill()
+        self.process.wait()
+        self.assertTrue(os.path.exists(get_socket_path(self.root)))
+        with self.assertRaises(DaemonError):
+            connect(self.root, start=False)
+
+        self.process = self.start_daemon()
+        self.assertEqual(self.run_request(["hello"])[1], "hello 2\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
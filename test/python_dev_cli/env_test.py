@@ -0,0 +1,160 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.cache import ConfigCache
+from src.python_dev_cli.env import EnvError, EnvVars, find_references, validate_env_entry
+
+# A command that prints the time it started, then sleeps; so concurrent commands print nearly the same time.
+print_time: str = "python3 -c 'import time; print(time.time()); time.sleep(0.5)'"
+
+
+class TestEnv(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.cache = ConfigCache(os.path.join(self.root, "pyproject.toml"))
+        self.environ = patch.dict(os.environ)
+        self.environ.start()
+        for name in ["FOO", "BAR", "BAZ"]:
+            os.environ.pop(name, None)
+        self.run = patch("src.python_dev_cli.env.subprocess.run", wraps=subprocess.run)
+        self.mock_run = self.run.start()
+
+    def tearDown(self):
+        self.run.stop()
+        self.environ.stop()
+        self.tmp_dir.cleanup()
+
+    def write_input(self, name, content, age=60):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as file:
+            file.write(content)
+        mtime = time.time() - age  # Files modified in the last few seconds are never trusted.
+        os.utime(path, (mtime, mtime))
+
+    def test_validate_env_entry(self):
+        valid = ["echo foo", {"cmd": "echo foo"}, {"cmd": "echo foo", "ttl": 60, "inputs": ["*.txt"]}]
+        for entry in valid:
+            with self.subTest(entry=entry):
+                validate_env_entry("FOO", entry)
+
+        invalid = [
+            1,
+            ["echo foo"],
+            {},
+            {"cmd": "echo", "bar": 1},
+            {"cmd": "echo", "ttl": -1},
+            {"cmd": "echo", "ttl": True},
+        ]
+        invalid += [{"cmd": "echo", "inputs": "*.txt"}]
+        for entry in invalid:
+            with self.subTest(entry=entry):
+                with self.assertRaises(TypeError):
+                    validate_env_entry("FOO", entry)
+
+    def test_find_references(self):
+        tests = [
+            {"script": "echo $FOO ${BAR}", "names": {"FOO", "BAR"}},
+            {"script": "echo {{ env.FOO }} {{ env['BAR'] }}", "names": {"FOO", "BAR"}},
+            {"script": "echo {{ environment.FOO }} FOO", "names": set()},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                self.assertEqual(find_references([test["script"]]), test["names"])
+
+    def test_lazy(self):
+        env = EnvVars({"FOO": "echo foo", "BAR": "echo bar"})
+        env.prefetch(["echo $HOME"])
+        self.mock_run.assert_not_called()
+
+        self.assertEqual(env["FOO"], "foo")
+        self.assertEqual(env.FOO, "foo")
+        self.assertEqual(env.generated, {"FOO": "foo"})
+        self.assertEqual(env.environ["FOO"], "foo")
+        self.assertNotIn("FOO", os.environ)  # Generated values are never set in the environment of the process.
+        self.assertEqual(self.mock_run.call_count, 1)
+
+        # Other environment variables can be read too.
+        self.assertEqual(env.get("HOME"), os.environ.get("HOME"))
+        self.assertIsNone(env.get("MISSING"))
+        with self.assertRaises(AttributeError):
+            env.MISSING
+
+    def test_override(self):
+        os.environ["FOO"] = "override"
+        env = EnvVars({"FOO": "echo foo"})
+        self.assertEqual(env["FOO"], "override")
+        self.mock_run.assert_not_called()
+
+        # Only variables that were set when the instance was created are overrides, until it is reset.
+        del os.environ["FOO"]
+        env = EnvVars({"FOO": "echo foo"})
+        os.environ["FOO"] = "later"
+        self.assertEqual(env["FOO"], "foo")
+        env.reset()
+        self.assertEqual(env["FOO"], "later")
+        self.assertEqual(env.generated, {})
+
+    def test_isolated(self):
+        first = EnvVars({"FOO": "echo first"})
+        second = EnvVars({"FOO": "echo second"})
+        self.assertEqual((first["FOO"], second["FOO"]), ("first", "second"))
+        self.assertEqual(self.mock_run.call_count, 2)
+
+    def test_cwd(self):
+        env = EnvVars({"FOO": "python3 -c 'import os; print(os.getcwd())'"}, self.cache)
+        self.assertEqual(os.path.realpath(env["FOO"]), os.path.realpath(self.root))
+
+    def test_concurrent(self):
+        env = EnvVars({"FOO": print_time, "BAR": print_time})
+        env.prefetch(["echo $FOO ${BAR}"])
+        self.assertEqual(self.mock_run.call_count, 2)
+        self.assertLess(abs(float(env["FOO"]) - float(env["BAR"])), 0.4)
+
+    def test_error(self):
+        env = EnvVars({"FOO": "python3 -c 'import sys; sys.exit(\"oops\")'", "BAR": "no-such-command-xyz"})
+        for name in ["FOO", "BAR"]:
+            with self.subTest(name=name):
+                with self.assertRaises(EnvError):
+                    env[name]
+                self.assertNotIn(name, env.generated)
+
+    def test_ttl(self):
+        entries = {"FOO": {"cmd": "echo foo", "ttl": 60}, "BAR": "echo bar"}
+        env = EnvVars(entries, self.cache)
+        env.prefetch(["echo $FOO $BAR"])
+        env.save()
+        self.assertEqual(self.mock_run.call_count, 2)
+
+        env = EnvVars(entries, self.cache)
+        env.prefetch(["echo $FOO $BAR"])
+        self.assertEqual(env.generated, {"FOO": "foo", "BAR": "bar"})
+        self.assertEqual(self.mock_run.call_count, 3)  # Only BAR, which has no ttl, is generated again.
+
+        # A changed command is generated again, and so is an expired value.
+        self.assertEqual(EnvVars({"FOO": {"cmd": "echo changed", "ttl": 60}}, self.cache)["FOO"], "changed")
+        with patch("src.python_dev_cli.env.time.time", return_value=time.time() + 120):
+            EnvVars(entries, self.cache).resolve(["FOO"])
+        self.assertEqual(self.mock_run.call_count, 5)
+
+    def test_inputs(self):
+        self.write_input("VERSION", "1")
+        entries = {"FOO": {"cmd": f"cat {os.path.join(self.root, 'VERSION')}", "inputs": ["VERSION"]}}
+        env = EnvVars(entries, self.cache)
+        self.assertEqual(env["FOO"], "1")
+        env.save()
+
+        self.assertEqual(EnvVars(entries, self.cache)["FOO"], "1")
+        self.assertEqual(self.mock_run.call_count, 1)
+
+        self.write_input("VERSION", "22")
+        self.assertEqual(EnvVars(entries, self.cache)["FOO"], "22")
+        self.assertEqual(self.mock_run.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.cache import ConfigCache
+from src.python_dev_cli.executables import ExecutableCache, get_path_key
+
+
+@unittest.skipIf(os.name == "nt", "executables are found using PATHEXT on Windows")
+class TestExecutableCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.bin_dir = os.path.join(self.root, "bin")
+        self.cache = ConfigCache(os.path.join(self.root, "pyproject.toml"))
+        os.makedirs(self.bin_dir)
+        self.add_executable("tool", age=60)
+        self.env = patch.dict(os.environ, {"PATH": self.bin_dir})
+        self.env.start()
+        self.which = patch("src.python_dev_cli.executables.shutil.which", wraps=shutil.which)
+        self.mock_which = self.which.start()
+
+    def tearDown(self):
+        self.which.stop()
+        self.env.stop()
+        self.tmp_dir.cleanup()
+
+    def add_executable(self, name, age):
+        path = os.path.join(self.bin_dir, name)
+        with open(path, "w") as file:
+            file.write("#!/bin/sh\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        mtime = time.time() - age  # Directories modified in the last few seconds are never cached on disk.
+        os.utime(self.bin_dir, (mtime, mtime))
+
+    def test_get_path_key(self):
+        self.assertEqual(get_path_key(), self.bin_dir)
+
+    def test_which(self):
+        executables = ExecutableCache()
+        self.assertEqual(executables.which("tool"), os.path.join(self.bin_dir, "tool"))
+        self.assertEqual(executables.which("tool"), os.path.join(self.bin_dir, "tool"))
+        self.assertIsNone(executables.which("missing"))
+        self.assertIsNone(executables.which("missing"))
+        self.assertEqual(self.mock_which.call_count, 2)
+
+        # Changing PATH invalidates every lookup.
+        with patch.dict(os.environ, {"PATH": os.pathsep.join([self.root, self.bin_dir])}):
+            self.assertEqual(executables.which("tool"), os.path.join(self.bin_dir, "tool"))
+        self.assertEqual(self.mock_which.call_count, 3)
+
+    def test_which_relative_path(self):
+        executables = ExecutableCache()
+        path = os.path.join(self.bin_dir, "tool")
+        self.assertEqual(executables.which(path), path)
+        self.assertEqual(executables.which(path), path)
+        self.assertEqual(self.mock_which.call_count, 2)
+
+        # Relative to the working directory the command runs in, if one is given.
+        self.assertEqual(
+            executables.which(os.path.join(".", "tool"), self.bin_dir), os.path.join(self.bin_dir, ".", "tool")
+        )
+
+    def test_save(self):
+        executables = ExecutableCache(self.cache)
+        executables.which("tool")
+        executables.which("missing")
+        executables.save()
+        self.assertTrue(os.path.isfile(executables.path))
+
+        executables = ExecutableCache(self.cache)
+        self.assertEqual(executables.which("tool"), os.path.join(self.bin_dir, "tool"))
+        self.assertIsNone(executables.which("missing"))
+        self.assertEqual(self.mock_which.call_count, 2)
+
+        # Installing an executable on PATH changes the mtime of its directory, which invalidates the stored lookups.
+        self.add_executable("missing", age=30)
+        executables = ExecutableCache(self.cache)
+        self.assertEqual(executables.which("missing"), os.path.join(self.bin_dir, "missing"))
+        self.assertEqual(self.mock_which.call_count, 3)
+
+    def test_save_recently_modified(self):
+        self.add_executable("other", age=0)
+        executables = ExecutableCache(self.cache)
+        executables.which("tool")
+        executables.save()
+
+        executables = ExecutableCache(self.cache)
+        executables.which("tool")
+        self.assertEqual(self.mock_which.call_count, 2)
+
+    def test_save_without_cache(self):
+        executables = ExecutableCache()
+        executables.which("tool")
+        executables.save()
+        self.assertIsNone(executables.path)
+        self.assertFalse(os.path.exists(os.path.join(self.root, ".python-dev-cli")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from src.python_dev_cli.cache import ConfigCache
+from src.python_dev_cli.fingerprints import FingerprintStore, get_file_hash, match_files
+
+
+class TestFingerprintStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        self.cache = ConfigCache(os.path.join(self.root, "pyproject.toml"))
+        os.makedirs(os.path.join(self.root, "src", "pkg"))
+        self.write("src/pkg/a.py", "a = 1")
+        self.write("src/b.py", "b = 2")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        with open(os.path.join(self.root, path), "w") as file:
+            file.write(content)
+
+    def test_match_files(self):
+        self.assertEqual(
+            match_files(self.root, ["src/**/*.py"]), [os.path.join("src", "b.py"), os.path.join("src", "pkg", "a.py")]
+        )
+        self.assertEqual(match_files(self.root, ["src", "*.txt"]), [])
+
+    def test_get_file_hash(self):
+        self.assertEqual(len(get_file_hash(os.path.join(self.root, "src", "b.py"))), 64)
+
+    def test_check(self):
+        store = FingerprintStore(self.cache)
+        args = ["build", ["echo build"], ["src/**/*.py"], ["dist/*"]]
+        fingerprint = store.check(*args)
+        self.assertEqual(
+            sorted(fingerprint["inputs"]), [os.path.join("src", "b.py"), os.path.join("src", "pkg", "a.py")]
+        )
+        store.update("build", fingerprint)
+        self.assertIsNotNone(store.check(*args))  # The output does not exist yet.
+        os.makedirs(os.path.join(self.root, "dist"))
+        self.write("dist/pkg.whl", "")
+        self.assertIsNone(store.check(*args))
+        self.assertIsNone(FingerprintStore(self.cache).check(*args))  # The fingerprints are persisted.
+        self.assertIsNotNone(store.check("build", ["echo rebuild"], *args[2:]))
+        self.write("src/b.py", "b = 3")
+        self.assertIsNotNone(store.check(*args))
+
+    def test_check_touched(self):
+        store = FingerprintStore(self.cache)
+        store.update("build", store.check("build", ["echo build"], ["src/*.py"], []))
+        os.utime(os.path.join(self.root, "src", "b.py"), (0, 0))
+        self.assertIsNone(store.check("build", ["echo build"], ["src/*.py"], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
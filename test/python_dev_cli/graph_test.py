@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import unittest
+from subprocess import CalledProcessError, CompletedProcess
+
+from src.python_dev_cli.graph import ScriptGraph, ScriptGraphError
+
+
+class TestScriptGraph(unittest.TestCase):
+    def test_add_node(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar"])
+        self.assertIn("foo", graph)
+        self.assertEqual(len(graph), 1)
+        self.assertEqual(graph.get_commands("foo"), ["echo foo"])
+        self.assertEqual(graph.get_dependencies("foo"), {"bar"})
+        self.assertEqual(graph.get_script_key("foo"), "foo")
+        graph.add_node("foo#2", ["echo foo"], ["foo"], "foo")
+        self.assertEqual(graph.get_script_key("foo#2"), "foo")
+
+    def test_topological_order(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar", "baz"])
+        graph.add_node("bar", ["echo bar"], ["baz"])
+        graph.add_node("baz", ["echo baz"])
+        self.assertEqual(graph.topological_order(), ["baz", "bar", "foo"])
+
+    def test_topological_order_cycle(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar"])
+        graph.add_node("bar", ["echo bar"], ["foo"])
+        with self.assertRaises(ScriptGraphError):
+            graph.topological_order()
+
+    def test_topological_order_invalid_dependency(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar"])
+        with self.assertRaises(ScriptGraphError):
+            graph.topological_order()
+
+    def test_is_sequential(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar", "baz"])
+        graph.add_node("bar", ["echo bar"], ["baz"])
+        graph.add_node("baz", ["echo baz"])
+        self.assertTrue(graph.is_sequential())
+
+        graph.add_node("bar", ["echo bar"])  # Now bar and baz can run at the same time.
+        self.assertFalse(graph.is_sequential())
+
+    def test_run(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar", "baz"])
+        graph.add_node("bar", ["echo bar"])
+        graph.add_node("baz", ["echo baz"])
+        lock = threading.Lock()
+        started = []
+
+        def run_node(key, abort):
+            with lock:
+                started.append(key)
+            time.sleep(0.05)
+            return [CompletedProcess(graph.get_commands(key), 0)]
+
+        output = graph.run(run_node, jobs=2)
+        self.assertEqual(sorted(started[:2]), ["bar", "baz"])
+        self.assertEqual(started[2], "foo")
+        self.assertEqual(len(output), 3)
+        self.assertEqual(output[-1].args, ["echo foo"])
+
+    def test_run_fail_fast(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar"])
+        graph.add_node("bar", ["false"])
+        graph.add_node("baz", ["sleep"])
+        aborted = []
+        started = threading.Event()
+
+        def run_node(key, abort):
+            if key == "bar":
+                started.wait(1)
+                raise CalledProcessError(1, ["false"])
+            started.set()
+            abort.wait(1)
+            aborted.append(abort.is_set())
+            return []
+
+        with self.assertRaises(CalledProcessError):
+            graph.run(run_node, jobs=2)
+        self.assertEqual(aborted, [True])
+
+
+class TestScriptGraphAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_run_async(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["echo foo"], ["bar", "baz"])
+        graph.add_node("bar", ["echo bar"])
+        graph.add_node("baz", ["echo baz"])
+        started = []
+
+        async def run_node(key):
+            started.append(key)
+            await asyncio.sleep(0.01)
+            return [CompletedProcess(graph.get_commands(key), 0)]
+
+        output = await graph.run_async(run_node)
+        self.assertEqual(sorted(started[:2]), ["bar", "baz"])
+        self.assertEqual(started[2], "foo")
+        self.assertEqual(output[-1].args, ["echo foo"])
+
+    async def test_run_async_fail_fast(self):
+        graph = ScriptGraph()
+        graph.add_node("foo", ["false"])
+        graph.add_node("bar", ["sleep"])
+        cancelled = []
+
+        async def run_node(key):
+            if key == "foo":
+                await asyncio.sleep(0.01)
+                raise CalledProcessError(1, ["false"])
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(key)
+                raise
+
+        with self.assertRaises(CalledProcessError):
+            await graph.run_async(run_node)
+        self.assertEqual(cancelled, ["bar"])
+
+
+if __name__ == "__main__":
+    unittest.main()
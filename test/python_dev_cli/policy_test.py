@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli.policy import ScriptPolicy, parse_size, validate_policy
+
+
+class TestPolicy(unittest.TestCase):
+    def test_parse_size(self):
+        tests = [
+            {"value": 512, "expected": 512},
+            {"value": "512", "expected": 512},
+            {"value": "64k", "expected": 64 * 1024},
+            {"value": "512M", "expected": 512 * 1024**2},
+            {"value": " 2GB ", "expected": 2 * 1024**3},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                self.assertEqual(parse_size(test["value"]), test["expected"])
+
+    def test_parse_size_invalid(self):
+        for value in [0, -1, True, 1.5, "", "0M", "2T", "M", "1.5G"]:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_size(value)
+
+    def test_validate_policy(self):
+        validate_policy("foo", {"cmd": ["bar"]})
+        validate_policy(
+            "foo",
+            {"cmd": "echo", "timeout": 1.5, "retries": 0, "retry_delay": 0, "nice": -1, "cpu_affinity": [0, 1]},
+        )
+        tests = [
+            {"cmd": ["bar"], "timeout": 10},
+            {"cmd": "echo", "timeout": True},
+            {"cmd": "echo", "retries": 1.0},
+            {"cmd": "echo", "retry_delay": -1},
+            {"cmd": "echo", "nice": "10"},
+            {"cmd": "echo", "cpu_affinity": 0},
+            {"cmd": "echo", "cpu_affinity": [-1]},
+            {"cmd": "echo", "memory_limit": 0},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                with self.assertRaises(TypeError):
+                    validate_policy("foo", test)
+
+    def test_from_table(self):
+        policy = ScriptPolicy.from_table({"cmd": "echo", "retries": 3, "retry_delay": 0.5, "memory_limit": "1M"})
+        self.assertEqual(policy, ScriptPolicy(retries=3, retry_delay=0.5, memory_limit=1024**2))
+        self.assertTrue(policy.limited)
+        self.assertFalse(ScriptPolicy.from_table({"cmd": "echo", "nice": 0}).limited)
+
+    def test_get_delay(self):
+        policy = ScriptPolicy(retries=3, retry_delay=0.5)
+        self.assertEqual([policy.get_delay(attempt) for attempt in range(3)], [0.5, 1.0, 2.0])
+
+    def test_get_kwargs(self):
+        self.assertEqual(ScriptPolicy().get_kwargs(), {})
+        self.assertEqual(ScriptPolicy(retries=3).get_kwargs(), {})
+        self.assertEqual(ScriptPolicy(timeout=10).get_kwargs().get("timeout"), 10)
+
+    @unittest.skipUnless(os.name == "posix", "process groups and resource limits are only supported on POSIX systems")
+    def test_get_kwargs_limits(self):
+        policy = ScriptPolicy(timeout=10, nice=5, cpu_affinity=[0], memory_limit=1024)
+        self.assertEqual(policy.get_kwargs(), {"timeout": 10, "on_start": policy.apply_limits, "process_group": 0})
+
+    @patch("src.python_dev_cli.policy.os.name", "nt")
+    def test_get_kwargs_limits_unsupported(self):
+        self.assertEqual(ScriptPolicy(timeout=10, nice=5).get_kwargs(), {"timeout": 10})
+
+    @unittest.skipUnless(hasattr(os, "sched_setaffinity"), "sched_setaffinity is not available")
+    def test_apply_limits(self):
+        import resource  # Only available on POSIX systems.
+
+        cpu = sorted(os.sched_getaffinity(0))[0]
+        policy = ScriptPolicy(nice=2, cpu_affinity=[cpu], memory_limit=2**30)
+        with subprocess.Popen([sys.executable, "-c", "import time; time.sleep(10)"]) as process:
+            try:
+                policy.apply_limits(process.pid)
+                self.assertEqual(os.getpriority(os.PRIO_PROCESS, process.pid), os.getpriority(os.PRIO_PROCESS, 0) + 2)
+                self.assertEqual(os.sched_getaffinity(process.pid), {cpu})
+                self.assertEqual(resource.prlimit(process.pid, resource.RLIMIT_AS), (2**30, 2**30))
+            finally:
+                process.kill()
+
+    @patch("src.python_dev_cli.policy.os.setpriority", autospec=True, side_effect=PermissionError("not permitted"))
+    @patch("src.python_dev_cli.policy.os.getpriority", autospec=True, return_value=0)
+    def test_apply_limits_error(self, mock_getpriority, mock_setpriority):
+        with self.assertLogs("src.python_dev_cli.policy", "WARNING"):
+            ScriptPolicy(nice=-5).apply_limits(12345)
+        mock_setpriority.side_effect = ProcessLookupError()
+        with self.assertNoLogs("src.python_dev_cli.policy", "WARNING"):
+            ScriptPolicy(nice=-5).apply_limits(12345)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import io
+import os
+import unittest
+from subprocess import CalledProcessError
+from unittest.mock import patch
+
+from src.python_dev_cli.async_runner import run_call_async
+from src.python_dev_cli.calls import Call
+from src.python_dev_cli.pool import WorkerPool
+
+# The module of the functions called by these tests.
+module: str = "test.python_dev_cli.calls_test"
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(2, ["json", module])
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_run(self):
+        self.assertFalse(self.pool.started)
+        pids = {int(self.pool.run(Call(module, "print_pid"), capture_output=True).stdout) for _ in range(6)}
+        self.assertTrue(self.pool.started)
+        self.assertNotIn(os.getpid(), pids)
+        self.assertLessEqual(len(pids), 2)
+
+        with self.assertRaises(CalledProcessError):
+            self.pool.run(Call(module, "fail"), capture_output=True, check=True)
+
+    def test_preload(self):
+        result = self.pool.run(Call(module, "print_modules", ["json", "json.tool", "csv"]), capture_output=True)
+        self.assertEqual(result.stdout.split(), [b"json"])
+
+    def test_environment(self):
+        self.pool.run(Call(module, "print_pid"), capture_output=True)  # Starts the pool.
+        with patch.dict(os.environ, {"GREETING_SUFFIX": "!"}):
+            result = self.pool.run(Call(module, "greet"), capture_output=True)
+        self.assertEqual(result.stderr, b"!\n")
+
+    def test_broken(self):
+        with self.assertRaises(CalledProcessError) as cm:
+            self.pool.run(Call(module, "exit_now"), capture_output=True, check=True)
+        self.assertEqual(cm.exception.cmd, [module])
+        self.assertIn(b"Worker process died", cm.exception.stderr)
+        self.assertFalse(self.pool.started)
+        self.assertEqual(self.pool.run(Call(module, "greet"), capture_output=True).stdout, b"hello\n")
+
+        with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            result = self.pool.run(Call(module, "exit_now"))
+        self.assertEqual((result.returncode, result.stdout, result.stderr), (1, None, None))
+        self.assertIn("Worker process died", stderr.getvalue())
+
+    def test_broken_async(self):
+        out, err = io.StringIO(), io.StringIO()
+        with self.assertRaises(CalledProcessError):
+            asyncio.run(
+                run_call_async(Call(module, "exit_now"), "[x] ", out_stream=out, err_stream=err, pool=self.pool)
+            )
+        self.assertTrue(err.getvalue().startswith("[x] Worker process died"))
+        self.assertFalse(self.pool.started)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from subprocess import CompletedProcess
+from unittest.mock import patch
+
+from src.python_dev_cli.results import ResultCache, get_result_key
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "project")
+        self.results = ResultCache(os.path.join(self.tmp_dir.name, "results"))
+        os.makedirs(os.path.join(self.root, "dist"))
+        self.write("dist/app", "#!/bin/sh\n")
+        os.chmod(os.path.join(self.root, "dist", "app"), 0o755)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        with open(os.path.join(self.root, path), "w") as file:
+            file.write(content)
+
+    def expire_objects(self):
+        for prefix in os.listdir(self.results.objects_dir):
+            for name in os.listdir(os.path.join(self.results.objects_dir, prefix)):
+                os.utime(os.path.join(self.results.objects_dir, prefix, name), (0, 0))
+
+    def test_get_result_key(self):
+        key = get_result_key(["echo build"], {"src/a.py": "abc"}, ["dist/*"], {"CI": None})
+        self.assertEqual(len(key), 64)
+        self.assertEqual(key, get_result_key(["echo build"], {"src/a.py": "abc"}, ["dist/*"], {"CI": None}))
+        self.assertNotEqual(key, get_result_key(["echo build"], {"src/a.py": "abd"}, ["dist/*"], {"CI": None}))
+        self.assertNotEqual(key, get_result_key(["echo build"], {"src/a.py": "abc"}, ["dist/*"], {"CI": "1"}))
+        self.assertNotEqual(key, get_result_key(["echo test"], {"src/a.py": "abc"}, ["dist/*"], {"CI": None}))
+
+    def test_put_and_restore(self):
+        self.assertIsNone(self.results.get("key"))
+        process = CompletedProcess(["build"], 0, b"built\n", "")
+        self.results.put("key", [process], self.root, [os.path.join("dist", "app")])
+        os.remove(os.path.join(self.root, "dist", "app"))
+        manifest = self.results.get("key")
+        self.assertEqual(self.results.read(manifest["processes"][0]["stdout"]), b"built\n")
+        self.assertEqual(self.results.read(manifest["processes"][0]["stderr"]), b"")
+        self.results.restore(manifest, self.root)
+        with open(os.path.join(self.root, "dist", "app")) as file:
+            self.assertEqual(file.read(), "#!/bin/sh\n")
+        self.assertTrue(os.access(os.path.join(self.root, "dist", "app"), os.X_OK))
+
+    def test_get_missing_object(self):
+        self.results.put("key", [CompletedProcess(["build"], 0, b"built\n", b"")], self.root, [])
+        for prefix in os.listdir(self.results.objects_dir):
+            for name in os.listdir(os.path.join(self.results.objects_dir, prefix)):
+                os.remove(os.path.join(self.results.objects_dir, prefix, name))
+        self.assertIsNone(self.results.get("key"))
+
+    def test_evict(self):
+        for i in range(3):
+            self.write(f"dist/{i}.bin", str(i) * 1000)
+            os.utime(os.path.join(self.root, "dist", f"{i}.bin"))
+            self.results.put(str(i), [CompletedProcess(["build"], 0, b"", b"")], self.root, [f"dist/{i}.bin"])
+            path = os.path.join(self.results.results_dir, f"{i}.json")
+            os.utime(path, (i, i))  # Make the order of use explicit, as mtimes can be too coarse.
+        self.expire_objects()
+        self.results.get("0")  # Marks the first result as the most recently used.
+        self.results.max_size = 2000
+        self.assertEqual(self.results.evict(), 1000)
+        self.assertIsNotNone(self.results.get("0"))
+        self.assertIsNone(self.results.get("1"))
+        self.assertIsNotNone(self.results.get("2"))
+        self.assertEqual(self.results.evict(), 0)
+
+    def test_evict_recent_objects(self):
+        self.write("dist/0.bin", "0" * 1000)
+        self.results.put("0", [CompletedProcess(["build"], 0, b"", b"")], self.root, ["dist/0.bin"])
+        os.remove(os.path.join(self.results.results_dir, "0.json"))  # As if a concurrent put() had not finished.
+        self.results.max_size = 0
+        self.assertEqual(self.results.evict(), 0)
+        self.expire_objects()
+        self.assertEqual(self.results.evict(), 1000)
+
+    def test_put_concurrent(self):
+        process = CompletedProcess(["build"], 0, b"built\n", b"")
+        threads = [threading.Thread(target=self.results.put, args=(str(i), [process], self.root, [])) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(8):
+            self.assertIsNotNone(self.results.get(str(i)))
+
+    def test_restore_invalid_path(self):
+        self.results.put("key", [CompletedProcess(["build"], 0, b"", b"")], self.root, ["dist/app"])
+        manifest = self.results.get("key")
+        for path in ["../app", "dist/../../app", os.path.abspath("app"), "", "."]:
+            with self.subTest(path=path):
+                invalid = {**manifest, "outputs": {path: manifest["outputs"]["dist/app"]}}
+                with self.assertRaises(OSError):
+                    self.results.restore(invalid, self.root)
+                with open(os.path.join(self.results.results_dir, "invalid.json"), "w") as file:
+                    json.dump(invalid, file)
+                self.assertIsNone(self.results.get("invalid"))
+
+    def test_invalid_digest(self):
+        self.results.put("key", [CompletedProcess(["build"], 0, b"", b"")], self.root, ["dist/app"])
+        manifest = self.results.get("key")
+        secret = os.path.join(self.tmp_dir.name, "secret")
+        with open(secret, "w") as file:
+            file.write("secret")
+        for digest in ["../../secret", "A" * 64, "0" * 63, 1]:
+            with self.subTest(digest=digest):
+                invalid = {**manifest, "outputs": {"dist/app": [digest, 0o644]}}
+                with self.assertRaises(OSError):
+                    self.results.restore(invalid, self.root)
+                with open(os.path.join(self.results.results_dir, "invalid.json"), "w") as file:
+                    json.dump(invalid, file)
+                self.assertIsNone(self.results.get("invalid"))
+
+    def test_restore_mode(self):
+        self.results.put("key", [CompletedProcess(["build"], 0, b"", b"")], self.root, ["dist/app"])
+        manifest = self.results.get("key")
+        self.assertEqual(manifest["outputs"]["dist/app"][1], 0o755)
+        digest = manifest["outputs"]["dist/app"][0]
+        umask = os.umask(0o027)
+        try:
+            self.results.restore({**manifest, "outputs": {"dist/app": [digest, 0o6777]}}, self.root)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(os.path.join(self.root, "dist", "app")).st_mode & 0o7777, 0o750)
+
+    def test_put_evicts_over_limit(self):
+        process = CompletedProcess(["build"], 0, b"built\n", b"")
+        with patch.object(ResultCache, "evict", autospec=True, side_effect=ResultCache.evict) as mock_evict:
+            for i in range(3):
+                self.results.put(str(i), [process], self.root, [])
+            self.assertEqual(mock_evict.call_count, 1)  # Only the first put() scans the cache.
+            self.results.max_size = 10
+            self.write("dist/big.bin", "x" * 100)
+            self.results.put("big", [process], self.root, ["dist/big.bin"])
+            self.assertEqual(mock_evict.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
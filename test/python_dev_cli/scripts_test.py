@@ -1,7 +1,18 @@
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
 import unittest
+from subprocess import CalledProcessError, TimeoutExpired, run
 from unittest.mock import patch, MagicMock
 
-from src.python_dev_cli.scripts import Scripts
+from src.python_dev_cli.cache import ConfigCache
+from src.python_dev_cli.policy import ScriptPolicy
+from src.python_dev_cli.scripts import ScriptReferenceError, Scripts, ScriptTemplateError
+from src.python_dev_cli.settings import Settings
 
 
 @patch("src.python_dev_cli.settings.Settings", autospec=True)
@@ -24,6 +35,46 @@ class TestScripts(unittest.TestCase):
         scripts["foo"] = "echo foo"
         self.assertEqual(scripts["foo"], "echo foo")
 
+    def test_setitem_table(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings)
+        scripts["foo"] = {"cmd": ["bar", "baz"], "parallel": True, "depends_on": ["qux"]}
+        self.assertEqual(scripts["foo"], {"cmd": ["bar", "baz"], "parallel": True, "depends_on": ["qux"]})
+
+    def test_setitem_invalid_table(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings)
+        tests = [
+            {"depends_on": ["bar"]},
+            {"cmd": 1},
+            {"cmd": ["bar", 1]},
+            {"cmd": "echo foo", "depends_on": "bar"},
+            {"cmd": "echo foo", "parallel": "yes"},
+            {"cmd": "echo foo", "unknown": True},
+            {"cmd": "echo foo", "inputs": "*.py"},
+            {"cmd": "echo foo", "outputs": [1]},
+            {"cmd": "echo foo", "cache": True},
+            {"cmd": "echo foo", "inputs": ["*.py"], "cache": "yes"},
+            {"cmd": "echo foo", "inputs": ["*.py"], "cache": True, "cache_env": "CI"},
+            {"cmd": "echo foo", "args": ["bar"]},
+            {"cmd": "echo foo", "call": "json.tool"},
+            {"call": "json.tool as tool"},
+            {"call": "not a module"},
+            {"call": 1},
+            {"call": "json.tool", "args": "bar"},
+            {"cmd": ["bar"], "retries": 1},
+            {"cmd": "echo foo", "timeout": 0},
+            {"cmd": "echo foo", "retries": -1},
+            {"cmd": "echo foo", "retry_delay": "1s"},
+            {"cmd": "echo foo", "nice": 1.5},
+            {"cmd": "echo foo", "cpu_affinity": []},
+            {"cmd": "echo foo", "memory_limit": "2T"},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                with self.assertRaises(TypeError):
+                    scripts["foo"] = test
+
     def test_setitem_invalid_key(self, mock_settings):
         settings = mock_settings()
         scripts = Scripts(settings)
@@ -63,12 +114,37 @@ class TestScripts(unittest.TestCase):
         settings = mock_settings()
         key = settings.script_refs
         scripts = Scripts(settings)
-        self.assertEqual(scripts._context, {str(key): {}})
+        self.assertEqual(scripts._context, {str(key): {}, "env": scripts.env})
         scripts["foo"] = "echo foo"
-        self.assertEqual(scripts._context, {str(key): {"foo": "echo foo"}})
+        self.assertEqual(scripts._context, {str(key): {"foo": "echo foo"}, "env": scripts.env})
+
+    def test_context_settings_changed(self, mock_settings):
+        settings = Settings()
+        scripts = Scripts(settings)
+        self.assertNotIn("os", scripts._context.keys())
         settings.include = ["os"]
         self.assertTrue("os" in scripts._context.keys())
 
+    def test_context_not_rebuilt(self, mock_settings):
+        settings = Settings(include=["os"])
+        scripts = Scripts(settings, foo="echo foo")
+        context = scripts._context
+        self.assertIs(scripts._context, context)
+        scripts["bar"] = "echo bar"
+        self.assertIsNot(scripts._context, context)
+
+    def test_version(self, mock_settings):
+        settings = Settings()
+        scripts = Scripts(settings)
+        versions = [scripts.version]
+        scripts["foo"] = "echo foo"
+        versions.append(scripts.version)
+        settings.parse_help = False
+        versions.append(scripts.version)
+        del scripts["foo"]
+        versions.append(scripts.version)
+        self.assertEqual(versions, sorted(set(versions)))
+
     @patch("src.python_dev_cli.settings.Settings.from_config", autospec=True)
     def test_from_config(self, mock_settings_from_config, mock_settings):
         mock_settings_from_config.return_value = mock_settings()
@@ -78,6 +154,34 @@ class TestScripts(unittest.TestCase):
         self.assertEqual(scripts["foo"], "echo foo")
         self.assertEqual(scripts["bar"], "echo bar")
 
+    def test_from_config_cache(self, mock_settings):
+        cache = MagicMock()
+        cache.get_config.return_value = {"tool": {"python-dev-cli": {"scripts": {"foo": "echo foo", "bar": ["foo"]}}}}
+        cache.get_resolved.return_value = None
+        cache.get_rendered.return_value = None
+        scripts = Scripts.from_config(cache=cache)
+        self.assertIs(scripts.cache, cache)
+        self.assertEqual(scripts.get_script_command("bar"), ["echo foo"])
+        cache.set_resolved.assert_called_once_with("bar", ["foo"])
+        cache.get_resolved.return_value = ["foo", "foo"]
+        self.assertEqual(scripts.get_script_command("bar"), ["echo foo", "echo foo"])
+        scripts["baz"] = "echo baz"
+        self.assertIsNone(scripts.cache)
+
+    def test_cache_settings_changed(self, mock_settings):
+        settings = Settings()
+        scripts = Scripts(settings, foo="echo foo")
+        scripts.cache = MagicMock()
+        self.assertIsNotNone(scripts.cache)
+        settings.script_refs = "scripts"
+        self.assertIsNone(scripts.cache)
+
+    def test_from_config_cache_ignored(self, mock_settings):
+        cache = MagicMock()
+        scripts = Scripts.from_config({"tool": {"python-dev-cli": {"scripts": {"foo": "echo foo"}}}}, cache=cache)
+        self.assertIsNone(scripts.cache)
+        cache.get_config.assert_not_called()
+
     @patch("src.python_dev_cli.settings.Settings.from_config", autospec=True)
     def test_from_config_invalid_config(self, mock_settings_from_config, mock_settings):
         mock_settings_from_config.return_value = mock_settings()
@@ -111,6 +215,110 @@ class TestScripts(unittest.TestCase):
                 scripts[test["key"]] = test["value"]
                 self.assertEqual(scripts.get_script_command(test["key"]), test["expected"])
 
+    def test_get_script_command_table(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo", bar="echo bar")
+        tests = [
+            {"value": {"cmd": "echo {{ 2 + 2 }}"}, "expected": ["echo 4"]},
+            {"value": {"cmd": ["foo", "bar"], "parallel": True}, "expected": ["echo foo", "echo bar"]},
+            {"value": {"cmd": "echo baz", "depends_on": ["foo"]}, "expected": ["echo foo", "echo baz"]},
+            {"value": {"cmd": ["bar"], "depends_on": ["foo"]}, "expected": ["echo foo", "echo bar"]},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                scripts["baz"] = test["value"]
+                self.assertEqual(scripts.get_script_command("baz"), test["expected"])
+
+    def test_get_script_graph(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo", bar="echo bar", baz=["foo", "bar"])
+        scripts["par"] = {"cmd": ["foo", "baz"], "parallel": True, "depends_on": ["qux"]}
+        scripts["qux"] = {"cmd": "echo qux"}
+        scripts["all"] = ["par", "bar"]
+        graph = scripts.get_script_graph("all")
+        self.assertEqual(sorted(graph), ["all", "bar", "baz", "foo", "par", "qux"])
+        self.assertEqual(graph.get_commands("par"), [])
+        self.assertEqual(graph.get_commands("baz"), ["echo foo", "echo bar"])
+        self.assertEqual(graph.get_dependencies("par"), {"foo", "baz", "qux"})
+        self.assertEqual(graph.get_dependencies("foo"), {"qux"})
+        self.assertEqual(graph.get_dependencies("bar"), {"par"})
+        self.assertEqual(graph.get_dependencies("all"), {"par", "bar"})
+
+    def test_get_script_graph_repeated(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, fmt="echo fmt", lint="echo lint")
+        scripts["test"] = {"cmd": "echo test", "retries": 1, "depends_on": ["lint"]}
+        scripts["par"] = {"cmd": ["fmt", "fmt", "lint"], "parallel": True}
+        scripts["all"] = ["fmt", "test", "fmt", "par"]
+        graph = scripts.get_script_graph("all")
+        self.assertEqual(sorted(graph), ["all", "fmt", "fmt#2", "fmt#3", "lint", "lint#2", "par", "test"])
+        self.assertEqual(graph.get_script_key("fmt#3"), "fmt")
+        self.assertEqual(graph.get_dependencies("test"), {"fmt", "lint#2"})
+        self.assertEqual(graph.get_dependencies("fmt#2"), {"test"})
+        self.assertEqual(graph.get_dependencies("par"), {"fmt#2", "fmt#3", "lint"})
+        self.assertEqual(graph.get_dependencies("fmt#3"), {"fmt#2"})
+        result = scripts.run_script("all", jobs=1, capture_output=True)
+        outputs = [res.stdout.decode().strip() for res in result]
+        self.assertEqual((sorted(outputs[:2]), outputs[2:4]), (["fmt", "lint"], ["test", "fmt"]))
+        self.assertEqual(sorted(res.stdout.decode().strip() for res in result[4:]), ["fmt", "lint"])
+
+    def test_get_script_graph_circular_reference(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo=["bar", "baz"], bar=["foo"])
+        scripts["baz"] = {"cmd": "echo baz", "retries": 1}
+        with self.assertRaises(ScriptReferenceError):
+            scripts.get_script_graph("foo")
+
+    def test_get_script_references(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo", bar=["foo"])
+        scripts["baz"] = {"cmd": ["bar"], "depends_on": ["foo"]}
+        scripts["qux"] = {"cmd": "echo qux", "depends_on": ["foo"]}
+        self.assertEqual(scripts.get_script_references("foo"), [])
+        self.assertEqual(scripts.get_script_references("bar"), ["foo"])
+        self.assertEqual(scripts.get_script_references("baz"), ["foo", "bar"])
+        self.assertEqual(scripts.get_script_references("qux"), ["foo"])
+
+    def test_get_script_command_circular_reference(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo")
+        tests = [
+            {"scripts": {"bar": ["bar"]}, "expected": "bar -> bar"},
+            {"scripts": {"bar": ["foo", "baz"], "baz": ["qux"], "qux": ["baz"]}, "expected": "baz -> qux -> baz"},
+            {
+                "scripts": {"bar": {"cmd": "echo bar", "depends_on": ["baz"]}, "baz": ["bar"]},
+                "expected": "bar -> baz -> bar",
+            },
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                for key, value in test["scripts"].items():
+                    scripts[key] = value
+                with self.assertRaises(ScriptReferenceError) as context:
+                    scripts.get_script_command("bar")
+                self.assertIn(test["expected"], str(context.exception))
+
+    def test_get_script_command_circular_template(self, mock_settings):
+        settings = Settings()
+        scripts = Scripts(settings, foo="{{ dev.bar }}", bar="{{ dev.foo }}")
+        with self.assertRaises(ScriptTemplateError):
+            scripts.get_script_command("foo")
+
+    def test_get_script_command_deeply_nested(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, list_0="echo foo")
+        for i in range(1, 5000):
+            scripts[f"list_{i}"] = [f"list_{i - 1}", f"list_{i - 1}"] if i == 4999 else [f"list_{i - 1}"]
+        self.assertEqual(scripts.get_script_command("list_4999"), ["echo foo", "echo foo"])
+
+    def test_get_script_command_shared_references(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo", bar="echo bar", lint=["foo", "bar"])
+        scripts["check"] = ["lint", "lint"]
+        self.assertEqual(scripts.get_script_command("check"), ["echo foo", "echo bar", "echo foo", "echo bar"])
+        scripts["lint"] = ["bar"]
+        self.assertEqual(scripts.get_script_command("check"), ["echo bar", "echo bar"])
+
     def test_get_script_command_invalid_key(self, mock_settings):
         settings = mock_settings()
         scripts = Scripts(settings)
@@ -148,6 +356,20 @@ class TestScripts(unittest.TestCase):
                 self.assertEqual(mock_uuid.call_count, test["expected_call_count"])
                 mock_uuid.reset_mock()
 
+    def test_get_script_command_rendered_cache(self, mock_settings):
+        settings = mock_settings()
+        settings.script_refs = "dev"
+        settings.include = ["uuid:uuid4 as uuid"]
+        scripts = Scripts(settings, foo="echo foo", bar="echo {{ dev.foo }}", baz="echo {{ uuid() }}")
+        scripts.cache = MagicMock(get_rendered=MagicMock(return_value=None))
+        self.assertEqual(scripts.get_script_command("bar"), ["echo echo foo"])
+        scripts.cache.set_rendered.assert_called_once_with("echo {{ dev.foo }}", "echo echo foo")
+        scripts.cache.set_rendered.reset_mock()
+        scripts.get_script_command("baz")
+        scripts.cache.set_rendered.assert_not_called()
+        scripts.cache.get_rendered.return_value = "echo cached"
+        self.assertEqual(scripts.get_script_command("bar"), ["echo cached"])
+
     def test_get_script_help(self, mock_settings):
         settings = mock_settings()
         scripts = Scripts(settings)
@@ -167,6 +389,19 @@ class TestScripts(unittest.TestCase):
                 scripts.get_script_command.assert_called_once_with("foo", parse=test["expected"])
                 scripts.get_script_command.reset_mock()
 
+    def test_preload_executables(self, mock_settings):
+        settings = mock_settings()
+        settings.enable_templates = True
+        scripts = Scripts(
+            settings, foo="echo foo", bar="python3 -c 'print(1)'", baz="{{ dev.foo }}", all=["foo", "bar"]
+        )
+        with patch("src.python_dev_cli.executables.shutil.which", wraps=shutil.which) as mock_which:
+            scripts.preload_executables()
+            self.assertEqual(sorted(call.args[0] for call in mock_which.call_args_list), ["echo", "python3"])
+            result = scripts.run_script("all", capture_output=True, check=False)
+            self.assertEqual(mock_which.call_count, 2)
+        self.assertEqual([res.args[0] for res in result], [shutil.which("echo"), shutil.which("python3")])
+
     @patch("uuid.uuid4", autospec=True)
     @patch("os.getenv", autospec=True)
     @patch("os.getcwd", autospec=True)
@@ -195,6 +430,263 @@ class TestScripts(unittest.TestCase):
                 for i, res in enumerate(result):
                     self.assertEqual(res.stdout.decode().strip(), expected[i])
 
+    @patch.dict(os.environ, {"GREETING": "hello  world"})
+    def test_run_script_env_with_spaces(self, mock_settings):
+        settings = mock_settings()
+        settings.enable_templates = True
+        scripts = Scripts(settings, foo="python3 -c 'import sys; print(sys.argv[1:])' $GREETING")
+        result = scripts.run_script("foo", capture_output=True)
+        self.assertEqual(result[0].stdout.decode().strip(), "['hello  world']")
+        self.assertEqual(
+            scripts.get_script_command("foo"), ["python3 -c 'import sys; print(sys.argv[1:])' hello  world"]
+        )
+
+    def test_env(self, mock_settings):
+        config = {
+            "tool": {
+                "python-dev-cli": {
+                    "settings": {"enable_templates": True},
+                    "scripts": {"foo": "echo $FOO_SHA", "bar": "echo {{ env.BAR_SHA }}", "baz": "echo baz"},
+                    "env": {"FOO_SHA": "echo foo", "BAR_SHA": "echo bar", "BAZ_SHA": "echo baz"},
+                }
+            }
+        }
+        with patch.dict(os.environ), patch("src.python_dev_cli.env.subprocess.run", wraps=run) as mock_run:
+            for name in ["FOO_SHA", "BAR_SHA", "BAZ_SHA"]:
+                os.environ.pop(name, None)
+            scripts = Scripts.from_config(config)
+            self.assertEqual(scripts.get_script_command("baz"), ["echo baz"])
+            # Resolving a script for its help, or to preload it, never generates the variables it references.
+            self.assertEqual(scripts.get_script_help("foo"), ["echo $FOO_SHA"])
+            scripts.preload_executables()
+            mock_run.assert_not_called()
+            self.assertEqual(scripts.run_script("foo", capture_output=True)[0].stdout, b"foo\n")
+            self.assertEqual(mock_run.call_count, 1)
+            self.assertEqual(scripts.get_script_command("foo"), ["echo foo"])
+            self.assertEqual(scripts.get_script_command("bar"), ["echo bar"])  # Templates use them directly.
+            self.assertEqual(mock_run.call_count, 2)
+
+    def test_env_isolated(self, mock_settings):
+        def make_config(value):
+            script = "python3 -c 'import os, sys; print(os.environ[\"FOO_SHA\"], *sys.argv[1:])' $FOO_SHA"
+            return {"tool": {"python-dev-cli": {"scripts": {"foo": script}, "env": {"FOO_SHA": f"echo {value}"}}}}
+
+        with patch.dict(os.environ):
+            os.environ.pop("FOO_SHA", None)
+            first, second = Scripts.from_config(make_config("first")), Scripts.from_config(make_config("second"))
+            # Generated values are passed to commands, but never set in the environment of the process.
+            self.assertEqual(first.run_script("foo", capture_output=True)[0].stdout, b"first first\n")
+            self.assertEqual(second.run_script("foo", capture_output=True)[0].stdout, b"second second\n")
+            self.assertNotIn("FOO_SHA", os.environ)
+
+    def test_run_script_streamed(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="python3 -c 'print(\"x\" * 1000)'", bar="echo bar", all=["foo", "bar"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, "all.log")
+            with open(log_file, "w") as f:
+                f.write("old output\n")
+            result = scripts.run_script("all", tail_size=10, log_file=log_file)
+            with open(log_file, "r") as f:
+                self.assertEqual(f.read(), "x" * 1000 + "\nbar\n")
+        self.assertEqual([res.stdout for res in result], [b"x" * 9 + b"\n", b"bar\n"])
+        self.assertEqual([res.truncated for res in result], [True, False])
+        self.assertTrue(all(res.duration > 0 for res in result))
+
+        scripts["fail"] = "python3 -c 'import sys; sys.exit(\"oops\")'"
+        with self.assertRaises(CalledProcessError) as cm:
+            scripts.run_script("fail", tail_size=1024)
+        self.assertEqual(cm.exception.stderr, b"oops\n")
+
+        with self.assertRaises(ValueError):
+            scripts.run_script("foo", tail_size=10, capture_output=True)
+
+    def test_run_script_parallel(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo", bar="echo bar", baz="echo baz")
+        scripts["par"] = {"cmd": ["foo", "bar"], "parallel": True, "depends_on": ["baz"]}
+        result = scripts.run_script("par", jobs=2, capture_output=True)
+        outputs = [res.stdout.decode().strip() for res in result]
+        self.assertEqual(outputs[0], "baz")
+        self.assertEqual(sorted(outputs[1:]), ["bar", "foo"])
+
+    def test_run_script_parallel_fail_fast(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="python3 -c 'import sys; sys.exit(1)'", bar="echo bar", baz="echo baz")
+        scripts["par"] = {"cmd": ["foo", "bar"], "parallel": True}
+        scripts["all"] = ["par", "baz"]
+        with patch("src.python_dev_cli.scripts.run", wraps=run) as mock_run:
+            with self.assertRaises(CalledProcessError):
+                scripts.run_script("all", jobs=1, capture_output=True)
+            self.assertNotIn("baz", [call.args[0][-1] for call in mock_run.call_args_list])
+
+    def test_run_script_incremental(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo")
+        scripts["gen"] = {"cmd": "echo gen", "inputs": ["*.txt"], "outputs": ["*.txt"]}
+        scripts["all"] = ["foo", "gen"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "input.txt")
+            with open(input_path, "w") as file:
+                file.write("foo")
+            scripts.cache = ConfigCache(os.path.join(tmp_dir, "pyproject.toml"))
+            self.assertEqual(len(scripts.run_script("all", capture_output=True)), 2)
+            self.assertEqual(len(scripts.run_script("all", capture_output=True)), 1)
+            with open(input_path, "w") as file:
+                file.write("bar")
+            self.assertEqual(len(scripts.run_script("gen", capture_output=True)), 1)
+            self.assertEqual(scripts.run_script("gen", capture_output=True), [])
+            scripts.cache = None
+            self.assertEqual(len(scripts.run_script("gen", capture_output=True)), 1)
+
+    def test_run_script_result_cache(self, mock_settings):
+        code = "import sys; open('runs.log', 'a').write('x'); open('out.txt', 'w').write(sys.argv[1]); print('built')"
+        scripts = Scripts(Settings())
+        scripts["gen"] = {"cmd": f'{sys.executable} -c "{code}" {{{{ 1 + 1 }}}}', "inputs": ["*.in"], "cache": True}
+        scripts["gen"]["outputs"] = ["out.txt"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            def write(path, content):
+                with open(os.path.join(tmp_dir, path), "w") as file:
+                    file.write(content)
+
+            def read(path):
+                with open(os.path.join(tmp_dir, path)) as file:
+                    return file.read()
+
+            write("pyproject.toml", "")
+            scripts.cache = ConfigCache(os.path.join(tmp_dir, "pyproject.toml"))
+            for content, runs in [("a", "x"), ("b", "xx"), ("a", "xx")]:
+                write("src.in", content)
+                write("out.txt", "stale")
+                out = io.StringIO()
+                with contextlib.redirect_stdout(out):
+                    output = scripts.run_script("gen", cwd=tmp_dir)
+                self.assertEqual(output[0].stdout.strip(), b"built")
+                self.assertEqual(out.getvalue().strip(), "built")
+                self.assertEqual(read("out.txt"), "2")
+                self.assertEqual(read("runs.log"), runs)
+            self.assertTrue(os.listdir(scripts.results.results_dir))
+
+    def test_run_script_async(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo", bar="echo bar", baz="echo baz")
+        scripts["par"] = {"cmd": ["foo", "bar"], "parallel": True, "depends_on": ["baz"]}
+        out = io.StringIO()
+        result = asyncio.run(scripts.run_script_async("par", out_stream=out))
+        self.assertEqual(len(result), 3)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "[baz] baz")
+        self.assertEqual(sorted(lines[1:]), ["[bar] bar", "[foo] foo"])
+
+    @patch.dict(os.environ, {"GREETING": "hello  world"})
+    def test_run_script_call(self, mock_settings):
+        settings = mock_settings()
+        settings.call_workers = 0
+        scripts = Scripts(settings, foo="echo foo")
+        scripts["hello"] = {"call": "test.python_dev_cli.calls_test:greet", "args": ["$GREETING"]}
+        scripts["all"] = ["hello", "foo"]
+        self.assertEqual(scripts.get_script_command("hello"), ["test.python_dev_cli.calls_test:greet 'hello  world'"])
+
+        with patch("src.python_dev_cli.scripts.run", wraps=run) as mock_run:
+            result = scripts.run_script("all", capture_output=True)
+        self.assertEqual([res.stdout for res in result], [b"hello hello  world\n", b"foo\n"])
+        self.assertEqual(mock_run.call_count, 1)
+
+        out = io.StringIO()
+        asyncio.run(scripts.run_script_async("hello", out_stream=out))
+        self.assertEqual(out.getvalue(), "[hello] hello hello  world\n")
+
+        scripts["fail"] = {"call": "test.python_dev_cli.calls_test:fail"}
+        with self.assertRaises(CalledProcessError):
+            scripts.run_script("fail", capture_output=True)
+
+    def test_run_script_call_concurrent(self, mock_settings):
+        settings = mock_settings()
+        settings.call_workers = 0
+        scripts = Scripts(settings, b="echo b")
+        scripts["a"] = {"call": "test.python_dev_cli.calls_test:greet", "args": ["a"]}
+        scripts["pid"] = {"call": "test.python_dev_cli.calls_test:print_pid"}
+        scripts["both"] = {"cmd": ["a", "b"], "parallel": True}
+        scripts["pids"] = {"cmd": ["pid", "b"], "parallel": True}
+
+        out = io.StringIO()
+        asyncio.run(scripts.run_script_async("both", out_stream=out))
+        self.assertEqual(sorted(out.getvalue().splitlines()), ["[a] hello a", "[b] b"])
+
+        result = scripts.run_script("pids", capture_output=True)
+        self.assertNotEqual(int(next(res.stdout for res in result if res.stdout != b"b\n")), os.getpid())
+        self.assertEqual(int(scripts.run_script("pid", capture_output=True)[0].stdout), os.getpid())
+
+    def test_run_script_call_pool(self, mock_settings):
+        settings = Settings(include=["json"], call_workers=2)
+        scripts = Scripts(settings)
+        scripts["foo"] = {"call": "test.python_dev_cli.calls_test:print_pid", "preload": ["json.tool"]}
+        scripts["bar"] = {"call": "test.python_dev_cli.calls_test:print_pid"}
+        scripts["par"] = {"cmd": ["foo", "bar"], "parallel": True}
+        self.assertEqual(scripts.get_preload_modules(), ["json", "test.python_dev_cli.calls_test", "json.tool"])
+
+        try:
+            result = scripts.run_script("par", capture_output=True)
+            pids = {int(res.stdout) for res in result}
+            self.assertEqual(len(result), 2)
+            self.assertNotIn(os.getpid(), pids)
+
+            out = io.StringIO()
+            asyncio.run(scripts.run_script_async("foo", out_stream=out))
+            self.assertNotEqual(int(out.getvalue().split()[-1]), os.getpid())
+            self.assertTrue(scripts.pool.started)
+        finally:
+            scripts.pool.shutdown()
+        self.assertFalse(scripts.pool.started)
+
+    def test_run_script_retries(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            counter = os.path.join(tmp_dir, "counter")
+            code = f"import os, sys; open({counter!r}, 'a').write('x'); sys.exit(os.path.getsize({counter!r}) < 3)"
+            scripts["flaky"] = {"cmd": f'{sys.executable} -c "{code}"', "retries": 2, "retry_delay": 0}
+            scripts["all"] = ["flaky", "foo"]
+            self.assertEqual(scripts.get_script_policy("flaky").retries, 2)
+            result = scripts.run_script("all", capture_output=True)
+            self.assertEqual([res.returncode for res in result], [0, 0])
+            self.assertEqual(os.path.getsize(counter), 3)
+
+            os.remove(counter)
+            scripts["flaky"] = {"cmd": f'{sys.executable} -c "{code}"', "retries": 1, "retry_delay": 0}
+            with self.assertRaises(CalledProcessError):
+                scripts.run_script("flaky", capture_output=True)
+            self.assertEqual(os.path.getsize(counter), 2)
+
+    def test_run_script_timeout(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings)
+        scripts["slow"] = {"cmd": "python3 -c 'import time; time.sleep(10)'", "timeout": 0.5}
+        with self.assertRaises(TimeoutExpired):
+            scripts.run_script("slow", capture_output=True)
+        with self.assertRaises(TimeoutExpired):
+            asyncio.run(scripts.run_script_async("slow", out_stream=io.StringIO()))
+
+    @unittest.skipUnless(hasattr(os, "sched_setaffinity"), "sched_setaffinity is not available")
+    def test_run_script_limits(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings)
+        cpu = sorted(os.sched_getaffinity(0))[0]
+        code = "import os; print(os.nice(0), sorted(os.sched_getaffinity(0)))"
+        scripts["limited"] = {"cmd": f"python3 -c '{code}'", "nice": 1, "cpu_affinity": [cpu], "memory_limit": "4G"}
+        result = scripts.run_script("limited", capture_output=True)
+        self.assertEqual(result[0].stdout.decode().strip(), f"{os.nice(0) + 1} [{cpu}]")
+
+    def test_get_script_policy(self, mock_settings):
+        settings = mock_settings()
+        scripts = Scripts(settings, foo="echo foo")
+        scripts["bar"] = {"cmd": "echo bar", "timeout": 60, "memory_limit": "1K"}
+        self.assertEqual(scripts.get_script_policy("foo"), ScriptPolicy())
+        self.assertEqual(scripts.get_script_policy("bar"), ScriptPolicy(timeout=60, memory_limit=1024))
+        with self.assertRaises(KeyError):
+            scripts.get_script_policy("baz")
+
     def test_run_script_invalid_key(self, mock_settings):
         settings = mock_settings()
         scripts = Scripts(settings)
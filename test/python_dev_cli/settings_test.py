@@ -30,6 +30,10 @@ class TestSettings(unittest.TestCase):
         self.assertTrue(settings.parse_help)
         self.assertEqual(settings.include, [])
         self.assertEqual(settings.script_refs, "dev")
+        self.assertIsNone(settings.result_cache_dir)
+        self.assertEqual(settings.result_cache_size, 1024)
+        self.assertFalse(settings.preload_executables)
+        self.assertEqual(settings.call_workers, 0)
 
     def test_init_with_kwargs(self):
         settings = Settings(enable_templates=False, parse_help=False, include=["os"], script_refs="foo")
@@ -76,6 +80,50 @@ class TestSettings(unittest.TestCase):
         settings.include = ["os"]
         self.assertEqual(settings.include, ["os"])
 
+    def test_version(self):
+        settings = Settings()
+        version = settings.version
+        tests = [
+            {"key": "enable_templates", "value": False},
+            {"key": "parse_help", "value": False},
+            {"key": "include", "value": ["os"]},
+            {"key": "script_refs", "value": "foo"},
+            {"key": "result_cache_dir", "value": "~/.cache/python-dev-cli"},
+            {"key": "result_cache_size", "value": "256"},
+            {"key": "preload_executables", "value": True},
+            {"key": "call_workers", "value": "4"},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                setattr(settings, test["key"], test["value"])
+                self.assertGreater(settings.version, version)
+                version = settings.version
+
+    def test_version_not_listed(self):
+        settings = Settings()
+        self.assertNotIn("_version", dir(settings))
+        self.assertNotIn("_version", dict(settings))
+        self.assertNotIn("_version", str(settings))
+
+    def test_set_result_cache_size(self):
+        settings = Settings()
+        settings.result_cache_size = "0.5"
+        self.assertEqual(settings.result_cache_size, 0.5)
+
+    def test_set_preload_executables(self):
+        settings = Settings()
+        for test in cast_to_bool_tests:
+            with self.subTest(test=test):
+                settings.preload_executables = test["value"]
+                self.assertEqual(settings.preload_executables, test["expected"])
+
+    def test_set_call_workers(self):
+        settings = Settings()
+        settings.call_workers = "4"
+        self.assertEqual(settings.call_workers, 4)
+        with self.assertRaises(ValueError):
+            settings.call_workers = -1
+
     def test_set_script_refs(self):
         settings = Settings()
         settings.script_refs = "foo"
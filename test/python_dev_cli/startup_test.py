@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import Dict, List
+
+# Root directory of the repository, which must be on the Python path for the `src.python_dev_cli` package to import.
+repo_root: str = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Maximum total import time, in milliseconds, of a `dev` process; override with the environment variable below.
+import_budget_env_var: str = "PYTHON_DEV_CLI_IMPORT_BUDGET"
+default_import_budget: float = 250.0
+
+# Modules that are slow to import, and must not be imported unless a script actually needs them.
+deferred_modules: List[str] = ["asyncio", "importlib.metadata", "jinja2"]
+
+# Modules of the package that are only needed by some scripts (e.g. tables, calls or generated environment variables).
+deferred_package_modules: List[str] = ["calls", "capture", "env", "fingerprints", "graph", "policy", "results"]
+
+pyproject_toml: str = """
+[tool.python-dev-cli.settings]
+include = ["uuid"]
+
+[tool.python-dev-cli.scripts]
+hello = "echo hello"
+hello_twice = ["hello", "hello"]
+"""
+
+
+def get_import_times(argv: List[str], cwd: str) -> Dict[str, int]:
+    """Runs the dev CLI with the given args in a new Python process, using `python -X importtime`, and returns the
+    time it took to import each module (excluding the modules it imports).
+
+    :param argv: The command line args, excluding the program name.
+    :param cwd: The directory to run the dev CLI in.
+    :return: A dictionary mapping module names to import times, in microseconds.
+    """
+    code: str = f"import sys; sys.argv = {['dev', *argv]!r}; from src.python_dev_cli.cli import dev_cli; dev_cli()"
+    env: Dict[str, str] = {**os.environ, "PYTHONPATH": repo_root}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    times: Dict[str, int] = {}
+
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_time, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_time)
+
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp_dir.name, "pyproject.toml"), "w") as f:
+            f.write(pyproject_toml)
+        self.budget: float = float(os.getenv(import_budget_env_var, default_import_budget))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_startup(self):
+        tests = [
+            {"argv": ["--help"]},
+            {"argv": ["hello"]},
+            {"argv": ["hello_twice"]},
+            {"argv": ["--no-cache", "hello"]},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                times = get_import_times(test["argv"], self.tmp_dir.name)
+                self.assertIn("src.python_dev_cli.cli", times)
+                package_modules = [f"src.python_dev_cli.{module}" for module in deferred_package_modules]
+                for module in [*deferred_modules, *package_modules, "uuid"]:
+                    self.assertNotIn(module, times)
+                self.assertLess(sum(times.values()) / 1000, self.budget)
+
+    def test_startup_bundle(self):
+        with open(os.path.join(self.tmp_dir.name, "pyproject.toml"), "a") as f:
+            f.write('hello_template = "{{ dev.hello }} world"\n')
+        get_import_times(["--compile"], self.tmp_dir.name)
+        times = get_import_times(["hello_template"], self.tmp_dir.name)
+        for module in deferred_modules:
+            self.assertNotIn(module, times)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import importlib
+import os
+import os.path
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.python_dev_cli import templates
+from src.python_dev_cli.templates import (
+    LazyImport,
+    compile_template,
+    get_cache_info,
+    is_static_template,
+    set_bytecode_cache,
+)
+
+
+class TestTemplates(unittest.TestCase):
+    def setUp(self):
+        set_bytecode_cache(None)
+
+    def tearDown(self):
+        set_bytecode_cache(None)
+
+    def test_compile_template(self):
+        template = compile_template("echo {{ 2 + 2 }}")
+        self.assertEqual(template.render(), "echo 4")
+        self.assertIs(compile_template("echo {{ 2 + 2 }}"), template)
+        info = compile_template.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_set_bytecode_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = os.path.join(tmp_dir, "templates")
+            set_bytecode_cache(directory)
+            compile_template("echo {{ 2 + 2 }}")
+            self.assertEqual(len(os.listdir(directory)), 1)
+            set_bytecode_cache(directory)
+            self.assertEqual(compile_template("echo {{ 2 + 2 }}").render(), "echo 4")
+            bytecode_cache = templates.get_environment().bytecode_cache
+            self.assertEqual((bytecode_cache.hits, bytecode_cache.misses), (1, 0))
+            self.assertIn("bytecode cache: 1 hits, 0 misses", get_cache_info())
+
+    def test_get_cache_info(self):
+        compile_template("echo {{ 2 + 2 }}")
+        compile_template("echo {{ 2 + 2 }}")
+        self.assertTrue(get_cache_info().startswith("Template cache: 1 hits, 1 misses, 1/"))
+
+    def test_is_static_template(self):
+        tests = [
+            {"script": "echo {{ dev.foo }}", "expected": True},
+            {"script": "echo {{ 2 + 2 }} {{ range(3) | list }}", "expected": True},
+            {"script": "echo {{ os.getcwd() }}", "expected": False},
+            {"script": "echo {{ scripts.foo }}", "expected": False},
+            {"script": "echo {{ lipsum() }}", "expected": False},
+            {"script": "echo {{ [1, 2] | random }}", "expected": False},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                self.assertEqual(is_static_template(test["script"], "dev"), test["expected"])
+
+
+class TestLazyImport(unittest.TestCase):
+    @patch("src.python_dev_cli.templates.importlib.import_module", wraps=importlib.import_module)
+    def test_lazy_import(self, mock_import_module):
+        join = LazyImport("os.path", "join")
+        path = LazyImport("os.path")
+        mock_import_module.assert_not_called()
+        self.assertEqual(join("foo", "bar"), os.path.join("foo", "bar"))
+        self.assertEqual(path.sep, os.path.sep)
+        self.assertEqual(compile_template("{{ path.join('a', 'b') }}").render(path=path), os.path.join("a", "b"))
+        self.assertEqual(mock_import_module.call_count, 2)
+
+    def test_lazy_import_not_found(self):
+        with self.assertRaises(ModuleNotFoundError):
+            str(LazyImport("not_a_module"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from src.python_dev_cli.timings import (
+    command_category,
+    disable_timings,
+    enable_timings,
+    get_timings,
+    timed,
+    which_category,
+)
+
+
+class TestTimings(unittest.TestCase):
+    def tearDown(self):
+        disable_timings()
+
+    def test_timed_disabled(self):
+        with timed("foo"):
+            pass
+        self.assertIsNone(get_timings())
+
+    def test_timed(self):
+        timings = enable_timings()
+        self.assertIs(get_timings(), timings)
+        with timed("foo"):
+            pass
+        with self.assertRaises(ValueError):
+            with timed("bar"):
+                raise ValueError("bar")
+        self.assertEqual([event["name"] for event in timings.events], ["foo", "bar"])
+        self.assertTrue(all(event["dur"] >= 0 and event["ph"] == "X" for event in timings.events))
+
+    @unittest.skipIf(sys.platform == "win32", "resource module is not available")
+    def test_timed_command(self):
+        timings = enable_timings()
+        with timed("[foo] python", command_category):
+            subprocess.run([sys.executable, "-c", "sum(range(10 ** 6))"], check=True)
+        args = timings.events[0]["args"]
+        self.assertGreater(args["cpu_ms"], 0)
+        self.assertGreater(args["max_rss_kb"], 0)
+
+    def test_format_summary(self):
+        timings = enable_timings()
+        for name, category in [("toml parse", "phase"), ("which ls", which_category), ("which rm", which_category)]:
+            with timed(name, category):
+                pass
+        with timed("[foo] ls", command_category):
+            pass
+        summary = timings.format_summary()
+        self.assertRegex(summary, r"shutil.which\s+2 ")
+        self.assertRegex(summary, r"toml parse\s+1 ")
+        self.assertIn("[foo] ls", summary)
+        self.assertIn("Max RSS so far (KB)", summary)  # The OS only reports the peak of all child processes so far.
+
+    def test_write_trace(self):
+        timings = enable_timings()
+        with timed("foo"):
+            pass
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.json")
+            timings.write_trace(path)
+            with open(path) as file:
+                trace = json.load(file)
+        self.assertEqual([event["name"] for event in trace["traceEvents"]], ["foo"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from src.python_dev_cli.scripts import Scripts
+from src.python_dev_cli.settings import Settings
+from src.python_dev_cli.watch import (
+    InotifyWatcher,
+    PathMatcher,
+    PollingWatcher,
+    compile_pattern,
+    get_watch_patterns,
+    watch_script,
+)
+
+
+class TestPathMatcher(unittest.TestCase):
+    def test_compile_pattern(self):
+        tests = [
+            {"pattern": "src/**/*.py", "path": "src/a.py", "expected": True},
+            {"pattern": "src/**/*.py", "path": "src/pkg/sub/a.py", "expected": True},
+            {"pattern": "src/**/*.py", "path": "test/a.py", "expected": False},
+            {"pattern": "src/*.py", "path": "src/pkg/a.py", "expected": False},
+            {"pattern": "*.toml", "path": "pyproject.toml", "expected": True},
+            {"pattern": "data/file?.[ct]sv", "path": "data/file1.csv", "expected": True},
+            {"pattern": "data/file?.[!ct]sv", "path": "data/file1.csv", "expected": False},
+            {"pattern": "docs/**", "path": "docs/a/b.md", "expected": True},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                self.assertEqual(bool(compile_pattern(test["pattern"]).match(test["path"])), test["expected"])
+
+    def test_matcher(self):
+        matcher = PathMatcher(["src/**/*.py", "src/pkg/*.json", "*.toml"], ["src/generated/*.py"])
+        self.assertEqual(matcher.roots, ["."])
+        self.assertTrue(matcher.matches("src/pkg/a.py"))
+        self.assertFalse(matcher.matches("src/generated/a.py"))
+        self.assertTrue(matcher.should_descend("src/pkg/sub"))
+        self.assertFalse(matcher.should_descend("test"))
+        self.assertFalse(matcher.should_descend("src/.hidden"))
+        self.assertFalse(matcher.should_descend("src/__pycache__"))
+
+        matcher = PathMatcher(["src/pkg/*.json", "src/*.py"])
+        self.assertEqual(matcher.roots, ["src"])
+        self.assertTrue(matcher.should_descend("src/pkg"))
+        self.assertFalse(matcher.should_descend("src/pkg/sub"))
+
+        matcher = PathMatcher()
+        self.assertEqual(matcher.roots, ["."])
+        self.assertTrue(matcher.matches("anything.txt"))
+        self.assertTrue(matcher.should_descend("any/dir"))
+        self.assertFalse(matcher.should_descend(".git"))
+
+    def test_get_watch_patterns(self):
+        scripts = Scripts(Settings(), lint="ruff .", test="pytest", all=["lint", "test"])
+        scripts["lint"] = {"cmd": "ruff .", "inputs": ["src/**/*.py"]}
+        scripts["test"] = {"cmd": "pytest", "inputs": ["src/**/*.py", "test/**/*.py"], "outputs": [".coverage"]}
+        self.assertEqual(get_watch_patterns(scripts, "all"), (["src/**/*.py", "test/**/*.py"], [".coverage"]))
+        with self.assertRaises(KeyError):
+            get_watch_patterns(scripts, "invalid_key")
+
+
+class WatcherTestMixin:
+    watcher_class = None
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        os.makedirs(os.path.join(self.root, "src", "pkg"))
+        self.write("src/a.py", "a = 1")
+        self.write("README.md", "")
+        self.watcher = self.watcher_class(self.root, PathMatcher(["src/**/*.py"]))
+
+    def tearDown(self):
+        self.watcher.close()
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        with open(os.path.join(self.root, path), "w") as file:
+            file.write(content)
+
+    def test_wait(self):
+        self.assertEqual(self.watcher.wait(0.1), set())
+        self.write("README.md", "ignored")
+        self.write("src/a.py", "a = 2")
+        self.assertEqual(self.watcher.wait(2), {"src/a.py"})
+
+    def test_wait_new_directory(self):
+        os.makedirs(os.path.join(self.root, "src", "new"))
+        self.write("src/new/b.py", "b = 1")
+        changes = self.watcher.wait(2)
+        while "src/new/b.py" not in changes and (more := self.watcher.wait(2)):
+            changes |= more
+        self.assertIn("src/new/b.py", changes)
+        os.remove(os.path.join(self.root, "src", "new", "b.py"))
+        self.assertEqual(self.watcher.wait(2), {"src/new/b.py"})
+
+
+class TestPollingWatcher(WatcherTestMixin, unittest.TestCase):
+    watcher_class = staticmethod(lambda root, matcher: PollingWatcher(root, matcher, interval=0.05))
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on Linux")
+class TestInotifyWatcher(WatcherTestMixin, unittest.TestCase):
+    watcher_class = InotifyWatcher
+
+
+class FakeWatcher:
+    """A watcher that reports each of the given sets of changes in turn, and then no further changes."""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.closed = False
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, 0.05))
+        return self.changes.pop(0) if self.changes else set()
+
+    def close(self):
+        self.closed = True
+
+
+class TestWatchScript(unittest.IsolatedAsyncioTestCase):
+    async def test_watch_script(self):
+        code = "import time; print('start', flush=True); time.sleep(0.5); print('done')"
+        scripts = Scripts(Settings(), slow=f'{sys.executable} -c "{code}"')
+        # The first change arrives while the script is running, so it is cancelled; the second is debounced with it.
+        watcher = FakeWatcher([set(), {"src/a.py"}, {"src/b.py"}])
+        out = io.StringIO()
+
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            task = asyncio.create_task(watch_script(scripts, "slow", debounce=0, watcher=watcher))
+            await asyncio.sleep(1.5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertTrue(watcher.closed)
+        self.assertEqual(out.getvalue().count("[slow] start"), 2)
+        self.assertEqual(out.getvalue().count("[slow] done"), 1)
+
+    async def test_watch_script_error(self):
+        scripts = Scripts(Settings(), broken="echo {{ undefined() }}")
+        watcher = FakeWatcher([set(), {"src/a.py"}])
+        err = io.StringIO()
+
+        with contextlib.redirect_stderr(err), self.assertLogs("src.python_dev_cli.watch", "ERROR") as logs:
+            task = asyncio.create_task(watch_script(scripts, "broken", debounce=0, watcher=watcher))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("ScriptTemplateError", logs.output[0])
+        self.assertEqual(err.getvalue().count("Waiting for changes to re-run [broken]"), 2)
+
+    async def test_watch_script_invalid_key(self):
+        with self.assertRaises(KeyError):
+            await watch_script(Scripts(Settings()), "invalid_key", watcher=FakeWatcher([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
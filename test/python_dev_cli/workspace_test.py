@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import io
+import os
+import subprocess
+import tempfile
+import unittest
+
+from src.python_dev_cli.workspace import (
+    Project,
+    ProjectResult,
+    WorkspaceError,
+    find_projects,
+    format_summary,
+    get_changed_projects,
+    run_workspace,
+)
+
+print_cwd = "python3 -c 'import os; print(os.getcwd())'"
+
+pyproject_tomls = {
+    "pyproject.toml": '[tool.python-dev-cli.scripts]\ntest = "echo root"\n',
+    "packages/a/pyproject.toml": f'[tool.python-dev-cli.scripts]\ntest = "{print_cwd}"\n',
+    "packages/b/pyproject.toml": "[tool.python-dev-cli.scripts]\ntest = \"python3 -c 'import sys; sys.exit(3)'\"\n",
+    "packages/c/pyproject.toml": '[tool.python-dev-cli.scripts]\nlint = "echo lint"\n',
+    "packages/c/nested/pyproject.toml": '[project]\nname = "nested"\n',
+    "packages/a/.venv/lib/pyproject.toml": "",
+    "packages/a/env/pyvenv.cfg": "",
+    "packages/a/env/pyproject.toml": "",
+    "node_modules/pkg/pyproject.toml": "",
+    "build/lib/pyproject.toml": "",
+}
+
+
+class TestWorkspace(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp_dir.name)
+        for path, content in pyproject_tomls.items():
+            self.write(path, content)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+        with open(os.path.join(self.root, path), "w") as file:
+            file.write(content)
+
+    def project(self, name):
+        return Project(os.path.normpath(os.path.join(self.root, name)), name)
+
+    def git(self, *args):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+            cwd=self.root,
+            capture_output=True,
+            check=True,
+        )
+
+    def test_find_projects(self):
+        tests = [
+            {"patterns": None, "expected": [".", "packages/a", "packages/b", "packages/c", "packages/c/nested"]},
+            {"patterns": ["packages/*"], "expected": ["packages/a", "packages/b", "packages/c"]},
+            {"patterns": ["packages/**"], "expected": ["packages/a", "packages/b", "packages/c", "packages/c/nested"]},
+            {"patterns": ["packages/a", "packages/c/"], "expected": ["packages/a", "packages/c"]},
+            {"patterns": ["missing/*"], "expected": []},
+        ]
+        for test in tests:
+            with self.subTest(test=test):
+                projects = find_projects(self.root, test["patterns"])
+                self.assertEqual(projects, [self.project(name) for name in test["expected"]])
+
+    def test_get_changed_projects(self):
+        self.git("init", "-q")
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", "initial")
+        projects = find_projects(self.root)
+        self.assertEqual(get_changed_projects(self.root, projects, "HEAD"), [])
+
+        self.write("packages/a/src/module.py", "")  # Untracked.
+        self.write("packages/c/nested/pyproject.toml", "")  # Belongs to the nested project, not packages/c.
+        self.write("README.md", "")
+        changed = get_changed_projects(self.root, projects, "HEAD")
+        self.assertEqual(changed, [self.project(name) for name in [".", "packages/a", "packages/c/nested"]])
+
+        with self.assertRaises(WorkspaceError):
+            get_changed_projects(self.root, projects, "no-such-ref")
+
+    def test_run_workspace(self):
+        projects = find_projects(self.root)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            results = asyncio.run(run_workspace(projects, "test", jobs=2, use_cache=False))
+
+        self.assertEqual([result.project for result in results], projects)
+        self.assertEqual([result.status for result in results], ["ok", "ok", "failed", "skipped", "skipped"])
+        self.assertIn("exit status 3", results[2].error)
+        lines = stdout.getvalue().splitlines()
+        self.assertIn("[.:test] root", lines)
+        self.assertIn(f"[packages/a:test] {self.project('packages/a').path}", lines)
+
+    @unittest.skipUnless(os.name == "posix", "the tool is a shell script")
+    def test_run_workspace_project_root(self):
+        self.write(
+            "packages/c/pyproject.toml",
+            '[tool.python-dev-cli.settings]\nenable_templates = true\ninclude = ["os"]\n'
+            f'[tool.python-dev-cli.env]\nPROJECT_DIR = "{print_cwd}"\n'
+            '[tool.python-dev-cli.scripts]\nlint = "./bin/tool $PROJECT_DIR {{ os.getcwd() }}"\n',
+        )
+        self.write("packages/c/bin/tool", '#!/bin/sh\necho "$@"\n')
+        os.chmod(os.path.join(self.root, "packages/c/bin/tool"), 0o755)
+
+        for use_cache in [False, True]:
+            with self.subTest(use_cache=use_cache):
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+                    results = asyncio.run(run_workspace(find_projects(self.root), "lint", use_cache=use_cache))
+
+                # The environment variable, the executable and the template all use the project directory.
+                self.assertEqual([result.status for result in results if result.status != "skipped"], ["ok"])
+                path = self.project("packages/c").path
+                self.assertIn(f"[packages/c:lint] {path} {path}", stdout.getvalue().splitlines())
+                self.assertNotEqual(os.getcwd(), path)
+
+    def test_format_summary(self):
+        results = [
+            ProjectResult(self.project("packages/a"), "ok", 1.5),
+            ProjectResult(self.project("packages/b"), "failed", 2.25, "boom"),
+            ProjectResult(self.project("packages/c"), "skipped", 0.0),
+        ]
+        lines = format_summary("test", results, 3.0).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith("FAILED") and lines[1].endswith("packages/b: boom"))
+        self.assertTrue(lines[2].startswith("OK") and lines[2].endswith("packages/a"))
+        self.assertEqual(
+            lines[3], "Ran `test` in 2 of 3 projects in 3.00s: 1 ok, 1 failed, 1 skipped (script not defined)"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()